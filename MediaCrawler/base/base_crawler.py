@@ -8,11 +8,29 @@
 # 详细许可条款请参阅项目根目录下的LICENSE文件。
 # 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
 
+import asyncio
+import inspect
+from contextlib import asynccontextmanager
 from abc import ABC, abstractmethod
-from typing import Dict, Optional
+from http.cookiejar import CookieJar, DefaultCookiePolicy
+from typing import TYPE_CHECKING, Any, AsyncIterator, Dict, List, Optional, Tuple, Type
 
+import httpx
 from playwright.async_api import BrowserContext, BrowserType, Playwright
 
+import config
+from base.request_pipeline import (CacheMiddleware, MetricsMiddleware,
+                                   ProxyRotationMiddleware,
+                                   RateLimitMiddleware, RequestContext,
+                                   RequestMiddleware, RequestPipeline,
+                                   RetryMiddleware, SigningMiddleware)
+from cache.abs_cache import AbstractCache
+from tools import utils
+
+if TYPE_CHECKING:
+    from proxy.proxy_ip_pool import ProxyIpPool
+    from proxy.types import IpInfoModel
+
 
 class AbstractCrawler(ABC):
 
@@ -84,12 +102,32 @@ class AbstractStore(ABC):
     async def store_comment(self, comment_item: Dict):
         pass
 
+    async def store_contents(self, content_items: List[Dict]):
+        """
+        store a batch of contents, db backends override this with a bulk upsert
+        """
+        for content_item in content_items:
+            await self.store_content(content_item)
+
+    async def store_comments(self, comment_items: List[Dict]):
+        """
+        store a batch of comments (usually one page), db backends override this with a bulk upsert
+        """
+        for comment_item in comment_items:
+            await self.store_comment(comment_item)
+
     # TODO support all platform
     # only xhs is supported, so @abstractmethod is commented
     @abstractmethod
     async def store_creator(self, creator: Dict):
         pass
 
+    async def close(self):
+        """
+        flush buffered data and release file handles, called when the crawler finishes
+        """
+        pass
+
 
 class AbstractStoreImage(ABC):
     # TODO: support all platform
@@ -107,12 +145,288 @@ class AbstractStoreVideo(ABC):
         pass
 
 
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+_response_cache: Optional[AbstractCache] = None
+
+
+def get_response_cache() -> AbstractCache:
+    """
+    response cache shared by all api clients of the process, the backend is config.REQUEST_CACHE_TYPE
+    """
+    global _response_cache
+    if _response_cache is None:
+        from cache.cache_factory import CacheFactory
+        _response_cache = CacheFactory.create_cache(config.REQUEST_CACHE_TYPE)
+    return _response_cache
+
+
 class AbstractApiClient(ABC):
+    # 长连接池, 第一次请求时创建; 子类在 __init__ 中设置 self.proxy / self.timeout
+    _http_client: Optional[httpx.AsyncClient] = None
+    _http_client_proxy: Optional[str] = None
+    _retired_http_clients: Optional[List[httpx.AsyncClient]] = None
+    # 每个连接池上进行中的请求数, 换代理后旧连接池在最后一个请求结束时关闭
+    _http_client_users: Optional[Dict[httpx.AsyncClient, int]] = None
+    _pipeline: Optional[RequestPipeline] = None
+    # 平台可重试的业务异常, 网络层异常(httpx.TransportError)总是可重试
+    retryable_errors: Tuple[Type[Exception], ...] = ()
+    # 表示请求过快的异常(验证码、封禁等), 触发限速器成倍降速
+    throttle_errors: Tuple[Type[Exception], ...] = ()
+    # 设置代理池后, 遇到这些异常以及 throttle_errors 时换一个代理重试
+    proxy_rotate_errors: Tuple[Type[Exception], ...] = (httpx.TimeoutException, httpx.ProxyError)
+    # 代理池及当前租借的代理, 由 use_proxy_pool 设置
+    ip_pool: Optional["ProxyIpPool"] = None
+    proxy_info: Optional["IpInfoModel"] = None
+    _proxy_rotate_lock: Optional[asyncio.Lock] = None
+    # 标识登录账号的 cookie 名, 用于区分响应缓存; 为空时使用整个 Cookie 请求头
+    identity_cookies: Tuple[str, ...] = ()
 
     @abstractmethod
     async def request(self, method, url, **kwargs):
         pass
 
+    async def sign_request(self, ctx: RequestContext):
+        """
+        Platform signer, called before every attempt. Read the unsigned input from ctx.options
+        and write the signed headers/params into ctx.kwargs (or ctx.url)
+        """
+        pass
+
+    def classify_response(self, ctx: RequestContext) -> Any:
+        """
+        Platform error classifier: raise the platform exception for blocked or failed responses,
+        otherwise return the payload of ctx.response; may be a coroutine when it has to await IO
+        """
+        return ctx.response
+
+    def rate_limit_key(self, ctx: RequestContext) -> str:
+        """
+        key of the shared token bucket, the request host by default; platforms crawling with
+        several accounts can append an account id
+        """
+        return httpx.URL(ctx.url).host
+
+    def cache_identity(self) -> str:
+        """
+        account dimension of the response cache key: the identity_cookies of the current Cookie header,
+        or the whole header; an empty string means not logged in
+        """
+        headers = getattr(self, "headers", None) or {}
+        cookie_str = headers.get("Cookie") or headers.get("cookie") or ""
+        if not self.identity_cookies:
+            return cookie_str
+        cookie_dict = utils.convert_str_cookie_to_dict(cookie_str)
+        return ";".join(f"{name}={cookie_dict[name]}" for name in self.identity_cookies if cookie_dict.get(name))
+
+    def build_middlewares(self) -> List[RequestMiddleware]:
+        """
+        middlewares of the request pipeline, outermost first; platforms may override to add their own
+        """
+        middlewares: List[RequestMiddleware] = [MetricsMiddleware(self.__class__.__name__)]
+        if config.ENABLE_REQUEST_CACHE or config.REQUEST_CACHE_TTL_SEC > 0:
+            middlewares.append(CacheMiddleware(
+                get_response_cache(),
+                config.REQUEST_CACHE_TTL_SEC,
+                namespace=self.__class__.__name__,
+                endpoint_ttls=config.REQUEST_CACHE_ENDPOINT_TTL_SEC if config.ENABLE_REQUEST_CACHE else None,
+                ignore_params=config.REQUEST_CACHE_IGNORE_PARAMS,
+                bypass=config.REQUEST_CACHE_BYPASS,
+                identity=self.cache_identity,
+            ))
+        retry_on = (httpx.TransportError,) + tuple(self.retryable_errors)
+        if self.ip_pool is not None:
+            # 封禁类异常换代理后可以重试
+            retry_on += self.rotate_on
+        middlewares.append(RetryMiddleware(
+            max_attempts=config.REQUEST_MAX_ATTEMPTS,
+            base_delay_sec=config.REQUEST_RETRY_BASE_DELAY_SEC,
+            max_delay_sec=config.REQUEST_RETRY_MAX_DELAY_SEC,
+            retry_on=retry_on,
+        ))
+        if self.ip_pool is not None:
+            middlewares.append(ProxyRotationMiddleware(
+                lambda: getattr(self, "proxy", None), self.rotate_proxy, self._report_proxy_success, self.rotate_on,
+            ))
+        if config.ENABLE_ADAPTIVE_RATE_LIMIT:
+            middlewares.append(RateLimitMiddleware(self.rate_limit_key, throttle_errors=tuple(self.throttle_errors)))
+        middlewares.append(SigningMiddleware(self.sign_request))
+        return middlewares
+
+    @property
+    def rotate_on(self) -> Tuple[Type[Exception], ...]:
+        return tuple(self.proxy_rotate_errors) + tuple(self.throttle_errors)
+
+    def use_proxy_pool(self, ip_pool: Optional["ProxyIpPool"], proxy_info: Optional["IpInfoModel"] = None):
+        """
+        Rotate to a fresh lease of ip_pool when a request is blocked or times out.
+        proxy_info is the lease the client currently uses (self.proxy)
+        """
+        self.ip_pool = ip_pool
+        self.proxy_info = proxy_info
+        # 重新构建请求管道, 加入代理切换中间件
+        self._pipeline = None
+
+    async def rotate_proxy(self, failed_proxy: Optional[str], error: Exception):
+        """
+        report the failed lease and switch self.proxy to a new one, get_http_client rebuilds the
+        connection pool on the new proxy for the next request. The failure is reported before
+        leasing, and the failed proxy is excluded, so it is never leased again right away
+        """
+        if self._proxy_rotate_lock is None:
+            self._proxy_rotate_lock = asyncio.Lock()
+        async with self._proxy_rotate_lock:
+            if getattr(self, "proxy", None) != failed_proxy:
+                # 并发的请求已经切换过代理
+                return
+            old_info = self.proxy_info
+            if old_info is not None:
+                self.ip_pool.report_failure(old_info)
+                self.ip_pool.release_proxy(old_info)
+            try:
+                new_info = await self.ip_pool.get_proxy(exclude=[old_info] if old_info is not None else None)
+            except Exception as e:
+                utils.logger.error(f"[AbstractApiClient.rotate_proxy] get new proxy err: {e}, keep using {failed_proxy}")
+                return
+            _, new_proxy = utils.format_proxy_info(new_info)
+            if new_proxy == failed_proxy:
+                self.ip_pool.release_proxy(new_info)
+                utils.logger.warning(f"[AbstractApiClient.rotate_proxy] no other proxy than {failed_proxy}, keep using it")
+                return
+            self.proxy_info = new_info
+            self.proxy = new_proxy
+            utils.logger.warning(
+                f"[AbstractApiClient.rotate_proxy] {self.__class__.__name__} switch proxy "
+                f"{failed_proxy} -> {new_proxy} after {error.__class__.__name__}: {error}"
+            )
+
+    def _report_proxy_success(self, proxy: Optional[str], latency_sec: float):
+        if self.proxy_info is not None and proxy == getattr(self, "proxy", None):
+            self.ip_pool.report_success(self.proxy_info, latency_sec)
+
+    @property
+    def pipeline(self) -> RequestPipeline:
+        if self._pipeline is None:
+            self._pipeline = RequestPipeline(self.build_middlewares(), self._send)
+        return self._pipeline
+
+    async def _send(self, ctx: RequestContext) -> Any:
+        async with self.use_http_client() as client:
+            ctx.response = await client.request(ctx.method, ctx.url, **ctx.kwargs)
+        result = self.classify_response(ctx)
+        if inspect.isawaitable(result):
+            result = await result
+        return result
+
+    async def execute(self, method: str, url: str, options: Optional[Dict] = None, **kwargs) -> Any:
+        """
+        Send one api request through the pipeline (metrics -> cache -> retry -> rate limit -> signing)
+        Args:
+            method: http method
+            url: request url
+            options: platform options read by sign_request/classify_response
+            **kwargs: httpx request arguments
+
+        Returns:
+            the value returned by classify_response
+        """
+        ctx = RequestContext(method=method, url=url, kwargs=kwargs, options=options or {})
+        return await self.pipeline(ctx)
+
+    def request_stats(self) -> Optional[Dict[str, Any]]:
+        metrics = self._pipeline.find(MetricsMiddleware) if self._pipeline else None
+        if not metrics:
+            return None
+        stats = metrics.stats()
+        cache = self._pipeline.find(CacheMiddleware)
+        if cache:
+            stats.update(cache.stats())
+        return stats
+
+    def get_http_client(self) -> httpx.AsyncClient:
+        """
+        Return the long-lived pooled client of this api client (keep-alive, optional HTTP/2).
+        The pool is bound to self.proxy, after a proxy switch a new pool is created transparently;
+        the old one is closed once the requests running on it through use_http_client() have finished.
+        """
+        proxy = getattr(self, "proxy", None)
+        if self._http_client is not None and not self._http_client.is_closed and self._http_client_proxy == proxy:
+            return self._http_client
+        if self._http_client is not None and not self._http_client.is_closed:
+            if self._retired_http_clients is None:
+                self._retired_http_clients = []
+            self._retired_http_clients.append(self._http_client)
+        http2 = config.HTTP_CLIENT_HTTP2 and _http2_available()
+        limits = httpx.Limits(
+            max_connections=config.HTTP_CLIENT_MAX_CONNECTIONS,
+            max_keepalive_connections=config.HTTP_CLIENT_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=config.HTTP_CLIENT_KEEPALIVE_EXPIRY,
+        )
+        transport = None
+        if config.HTTP_REPLAY_MODE:
+            from tools.http_replay import create_replay_transport
+            transport = create_replay_transport(config.HTTP_REPLAY_MODE, proxy=proxy, http2=http2, limits=limits)
+        self._http_client = httpx.AsyncClient(
+            # 录制/回放时代理由 transport 处理
+            proxy=None if transport else proxy,
+            transport=transport,
+            timeout=getattr(self, "timeout", None) or httpx.Timeout(5.0),
+            http2=http2,
+            # 不保存响应中的 Set-Cookie, cookie 只由各平台的 headers/update_cookies 决定, 与每次新建客户端时一致
+            cookies=CookieJar(policy=DefaultCookiePolicy(allowed_domains=[])),
+            limits=limits,
+        )
+        self._http_client_proxy = proxy
+        return self._http_client
+
+    @asynccontextmanager
+    async def use_http_client(self) -> AsyncIterator[httpx.AsyncClient]:
+        """
+        the pooled client for one request, counted so a pool retired by a proxy switch is not
+        closed under a running request
+        """
+        client = self.get_http_client()
+        if self._http_client_users is None:
+            self._http_client_users = {}
+        self._http_client_users[client] = self._http_client_users.get(client, 0) + 1
+        try:
+            yield client
+        finally:
+            self._http_client_users[client] -= 1
+            if not self._http_client_users[client]:
+                del self._http_client_users[client]
+            await self._close_idle_retired_clients()
+
+    async def _close_idle_retired_clients(self):
+        users = self._http_client_users or {}
+        idle = [client for client in self._retired_http_clients or [] if client not in users]
+        if not idle:
+            return
+        self._retired_http_clients = [client for client in self._retired_http_clients if client in users]
+        for client in idle:
+            await client.aclose()
+
+    async def aclose(self):
+        """
+        close the pooled http client(s), called from the crawler close()
+        """
+        stats = self.request_stats()
+        if stats and stats["requests"]:
+            utils.logger.info(f"[AbstractApiClient.aclose] request stats: {stats}")
+        clients = list(self._retired_http_clients or [])
+        if self._http_client is not None:
+            clients.append(self._http_client)
+        self._http_client = None
+        self._retired_http_clients = None
+        for client in clients:
+            await client.aclose()
+
     @abstractmethod
     async def update_cookies(self, browser_context: BrowserContext):
         pass
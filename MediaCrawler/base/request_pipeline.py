@@ -0,0 +1,301 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+# @Desc    : API 请求管道：签名、限速、重试、指标、响应缓存等中间件，由 AbstractApiClient.execute 统一调度
+import asyncio
+import hashlib
+import json
+import random
+import time
+from dataclasses import dataclass, field
+from typing import (Any, Awaitable, Callable, Dict, Iterable, List, Optional,
+                    Tuple, Type)
+
+import httpx
+
+from cache.abs_cache import AbstractCache
+from tools import utils
+from tools.rate_limiter import get_token_bucket
+
+
+@dataclass
+class RequestContext:
+    method: str
+    url: str
+    # 传给 httpx 的参数, 例如 headers / params / data
+    kwargs: Dict[str, Any] = field(default_factory=dict)
+    # 平台自定义选项, 例如待签名的 uri、return_response
+    options: Dict[str, Any] = field(default_factory=dict)
+    attempt: int = 1
+    response: Optional[httpx.Response] = None
+
+
+Handler = Callable[[RequestContext], Awaitable[Any]]
+
+
+class RequestMiddleware:
+    """
+    A middleware wraps the rest of the pipeline: it may change the context before calling
+    call_next, and inspect, replace or retry the result afterwards.
+    """
+
+    async def handle(self, ctx: RequestContext, call_next: Handler) -> Any:
+        return await call_next(ctx)
+
+
+class SigningMiddleware(RequestMiddleware):
+    """
+    run the platform signer before every attempt, so a retried request gets a fresh signature
+    """
+
+    def __init__(self, signer: Callable[[RequestContext], Awaitable[None]]):
+        self.signer = signer
+
+    async def handle(self, ctx: RequestContext, call_next: Handler) -> Any:
+        await self.signer(ctx)
+        return await call_next(ctx)
+
+
+class RateLimitMiddleware(RequestMiddleware):
+    """
+    Acquire a token from the adaptive bucket of the request host before sending, and feed the
+    outcome back: success speeds the bucket up, throttle errors or HTTP 429 slow it down
+    """
+
+    def __init__(self, bucket_key: Callable[[RequestContext], str],
+                 throttle_errors: Tuple[Type[BaseException], ...] = ()):
+        self.bucket_key = bucket_key
+        self.throttle_errors = throttle_errors
+
+    async def handle(self, ctx: RequestContext, call_next: Handler) -> Any:
+        bucket = get_token_bucket(self.bucket_key(ctx))
+        await bucket.acquire()
+        ctx.response = None
+        try:
+            result = await call_next(ctx)
+        except Exception as e:
+            if isinstance(e, self.throttle_errors) or self._too_many_requests(ctx):
+                self._throttled(bucket, ctx)
+            raise
+        if self._too_many_requests(ctx):
+            self._throttled(bucket, ctx)
+        else:
+            bucket.on_success()
+        return result
+
+    @staticmethod
+    def _too_many_requests(ctx: RequestContext) -> bool:
+        return ctx.response is not None and ctx.response.status_code == 429
+
+    @staticmethod
+    def _throttled(bucket, ctx: RequestContext):
+        bucket.on_throttled()
+        utils.logger.warning(f"[RateLimitMiddleware] throttled by {ctx.url}, slow down to {bucket.rate:.3f} req/s")
+
+
+class ProxyRotationMiddleware(RequestMiddleware):
+    """
+    Sits inside RetryMiddleware: on block/timeout errors the client switches to a fresh proxy lease
+    before the error reaches the retry loop, so the retry goes out through the new proxy.
+    Successful requests report their latency back to the proxy pool.
+    """
+
+    def __init__(self, current_proxy: Callable[[], Optional[str]],
+                 rotate: Callable[[Optional[str], Exception], Awaitable[None]],
+                 report_success: Callable[[Optional[str], float], None],
+                 rotate_on: Tuple[Type[BaseException], ...]):
+        self.current_proxy = current_proxy
+        self.rotate = rotate
+        self.report_success = report_success
+        self.rotate_on = rotate_on
+        self.rotations = 0
+
+    async def handle(self, ctx: RequestContext, call_next: Handler) -> Any:
+        proxy = self.current_proxy()
+        start = time.monotonic()
+        try:
+            result = await call_next(ctx)
+        except self.rotate_on as e:
+            self.rotations += 1
+            await self.rotate(proxy, e)
+            raise
+        self.report_success(proxy, time.monotonic() - start)
+        return result
+
+
+class RetryMiddleware(RequestMiddleware):
+    """
+    retry the inner pipeline on retryable errors with exponential backoff and jitter
+    """
+
+    def __init__(self, max_attempts: int, base_delay_sec: float, max_delay_sec: float,
+                 retry_on: Tuple[Type[BaseException], ...] = (httpx.TransportError,)):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay_sec = base_delay_sec
+        self.max_delay_sec = max_delay_sec
+        self.retry_on = retry_on
+
+    def backoff(self, attempt: int) -> float:
+        # 等待时间在 [delay/2, delay] 之间随机, 避免多个协程同时重试
+        delay = min(self.max_delay_sec, self.base_delay_sec * (2 ** (attempt - 1)))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    async def handle(self, ctx: RequestContext, call_next: Handler) -> Any:
+        for attempt in range(1, self.max_attempts + 1):
+            ctx.attempt = attempt
+            try:
+                return await call_next(ctx)
+            except self.retry_on as e:
+                if attempt >= self.max_attempts:
+                    raise
+                delay = self.backoff(attempt)
+                utils.logger.warning(
+                    f"[RetryMiddleware] {ctx.method} {ctx.url} failed: {e.__class__.__name__} {e}, "
+                    f"retry in {delay:.2f}s ({attempt}/{self.max_attempts})"
+                )
+                await asyncio.sleep(delay)
+
+
+class MetricsMiddleware(RequestMiddleware):
+    """
+    count requests, failures, retries and latency of one client
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.requests = 0
+        self.failed = 0
+        self.retries = 0
+        self.total_latency_sec = 0.0
+
+    async def handle(self, ctx: RequestContext, call_next: Handler) -> Any:
+        start = time.monotonic()
+        self.requests += 1
+        try:
+            return await call_next(ctx)
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.retries += ctx.attempt - 1
+            self.total_latency_sec += time.monotonic() - start
+
+    def stats(self) -> Dict[str, Any]:
+        avg_latency_ms = self.total_latency_sec * 1000 / self.requests if self.requests else 0.0
+        return {
+            "client": self.name,
+            "requests": self.requests,
+            "failed": self.failed,
+            "retries": self.retries,
+            "avg_latency_ms": round(avg_latency_ms, 2),
+        }
+
+
+class CacheMiddleware(RequestMiddleware):
+    """
+    Cache the parsed result of GET requests. The ttl of a request is the one of the longest matching
+    path prefix in endpoint_ttls, or ttl_sec otherwise (0 disables caching). The key is the normalized
+    uri plus the sorted params, without the volatile params (signatures, fingerprints...).
+    The key also holds a hash of identity(), the logged-in account, so responses of one account
+    are never served to another one sharing the cache.
+    A request opts out with options["cache"] = False; with bypass=True cached results are not read
+    but fresh results are still written. Blocking backends (cache.blocking_io) run in a thread.
+    """
+
+    def __init__(self, cache: AbstractCache, ttl_sec: int, namespace: str = "",
+                 endpoint_ttls: Optional[Dict[str, int]] = None, ignore_params: Iterable[str] = (),
+                 bypass: bool = False, identity: Optional[Callable[[], str]] = None):
+        self.cache = cache
+        self.identity = identity
+        self.ttl_sec = ttl_sec
+        self.namespace = namespace
+        self.endpoint_ttls = endpoint_ttls or {}
+        self.ignore_params = set(ignore_params)
+        self.bypass = bypass
+        self.hits = 0
+        self.misses = 0
+
+    def ttl(self, ctx: RequestContext) -> int:
+        path = httpx.URL(ctx.url).path
+        prefixes = [prefix for prefix in self.endpoint_ttls if path.startswith(prefix)]
+        if not prefixes:
+            return self.ttl_sec
+        return self.endpoint_ttls[max(prefixes, key=len)]
+
+    def cache_key(self, ctx: RequestContext) -> str:
+        url = httpx.URL(ctx.url)
+        params = dict(url.params)
+        # 平台在签名时才拼接的参数放在 options["sign_params"] 中, 例如抖音、B站
+        for extra in (ctx.options.get("sign_params"), ctx.kwargs.get("params")):
+            if isinstance(extra, dict):
+                params.update(extra)
+        params = {k: v for k, v in params.items() if k not in self.ignore_params}
+        params_str = json.dumps(params, sort_keys=True, ensure_ascii=False, default=str) if params else ""
+        identity = self.identity() if self.identity else ""
+        account = hashlib.sha1(identity.encode("utf-8")).hexdigest()[:16] if identity else "anonymous"
+        return f"api_cache:{self.namespace}:{account}:{ctx.method.upper()}:{url.host}{url.path}:{params_str}"
+
+    async def _cache_get(self, key: str) -> Any:
+        if getattr(self.cache, "blocking_io", False):
+            return await asyncio.to_thread(self.cache.get, key)
+        return self.cache.get(key)
+
+    async def _cache_set(self, key: str, value: Any, ttl: int):
+        if getattr(self.cache, "blocking_io", False):
+            await asyncio.to_thread(self.cache.set, key, value, ttl)
+        else:
+            self.cache.set(key, value, ttl)
+
+    async def handle(self, ctx: RequestContext, call_next: Handler) -> Any:
+        if ctx.method.upper() != "GET" or not ctx.options.get("cache", True):
+            return await call_next(ctx)
+        ttl = self.ttl(ctx)
+        if ttl <= 0:
+            return await call_next(ctx)
+        key = self.cache_key(ctx)
+        if not self.bypass:
+            cached = await self._cache_get(key)
+            if cached is not None:
+                self.hits += 1
+                return cached
+        self.misses += 1
+        result = await call_next(ctx)
+        if result is not None:
+            await self._cache_set(key, result, ttl)
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        return {"cache_hits": self.hits, "cache_misses": self.misses}
+
+
+class RequestPipeline:
+    """
+    Chain of middlewares around the handler sending the request, the first middleware is the outermost
+    """
+
+    def __init__(self, middlewares: List[RequestMiddleware], handler: Handler):
+        self.middlewares = middlewares
+        self.handler = handler
+
+    def find(self, middleware_type: Type[RequestMiddleware]) -> Optional[RequestMiddleware]:
+        for middleware in self.middlewares:
+            if isinstance(middleware, middleware_type):
+                return middleware
+        return None
+
+    async def __call__(self, ctx: RequestContext) -> Any:
+        return await self._dispatch(0, ctx)
+
+    async def _dispatch(self, index: int, ctx: RequestContext) -> Any:
+        if index == len(self.middlewares):
+            return await self.handler(ctx)
+        return await self.middlewares[index].handle(ctx, lambda next_ctx: self._dispatch(index + 1, next_ctx))
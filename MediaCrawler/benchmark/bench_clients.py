@@ -0,0 +1,288 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+# @Desc    : 平台客户端离线基准测试：基于录制的响应回放评论抓取流程，休眠被虚拟化，统计请求吞吐和各阶段 CPU 时间
+#
+# 录制(访问真实站点, 需要登录 cookie):
+#   python -m benchmark.bench_clients --platform bili --id 1234567 --cookies "SESSDATA=..." --record
+# 回放:
+#   python -m benchmark.bench_clients --platform bili --id 1234567 --rounds 5
+import argparse
+import asyncio
+import functools
+import time
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Dict, Optional
+from unittest.mock import patch
+
+import config
+from media_platform.bilibili.client import BilibiliClient
+from media_platform.douyin.client import DouYinClient
+from media_platform.tieba.client import BaiduTieBaClient
+from tools import utils
+from tools.http_replay import RecordingPage, ReplayPage, get_replay_store
+
+_real_sleep = asyncio.sleep
+
+
+class VirtualClock:
+    """
+    replace asyncio.sleep for the benchmark task: nothing waits, the requested seconds are only added up.
+    Other tasks of the loop (cache cleaners, writers...) keep sleeping for real
+    """
+
+    def __init__(self):
+        self.slept_sec = 0.0
+        self._task: Optional[asyncio.Task] = None
+        self._patch = patch("asyncio.sleep", self.sleep)
+
+    async def sleep(self, delay: float, result: Any = None) -> Any:
+        if asyncio.current_task() is not self._task:
+            return await _real_sleep(delay, result)
+        self.slept_sec += max(0.0, delay)
+        await _real_sleep(0)
+        return result
+
+    def __enter__(self):
+        self._task = asyncio.current_task()
+        self._patch.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._patch.stop()
+
+
+class StageProfiler:
+    """
+    CPU time (time.process_time) and call count per stage; the benchmark runs one request at a time,
+    so the CPU spent while an async stage is awaited belongs to that stage
+    """
+
+    def __init__(self):
+        self.cpu_sec: Dict[str, float] = defaultdict(float)
+        self.calls: Dict[str, int] = defaultdict(int)
+
+    def wrap_async(self, stage: str, func: Callable[..., Awaitable]) -> Callable[..., Awaitable]:
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            start = time.process_time()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                self.cpu_sec[stage] += time.process_time() - start
+                self.calls[stage] += 1
+        return wrapper
+
+    def wrap_sync(self, stage: str, func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.process_time()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.cpu_sec[stage] += time.process_time() - start
+                self.calls[stage] += 1
+        return wrapper
+
+    def profile_api_client(self, client):
+        """
+        sign: platform signer, transport: send + replayed response, parse: classify_response.
+        Must be called before the first request, the pipeline binds the methods when it is built
+        """
+        client.sign_request = self.wrap_async("sign", client.sign_request)
+        client.classify_response = self.wrap_sync("parse", client.classify_response)
+        transport = client.get_http_client()._transport
+        transport.handle_async_request = self.wrap_async("transport", transport.handle_async_request)
+
+
+class StaticPage:
+    """
+    page stand-in for the clients that only read window.localStorage while signing (douyin, bilibili)
+    """
+
+    def __init__(self, local_storage: Optional[Dict] = None):
+        self.local_storage = local_storage or {}
+
+    async def evaluate(self, expression: str, arg: Any = None) -> Any:
+        return self.local_storage
+
+
+async def run_douyin(args, page, profiler: StageProfiler, callback: Callable) -> int:
+    client = DouYinClient(
+        proxy=None,
+        headers={
+            "User-Agent": utils.get_user_agent(),
+            "Cookie": args.cookies,
+            "Host": "www.douyin.com",
+            "Origin": "https://www.douyin.com/",
+            "Referer": "https://www.douyin.com/",
+            "Content-Type": "application/json;charset=UTF-8",
+        },
+        playwright_page=page,
+        cookie_dict=utils.convert_str_cookie_to_dict(args.cookies),
+    )
+    profiler.profile_api_client(client)
+    try:
+        comments = await client.get_aweme_all_comments(
+            args.id, is_fetch_sub_comments=args.sub_comments, callback=callback, max_count=args.max_count
+        )
+    finally:
+        await client.aclose()
+    return len(comments)
+
+
+async def run_bilibili(args, page, profiler: StageProfiler, callback: Callable) -> int:
+    client = BilibiliClient(
+        proxy=None,
+        headers={
+            "User-Agent": utils.get_user_agent(),
+            "Cookie": args.cookies,
+            "Origin": "https://www.bilibili.com",
+            "Referer": "https://www.bilibili.com",
+            "Content-Type": "application/json;charset=UTF-8",
+        },
+        playwright_page=page,
+        cookie_dict=utils.convert_str_cookie_to_dict(args.cookies),
+    )
+    profiler.profile_api_client(client)
+    try:
+        comments = await client.get_video_all_comments(
+            args.id, is_fetch_sub_comments=args.sub_comments, callback=callback, max_count=args.max_count
+        )
+    finally:
+        await client.aclose()
+    return len(comments or [])
+
+
+async def run_tieba(args, page, profiler: StageProfiler, callback: Callable) -> int:
+    client = BaiduTieBaClient(
+        headers={"User-Agent": utils.get_user_agent(), "Cookie": args.cookies},
+        playwright_page=page,
+    )
+    # 贴吧通过浏览器页面抓取, transport 阶段为读取页面内容, parse 阶段为 HTML 解析
+    page.content = profiler.wrap_async("transport", page.content)
+    extractor = client._page_extractor
+    for name in ("extract_note_detail", "extract_tieba_note_parment_comments", "extract_tieba_note_sub_comments"):
+        setattr(extractor, name, profiler.wrap_sync("parse", getattr(extractor, name)))
+    note = await client.get_note_by_id(args.id)
+    comments = await client.get_note_all_comments(note, callback=callback, max_count=args.max_count)
+    return len(comments)
+
+
+SCENARIOS = {
+    "dy": run_douyin,
+    "bili": run_bilibili,
+    "tieba": run_tieba,
+}
+
+
+async def _launch_browser_page():
+    from playwright.async_api import async_playwright
+
+    playwright = await async_playwright().start()
+    browser = await playwright.chromium.launch(headless=True)
+    return playwright, browser, await browser.new_page()
+
+
+async def run_round(args) -> Dict[str, Any]:
+    """
+    run the scenario once, against the network with --record, otherwise against the fixture file
+    """
+    store = get_replay_store(args.fixtures)
+    store.hits = store.misses = 0
+    store._cursors.clear()
+    profiler = StageProfiler()
+    callback_comments = 0
+
+    async def callback(_content_id, comments):
+        nonlocal callback_comments
+        callback_comments += len(comments)
+
+    callback = profiler.wrap_async("callback", callback)
+
+    browser_handles = None
+    if args.record:
+        if args.platform == "tieba":
+            browser_handles = await _launch_browser_page()
+            page = RecordingPage(browser_handles[2], store)
+        else:
+            page = RecordingPage(StaticPage(), store)
+    else:
+        page = ReplayPage(store)
+
+    clock = VirtualClock()
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    try:
+        if args.record:
+            comments = await SCENARIOS[args.platform](args, page, profiler, callback)
+        else:
+            with clock:
+                comments = await SCENARIOS[args.platform](args, page, profiler, callback)
+    finally:
+        if browser_handles:
+            await browser_handles[1].close()
+            await browser_handles[0].stop()
+    wall_sec = time.perf_counter() - wall_start
+    cpu_sec = time.process_time() - cpu_start
+
+    requests = profiler.calls["transport"]
+    stage_cpu_ms = {stage: round(sec * 1000, 2) for stage, sec in sorted(profiler.cpu_sec.items())}
+    stage_cpu_ms["other"] = round(max(0.0, cpu_sec - sum(profiler.cpu_sec.values())) * 1000, 2)
+    return {
+        "comments": comments,
+        "callback_comments": callback_comments,
+        "requests": requests,
+        "wall_sec": round(wall_sec, 4),
+        "requests_per_sec": round(requests / wall_sec, 2) if wall_sec else 0.0,
+        "cpu_ms": round(cpu_sec * 1000, 2),
+        "stage_cpu_ms": stage_cpu_ms,
+        "virtual_sleep_sec": round(clock.slept_sec, 2),
+        **store.stats(),
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="MediaCrawler platform client benchmark (record/replay)")
+    parser.add_argument("--platform", choices=sorted(SCENARIOS), required=True)
+    parser.add_argument("--id", required=True, help="aweme_id / bilibili aid / tieba note id")
+    parser.add_argument("--fixtures", default=config.HTTP_REPLAY_FILE, help="fixture file (jsonl)")
+    parser.add_argument("--record", action="store_true", help="hit the live site and append the responses to the fixture file")
+    parser.add_argument("--cookies", default=config.COOKIES)
+    parser.add_argument("--max_count", type=int, default=config.CRAWLER_MAX_COMMENTS_COUNT_SINGLENOTES)
+    parser.add_argument("--sub_comments", action="store_true", help="also fetch the second level comments")
+    parser.add_argument("--rounds", type=int, default=3, help="replay rounds, ignored with --record")
+    return parser.parse_args(argv)
+
+
+async def main(argv=None):
+    args = parse_args(argv)
+    config.HTTP_REPLAY_MODE = "record" if args.record else "replay"
+    config.HTTP_REPLAY_FILE = args.fixtures
+    config.ENABLE_GET_SUB_COMMENTS = args.sub_comments
+    # 回放时只测客户端本身: 关闭响应缓存和限速, 休眠由 VirtualClock 虚拟化
+    config.ENABLE_REQUEST_CACHE = False
+    config.REQUEST_CACHE_TTL_SEC = 0
+    if not args.record:
+        config.ENABLE_ADAPTIVE_RATE_LIMIT = False
+
+    rounds = 1 if args.record else max(1, args.rounds)
+    results = [await run_round(args) for _ in range(rounds)]
+    for index, result in enumerate(results, 1):
+        utils.logger.info(f"[bench_clients] {args.platform} round {index}: {result}")
+    if not args.record:
+        best = max(results, key=lambda r: r["requests_per_sec"])
+        utils.logger.info(f"[bench_clients] {args.platform} best: {best['requests_per_sec']} req/s, stage cpu ms: {best['stage_cpu_ms']}")
+    return results
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,127 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+# @Desc    : JSON 编解码基准：用录制的 API 响应体对比标准库 json 和 orjson 的解码、缩进编码吞吐
+#
+#   python -m benchmark.bench_json_codec --fixtures data/replay/http_fixtures.jsonl --rounds 20
+# 没有夹具文件时使用合成的评论列表响应
+import argparse
+import json
+import os
+import time
+from typing import Any, Dict, List
+
+import config
+from tools import json_codec, utils
+
+
+def load_payloads(path: str) -> List[bytes]:
+    """
+    json response bodies of the fixture file recorded by tools.http_replay
+    """
+    payloads = []
+    if not os.path.exists(path):
+        return payloads
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            body = json.loads(line).get("body", "")
+            if body.lstrip().startswith(("{", "[")):
+                payloads.append(body.encode("utf-8"))
+    return payloads
+
+
+def synthetic_payloads(count: int = 50, comments: int = 20) -> List[bytes]:
+    """
+    comment list pages shaped like the douyin api responses
+    """
+    payloads = []
+    for page in range(count):
+        items = [
+            {
+                "cid": str(7300000000000000000 + page * comments + i),
+                "text": f"评论内容 {i} 😀 " * 5,
+                "aweme_id": "7300000000000000000",
+                "create_time": 1700000000 + i,
+                "digg_count": i * 3,
+                "reply_comment_total": i % 4,
+                "ip_label": "广东",
+                "user": {
+                    "uid": str(100000 + i),
+                    "sec_uid": "MS4wLjABAAAA" + "x" * 40,
+                    "nickname": f"用户{i}",
+                    "avatar_thumb": {"url_list": [f"https://p3.douyinpic.com/aweme/100x100/{i}.jpeg"]},
+                },
+                "image_list": None,
+                "is_author_digged": False,
+            }
+            for i in range(comments)
+        ]
+        body = {"status_code": 0, "comments": items, "cursor": (page + 1) * comments, "has_more": 1, "total": 1000}
+        payloads.append(json.dumps(body, ensure_ascii=False).encode("utf-8"))
+    return payloads
+
+
+def bench_codec(codec, payloads: List[bytes], rounds: int) -> Dict[str, Any]:
+    total_mb = sum(len(p) for p in payloads) / 1024 / 1024
+    objects = [codec.loads(p) for p in payloads]
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for payload in payloads:
+            codec.loads(payload)
+    loads_sec = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for obj in objects:
+            codec.dumps(obj, indent=True)
+    dumps_sec = time.perf_counter() - start
+
+    return {
+        "codec": codec.name,
+        "loads_mb_per_sec": round(total_mb * rounds / loads_sec, 2),
+        "dumps_indent_mb_per_sec": round(total_mb * rounds / dumps_sec, 2),
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="MediaCrawler json codec benchmark")
+    parser.add_argument("--fixtures", default=config.HTTP_REPLAY_FILE, help="fixture file (jsonl) recorded by bench_clients --record")
+    parser.add_argument("--rounds", type=int, default=10)
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> List[Dict[str, Any]]:
+    args = parse_args(argv)
+    payloads = load_payloads(args.fixtures)
+    source = args.fixtures
+    if not payloads:
+        payloads = synthetic_payloads()
+        source = "synthetic"
+    utils.logger.info(f"[bench_json_codec] {len(payloads)} payloads from {source}, "
+                      f"{sum(len(p) for p in payloads) / 1024:.1f} KB")
+
+    results = []
+    for name, codec_cls in json_codec.CODECS.items():
+        if name == "orjson" and json_codec.orjson is None:
+            utils.logger.info("[bench_json_codec] orjson is not installed, skipped")
+            continue
+        result = bench_codec(codec_cls(), payloads, max(1, args.rounds))
+        utils.logger.info(f"[bench_json_codec] {result}")
+        results.append(result)
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+# @Desc    : 知乎 x-zse-96 签名基准：对比 Python 实现和 execjs 调用 libs/zhihu.js 的单次签名耗时
+#
+#   python -m benchmark.bench_zhihu_sign --calls 2000 --js_calls 20
+import argparse
+import time
+from typing import Any, Callable, Dict, List
+
+from media_platform.zhihu import help
+from tools import utils
+
+_URL = "/api/v4/search_v3?gk_version=gz-gaokao&t=general&q=python&correction=1&offset=0&limit=20&filter_fields=&lc_idx=0&show_all_topics=0&search_source=Normal"
+_COOKIES = "_xsrf=abc; d_c0=AKDSS1nMXhiPTvJv3ZkVuKpIqoFQl4Is7kU=|1710000000; z_c0=2|1:0|10:1710000000|4:z_c0|92:Mi4x"
+
+
+def bench(name: str, func: Callable[[str, str], Dict], calls: int) -> Dict[str, Any]:
+    func(_URL, _COOKIES)
+    start = time.perf_counter()
+    for i in range(calls):
+        func(f"{_URL}&page={i}", _COOKIES)
+    elapsed = time.perf_counter() - start
+    return {"signer": name, "calls": calls, "us_per_call": round(elapsed * 1e6 / calls, 1)}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="MediaCrawler zhihu x-zse-96 signer benchmark")
+    parser.add_argument("--calls", type=int, default=2000, help="calls of the python signer")
+    parser.add_argument("--js_calls", type=int, default=20, help="calls of the execjs signer, 0 to skip")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> List[Dict[str, Any]]:
+    args = parse_args(argv)
+    results = [bench("python", help.sign_native, max(1, args.calls))]
+    if args.js_calls > 0:
+        results.append(bench("execjs", help.sign_with_js, args.js_calls))
+    for result in results:
+        utils.logger.info(f"[bench_zhihu_sign] {result}")
+    if len(results) == 2:
+        utils.logger.info(f"[bench_zhihu_sign] python signer is {results[1]['us_per_call'] / results[0]['us_per_call']:.0f}x faster")
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -20,6 +20,8 @@ from typing import Any, List, Optional
 
 
 class AbstractCache(ABC):
+    # get/set 是否会阻塞(磁盘或网络 IO), 为 True 时请求管道在线程中调用, 不阻塞事件循环
+    blocking_io: bool = False
 
     @abstractmethod
     def get(self, key: str) -> Optional[Any]:
@@ -25,6 +25,7 @@ from config import db_config
 
 
 class RedisCache(AbstractCache):
+    blocking_io = True
 
     def __init__(self) -> None:
         # 连接redis, 返回redis客户端
@@ -0,0 +1,97 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：  
+# 1. 不得用于任何商业用途。  
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。  
+# 3. 不得进行大规模爬取或对平台造成运营干扰。  
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。   
+# 5. 不得用于任何非法或不当的用途。
+#   
+# 详细许可条款请参阅项目根目录下的LICENSE文件。  
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。  
+
+
+# -*- coding: utf-8 -*-
+# @Desc    : SQLite 持久化缓存，进程重启后仍然有效，用于缓存 API 响应
+
+import os
+import pathlib
+import pickle
+import sqlite3
+import threading
+import time
+from typing import Any, List, Optional
+
+from cache.abs_cache import AbstractCache
+from config import db_config
+
+
+class SqliteCache(AbstractCache):
+    blocking_io = True
+
+    def __init__(self, db_path: str = None):
+        """
+        初始化 SQLite 缓存, 连接在第一次读写时建立
+        :param db_path: 数据库文件路径
+        :return:
+        """
+        self._db_path = db_path or db_config.SQLITE_CACHE_DB_PATH
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            pathlib.Path(os.path.dirname(self._db_path) or ".").mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(self._db_path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS kv_cache (key TEXT PRIMARY KEY, value BLOB NOT NULL, expire_at REAL NOT NULL)"
+            )
+            # 启动时清理已过期的缓存
+            self._conn.execute("DELETE FROM kv_cache WHERE expire_at < ?", (time.time(),))
+            self._conn.commit()
+        return self._conn
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        从缓存中获取键的值, 并且反序列化, 键已过期时返回None
+        :param key:
+        :return:
+        """
+        with self._lock:
+            row = self._connection().execute("SELECT value, expire_at FROM kv_cache WHERE key = ?", (key,)).fetchone()
+        if row is None or row[1] < time.time():
+            return None
+        return pickle.loads(row[0])
+
+    def set(self, key: str, value: Any, expire_time: int) -> None:
+        """
+        将键的值设置到缓存中, 并且序列化
+        :param key:
+        :param value:
+        :param expire_time: 过期时间(秒)
+        :return:
+        """
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO kv_cache (key, value, expire_at) VALUES (?, ?, ?)",
+                (key, pickle.dumps(value), time.time() + expire_time),
+            )
+            conn.commit()
+
+    def keys(self, pattern: str) -> List[str]:
+        """
+        获取所有符合pattern的未过期key, pattern 与 redis 一致使用 * 通配符
+        :param pattern: 匹配模式
+        :return:
+        """
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT key FROM kv_cache WHERE key GLOB ? AND expire_at >= ?", (pattern, time.time())
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -62,6 +62,7 @@ class SaveDataOptionEnum(str, Enum):
     DB = "db"
     JSON = "json"
     SQLITE = "sqlite"
+    PARQUET = "parquet"
 
 
 class InitDbOptionEnum(str, Enum):
@@ -186,11 +187,20 @@ async def parse_cmd(argv: Optional[Sequence[str]] = None):
                 show_default=True,
             ),
         ] = str(config.ENABLE_GET_SUB_COMMENTS),
+        incremental: Annotated[
+            str,
+            typer.Option(
+                "--incremental",
+                help="是否增量抓取评论(续抓中断的游标、只保存新评论)，支持 yes/true/t/y/1 或 no/false/f/n/0",
+                rich_help_panel="评论配置",
+                show_default=True,
+            ),
+        ] = str(config.ENABLE_INCREMENTAL_CRAWL),
         save_data_option: Annotated[
             SaveDataOptionEnum,
             typer.Option(
                 "--save_data_option",
-                help="数据保存方式 (csv=CSV文件 | db=MySQL数据库 | json=JSON文件 | sqlite=SQLite数据库)",
+                help="数据保存方式 (csv=CSV文件 | db=MySQL数据库 | json=JSON文件 | sqlite=SQLite数据库 | parquet=Parquet列式文件)",
                 rich_help_panel="存储配置",
             ),
         ] = _coerce_enum(
@@ -212,6 +222,15 @@ async def parse_cmd(argv: Optional[Sequence[str]] = None):
                 rich_help_panel="账号配置",
             ),
         ] = config.COOKIES,
+        cache_bypass: Annotated[
+            str,
+            typer.Option(
+                "--cache_bypass",
+                help="是否跳过 API 响应缓存(仍写入新响应)，支持 yes/true/t/y/1 或 no/false/f/n/0",
+                rich_help_panel="缓存配置",
+                show_default=True,
+            ),
+        ] = str(config.REQUEST_CACHE_BYPASS),
     ) -> SimpleNamespace:
         """MediaCrawler 命令行入口"""
 
@@ -227,8 +246,10 @@ async def parse_cmd(argv: Optional[Sequence[str]] = None):
         config.KEYWORDS = keywords
         config.ENABLE_GET_COMMENTS = enable_comment
         config.ENABLE_GET_SUB_COMMENTS = enable_sub_comment
+        config.ENABLE_INCREMENTAL_CRAWL = _to_bool(incremental)
         config.SAVE_DATA_OPTION = save_data_option.value
         config.COOKIES = cookies
+        config.REQUEST_CACHE_BYPASS = _to_bool(cache_bypass)
 
         return SimpleNamespace(
             platform=config.PLATFORM,
@@ -238,9 +259,11 @@ async def parse_cmd(argv: Optional[Sequence[str]] = None):
             keywords=config.KEYWORDS,
             get_comment=config.ENABLE_GET_COMMENTS,
             get_sub_comment=config.ENABLE_GET_SUB_COMMENTS,
+            incremental=config.ENABLE_INCREMENTAL_CRAWL,
             save_data_option=config.SAVE_DATA_OPTION,
             init_db=init_db_value,
             cookies=config.COOKIES,
+            cache_bypass=config.REQUEST_CACHE_BYPASS,
         )
 
     command = typer.main.get_command(app)
@@ -25,6 +25,15 @@ IP_PROXY_POOL_COUNT = 2
 # 代理IP提供商名称
 IP_PROXY_PROVIDER_NAME = "kuaidaili"  # kuaidaili | wandouhttp
 
+# 代理池健康检查配置：候选 IP 并发验证，按成功率和延迟打分，连续失败或成功率过低的 IP 被淘汰，可用 IP 不足时后台补充
+IP_PROXY_VALIDATE_URL = "https://echo.apifox.cn/"  # 验证 IP 是否有效的地址
+IP_PROXY_VALIDATE_TIMEOUT_SEC = 10  # 验证请求的超时时间(秒)
+IP_PROXY_VALIDATE_CONCURRENCY = 10  # 同时验证的 IP 数量
+IP_PROXY_MAX_FAILURES = 3  # 连续失败次数达到该值后淘汰
+IP_PROXY_MIN_SUCCESS_RATE = 0.5  # 请求数达到 5 次后成功率低于该值则淘汰
+IP_PROXY_REFILL_THRESHOLD = 1  # 可用 IP 数不高于该值时后台补充
+IP_PROXY_EXPIRE_MARGIN_SEC = 30  # 距离过期不足该秒数的 IP 不再租借
+
 # 设置为True不会打开浏览器（无头浏览器）
 # 设置False会打开一个浏览器
 # 小红书如果一直扫码登录不通过，打开浏览器手动过一下滑动验证码
@@ -61,8 +70,26 @@ BROWSER_LAUNCH_TIMEOUT = 120
 # 设置为False可以保持浏览器运行，便于调试
 AUTO_CLOSE_BROWSER = True
 
-# 数据保存类型选项配置,支持四种类型：csv、db、json、sqlite, 最好保存到DB，有排重的功能。
-SAVE_DATA_OPTION = "json"  # csv or db or json or sqlite
+# 数据保存类型选项配置,支持五种类型：csv、db、json、sqlite、parquet, 最好保存到DB，有排重的功能。
+SAVE_DATA_OPTION = "json"  # csv or db or json or sqlite or parquet
+
+# CSV写入缓冲配置：累计行数达到 CSV_FLUSH_ROWS 或距上次写盘超过 CSV_FLUSH_INTERVAL_SEC 秒时写入磁盘
+CSV_FLUSH_ROWS = 200
+CSV_FLUSH_INTERVAL_SEC = 5
+
+# CSV压缩与分卷配置：启用任意一项后输出为 <文件名>_part0001.csv[.gz|.zst]，并生成 <文件名>_manifest.json 记录各分卷行数
+CSV_COMPRESSION = ""  # "" 不压缩, "gzip" 或 "zstd"(需安装 zstandard)
+CSV_ROTATE_MAX_BYTES = 0  # 单个分卷的最大字节数(压缩前), 0 表示不按大小分卷
+CSV_ROTATE_MAX_ROWS = 0  # 单个分卷的最大行数, 0 表示不按行数分卷
+
+# Parquet写入配置：每累计 PARQUET_ROW_GROUP_SIZE 行写入一个 row group
+PARQUET_ROW_GROUP_SIZE = 5000
+
+# 写入队列配置：采集协程只把数据放入有界队列，由后台写入任务批量写入存储，抓取与存储并行
+ENABLE_STORE_QUEUE = True
+STORE_QUEUE_MAX_SIZE = 1000  # 队列上限，写满后采集协程等待（背压）
+STORE_QUEUE_BATCH_SIZE = 100  # 写入任务每批最多取出的记录数
+STORE_QUEUE_WORKERS = 1  # 写入任务数量，大于1时同一批次内的写入顺序不再保证
 
 # 用户浏览器缓存的浏览器文件配置
 USER_DATA_DIR = "%s_user_data_dir"  # %s will be replaced by platform name
@@ -79,6 +106,67 @@ MAX_CONCURRENCY_NUM = 1
 # 是否开启爬媒体模式（包含图片或视频资源），默认不开启爬媒体
 ENABLE_GET_MEIDAS = False
 
+# API 请求管道配置：所有平台客户端的请求统一经过 重试 -> 限速 -> 签名 中间件
+REQUEST_MAX_ATTEMPTS = 3  # 单个请求的最大尝试次数(含首次)
+REQUEST_RETRY_BASE_DELAY_SEC = 1  # 首次重试的等待时间(秒)，之后每次翻倍并加入随机抖动
+REQUEST_RETRY_MAX_DELAY_SEC = 30  # 重试等待时间上限(秒)
+
+# API 响应缓存配置：重复运行或关键词重叠时，详情/主页接口直接使用缓存的响应，缓存键为 规范化的 URI + 排序后的参数
+ENABLE_REQUEST_CACHE = False
+REQUEST_CACHE_TYPE = "sqlite"  # 缓存后端：sqlite(持久化到 SQLITE_CACHE_DB_PATH) / memory / redis
+REQUEST_CACHE_BYPASS = False  # 为 True 时不读取缓存，但仍写入新响应，用于强制刷新
+REQUEST_CACHE_TTL_SEC = 0  # 未在下面列出的 GET 接口的缓存时间(秒)，0 表示不缓存
+# 按接口路径前缀设置缓存时间(秒)，匹配最长的前缀
+REQUEST_CACHE_ENDPOINT_TTL_SEC = {
+    "/aweme/v1/web/aweme/detail/": 24 * 3600,  # 抖音视频详情
+    "/aweme/v1/web/user/profile/other/": 6 * 3600,  # 抖音用户主页
+    "/x/web-interface/view/detail": 24 * 3600,  # B站视频详情
+    "/x/space/wbi/acc/info": 6 * 3600,  # B站UP主信息
+    "/people/": 6 * 3600,  # 知乎创作者主页
+    "/explore/": 24 * 3600,  # 小红书笔记详情页HTML
+}
+# 计算缓存键时忽略的参数：签名、设备指纹、来源 token 等每次请求都会变化的参数
+REQUEST_CACHE_IGNORE_PARAMS = ["a_bogus", "X-Bogus", "msToken", "webid", "verifyFp", "fp", "w_rid", "wts", "xsec_token", "xsec_source"]
+
+# 自适应限速配置：同一域名的请求共享一个令牌桶，成功时线性提速，出现验证码/封禁/429 时成倍降速(AIMD)
+# 开启后不再在翻页、评论批次之间固定休眠 CRAWLER_MAX_SLEEP_SEC, 包括浏览器页面跳转前后的休眠(这些请求不经过令牌桶)
+# 默认关闭, 只建议在纯 API 采集时开启
+ENABLE_ADAPTIVE_RATE_LIMIT = False
+RATE_LIMIT_INITIAL_RPS = 0.5  # 初始速率(请求/秒)
+RATE_LIMIT_MIN_RPS = 0.1  # 速率下限
+RATE_LIMIT_MAX_RPS = 2  # 速率上限，即安全预算
+RATE_LIMIT_BURST = 3  # 令牌桶容量，允许的瞬时突发请求数
+RATE_LIMIT_INCREASE_STEP = 0.05  # 每次成功请求增加的速率
+RATE_LIMIT_DECREASE_FACTOR = 0.5  # 被限流时速率乘以该系数
+
+# API 客户端连接池配置：每个平台客户端复用一个长连接池(keep-alive)，安装 h2 后启用 HTTP/2
+HTTP_CLIENT_HTTP2 = True
+HTTP_CLIENT_MAX_CONNECTIONS = 100  # 连接池最大连接数
+HTTP_CLIENT_MAX_KEEPALIVE_CONNECTIONS = 20  # 保持空闲的最大连接数
+HTTP_CLIENT_KEEPALIVE_EXPIRY = 30  # 空闲连接的保留时间(秒)
+
+# JSON 编解码后端：auto(安装了 orjson 时使用 orjson) | orjson | json(标准库)，用于 API 响应解码和 JSON 文件写入
+JSON_CODEC = "auto"
+
+# HTTP 录制/回放配置：record 模式把 API 客户端的真实响应写入夹具文件，replay 模式离线回放，用于基准测试和调试
+HTTP_REPLAY_MODE = ""  # 空字符串表示关闭, 可选 record / replay
+HTTP_REPLAY_FILE = "data/replay/http_fixtures.jsonl"  # 夹具文件路径
+
+# 媒体下载配置：分块流式写入临时文件(.part)，完成后原子重命名，中断的下载会通过 HTTP Range 续传
+MEDIA_DOWNLOAD_CHUNK_SIZE = 256 * 1024  # 每次写盘的块大小(字节)
+MEDIA_DOWNLOAD_MAX_BYTES = 2 * 1024 * 1024 * 1024  # 单个文件大小上限(字节), 0 表示不限制
+MEDIA_DOWNLOAD_TIMEOUT_SEC = 600  # 单个文件下载的总超时时间(秒)
+
+# 媒体下载池配置：采集协程只提交下载任务，由后台 worker 下载，不再阻塞元数据和评论的抓取
+MEDIA_DOWNLOAD_WORKERS = 4  # 下载 worker 数量
+MEDIA_DOWNLOAD_PER_HOST_LIMIT = 2  # 同一域名的最大并发下载数
+MEDIA_DOWNLOAD_MAX_RETRIES = 2  # 下载失败后的最大重试次数
+MEDIA_DOWNLOAD_RETRY_BACKOFF_SEC = 5  # 首次重试的等待时间(秒)，之后每次翻倍
+
+# 媒体去重配置：相同 url 或相同内容的文件只下载/保存一次，帖子目录下的文件链接到 MEDIA_CAS_DIR/blobs 中的唯一副本
+ENABLE_MEDIA_DEDUP = True
+MEDIA_CAS_DIR = "data/media"  # url->哈希 索引(media_index.db) 和 blob 文件所在目录
+
 # 是否开启爬评论模式, 默认开启爬评论
 ENABLE_GET_COMMENTS = True
 
@@ -89,6 +177,12 @@ CRAWLER_MAX_COMMENTS_COUNT_SINGLENOTES = 20
 # 老版本项目使用了 db, 则需参考 schema/tables.sql line 287 增加表字段
 ENABLE_GET_SUB_COMMENTS = False
 
+# 增量抓取评论：记录每个视频/帖子的评论游标和已抓取的评论ID(抖音、小红书、B站)，
+# 上次未抓完时从中断的游标续抓，否则只抓新评论、整页都是已抓取的评论时停止翻页
+# 已保存过的视频/帖子不再重复保存；只有存储写入成功后才记为已抓取
+ENABLE_INCREMENTAL_CRAWL = False
+CRAWL_STATE_DB_PATH = "data/crawl_state/crawl_state.db"
+
 # 词云相关
 # 是否开启生成评论词云图
 ENABLE_GET_WORDCLOUD = True
@@ -57,3 +57,8 @@ CRAWLER_MAX_CONTACTS_COUNT_SINGLENOTES = 100
 
 # 单个视频/帖子最大爬取动态数
 CRAWLER_MAX_DYNAMICS_COUNT_SINGLENOTES = 50
+
+# WBI 签名密钥(img_key/sub_key)缓存：后端可选 memory / sqlite / redis，redis 可在多个爬虫进程间共享，
+# 密钥每天更新一次，缓存过期或签名校验失败(-352)后重新获取
+BILI_WBI_KEY_CACHE_TYPE = "memory"
+BILI_WBI_KEY_TTL_SEC = 24 * 60 * 60
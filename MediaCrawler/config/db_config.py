@@ -17,6 +17,11 @@ MYSQL_DB_USER = os.getenv("MYSQL_DB_USER", "root")
 MYSQL_DB_HOST = os.getenv("MYSQL_DB_HOST", "localhost")
 MYSQL_DB_PORT = os.getenv("MYSQL_DB_PORT", 3306)
 MYSQL_DB_NAME = os.getenv("MYSQL_DB_NAME", "media_crawler")
+# 连接池配置：并发评论任务较多时可适当调大 pool_size / max_overflow
+MYSQL_POOL_SIZE = int(os.getenv("MYSQL_POOL_SIZE", 10))
+MYSQL_MAX_OVERFLOW = int(os.getenv("MYSQL_MAX_OVERFLOW", 20))
+MYSQL_POOL_RECYCLE = int(os.getenv("MYSQL_POOL_RECYCLE", 3600))  # 秒，需小于服务端 wait_timeout
+MYSQL_POOL_TIMEOUT = int(os.getenv("MYSQL_POOL_TIMEOUT", 30))  # 秒，等待空闲连接的最长时间
 
 mysql_db_config = {
     "user": MYSQL_DB_USER,
@@ -24,6 +29,10 @@ mysql_db_config = {
     "host": MYSQL_DB_HOST,
     "port": MYSQL_DB_PORT,
     "db_name": MYSQL_DB_NAME,
+    "pool_size": MYSQL_POOL_SIZE,
+    "max_overflow": MYSQL_MAX_OVERFLOW,
+    "pool_recycle": MYSQL_POOL_RECYCLE,
+    "pool_timeout": MYSQL_POOL_TIMEOUT,
 }
 
 
@@ -36,10 +45,18 @@ REDIS_DB_NUM = os.getenv("REDIS_DB_NUM", 0)  # your redis db num
 # cache type
 CACHE_TYPE_REDIS = "redis"
 CACHE_TYPE_MEMORY = "memory"
+CACHE_TYPE_SQLITE = "sqlite"
+
+# sqlite 缓存文件路径, 用于持久化的 API 响应缓存
+SQLITE_CACHE_DB_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "cache", "response_cache.db")
 
 # sqlite config
 SQLITE_DB_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "database", "sqlite_tables.db")
 
+# 写锁被占用时最多等待的毫秒数，避免并发写入直接报 database is locked
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", 5000))
+
 sqlite_db_config = {
-    "db_path": SQLITE_DB_PATH
+    "db_path": SQLITE_DB_PATH,
+    "busy_timeout_ms": SQLITE_BUSY_TIMEOUT_MS,
 }
\ No newline at end of file
@@ -39,3 +39,10 @@ DY_CREATOR_ID_LIST = [
     "MS4wLjABAAAATJPY7LAlaa5X-c8uNdWkvz0jUGgpw4eeXIwu_8BhvqE"
     # ........................
 ]
+
+# a_bogus 签名进程池：常驻 node 进程数量和单次签名超时(秒)，没有安装 node 时回退到 execjs
+DY_SIGN_WORKERS = 2
+DY_SIGN_TIMEOUT_SEC = 10
+
+# msToken(localStorage 中的 xmst) 缓存时间(秒)，过期后下一次请求重新从页面读取，cookie 更新时也会重新读取
+DY_MS_TOKEN_REFRESH_SEC = 300
@@ -30,3 +30,6 @@ XHS_CREATOR_ID_LIST = [
     "63e36c9a000000002703502b",    
     # ........................
 ]
+
+# 请求头签名页面池大小(包含主页面)，并发的评论任务分摊到多个页面上调用 window._webmsxyw 签名
+XHS_SIGN_PAGE_POOL_SIZE = 2
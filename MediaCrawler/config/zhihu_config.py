@@ -23,3 +23,6 @@ ZHIHU_SPECIFIED_ID_LIST = [
     "https://zhuanlan.zhihu.com/p/673461588",  # 文章
     "https://www.zhihu.com/zvideo/1539542068422144000",  # 视频
 ]
+
+# 是否使用 libs/zhihu.js(execjs) 计算 x-zse-96 签名，默认使用等价的 Python 实现，不再每次请求启动 node 进程
+ZHIHU_SIGN_WITH_JS = False
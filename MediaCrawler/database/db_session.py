@@ -1,13 +1,26 @@
-from sqlalchemy import text
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from sqlalchemy.orm import sessionmaker
+from typing import Dict, List, Optional, Sequence
+
+from sqlalchemy import Index, event, inspect, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine, AsyncSession
 from contextlib import asynccontextmanager
 from .models import Base
 import config
+from tools import utils
+from tools.time_util import get_current_timestamp
 from config.db_config import mysql_db_config, sqlite_db_config
 
 # Keep a cache of engines
 _engines = {}
+# Session factories bound to the cached engines
+_session_factories = {}
+
+# Max rows per multi-row INSERT statement
+BULK_UPSERT_CHUNK_SIZE = 200
+# (database url, table name, column) whose unique index has been checked
+_checked_unique_indexes = set()
 
 
 async def create_database_if_not_exists(db_type: str):
@@ -20,6 +33,19 @@ async def create_database_if_not_exists(db_type: str):
         await engine.dispose()
 
 
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """
+    Applied on every new SQLite connection: WAL lets readers run alongside the writer,
+    synchronous=NORMAL is safe under WAL and busy_timeout makes writers wait for the lock
+    instead of failing with "database is locked".
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={int(sqlite_db_config['busy_timeout_ms'])}")
+    cursor.close()
+
+
 def get_async_engine(db_type: str = None):
     if db_type is None:
         db_type = config.SAVE_DATA_OPTION
@@ -32,17 +58,51 @@ def get_async_engine(db_type: str = None):
 
     if db_type == "sqlite":
         db_url = f"sqlite+aiosqlite:///{sqlite_db_config['db_path']}"
+        engine = create_async_engine(db_url, echo=False)
+        event.listen(engine.sync_engine, "connect", _set_sqlite_pragmas)
     elif db_type == "mysql" or db_type == "db":
         db_url = f"mysql+asyncmy://{mysql_db_config['user']}:{mysql_db_config['password']}@{mysql_db_config['host']}:{mysql_db_config['port']}/{mysql_db_config['db_name']}"
+        engine = create_async_engine(
+            db_url,
+            echo=False,
+            pool_size=mysql_db_config["pool_size"],
+            max_overflow=mysql_db_config["max_overflow"],
+            pool_recycle=mysql_db_config["pool_recycle"],
+            pool_timeout=mysql_db_config["pool_timeout"],
+            pool_pre_ping=True,
+        )
     else:
         raise ValueError(f"Unsupported database type: {db_type}")
 
-    engine = create_async_engine(db_url, echo=False)
     _engines[db_type] = engine
     return engine
 
 
+def get_session_factory(db_type: str = None) -> Optional[async_sessionmaker]:
+    """
+    Return the session factory bound to the engine of db_type, created once and reused
+    Args:
+        db_type: database type, defaults to config.SAVE_DATA_OPTION
+
+    Returns:
+        async_sessionmaker, or None for file based save options
+    """
+    if db_type is None:
+        db_type = config.SAVE_DATA_OPTION
+    if db_type in _session_factories:
+        return _session_factories[db_type]
+    engine = get_async_engine(db_type)
+    if not engine:
+        return None
+    _session_factories[db_type] = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    return _session_factories[db_type]
+
+
 async def create_tables(db_type: str = None):
+    """
+    Create missing tables and migrate existing ones to the unique indexes of the models,
+    only run by --init_db because the migration deletes duplicate rows
+    """
     if db_type is None:
         db_type = config.SAVE_DATA_OPTION
     await create_database_if_not_exists(db_type)
@@ -50,16 +110,96 @@ async def create_tables(db_type: str = None):
     if engine:
         async with engine.begin() as conn:
             await conn.run_sync(Base.metadata.create_all)
+            await conn.run_sync(migrate_unique_indexes)
+
+
+def _has_unique_index(conn: Connection, table_name: str, column: str) -> bool:
+    inspector = inspect(conn)
+    for index in inspector.get_indexes(table_name):
+        if index.get("unique") and index["column_names"] == [column]:
+            return True
+    for constraint in inspector.get_unique_constraints(table_name):
+        if constraint["column_names"] == [column]:
+            return True
+    return False
+
+
+def migrate_unique_index(conn: Connection, table, column: str):
+    """
+    Replace the plain index of column by the unique one declared in the model, for tables created
+    before the column was declared unique (create_all never changes existing tables).
+    Duplicate rows are deleted first, the row with the highest id is kept.
+    """
+    if not inspect(conn).has_table(table.name) or _has_unique_index(conn, table.name, column):
+        return
+    quote = conn.dialect.identifier_preparer.quote
+    table_name, column_name = quote(table.name), quote(column)
+    # MySQL 不允许在子查询中直接引用被删除的表, 多包一层派生表
+    result = conn.execute(text(
+        f"DELETE FROM {table_name} WHERE {column_name} IS NOT NULL AND id NOT IN "
+        f"(SELECT keep_id FROM (SELECT MAX(id) AS keep_id FROM {table_name} "
+        f"WHERE {column_name} IS NOT NULL GROUP BY {column_name}) AS keep_rows)"
+    ))
+    if result.rowcount:
+        utils.logger.warning(f"[migrate_unique_index] removed {result.rowcount} duplicate rows from {table.name} by {column}")
+    # 删除旧版本建的普通索引, 换成模型中声明的唯一索引, 与新建的表一致
+    for index in inspect(conn).get_indexes(table.name):
+        if not index.get("unique") and index["column_names"] == [column]:
+            drop_sql = f"DROP INDEX {quote(index['name'])}"
+            if conn.dialect.name == "mysql":
+                drop_sql += f" ON {table_name}"
+            conn.execute(text(drop_sql))
+    declared = [index for index in table.indexes if [c.name for c in index.columns] == [column] and index.unique]
+    if declared:
+        declared[0].create(conn)
+    else:
+        conn.execute(text(f"CREATE UNIQUE INDEX {quote(f'uq_{table.name}_{column}')} ON {table_name} ({column_name})"))
+    utils.logger.info(f"[migrate_unique_index] created unique index on {table.name}.{column}")
+
+
+def migrate_unique_indexes(conn: Connection):
+    """
+    Migrate every existing table to the unique columns declared in database/models.py
+    """
+    for table in Base.metadata.sorted_tables:
+        for column in table.columns:
+            if column.unique:
+                migrate_unique_index(conn, table, column.name)
+
+
+def check_unique_index(conn: Connection, table, column: str):
+    """
+    Fail with a clear message when the upsert conflict column has no unique index: without it
+    every upsert would insert a duplicate row. Checked once per table.
+    """
+    check_key = (str(conn.engine.url), table.name, column)
+    if check_key in _checked_unique_indexes:
+        return
+    if not _has_unique_index(conn, table.name, column):
+        raise RuntimeError(
+            f"table {table.name} has no unique index on {column}, it was created by an older version; "
+            f"run `python main.py --init_db {conn.dialect.name}` to migrate it (duplicate rows are removed)"
+        )
+    _checked_unique_indexes.add(check_key)
+
+
+async def dispose_engines():
+    """
+    Close all pooled connections and forget the cached engines and session factories
+    """
+    _session_factories.clear()
+    while _engines:
+        _, engine = _engines.popitem()
+        await engine.dispose()
 
 
 @asynccontextmanager
 async def get_session() -> AsyncSession:
-    engine = get_async_engine(config.SAVE_DATA_OPTION)
-    if not engine:
+    session_factory = get_session_factory(config.SAVE_DATA_OPTION)
+    if not session_factory:
         yield None
         return
-    AsyncSessionFactory = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
-    session = AsyncSessionFactory()
+    session = session_factory()
     try:
         yield session
         await session.commit()
@@ -67,4 +207,71 @@ async def get_session() -> AsyncSession:
         await session.rollback()
         raise e
     finally:
-        await session.close()
\ No newline at end of file
+        await session.close()
+
+
+async def bulk_upsert(
+    session: AsyncSession,
+    model,
+    rows: List[Dict],
+    conflict_key: str,
+    update_columns: Optional[Sequence[str]] = None,
+):
+    """
+    Insert or update many rows with one multi-row statement per chunk:
+    INSERT ... ON DUPLICATE KEY UPDATE (MySQL) or INSERT ... ON CONFLICT DO UPDATE (SQLite).
+    The conflict_key column must be declared unique in database/models.py; tables created
+    before that are migrated by --init_db (see migrate_unique_index), until then this raises.
+    Rows are grouped by their set of columns, so a column missing from a row is neither
+    inserted as NULL nor used to overwrite the stored value.
+    Args:
+        session: async session from get_session()
+        model: ORM model class
+        rows: row dicts, keys that are not columns of the model are ignored
+        conflict_key: unique column used to detect existing rows
+        update_columns: columns overwritten on conflict, defaults to every given column except add_ts
+            (per group of rows, only the columns the rows actually have)
+    """
+    if not rows:
+        return
+    table = model.__table__
+    column_names = set(table.columns.keys())
+    now_ts = get_current_timestamp() if "add_ts" in column_names else None
+
+    # 同一批次中重复的记录只保留最后一条
+    deduped: Dict = {}
+    for row in rows:
+        values = {key: value for key, value in row.items() if key in column_names}
+        if now_ts is not None and values.get("add_ts") is None:
+            values["add_ts"] = now_ts
+        deduped[values.get(conflict_key)] = values
+
+    # 多行 VALUES 要求每行的列一致, 按列集合分组, 不用 NULL 补齐缺失的列
+    groups: Dict[tuple, List[Dict]] = {}
+    for values in deduped.values():
+        groups.setdefault(tuple(sorted(values)), []).append(values)
+
+    dialect_name = session.bind.dialect.name
+    if dialect_name not in ("mysql", "sqlite"):
+        raise ValueError(f"Unsupported database dialect for bulk upsert: {dialect_name}")
+    await session.run_sync(lambda sync_session: check_unique_index(sync_session.connection(), table, conflict_key))
+
+    for insert_columns, values_list in groups.items():
+        if update_columns is None:
+            group_update_columns = [key for key in insert_columns if key not in (conflict_key, "add_ts")]
+        else:
+            group_update_columns = [key for key in update_columns if key in insert_columns and key != conflict_key]
+        for start in range(0, len(values_list), BULK_UPSERT_CHUNK_SIZE):
+            chunk = values_list[start:start + BULK_UPSERT_CHUNK_SIZE]
+            if dialect_name == "mysql":
+                stmt = mysql_insert(table).values(chunk)
+                stmt = stmt.on_duplicate_key_update(
+                    {key: stmt.inserted[key] for key in group_update_columns} or {conflict_key: stmt.inserted[conflict_key]}
+                )
+            else:
+                stmt = sqlite_insert(table).values(chunk)
+                if group_update_columns:
+                    stmt = stmt.on_conflict_do_update(index_elements=[conflict_key], set_={key: stmt.excluded[key] for key in group_update_columns})
+                else:
+                    stmt = stmt.on_conflict_do_nothing(index_elements=[conflict_key])
+            await session.execute(stmt)
@@ -39,7 +39,7 @@ class BilibiliVideoComment(Base):
     avatar = Column(Text)
     add_ts = Column(BigInteger)
     last_modify_ts = Column(BigInteger)
-    comment_id = Column(BigInteger, index=True)
+    comment_id = Column(BigInteger, index=True, unique=True)
     video_id = Column(BigInteger, index=True)
     content = Column(Text)
     create_time = Column(BigInteger)
@@ -104,7 +104,7 @@ class DouyinAweme(Base):
     ip_location = Column(Text)
     add_ts = Column(BigInteger)
     last_modify_ts = Column(BigInteger)
-    aweme_id = Column(BigInteger, index=True)
+    aweme_id = Column(BigInteger, index=True, unique=True)
     aweme_type = Column(Text)
     title = Column(Text)
     desc = Column(Text)
@@ -133,7 +133,7 @@ class DouyinAwemeComment(Base):
     ip_location = Column(Text)
     add_ts = Column(BigInteger)
     last_modify_ts = Column(BigInteger)
-    comment_id = Column(BigInteger, index=True)
+    comment_id = Column(BigInteger, index=True, unique=True)
     aweme_id = Column(BigInteger, index=True)
     content = Column(Text)
     create_time = Column(BigInteger)
@@ -166,7 +166,7 @@ class KuaishouVideo(Base):
     avatar = Column(Text)
     add_ts = Column(BigInteger)
     last_modify_ts = Column(BigInteger)
-    video_id = Column(String(255), index=True)
+    video_id = Column(String(255), index=True, unique=True)
     video_type = Column(Text)
     title = Column(Text)
     desc = Column(Text)
@@ -186,7 +186,7 @@ class KuaishouVideoComment(Base):
     avatar = Column(Text)
     add_ts = Column(BigInteger)
     last_modify_ts = Column(BigInteger)
-    comment_id = Column(BigInteger, index=True)
+    comment_id = Column(BigInteger, index=True, unique=True)
     video_id = Column(String(255), index=True)
     content = Column(Text)
     create_time = Column(BigInteger)
@@ -203,7 +203,7 @@ class WeiboNote(Base):
     ip_location = Column(Text, default='')
     add_ts = Column(BigInteger)
     last_modify_ts = Column(BigInteger)
-    note_id = Column(BigInteger, index=True)
+    note_id = Column(BigInteger, index=True, unique=True)
     content = Column(Text)
     create_time = Column(BigInteger, index=True)
     create_date_time = Column(String(255), index=True)
@@ -224,7 +224,7 @@ class WeiboNoteComment(Base):
     ip_location = Column(Text, default='')
     add_ts = Column(BigInteger)
     last_modify_ts = Column(BigInteger)
-    comment_id = Column(BigInteger, index=True)
+    comment_id = Column(BigInteger, index=True, unique=True)
     note_id = Column(BigInteger, index=True)
     content = Column(Text)
     create_time = Column(BigInteger)
@@ -273,7 +273,7 @@ class XhsNote(Base):
     ip_location = Column(Text)
     add_ts = Column(BigInteger)
     last_modify_ts = Column(BigInteger)
-    note_id = Column(String(255), index=True)
+    note_id = Column(String(255), index=True, unique=True)
     type = Column(Text)
     title = Column(Text)
     desc = Column(Text)
@@ -299,7 +299,7 @@ class XhsNoteComment(Base):
     ip_location = Column(Text)
     add_ts = Column(BigInteger)
     last_modify_ts = Column(BigInteger)
-    comment_id = Column(String(255), index=True)
+    comment_id = Column(String(255), index=True, unique=True)
     create_time = Column(BigInteger, index=True)
     note_id = Column(String(255))
     content = Column(Text)
@@ -311,7 +311,7 @@ class XhsNoteComment(Base):
 class TiebaNote(Base):
     __tablename__ = 'tieba_note'
     id = Column(Integer, primary_key=True)
-    note_id = Column(String(644), index=True)
+    note_id = Column(String(644), index=True, unique=True)
     title = Column(Text)
     desc = Column(Text)
     note_url = Column(Text)
@@ -332,7 +332,7 @@ class TiebaNote(Base):
 class TiebaComment(Base):
     __tablename__ = 'tieba_comment'
     id = Column(Integer, primary_key=True)
-    comment_id = Column(String(255), index=True)
+    comment_id = Column(String(255), index=True, unique=True)
     parent_comment_id = Column(String(255), default='')
     content = Column(Text)
     user_link = Column(Text, default='')
@@ -367,7 +367,7 @@ class TiebaCreator(Base):
 class ZhihuContent(Base):
     __tablename__ = 'zhihu_content'
     id = Column(Integer, primary_key=True)
-    content_id = Column(String(64), index=True)
+    content_id = Column(String(64), index=True, unique=True)
     content_type = Column(Text)
     content_text = Column(Text)
     content_url = Column(Text)
@@ -395,7 +395,7 @@ class ZhihuContent(Base):
 class ZhihuComment(Base):
     __tablename__ = 'zhihu_comment'
     id = Column(Integer, primary_key=True)
-    comment_id = Column(String(64), index=True)
+    comment_id = Column(String(64), index=True, unique=True)
     parent_comment_id = Column(String(64))
     content = Column(Text)
     publish_time = Column(String(32), index=True)
@@ -1903,7 +1903,7 @@ class MediaCrawlerGUI:
             # 🔥 重置store
             from store.douyin import DouyinStoreFactory
             import store.douyin as douyin_store
-            DouyinStoreFactory.reset_store()
+            await DouyinStoreFactory.reset_store()
             douyin_store._video_info_cache.clear()
 
             if output_dir:
@@ -2083,7 +2083,7 @@ class MediaCrawlerGUI:
             # 🔥 重置store
             from store.xhs import XhsStoreFactory
             import store.xhs as xhs_store
-            XhsStoreFactory.reset_store()
+            await XhsStoreFactory.reset_store()
             if hasattr(xhs_store, '_note_info_cache'):
                 xhs_store._note_info_cache.clear()
 
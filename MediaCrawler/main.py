@@ -70,7 +70,12 @@ async def main():
 
 
     crawler = CrawlerFactory.create_crawler(platform=config.PLATFORM)
-    await crawler.start()
+    try:
+        await crawler.start()
+    finally:
+        # 在同一个事件循环里释放连接池
+        if config.SAVE_DATA_OPTION in ["db", "sqlite"]:
+            await db.close()
 
 
 def cleanup():
@@ -14,7 +14,6 @@
 # @Desc    : bilibili 请求客户端
 import asyncio
 import json
-import random
 from typing import Any, Callable, Dict, List, Optional, Tuple, Union
 from urllib.parse import urlencode
 
@@ -23,14 +22,22 @@ from playwright.async_api import BrowserContext, Page
 
 import config
 from base.base_crawler import AbstractApiClient
-from tools import utils
+from base.request_pipeline import RequestContext
+from tools import json_codec, utils
+from tools.crawl_state import comment_crawl_cursor
+from tools.rate_limiter import crawl_sleep
+from tools.media_downloader import download_to_file
 
-from .exception import DataFetchError
+from .exception import DataFetchError, TransientFetchError
 from .field import CommentOrderType, SearchOrderType
-from .help import BilibiliSign
+from .help import get_wbi_key_cache, get_wbi_signer, wbi_keys_from_urls
 
 
 class BilibiliClient(AbstractApiClient):
+    retryable_errors = (TransientFetchError,)
+    # 可重试的业务码: 风控校验失败、请求被拦截、服务繁忙、调用过于频繁, 其余(稿件不存在、无权限、参数错误等)重试也不会成功
+    TRANSIENT_ERROR_CODES = (-352, -412, -500, -503, -509, -799)
+    identity_cookies = ("SESSDATA",)
 
     def __init__(
         self,
@@ -38,7 +45,7 @@ class BilibiliClient(AbstractApiClient):
         proxy=None,
         *,
         headers: Dict[str, str],
-        playwright_page: Page,
+        playwright_page: Optional[Page],
         cookie_dict: Dict[str, str],
     ):
         self.proxy = proxy
@@ -47,20 +54,42 @@ class BilibiliClient(AbstractApiClient):
         self._host = "https://api.bilibili.com"
         self.playwright_page = playwright_page
         self.cookie_dict = cookie_dict
+        # wbi 密钥在进程内和 cache 层缓存, 签名本身是纯计算, 不需要访问浏览器页面
+        self.wbi_key_cache = get_wbi_key_cache()
+        self._wbi_keys_lock = asyncio.Lock()
 
-    async def request(self, method, url, **kwargs) -> Any:
-        async with httpx.AsyncClient(proxy=self.proxy) as client:
-            response = await client.request(method, url, timeout=self.timeout, **kwargs)
+    async def sign_request(self, ctx: RequestContext):
+        """
+        wbi 参数签名, 签名包含时间戳, 每次重试都基于未签名的参数重新签名
+        """
+        if "sign_uri" not in ctx.options:
+            return
+        params = await self.pre_request_data(dict(ctx.options.get("sign_params") or {}))
+        if ctx.method.upper() == "POST":
+            ctx.kwargs["data"] = json.dumps(params, separators=(',', ':'), ensure_ascii=False)
+        else:
+            ctx.url = f"{self._host}{ctx.options['sign_uri']}?{urlencode(params)}"
+
+    async def classify_response(self, ctx: RequestContext) -> Any:
+        response = ctx.response
         try:
-            data: Dict = response.json()
+            data: Dict = json_codec.decode_response(response)
         except json.JSONDecodeError:
             utils.logger.error(f"[BilibiliClient.request] Failed to decode JSON from response. status_code: {response.status_code}, response_text: {response.text}")
-            raise DataFetchError(f"Failed to decode JSON, content: {response.text}")
+            raise TransientFetchError(f"Failed to decode JSON, content: {response.text}")
+        if data.get("code") == -352:
+            # 风控校验失败, wbi 密钥可能已更新, 重试时重新获取
+            await self.wbi_key_cache.invalidate()
+        if data.get("code") in self.TRANSIENT_ERROR_CODES:
+            raise TransientFetchError(data.get("message", "unkonw error"))
         if data.get("code") != 0:
             raise DataFetchError(data.get("message", "unkonw error"))
         else:
             return data.get("data", {})
 
+    async def request(self, method, url, **kwargs) -> Any:
+        return await self.execute(method, url, **kwargs)
+
     async def pre_request_data(self, req_data: Dict) -> Dict:
         """
         发送请求进行请求参数签名
@@ -72,43 +101,60 @@ class BilibiliClient(AbstractApiClient):
         if not req_data:
             return {}
         img_key, sub_key = await self.get_wbi_keys()
-        return BilibiliSign(img_key, sub_key).sign(req_data)
+        return get_wbi_signer(img_key, sub_key).sign(req_data)
 
     async def get_wbi_keys(self) -> Tuple[str, str]:
         """
-        获取最新的 img_key 和 sub_key
+        获取最新的 img_key 和 sub_key, 缓存过期前不再访问页面或接口
+        :return:
+        """
+        keys = await self.wbi_key_cache.get()
+        if keys:
+            return keys
+        async with self._wbi_keys_lock:
+            # 并发请求只有一个去获取, 其余等待后直接使用缓存
+            keys = await self.wbi_key_cache.get()
+            if keys:
+                return keys
+            img_key, sub_key = await self.fetch_wbi_keys()
+            await self.wbi_key_cache.set(img_key, sub_key)
+            return img_key, sub_key
+
+    async def fetch_wbi_keys(self) -> Tuple[str, str]:
+        """
+        从页面 localStorage 的 wbi_img_urls 中获取 img_key 和 sub_key, 没有页面或没有该值时请求 nav 接口
         :return:
         """
-        local_storage = await self.playwright_page.evaluate("() => window.localStorage")
-        wbi_img_urls = local_storage.get("wbi_img_urls", "")
-        if not wbi_img_urls:
-            img_url_from_storage = local_storage.get("wbi_img_url")
-            sub_url_from_storage = local_storage.get("wbi_sub_url")
-            if img_url_from_storage and sub_url_from_storage:
-                wbi_img_urls = f"{img_url_from_storage}-{sub_url_from_storage}"
+        wbi_img_urls = ""
+        if self.playwright_page is not None:
+            local_storage = await self.playwright_page.evaluate("() => window.localStorage")
+            wbi_img_urls = local_storage.get("wbi_img_urls", "")
+            if not wbi_img_urls:
+                img_url_from_storage = local_storage.get("wbi_img_url")
+                sub_url_from_storage = local_storage.get("wbi_sub_url")
+                if img_url_from_storage and sub_url_from_storage:
+                    wbi_img_urls = f"{img_url_from_storage}-{sub_url_from_storage}"
         if wbi_img_urls and "-" in wbi_img_urls:
             img_url, sub_url = wbi_img_urls.split("-")
         else:
             resp = await self.request(method="GET", url=self._host + "/x/web-interface/nav")
             img_url: str = resp['wbi_img']['img_url']
             sub_url: str = resp['wbi_img']['sub_url']
-        img_key = img_url.rsplit('/', 1)[1].split('.')[0]
-        sub_key = sub_url.rsplit('/', 1)[1].split('.')[0]
-        return img_key, sub_key
+        return wbi_keys_from_urls(img_url, sub_url)
 
     async def get(self, uri: str, params=None, enable_params_sign: bool = True) -> Dict:
-        final_uri = uri
         if enable_params_sign:
-            params = await self.pre_request_data(params)
+            options = {"sign_uri": uri, "sign_params": params}
+            return await self.execute("GET", f"{self._host}{uri}", options=options, headers=self.headers)
+        final_uri = uri
         if isinstance(params, dict):
             final_uri = (f"{uri}?"
                          f"{urlencode(params)}")
-        return await self.request(method="GET", url=f"{self._host}{final_uri}", headers=self.headers)
+        return await self.execute("GET", f"{self._host}{final_uri}", headers=self.headers)
 
     async def post(self, uri: str, data: dict) -> Dict:
-        data = await self.pre_request_data(data)
-        json_str = json.dumps(data, separators=(',', ':'), ensure_ascii=False)
-        return await self.request(method="POST", url=f"{self._host}{uri}", data=json_str, headers=self.headers)
+        options = {"sign_uri": uri, "sign_params": data}
+        return await self.execute("POST", f"{self._host}{uri}", options=options, headers=self.headers)
 
     async def pong(self) -> bool:
         """get a note to check if login state is ok"""
@@ -203,19 +249,32 @@ class BilibiliClient(AbstractApiClient):
 
     async def get_video_media(self, url: str) -> Union[bytes, None]:
         # Follow CDN 302 redirects and treat any 2xx as success (some endpoints return 206)
-        async with httpx.AsyncClient(proxy=self.proxy, follow_redirects=True) as client:
-            try:
-                response = await client.request("GET", url, timeout=self.timeout, headers=self.headers)
-                response.raise_for_status()
-                if 200 <= response.status_code < 300:
-                    return response.content
-                utils.logger.error(
-                    f"[BilibiliClient.get_video_media] Unexpected status {response.status_code} for {url}"
-                )
-                return None
-            except httpx.HTTPError as exc:  # some wrong when call httpx.request method, such as connection error, client error, server error or response status code is not 2xx
-                utils.logger.error(f"[BilibiliClient.get_video_media] {exc.__class__.__name__} for {exc.request.url} - {exc}")  # 保留原始异常类型名称，以便开发者调试
-                return None
+        try:
+            async with self.use_http_client() as client:
+                response = await client.request("GET", url, timeout=self.timeout, headers=self.headers, follow_redirects=True)
+            response.raise_for_status()
+            if 200 <= response.status_code < 300:
+                return response.content
+            utils.logger.error(
+                f"[BilibiliClient.get_video_media] Unexpected status {response.status_code} for {url}"
+            )
+            return None
+        except httpx.HTTPError as exc:  # some wrong when call httpx.request method, such as connection error, client error, server error or response status code is not 2xx
+            utils.logger.error(f"[BilibiliClient.get_video_media] {exc.__class__.__name__} for {exc.request.url} - {exc}")  # 保留原始异常类型名称，以便开发者调试
+            return None
+
+    async def download_video_media(self, url: str, save_file_name: str) -> bool:
+        """
+        流式下载视频到本地文件, 不在内存中保留完整内容
+        Args:
+            url: 视频地址
+            save_file_name: 保存路径
+
+        Returns:
+            是否下载成功
+        """
+        async with self.use_http_client() as client:
+            return await download_to_file(client, url, save_file_name, headers=self.headers)
 
     async def get_video_comments(
         self,
@@ -253,23 +312,16 @@ class BilibiliClient(AbstractApiClient):
         """
         result = []
         is_end = False
-        next_page = 0
-        max_retries = 3
+        crawl_cursor = await comment_crawl_cursor("bili", video_id, id_key="rpid", ts_key="ctime")
+        next_page = crawl_cursor.start_cursor(0) if crawl_cursor else 0
         while not is_end and len(result) < max_count:
-            comments_res = None
-            for attempt in range(max_retries):
-                try:
-                    comments_res = await self.get_video_comments(video_id, CommentOrderType.DEFAULT, next_page)
-                    break  # Success
-                except DataFetchError as e:
-                    if attempt < max_retries - 1:
-                        delay = 5 * (2**attempt) + random.uniform(0, 1)
-                        utils.logger.warning(f"[BilibiliClient.get_video_all_comments] Retrying video_id {video_id} in {delay:.2f}s... (Attempt {attempt + 1}/{max_retries})")
-                        await asyncio.sleep(delay)
-                    else:
-                        utils.logger.error(f"[BilibiliClient.get_video_all_comments] Max retries reached for video_id: {video_id}. Skipping comments. Error: {e}")
-                        is_end = True
-                        break
+            page_cursor = next_page
+            try:
+                # 失败重试由请求管道的 RetryMiddleware 负责
+                comments_res = await self.get_video_comments(video_id, CommentOrderType.DEFAULT, next_page)
+            except DataFetchError as e:
+                utils.logger.error(f"[BilibiliClient.get_video_all_comments] Max retries reached for video_id: {video_id}. Skipping comments. Error: {e}")
+                break
             if not comments_res:
                 break
 
@@ -291,16 +343,24 @@ class BilibiliClient(AbstractApiClient):
             if not isinstance(is_end, bool):
                 utils.logger.warning(f"[BilibiliClient.get_video_all_comments] 'is_end' is not a boolean for video_id: {video_id}. Assuming end of comments.")
                 is_end = True
+            if crawl_cursor:
+                comment_list = await crawl_cursor.new_comments(comment_list)
             if is_fetch_sub_comments:
                 for comment in comment_list:
                     comment_id = comment['rpid']
                     if (comment.get("rcount", 0) > 0):
                         {await self.get_video_all_level_two_comments(video_id, comment_id, CommentOrderType.DEFAULT, 10, crawl_interval, callback)}
-            if len(result) + len(comment_list) > max_count:
+            truncated = len(result) + len(comment_list) > max_count
+            if truncated:
                 comment_list = comment_list[:max_count - len(result)]
             if callback:  # 如果有回调函数，就执行回调函数
                 await callback(video_id, comment_list)
-            await asyncio.sleep(crawl_interval)
+            if crawl_cursor:
+                # 截断的页面下次从本页续抓, 已保存的评论会被过滤掉
+                next_cursor = page_cursor if truncated else next_page
+                if not await crawl_cursor.commit(comment_list, next_cursor, not is_end or truncated):
+                    is_end = True
+            await crawl_sleep(crawl_interval)
             if not is_fetch_sub_comments:
                 result.extend(comment_list)
                 continue
@@ -332,7 +392,7 @@ class BilibiliClient(AbstractApiClient):
             comment_list: List[Dict] = result.get("replies", [])
             if callback:  # 如果有回调函数，就执行回调函数
                 await callback(video_id, comment_list)
-            await asyncio.sleep(crawl_interval)
+            await crawl_sleep(crawl_interval)
             if (int(result["page"]["count"]) <= pn * ps):
                 break
 
@@ -482,7 +542,7 @@ class BilibiliClient(AbstractApiClient):
                 fans_list = fans_list[:max_count - len(result)]
             if callback:  # 如果有回调函数，就执行回调函数
                 await callback(creator_info, fans_list)
-            await asyncio.sleep(crawl_interval)
+            await crawl_sleep(crawl_interval)
             if not fans_list:
                 break
             result.extend(fans_list)
@@ -516,7 +576,7 @@ class BilibiliClient(AbstractApiClient):
                 followings_list = followings_list[:max_count - len(result)]
             if callback:  # 如果有回调函数，就执行回调函数
                 await callback(creator_info, followings_list)
-            await asyncio.sleep(crawl_interval)
+            await crawl_sleep(crawl_interval)
             if not followings_list:
                 break
             result.extend(followings_list)
@@ -551,6 +611,6 @@ class BilibiliClient(AbstractApiClient):
                 dynamics_list = dynamics_list[:max_count - len(result)]
             if callback:
                 await callback(creator_info, dynamics_list)
-            await asyncio.sleep(crawl_interval)
+            await crawl_sleep(crawl_interval)
             result.extend(dynamics_list)
         return result
@@ -36,6 +36,8 @@ from proxy.proxy_ip_pool import IpInfoModel, create_ip_pool
 from tools.resource_path import get_libs_path
 from store import bilibili as bilibili_store
 from tools import utils
+from tools.rate_limiter import crawl_sleep
+from tools.media_download_pool import close_media_download_pool, get_media_download_pool
 from tools.cdp_browser import CDPBrowserManager
 from var import crawler_type_var, source_keyword_var
 
@@ -59,6 +61,7 @@ class BilibiliCrawler(AbstractCrawler):
 
     async def start(self):
         playwright_proxy_format, httpx_proxy_format = None, None
+        ip_proxy_pool, ip_proxy_info = None, None
         if config.ENABLE_IP_PROXY:
             ip_proxy_pool = await create_ip_pool(config.IP_PROXY_POOL_COUNT, enable_validate_ip=True)
             ip_proxy_info: IpInfoModel = await ip_proxy_pool.get_proxy()
@@ -89,6 +92,9 @@ class BilibiliCrawler(AbstractCrawler):
 
             # Create a client to interact with the xiaohongshu website.
             self.bili_client = await self.create_bilibili_client(httpx_proxy_format)
+            if ip_proxy_pool:
+                # 请求被封禁或超时时, 客户端从代理池租借新的代理重试
+                self.bili_client.use_proxy_pool(ip_proxy_pool, ip_proxy_info)
             if not await self.bili_client.pong():
                 login_obj = BilibiliLogin(
                     login_type=config.LOGIN_TYPE,
@@ -101,25 +107,35 @@ class BilibiliCrawler(AbstractCrawler):
                 await self.bili_client.update_cookies(browser_context=self.browser_context)
 
             crawler_type_var.set(config.CRAWLER_TYPE)
-            if config.CRAWLER_TYPE == "search":
-                await self.search()
-            elif config.CRAWLER_TYPE == "detail":
-                # Get the information and comments of the specified post
-                await self.get_specified_videos(config.BILI_SPECIFIED_ID_LIST)
-            elif config.CRAWLER_TYPE == "creator":
-                if config.CREATOR_MODE:
-                    for creator_url in config.BILI_CREATOR_ID_LIST:
-                        try:
-                            creator_info = parse_creator_info_from_url(creator_url)
-                            utils.logger.info(f"[BilibiliCrawler.start] Parsed creator ID: {creator_info.creator_id} from {creator_url}")
-                            await self.get_creator_videos(int(creator_info.creator_id))
-                        except ValueError as e:
-                            utils.logger.error(f"[BilibiliCrawler.start] Failed to parse creator URL: {e}")
-                            continue
+            try:
+                if config.CRAWLER_TYPE == "search":
+                    await self.search()
+                elif config.CRAWLER_TYPE == "detail":
+                    # Get the information and comments of the specified post
+                    await self.get_specified_videos(config.BILI_SPECIFIED_ID_LIST)
+                elif config.CRAWLER_TYPE == "creator":
+                    if config.CREATOR_MODE:
+                        for creator_url in config.BILI_CREATOR_ID_LIST:
+                            try:
+                                creator_info = parse_creator_info_from_url(creator_url)
+                                utils.logger.info(f"[BilibiliCrawler.start] Parsed creator ID: {creator_info.creator_id} from {creator_url}")
+                                await self.get_creator_videos(int(creator_info.creator_id))
+                            except ValueError as e:
+                                utils.logger.error(f"[BilibiliCrawler.start] Failed to parse creator URL: {e}")
+                                continue
+                    else:
+                        await self.get_all_creator_details(config.BILI_CREATOR_ID_LIST)
                 else:
-                    await self.get_all_creator_details(config.BILI_CREATOR_ID_LIST)
-            else:
-                pass
+                    pass
+            finally:
+                # 等待已提交的媒体下载完成, 再刷新并关闭存储, 保证缓冲中的数据全部写入磁盘
+                await close_media_download_pool()
+                await bilibili_store.BiliStoreFactory.close_store()
+                if getattr(self, "bili_client", None):
+                    await self.bili_client.aclose()
+                if ip_proxy_pool:
+                    await ip_proxy_pool.close()
+
             utils.logger.info("[BilibiliCrawler.start] Bilibili Crawler finished ...")
 
     async def search(self):
@@ -221,8 +237,7 @@ class BilibiliCrawler(AbstractCrawler):
                 page += 1
                 
                 # Sleep after page navigation
-                await asyncio.sleep(config.CRAWLER_MAX_SLEEP_SEC)
-                utils.logger.info(f"[BilibiliCrawler.search_by_keywords] Sleeping for {config.CRAWLER_MAX_SLEEP_SEC} seconds after page {page-1}")
+                await crawl_sleep(config.CRAWLER_MAX_SLEEP_SEC)
                 
                 await self.batch_get_video_comments(video_id_list)
 
@@ -302,8 +317,7 @@ class BilibiliCrawler(AbstractCrawler):
                         page += 1
                         
                         # Sleep after page navigation
-                        await asyncio.sleep(config.CRAWLER_MAX_SLEEP_SEC)
-                        utils.logger.info(f"[BilibiliCrawler.search_by_keywords_in_time_range] Sleeping for {config.CRAWLER_MAX_SLEEP_SEC} seconds after page {page-1}")
+                        await crawl_sleep(config.CRAWLER_MAX_SLEEP_SEC)
                         
                         await self.batch_get_video_comments(video_id_list)
 
@@ -339,8 +353,7 @@ class BilibiliCrawler(AbstractCrawler):
         async with semaphore:
             try:
                 utils.logger.info(f"[BilibiliCrawler.get_comments] begin get video_id: {video_id} comments ...")
-                await asyncio.sleep(config.CRAWLER_MAX_SLEEP_SEC)
-                utils.logger.info(f"[BilibiliCrawler.get_comments] Sleeping for {config.CRAWLER_MAX_SLEEP_SEC} seconds after fetching comments for video {video_id}")
+                await crawl_sleep(config.CRAWLER_MAX_SLEEP_SEC)
                 await self.bili_client.get_video_all_comments(
                     video_id=video_id,
                     crawl_interval=config.CRAWLER_MAX_SLEEP_SEC,
@@ -369,8 +382,7 @@ class BilibiliCrawler(AbstractCrawler):
             await self.get_specified_videos(video_bvids_list)
             if int(result["page"]["count"]) <= pn * ps:
                 break
-            await asyncio.sleep(config.CRAWLER_MAX_SLEEP_SEC)
-            utils.logger.info(f"[BilibiliCrawler.get_creator_videos] Sleeping for {config.CRAWLER_MAX_SLEEP_SEC} seconds after page {pn}")
+            await crawl_sleep(config.CRAWLER_MAX_SLEEP_SEC)
             pn += 1
 
     async def get_specified_videos(self, video_url_list: List[str]):
@@ -418,8 +430,7 @@ class BilibiliCrawler(AbstractCrawler):
                 result = await self.bili_client.get_video_info(aid=aid, bvid=bvid)
                 
                 # Sleep after fetching video details
-                await asyncio.sleep(config.CRAWLER_MAX_SLEEP_SEC)
-                utils.logger.info(f"[BilibiliCrawler.get_video_info_task] Sleeping for {config.CRAWLER_MAX_SLEEP_SEC} seconds after fetching video details {bvid or aid}")
+                await crawl_sleep(config.CRAWLER_MAX_SLEEP_SEC)
                 
                 return result
             except DataFetchError as ex:
@@ -541,6 +552,10 @@ class BilibiliCrawler(AbstractCrawler):
 
     async def close(self):
         """Close browser context"""
+        await close_media_download_pool()
+        await bilibili_store.BiliStoreFactory.close_store()
+        if getattr(self, "bili_client", None):
+            await self.bili_client.aclose()
         try:
             # 如果使用CDP模式，需要特殊处理
             if self.cdp_manager:
@@ -583,13 +598,9 @@ class BilibiliCrawler(AbstractCrawler):
             utils.logger.info("[BilibiliCrawler.get_bilibili_video] get video url failed")
             return
 
-        content = await self.bili_client.get_video_media(video_url)
-        await asyncio.sleep(config.CRAWLER_MAX_SLEEP_SEC)
-        utils.logger.info(f"[BilibiliCrawler.get_bilibili_video] Sleeping for {config.CRAWLER_MAX_SLEEP_SEC} seconds after fetching video {aid}")
-        if content is None:
-            return
         extension_file_name = f"video.mp4"
-        await bilibili_store.store_video(aid, content, extension_file_name)
+        save_file_name = bilibili_store.BilibiliVideo().prepare_save_file_name(aid, extension_file_name)
+        get_media_download_pool().submit(video_url, save_file_name, self.bili_client.download_video_media)
 
     async def get_all_creator_details(self, creator_url_list: List[str]):
         """
@@ -21,5 +21,9 @@ class DataFetchError(RequestError):
     """something error when fetch"""
 
 
+class TransientFetchError(DataFetchError):
+    """temporary failure (server busy, too frequent, risk control), the request is retried"""
+
+
 class IPBlockError(RequestError):
     """fetch so fast that the server block us ip"""
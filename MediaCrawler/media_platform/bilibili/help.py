@@ -14,60 +14,158 @@
 # @Time    : 2023/12/2 23:26
 # @Desc    : bilibili 请求参数签名
 # 逆向实现参考：https://socialsisteryi.github.io/bilibili-API-collect/docs/misc/sign/wbi.html#wbi%E7%AD%BE%E5%90%8D%E7%AE%97%E6%B3%95
+import asyncio
+import functools
 import re
+import time
 import urllib.parse
 from hashlib import md5
-from typing import Dict
+from typing import Any, Dict, Optional, Tuple
 
+import config
+from cache.abs_cache import AbstractCache
 from model.m_bilibili import VideoUrlInfo, CreatorUrlInfo
 from tools import utils
 
+WBI_MIXIN_KEY_TABLE = [
+    46, 47, 18, 2, 53, 8, 23, 32, 15, 50, 10, 31, 58, 3, 45, 35, 27, 43, 5, 49,
+    33, 9, 42, 19, 29, 28, 14, 39, 12, 38, 41, 13, 37, 48, 7, 16, 24, 55, 40,
+    61, 26, 17, 0, 1, 60, 51, 30, 4, 22, 25, 54, 21, 56, 59, 6, 63, 57, 62, 11,
+    36, 20, 34, 44, 52
+]
+# 签名前从参数值中过滤 "!'()*" 字符
+_WBI_VALUE_FILTER = str.maketrans("", "", "!'()*")
+
+
+@functools.lru_cache(maxsize=8)
+def get_mixin_key(img_key: str, sub_key: str) -> str:
+    """
+    按混淆表重排 img_key + sub_key 得到加盐的 key, 同一对密钥只计算一次
+    :param img_key:
+    :param sub_key:
+    :return:
+    """
+    raw_key = img_key + sub_key
+    return "".join(raw_key[index] for index in WBI_MIXIN_KEY_TABLE)[:32]
+
 
 class BilibiliSign:
     def __init__(self, img_key: str, sub_key: str):
         self.img_key = img_key
         self.sub_key = sub_key
-        self.map_table = [
-            46, 47, 18, 2, 53, 8, 23, 32, 15, 50, 10, 31, 58, 3, 45, 35, 27, 43, 5, 49,
-            33, 9, 42, 19, 29, 28, 14, 39, 12, 38, 41, 13, 37, 48, 7, 16, 24, 55, 40,
-            61, 26, 17, 0, 1, 60, 51, 30, 4, 22, 25, 54, 21, 56, 59, 6, 63, 57, 62, 11,
-            36, 20, 34, 44, 52
-        ]
+        self.salt = get_mixin_key(img_key, sub_key)
 
     def get_salt(self) -> str:
         """
         获取加盐的 key
         :return:
         """
-        salt = ""
-        mixin_key = self.img_key + self.sub_key
-        for mt in self.map_table:
-            salt += mixin_key[mt]
-        return salt[:32]
+        return self.salt
 
-    def sign(self, req_data: Dict) -> Dict:
+    def sign(self, req_data: Dict, current_ts: Optional[int] = None) -> Dict:
         """
         请求参数中加上当前时间戳对请求参数中的key进行字典序排序
         再将请求参数进行 url 编码集合 salt 进行 md5 就可以生成w_rid参数了
         :param req_data:
+        :param current_ts: 签名时间戳, 默认当前时间
         :return:
         """
-        current_ts = utils.get_unix_timestamp()
-        req_data.update({"wts": current_ts})
-        req_data = dict(sorted(req_data.items()))
-        req_data = {
-            # 过滤 value 中的 "!'()*" 字符
-            k: ''.join(filter(lambda ch: ch not in "!'()*", str(v)))
-            for k, v
-            in req_data.items()
-        }
+        req_data.update({"wts": utils.get_unix_timestamp() if current_ts is None else current_ts})
+        req_data = {k: str(v).translate(_WBI_VALUE_FILTER) for k, v in sorted(req_data.items())}
         query = urllib.parse.urlencode(req_data)
-        salt = self.get_salt()
-        wbi_sign = md5((query + salt).encode()).hexdigest()  # 计算 w_rid
+        wbi_sign = md5((query + self.salt).encode()).hexdigest()  # 计算 w_rid
         req_data['w_rid'] = wbi_sign
         return req_data
 
 
+@functools.lru_cache(maxsize=8)
+def get_wbi_signer(img_key: str, sub_key: str) -> BilibiliSign:
+    return BilibiliSign(img_key, sub_key)
+
+
+def wbi_keys_from_urls(img_url: str, sub_url: str) -> Tuple[str, str]:
+    """
+    https://i0.hdslb.com/bfs/wbi/7cd084941338484aae1ad9425b84077c.png -> 7cd084941338484aae1ad9425b84077c
+    """
+    img_key = img_url.rsplit('/', 1)[1].split('.')[0]
+    sub_key = sub_url.rsplit('/', 1)[1].split('.')[0]
+    return img_key, sub_key
+
+
+class WbiKeyCache:
+    """
+    img_key/sub_key cached in the process and in the cache backend config.BILI_WBI_KEY_CACHE_TYPE
+    (redis shares them between crawler processes) until ttl_sec after they were fetched;
+    blocking backends (cache.blocking_io) are read and written in a thread
+    """
+    CACHE_KEY = "bilibili:wbi_keys"
+
+    def __init__(self, cache: Optional[AbstractCache] = None, ttl_sec: Optional[int] = None):
+        self._cache = cache
+        self.ttl_sec = config.BILI_WBI_KEY_TTL_SEC if ttl_sec is None else ttl_sec
+        self._keys: Optional[Tuple[str, str]] = None
+        self._expire_at = 0.0
+
+    @property
+    def cache(self) -> AbstractCache:
+        if self._cache is None:
+            from cache.cache_factory import CacheFactory
+            self._cache = CacheFactory.create_cache(config.BILI_WBI_KEY_CACHE_TYPE)
+        return self._cache
+
+    async def _cache_get(self) -> Any:
+        if getattr(self.cache, "blocking_io", False):
+            return await asyncio.to_thread(self.cache.get, self.CACHE_KEY)
+        return self.cache.get(self.CACHE_KEY)
+
+    async def _cache_set(self, value: Any, ttl: int):
+        if getattr(self.cache, "blocking_io", False):
+            await asyncio.to_thread(self.cache.set, self.CACHE_KEY, value, ttl)
+        else:
+            self.cache.set(self.CACHE_KEY, value, ttl)
+
+    async def get(self) -> Optional[Tuple[str, str]]:
+        if self._keys is not None and time.time() < self._expire_at:
+            return self._keys
+        try:
+            value = await self._cache_get()
+        except Exception as e:
+            utils.logger.warning(f"[WbiKeyCache.get] read wbi keys from {config.BILI_WBI_KEY_CACHE_TYPE} cache failed: {e}")
+            value = None
+        if not value or value["expire_at"] <= time.time():
+            return None
+        self._keys, self._expire_at = (value["img_key"], value["sub_key"]), value["expire_at"]
+        return self._keys
+
+    async def set(self, img_key: str, sub_key: str):
+        self._keys, self._expire_at = (img_key, sub_key), time.time() + self.ttl_sec
+        value = {"img_key": img_key, "sub_key": sub_key, "expire_at": self._expire_at}
+        try:
+            await self._cache_set(value, self.ttl_sec)
+        except Exception as e:
+            utils.logger.warning(f"[WbiKeyCache.set] write wbi keys to {config.BILI_WBI_KEY_CACHE_TYPE} cache failed: {e}")
+
+    async def invalidate(self):
+        """
+        drop the keys here and in the shared cache, the next signed request fetches them again
+        """
+        self._keys, self._expire_at = None, 0.0
+        try:
+            await self._cache_set({"img_key": "", "sub_key": "", "expire_at": 0.0}, 1)
+        except Exception as e:
+            utils.logger.warning(f"[WbiKeyCache.invalidate] invalidate wbi keys failed: {e}")
+
+
+_wbi_key_cache: Optional[WbiKeyCache] = None
+
+
+def get_wbi_key_cache() -> WbiKeyCache:
+    global _wbi_key_cache
+    if _wbi_key_cache is None:
+        _wbi_key_cache = WbiKeyCache()
+    return _wbi_key_cache
+
+
 def parse_video_info_from_url(url: str) -> VideoUrlInfo:
     """
     从B站视频URL中解析出视频ID
@@ -8,7 +8,6 @@
 # 详细许可条款请参阅项目根目录下的LICENSE文件。
 # 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
 
-import asyncio
 import copy
 import json
 import urllib.parse
@@ -18,7 +17,11 @@ import httpx
 from playwright.async_api import BrowserContext
 
 from base.base_crawler import AbstractApiClient
-from tools import utils
+from base.request_pipeline import RequestContext
+from tools import json_codec, utils
+from tools.crawl_state import comment_crawl_cursor
+from tools.rate_limiter import crawl_sleep
+from tools.media_downloader import download_to_file
 from var import request_keyword_var
 
 from .exception import *
@@ -27,6 +30,8 @@ from .help import *
 
 
 class DouYinClient(AbstractApiClient):
+    throttle_errors = (AccountBlockedError,)
+    identity_cookies = ("sessionid",)
 
     def __init__(
         self,
@@ -43,6 +48,8 @@ class DouYinClient(AbstractApiClient):
         self._host = "https://www.douyin.com"
         self.playwright_page = playwright_page
         self.cookie_dict = cookie_dict
+        # 通用参数、webid 和 msToken 按会话缓存, 不再每个请求都读取一次页面 localStorage
+        self.params_context = DouyinParamsContext(playwright_page)
 
     async def __process_req_params(
         self,
@@ -55,36 +62,7 @@ class DouYinClient(AbstractApiClient):
         if not params:
             return
         headers = headers or self.headers
-        local_storage: Dict = await self.playwright_page.evaluate("() => window.localStorage")  # type: ignore
-        common_params = {
-            "device_platform": "webapp",
-            "aid": "6383",
-            "channel": "channel_pc_web",
-            "version_code": "190600",
-            "version_name": "19.6.0",
-            "update_version_code": "170400",
-            "pc_client_type": "1",
-            "cookie_enabled": "true",
-            "browser_language": "zh-CN",
-            "browser_platform": "MacIntel",
-            "browser_name": "Chrome",
-            "browser_version": "125.0.0.0",
-            "browser_online": "true",
-            "engine_name": "Blink",
-            "os_name": "Mac OS",
-            "os_version": "10.15.7",
-            "cpu_core_num": "8",
-            "device_memory": "8",
-            "engine_version": "109.0",
-            "platform": "PC",
-            "screen_width": "2560",
-            "screen_height": "1440",
-            'effective_type': '4g',
-            "round_trip_time": "50",
-            "webid": get_web_id(),
-            "msToken": local_storage.get("xmst"),
-        }
-        params.update(common_params)
+        await self.params_context.apply(params)
         query_string = urllib.parse.urlencode(params)
 
         # 20240927 a-bogus更新（JS版本）
@@ -94,32 +72,57 @@ class DouYinClient(AbstractApiClient):
         a_bogus = await get_a_bogus(uri, query_string, post_data, headers["User-Agent"], self.playwright_page)
         params["a_bogus"] = a_bogus
 
-    async def request(self, method, url, **kwargs):
-        async with httpx.AsyncClient(proxy=self.proxy) as client:
-            response = await client.request(method, url, timeout=self.timeout, **kwargs)
+    async def sign_request(self, ctx: RequestContext):
+        """
+        补充通用参数并计算 a_bogus, 每次重试都基于未签名的参数副本重新签名
+        """
+        if "sign_uri" not in ctx.options:
+            return
+        params = copy.copy(ctx.options.get("sign_params"))
+        await self.__process_req_params(ctx.options["sign_uri"], params, ctx.kwargs.get("headers"))
+        ctx.kwargs["data" if ctx.method.upper() == "POST" else "params"] = params
+
+    def classify_response(self, ctx: RequestContext) -> Any:
+        response = ctx.response
+        if response.text == "" or response.text == "blocked":
+            utils.logger.error(f"request params incrr, response.text: {response.text}")
+            # msToken 可能已失效, 重试时从页面重新读取
+            self.params_context.invalidate()
+            raise AccountBlockedError(f"account blocked, {response.text}")
         try:
-            if response.text == "" or response.text == "blocked":
-                utils.logger.error(f"request params incrr, response.text: {response.text}")
-                raise Exception("account blocked")
-            return response.json()
+            return json_codec.decode_response(response)
         except Exception as e:
             raise DataFetchError(f"{e}, {response.text}")
 
+    async def request(self, method, url, **kwargs):
+        return await self.execute(method, url, **kwargs)
+
+    def request_stats(self) -> Optional[Dict[str, Any]]:
+        stats = super().request_stats()
+        if stats is not None and douyin_sign_pool.calls:
+            stats.update({f"sign_{key}": value for key, value in douyin_sign_pool.stats().items()})
+        return stats
+
+    async def aclose(self):
+        await super().aclose()
+        await douyin_sign_pool.close()
+
     async def get(self, uri: str, params: Optional[Dict] = None, headers: Optional[Dict] = None):
         """
         GET请求
         """
-        await self.__process_req_params(uri, params, headers)
         headers = headers or self.headers
-        return await self.request(method="GET", url=f"{self._host}{uri}", params=params, headers=headers)
+        options = {"sign_uri": uri, "sign_params": params}
+        return await self.execute("GET", f"{self._host}{uri}", options=options, headers=headers)
 
     async def post(self, uri: str, data: dict, headers: Optional[Dict] = None):
-        await self.__process_req_params(uri, data, headers)
         headers = headers or self.headers
-        return await self.request(method="POST", url=f"{self._host}{uri}", data=data, headers=headers)
+        options = {"sign_uri": uri, "sign_params": data}
+        return await self.execute("POST", f"{self._host}{uri}", options=options, headers=headers)
 
     async def pong(self, browser_context: BrowserContext) -> bool:
         local_storage = await self.playwright_page.evaluate("() => window.localStorage")
+        self.params_context.update_local_storage(local_storage)
         if local_storage.get("HasUserLogin", "") == "1":
             return True
 
@@ -130,6 +133,7 @@ class DouYinClient(AbstractApiClient):
         cookie_str, cookie_dict = utils.convert_cookies(await browser_context.cookies())
         self.headers["Cookie"] = cookie_str
         self.cookie_dict = cookie_dict
+        self.params_context.invalidate()
 
     async def search_info_by_keyword(
         self,
@@ -230,25 +234,36 @@ class DouYinClient(AbstractApiClient):
         :param is_fetch_sub_comments: 是否抓取子评论
         :param callback: 回调函数，用于处理抓取到的评论
         :param max_count: 一次帖子爬取的最大评论数量
-        :return: 评论列表
+        :return: 评论列表, 开启增量抓取时只包含新评论
         """
         result = []
         comments_has_more = 1
-        comments_cursor = 0
+        crawl_cursor = await comment_crawl_cursor("dy", aweme_id, id_key="cid", ts_key="create_time")
+        comments_cursor = crawl_cursor.start_cursor(0) if crawl_cursor else 0
         while comments_has_more and len(result) < max_count:
+            page_cursor = comments_cursor
             comments_res = await self.get_aweme_comments(aweme_id, comments_cursor)
             comments_has_more = comments_res.get("has_more", 0)
             comments_cursor = comments_res.get("cursor", 0)
             comments = comments_res.get("comments", [])
+            if crawl_cursor:
+                comments = await crawl_cursor.new_comments(comments)
+            truncated = len(result) + len(comments) > max_count
+            if truncated:
+                comments = comments[:max_count - len(result)]
+            if comments:
+                result.extend(comments)
+                if callback:  # 如果有回调函数，就执行回调函数
+                    await callback(aweme_id, comments)
+            if crawl_cursor:
+                # 截断的页面下次从本页续抓, 已保存的评论会被过滤掉
+                next_cursor = page_cursor if truncated else comments_cursor
+                if not await crawl_cursor.commit(comments, next_cursor, bool(comments_has_more) or truncated):
+                    comments_has_more = 0
             if not comments:
                 continue
-            if len(result) + len(comments) > max_count:
-                comments = comments[:max_count - len(result)]
-            result.extend(comments)
-            if callback:  # 如果有回调函数，就执行回调函数
-                await callback(aweme_id, comments)
 
-            await asyncio.sleep(crawl_interval)
+            await crawl_sleep(crawl_interval)
             if not is_fetch_sub_comments:
                 continue
             # 🔥 获取二级评论 - 每条一级评论最多100条二级评论
@@ -279,7 +294,7 @@ class DouYinClient(AbstractApiClient):
                         result.extend(sub_comments)
                         if callback:  # 如果有回调函数，就执行回调函数
                             await callback(aweme_id, sub_comments)
-                        await asyncio.sleep(crawl_interval)
+                        await crawl_sleep(crawl_interval)
         return result
 
     async def get_user_info(self, sec_user_id: str):
@@ -320,18 +335,31 @@ class DouYinClient(AbstractApiClient):
         return result
 
     async def get_aweme_media(self, url: str) -> Union[bytes, None]:
-        async with httpx.AsyncClient(proxy=self.proxy) as client:
-            try:
+        try:
+            async with self.use_http_client() as client:
                 response = await client.request("GET", url, timeout=self.timeout, follow_redirects=True)
-                response.raise_for_status()
-                if not response.reason_phrase == "OK":
-                    utils.logger.error(f"[DouYinClient.get_aweme_media] request {url} err, res:{response.text}")
-                    return None
-                else:
-                    return response.content
-            except httpx.HTTPError as exc:  # some wrong when call httpx.request method, such as connection error, client error, server error or response status code is not 2xx
-                utils.logger.error(f"[DouYinClient.get_aweme_media] {exc.__class__.__name__} for {exc.request.url} - {exc}")  # 保留原始异常类型名称，以便开发者调试
+            response.raise_for_status()
+            if not response.reason_phrase == "OK":
+                utils.logger.error(f"[DouYinClient.get_aweme_media] request {url} err, res:{response.text}")
                 return None
+            else:
+                return response.content
+        except httpx.HTTPError as exc:  # some wrong when call httpx.request method, such as connection error, client error, server error or response status code is not 2xx
+            utils.logger.error(f"[DouYinClient.get_aweme_media] {exc.__class__.__name__} for {exc.request.url} - {exc}")  # 保留原始异常类型名称，以便开发者调试
+            return None
+
+    async def download_aweme_media(self, url: str, save_file_name: str) -> bool:
+        """
+        流式下载抖音图片/视频到本地文件, 不在内存中保留完整内容
+        Args:
+            url: 媒体地址
+            save_file_name: 保存路径
+
+        Returns:
+            是否下载成功
+        """
+        async with self.use_http_client() as client:
+            return await download_to_file(client, url, save_file_name)
 
     async def resolve_short_url(self, short_url: str) -> str:
         """
@@ -341,19 +369,19 @@ class DouYinClient(AbstractApiClient):
         Returns:
             重定向后的完整URL
         """
-        async with httpx.AsyncClient(proxy=self.proxy, follow_redirects=False) as client:
-            try:
-                utils.logger.info(f"[DouYinClient.resolve_short_url] Resolving short URL: {short_url}")
-                response = await client.get(short_url, timeout=10)
-
-                # 短链接通常返回302重定向
-                if response.status_code in [301, 302, 303, 307, 308]:
-                    redirect_url = response.headers.get("Location", "")
-                    utils.logger.info(f"[DouYinClient.resolve_short_url] Resolved to: {redirect_url}")
-                    return redirect_url
-                else:
-                    utils.logger.warning(f"[DouYinClient.resolve_short_url] Unexpected status code: {response.status_code}")
-                    return ""
-            except Exception as e:
-                utils.logger.error(f"[DouYinClient.resolve_short_url] Failed to resolve short URL: {e}")
+        try:
+            utils.logger.info(f"[DouYinClient.resolve_short_url] Resolving short URL: {short_url}")
+            async with self.use_http_client() as client:
+                response = await client.get(short_url, timeout=10, follow_redirects=False)
+
+            # 短链接通常返回302重定向
+            if response.status_code in [301, 302, 303, 307, 308]:
+                redirect_url = response.headers.get("Location", "")
+                utils.logger.info(f"[DouYinClient.resolve_short_url] Resolved to: {redirect_url}")
+                return redirect_url
+            else:
+                utils.logger.warning(f"[DouYinClient.resolve_short_url] Unexpected status code: {response.status_code}")
                 return ""
+        except Exception as e:
+            utils.logger.error(f"[DouYinClient.resolve_short_url] Failed to resolve short URL: {e}")
+            return ""
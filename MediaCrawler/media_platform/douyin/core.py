@@ -10,7 +10,6 @@
 
 import asyncio
 import os
-import random
 from asyncio import Task
 from typing import Any, Dict, List, Optional, Tuple
 
@@ -27,6 +26,8 @@ from base.base_crawler import AbstractCrawler
 from proxy.proxy_ip_pool import IpInfoModel, create_ip_pool
 from store import douyin as douyin_store
 from tools import utils
+from tools.rate_limiter import crawl_sleep
+from tools.media_download_pool import close_media_download_pool, get_media_download_pool
 from tools.cdp_browser import CDPBrowserManager
 from tools.resource_path import get_libs_path
 from var import crawler_type_var, source_keyword_var
@@ -52,6 +53,7 @@ class DouYinCrawler(AbstractCrawler):
 
     async def start(self) -> None:
         playwright_proxy_format, httpx_proxy_format = None, None
+        ip_proxy_pool, ip_proxy_info = None, None
         if config.ENABLE_IP_PROXY:
             ip_proxy_pool = await create_ip_pool(config.IP_PROXY_POOL_COUNT, enable_validate_ip=True)
             ip_proxy_info: IpInfoModel = await ip_proxy_pool.get_proxy()
@@ -86,6 +88,9 @@ class DouYinCrawler(AbstractCrawler):
             await self.context_page.goto(self.index_url)
 
             self.dy_client = await self.create_douyin_client(httpx_proxy_format)
+            if ip_proxy_pool:
+                # 请求被封禁或超时时, 客户端从代理池租借新的代理重试
+                self.dy_client.use_proxy_pool(ip_proxy_pool, ip_proxy_info)
             if not await self.dy_client.pong(browser_context=self.browser_context):
                 login_obj = DouYinLogin(
                     login_type=config.LOGIN_TYPE,
@@ -97,15 +102,24 @@ class DouYinCrawler(AbstractCrawler):
                 await login_obj.begin()
                 await self.dy_client.update_cookies(browser_context=self.browser_context)
             crawler_type_var.set(config.CRAWLER_TYPE)
-            if config.CRAWLER_TYPE == "search":
-                # Search for notes and retrieve their comment information.
-                await self.search()
-            elif config.CRAWLER_TYPE == "detail":
-                # Get the information and comments of the specified post
-                await self.get_specified_awemes()
-            elif config.CRAWLER_TYPE == "creator":
-                # Get the information and comments of the specified creator
-                await self.get_creators_and_videos()
+            try:
+                if config.CRAWLER_TYPE == "search":
+                    # Search for notes and retrieve their comment information.
+                    await self.search()
+                elif config.CRAWLER_TYPE == "detail":
+                    # Get the information and comments of the specified post
+                    await self.get_specified_awemes()
+                elif config.CRAWLER_TYPE == "creator":
+                    # Get the information and comments of the specified creator
+                    await self.get_creators_and_videos()
+            finally:
+                # 等待已提交的媒体下载完成, 再刷新并关闭存储, 保证缓冲中的数据全部写入磁盘
+                await close_media_download_pool()
+                await douyin_store.DouyinStoreFactory.close_store()
+                if getattr(self, "dy_client", None):
+                    await self.dy_client.aclose()
+                if ip_proxy_pool:
+                    await ip_proxy_pool.close()
 
             utils.logger.info("[DouYinCrawler.start] Douyin Crawler finished ...")
 
@@ -188,8 +202,7 @@ class DouYinCrawler(AbstractCrawler):
                     break
 
                 # Sleep after each page navigation
-                await asyncio.sleep(config.CRAWLER_MAX_SLEEP_SEC)
-                utils.logger.info(f"[DouYinCrawler.search] Sleeping for {config.CRAWLER_MAX_SLEEP_SEC} seconds after page {page-1}")
+                await crawl_sleep(config.CRAWLER_MAX_SLEEP_SEC)
 
             # 🔥 最终确保只采集设置的数量
             aweme_list = aweme_list[:max_notes_to_collect]
@@ -237,8 +250,7 @@ class DouYinCrawler(AbstractCrawler):
             try:
                 result = await self.dy_client.get_video_by_id(aweme_id)
                 # Sleep after fetching aweme detail
-                await asyncio.sleep(config.CRAWLER_MAX_SLEEP_SEC)
-                utils.logger.info(f"[DouYinCrawler.get_aweme_detail] Sleeping for {config.CRAWLER_MAX_SLEEP_SEC} seconds after fetching aweme {aweme_id}")
+                await crawl_sleep(config.CRAWLER_MAX_SLEEP_SEC)
                 return result
             except DataFetchError as ex:
                 utils.logger.error(f"[DouYinCrawler.get_aweme_detail] Get aweme detail error: {ex}")
@@ -292,13 +304,12 @@ class DouYinCrawler(AbstractCrawler):
                     max_count=config.CRAWLER_MAX_COMMENTS_COUNT_SINGLENOTES,
                 )
                 # Sleep after fetching comments
-                await asyncio.sleep(crawl_interval)
+                await crawl_sleep(crawl_interval)
 
                 # 🔥 显示完成
                 if index > 0 and total > 0:
                     print(f"   ✅ [{index}/{total}] 视频 {aweme_id} 评论采集完成")
 
-                utils.logger.info(f"[DouYinCrawler.get_comments] Sleeping for {crawl_interval} seconds after fetching comments for aweme {aweme_id}")
                 utils.logger.info(f"[DouYinCrawler.get_comments] aweme_id: {aweme_id} comments have all been obtained and filtered ...")
             except DataFetchError as e:
                 utils.logger.error(f"[DouYinCrawler.get_comments] aweme_id: {aweme_id} get comments failed, error: {e}")
@@ -425,6 +436,10 @@ class DouYinCrawler(AbstractCrawler):
 
     async def close(self) -> None:
         """Close browser context"""
+        await close_media_download_pool()
+        await douyin_store.DouyinStoreFactory.close_store()
+        if getattr(self, "dy_client", None):
+            await self.dy_client.aclose()
         # 🔥 如果是统一浏览器模式，不关闭浏览器上下文（由GUI管理）
         if self._is_unified_browser:
             utils.logger.info("[DouYinCrawler.close] 统一浏览器模式，跳过关闭浏览器上下文")
@@ -477,13 +492,11 @@ class DouYinCrawler(AbstractCrawler):
         for url in note_download_url:
             if not url:
                 continue
-            content = await self.dy_client.get_aweme_media(url)
-            await asyncio.sleep(random.random())
-            if content is None:
-                continue
+            # 文件名按图片位置编号, 失败后重新下载时可以续传同一个 .part 文件
             extension_file_name = f"{picNum:>03d}.jpeg"
             picNum += 1
-            await douyin_store.update_dy_aweme_image(aweme_id, content, extension_file_name)
+            save_file_name = douyin_store.DouYinImage().prepare_save_file_name(aweme_id, extension_file_name)
+            get_media_download_pool().submit(url, save_file_name, self.dy_client.download_aweme_media)
 
     async def get_aweme_video(self, aweme_item: Dict):
         """
@@ -501,9 +514,6 @@ class DouYinCrawler(AbstractCrawler):
 
         if not video_download_url:
             return
-        content = await self.dy_client.get_aweme_media(video_download_url)
-        await asyncio.sleep(random.random())
-        if content is None:
-            return
         extension_file_name = f"video.mp4"
-        await douyin_store.update_dy_aweme_video(aweme_id, content, extension_file_name)
+        save_file_name = douyin_store.DouYinVideo().prepare_save_file_name(aweme_id, extension_file_name)
+        get_media_download_pool().submit(video_download_url, save_file_name, self.dy_client.download_aweme_media)
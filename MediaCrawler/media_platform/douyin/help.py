@@ -15,20 +15,26 @@
 # @Time    : 2024/6/10 02:24
 # @Desc    : 获取 a_bogus 参数, 学习交流使用，请勿用作商业用途，侵权联系作者删除
 
+import asyncio
 import random
 import re
-from typing import Optional
+import time
+from typing import Dict, Optional
 
 import execjs
 from playwright.async_api import Page
 
+import config
 from model.m_douyin import VideoUrlInfo, CreatorUrlInfo
 from tools.crawler_util import extract_url_params_to_dict
+from tools.js_worker_pool import JsWorkerPool
 from tools.resource_path import get_libs_path
 
 # 🔥 修复EXE打包后的路径问题 - 使用统一的资源路径工具
 douyin_js_path = get_libs_path('douyin.js')
 douyin_sign_obj = execjs.compile(open(douyin_js_path, encoding='utf-8-sig').read())
+# 常驻的签名进程池, douyin.js 在每个进程中只加载一次
+douyin_sign_pool = JsWorkerPool(douyin_js_path, size=config.DY_SIGN_WORKERS, timeout_sec=config.DY_SIGN_TIMEOUT_SEC)
 
 def get_web_id():
     """
@@ -51,16 +57,117 @@ def get_web_id():
     return web_id.replace('-', '')[:19]
 
 
+# 每个请求都携带的浏览器环境参数, 只构建一次
+DOUYIN_COMMON_PARAMS = {
+    "device_platform": "webapp",
+    "aid": "6383",
+    "channel": "channel_pc_web",
+    "version_code": "190600",
+    "version_name": "19.6.0",
+    "update_version_code": "170400",
+    "pc_client_type": "1",
+    "cookie_enabled": "true",
+    "browser_language": "zh-CN",
+    "browser_platform": "MacIntel",
+    "browser_name": "Chrome",
+    "browser_version": "125.0.0.0",
+    "browser_online": "true",
+    "engine_name": "Blink",
+    "os_name": "Mac OS",
+    "os_version": "10.15.7",
+    "cpu_core_num": "8",
+    "device_memory": "8",
+    "engine_version": "109.0",
+    "platform": "PC",
+    "screen_width": "2560",
+    "screen_height": "1440",
+    "effective_type": "4g",
+    "round_trip_time": "50",
+}
+
+
+class DouyinParamsContext:
+    """
+    Per session request params: the prebuilt common params, a webid fixed for the session and the
+    msToken (localStorage xmst) read from the page once and cached for ms_token_ttl_sec
+    """
+
+    def __init__(self, page: Optional[Page], ms_token_ttl_sec: float = None):
+        self.page = page
+        self.ms_token_ttl_sec = config.DY_MS_TOKEN_REFRESH_SEC if ms_token_ttl_sec is None else ms_token_ttl_sec
+        self.web_id = get_web_id()
+        self.page_reads = 0
+        self._ms_token: Optional[str] = None
+        self._ms_token_read_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+
+    def update_local_storage(self, local_storage: Dict):
+        """
+        cache msToken from a localStorage dump the caller already has (e.g. pong)
+        """
+        self._ms_token = local_storage.get("xmst")
+        self._ms_token_read_at = time.monotonic()
+
+    def invalidate(self):
+        """
+        msToken is read from the page again by the next request, called after the cookies changed
+        """
+        self._ms_token_read_at = None
+
+    def _ms_token_valid(self) -> bool:
+        return self._ms_token_read_at is not None and time.monotonic() - self._ms_token_read_at < self.ms_token_ttl_sec
+
+    async def ms_token(self) -> Optional[str]:
+        if self._ms_token_valid():
+            return self._ms_token
+        async with self._lock:
+            # 并发请求只有一个去页面读取, 其余等待后直接使用缓存
+            if not self._ms_token_valid():
+                local_storage: Dict = await self.page.evaluate("() => window.localStorage")  # type: ignore
+                self.page_reads += 1
+                self.update_local_storage(local_storage)
+        return self._ms_token
+
+    async def apply(self, params: Dict):
+        """
+        add the common params, webid and msToken to the request params
+        """
+        params.update(DOUYIN_COMMON_PARAMS)
+        params["webid"] = self.web_id
+        params["msToken"] = await self.ms_token()
+
+
 
 async def get_a_bogus(url: str, params: str, post_data: dict, user_agent: str, page: Page = None):
     """
     获取 a_bogus 参数, 目前不支持post请求类型的签名
     """
-    return get_a_bogus_from_js(url, params, user_agent)
+    return await sign(url, params, user_agent)
+
+
+def _sign_js_name(url: str) -> str:
+    if "/reply" in url:
+        return "sign_reply"
+    return "sign_datail"
+
+
+async def sign(uri: str, query: str, user_agent: str) -> str:
+    """
+    通过常驻签名进程池获取 a_bogus 参数, 签名在 node 进程中执行, 不阻塞事件循环
+    Args:
+        uri: 请求路径
+        query: 待签名的查询字符串
+        user_agent: 请求的 User-Agent
+
+    Returns:
+        a_bogus
+    """
+    return await douyin_sign_pool.call(_sign_js_name(uri), query, user_agent)
+
 
 def get_a_bogus_from_js(url: str, params: str, user_agent: str):
     """
-    通过js获取 a_bogus 参数
+    通过js获取 a_bogus 参数(同步调用, 每次调用都会启动新的 node 进程)
     Args:
         url:
         params:
@@ -69,10 +176,7 @@ def get_a_bogus_from_js(url: str, params: str, user_agent: str):
     Returns:
 
     """
-    sign_js_name = "sign_datail"
-    if "/reply" in url:
-        sign_js_name = "sign_reply"
-    return douyin_sign_obj.call(sign_js_name, params, user_agent)
+    return douyin_sign_obj.call(_sign_js_name(url), params, user_agent)
 
 
 
@@ -10,17 +10,17 @@
 
 
 # -*- coding: utf-8 -*-
-import asyncio
 import json
 from typing import Any, Callable, Dict, List, Optional
 from urllib.parse import urlencode
 
-import httpx
 from playwright.async_api import BrowserContext, Page
 
 import config
 from base.base_crawler import AbstractApiClient
-from tools import utils
+from base.request_pipeline import RequestContext
+from tools import json_codec, utils
+from tools.rate_limiter import crawl_sleep
 
 from .exception import DataFetchError
 from .graphql import KuaiShouGraphQL
@@ -44,15 +44,16 @@ class KuaiShouClient(AbstractApiClient):
         self.cookie_dict = cookie_dict
         self.graphql = KuaiShouGraphQL()
 
-    async def request(self, method, url, **kwargs) -> Any:
-        async with httpx.AsyncClient(proxy=self.proxy) as client:
-            response = await client.request(method, url, timeout=self.timeout, **kwargs)
-        data: Dict = response.json()
+    def classify_response(self, ctx: RequestContext) -> Any:
+        data: Dict = json_codec.decode_response(ctx.response)
         if data.get("errors"):
             raise DataFetchError(data.get("errors", "unkonw error"))
         else:
             return data.get("data", {})
 
+    async def request(self, method, url, **kwargs) -> Any:
+        return await self.execute(method, url, **kwargs)
+
     async def get(self, uri: str, params=None) -> Dict:
         final_uri = uri
         if isinstance(params, dict):
@@ -206,7 +207,7 @@ class KuaiShouClient(AbstractApiClient):
             if callback:  # 如果有回调函数，就执行回调函数
                 await callback(photo_id, comments)
             result.extend(comments)
-            await asyncio.sleep(crawl_interval)
+            await crawl_sleep(crawl_interval)
             sub_comments = await self.get_comments_all_sub_comments(
                 comments, photo_id, crawl_interval, callback
             )
@@ -259,7 +260,7 @@ class KuaiShouClient(AbstractApiClient):
                 comments = vision_sub_comment_list.get("subComments", {})
                 if callback:
                     await callback(photo_id, comments)
-                await asyncio.sleep(crawl_interval)
+                await crawl_sleep(crawl_interval)
                 result.extend(comments)
         return result
 
@@ -308,6 +309,6 @@ class KuaiShouClient(AbstractApiClient):
 
             if callback:
                 await callback(videos)
-            await asyncio.sleep(crawl_interval)
+            await crawl_sleep(crawl_interval)
             result.extend(videos)
         return result
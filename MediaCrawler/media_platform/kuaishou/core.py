@@ -30,6 +30,7 @@ from model.m_kuaishou import VideoUrlInfo, CreatorUrlInfo
 from proxy.proxy_ip_pool import IpInfoModel, create_ip_pool
 from store import kuaishou as kuaishou_store
 from tools import utils
+from tools.rate_limiter import crawl_sleep
 from tools.cdp_browser import CDPBrowserManager
 from tools.resource_path import get_libs_path
 from var import comment_tasks_var, crawler_type_var, source_keyword_var
@@ -53,6 +54,7 @@ class KuaishouCrawler(AbstractCrawler):
 
     async def start(self):
         playwright_proxy_format, httpx_proxy_format = None, None
+        ip_proxy_pool, ip_proxy_info = None, None
         if config.ENABLE_IP_PROXY:
             ip_proxy_pool = await create_ip_pool(
                 config.IP_PROXY_POOL_COUNT, enable_validate_ip=True
@@ -90,6 +92,9 @@ class KuaishouCrawler(AbstractCrawler):
 
             # Create a client to interact with the kuaishou website.
             self.ks_client = await self.create_ks_client(httpx_proxy_format)
+            if ip_proxy_pool:
+                # 请求被封禁或超时时, 客户端从代理池租借新的代理重试
+                self.ks_client.use_proxy_pool(ip_proxy_pool, ip_proxy_info)
             if not await self.ks_client.pong():
                 login_obj = KuaishouLogin(
                     login_type=config.LOGIN_TYPE,
@@ -104,17 +109,25 @@ class KuaishouCrawler(AbstractCrawler):
                 )
 
             crawler_type_var.set(config.CRAWLER_TYPE)
-            if config.CRAWLER_TYPE == "search":
-                # Search for videos and retrieve their comment information.
-                await self.search()
-            elif config.CRAWLER_TYPE == "detail":
-                # Get the information and comments of the specified post
-                await self.get_specified_videos()
-            elif config.CRAWLER_TYPE == "creator":
-                # Get creator's information and their videos and comments
-                await self.get_creators_and_videos()
-            else:
-                pass
+            try:
+                if config.CRAWLER_TYPE == "search":
+                    # Search for videos and retrieve their comment information.
+                    await self.search()
+                elif config.CRAWLER_TYPE == "detail":
+                    # Get the information and comments of the specified post
+                    await self.get_specified_videos()
+                elif config.CRAWLER_TYPE == "creator":
+                    # Get creator's information and their videos and comments
+                    await self.get_creators_and_videos()
+                else:
+                    pass
+            finally:
+                # 刷新并关闭存储, 保证缓冲中的数据全部写入磁盘
+                await kuaishou_store.KuaishouStoreFactory.close_store()
+                if getattr(self, "ks_client", None):
+                    await self.ks_client.aclose()
+                if ip_proxy_pool:
+                    await ip_proxy_pool.close()
 
             utils.logger.info("[KuaishouCrawler.start] Kuaishou Crawler finished ...")
 
@@ -168,8 +181,7 @@ class KuaishouCrawler(AbstractCrawler):
                 page += 1
                 
                 # Sleep after page navigation
-                await asyncio.sleep(config.CRAWLER_MAX_SLEEP_SEC)
-                utils.logger.info(f"[KuaishouCrawler.search] Sleeping for {config.CRAWLER_MAX_SLEEP_SEC} seconds after page {page-1}")
+                await crawl_sleep(config.CRAWLER_MAX_SLEEP_SEC)
                 
                 await self.batch_get_video_comments(video_id_list)
 
@@ -206,8 +218,7 @@ class KuaishouCrawler(AbstractCrawler):
                 result = await self.ks_client.get_video_info(video_id)
                 
                 # Sleep after fetching video details
-                await asyncio.sleep(config.CRAWLER_MAX_SLEEP_SEC)
-                utils.logger.info(f"[KuaishouCrawler.get_video_info_task] Sleeping for {config.CRAWLER_MAX_SLEEP_SEC} seconds after fetching video details {video_id}")
+                await crawl_sleep(config.CRAWLER_MAX_SLEEP_SEC)
                 
                 utils.logger.info(
                     f"[KuaishouCrawler.get_video_info_task] Get video_id:{video_id} info result: {result} ..."
@@ -264,8 +275,7 @@ class KuaishouCrawler(AbstractCrawler):
                 )
                 
                 # Sleep before fetching comments
-                await asyncio.sleep(config.CRAWLER_MAX_SLEEP_SEC)
-                utils.logger.info(f"[KuaishouCrawler.get_comments] Sleeping for {config.CRAWLER_MAX_SLEEP_SEC} seconds before fetching comments for video {video_id}")
+                await crawl_sleep(config.CRAWLER_MAX_SLEEP_SEC)
                 
                 await self.ks_client.get_video_all_comments(
                     photo_id=video_id,
@@ -429,6 +439,9 @@ class KuaishouCrawler(AbstractCrawler):
 
     async def close(self):
         """Close browser context"""
+        await kuaishou_store.KuaishouStoreFactory.close_store()
+        if getattr(self, "ks_client", None):
+            await self.ks_client.aclose()
         # 如果使用CDP模式，需要特殊处理
         if self.cdp_manager:
             await self.cdp_manager.cleanup()
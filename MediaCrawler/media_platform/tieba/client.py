@@ -13,21 +13,24 @@ import json
 from typing import Any, Callable, Dict, List, Optional, Union
 from urllib.parse import urlencode, quote
 
-import requests
+import httpx
 from playwright.async_api import BrowserContext, Page
-from tenacity import RetryError, retry, stop_after_attempt, wait_fixed
 
 import config
 from base.base_crawler import AbstractApiClient
+from base.request_pipeline import RequestContext
 from model.m_baidu_tieba import TiebaComment, TiebaCreator, TiebaNote
 from proxy.proxy_ip_pool import ProxyIpPool
-from tools import utils
+from tools import json_codec, utils
 
+from .exception import DataFetchError, IPBlockError
 from .field import SearchNoteType, SearchSortType
 from .help import TieBaExtractor
 
 
 class BaiduTieBaClient(AbstractApiClient):
+    retryable_errors = (DataFetchError, IPBlockError)
+    throttle_errors = (IPBlockError,)
 
     def __init__(
         self,
@@ -49,75 +52,50 @@ class BaiduTieBaClient(AbstractApiClient):
         self.default_ip_proxy = default_ip_proxy
         self.playwright_page = playwright_page  # Playwright页面对象
 
-    def _sync_request(self, method, url, proxy=None, **kwargs):
-        """
-        同步的requests请求方法
-        Args:
-            method: 请求方法
-            url: 请求的URL
-            proxy: 代理IP
-            **kwargs: 其他请求参数
+    @property
+    def proxy(self) -> Optional[str]:
+        # 连接池绑定当前代理, default_ip_proxy 变化后 get_http_client 会按新代理重建连接池
+        return self.default_ip_proxy
+
+    @proxy.setter
+    def proxy(self, value: Optional[str]):
+        self.default_ip_proxy = value
+
+    def classify_response(self, ctx: RequestContext) -> Union[str, Any]:
+        response = ctx.response
+        if response.status_code != 200:
+            utils.logger.error(f"Request failed, method: {ctx.method}, url: {ctx.url}, status code: {response.status_code}")
+            utils.logger.error(f"Request failed, response: {response.text}")
+            raise DataFetchError(f"Request failed, method: {ctx.method}, url: {ctx.url}, status code: {response.status_code}")
+
+        if response.text == "" or response.text == "blocked":
+            utils.logger.error(f"request params incorrect, response.text: {response.text}")
+            raise IPBlockError("account blocked")
+
+        if ctx.options.get("return_ori_content"):
+            return response.text
+
+        return json_codec.decode_response(response)
 
-        Returns:
-            response对象
-        """
-        # 构造代理字典
-        proxies = None
-        if proxy:
-            proxies = {
-                "http": proxy,
-                "https": proxy,
-            }
-
-        # 发送请求
-        response = requests.request(
-            method=method,
-            url=url,
-            headers=self.headers,
-            proxies=proxies,
-            timeout=self.timeout,
-            **kwargs
-        )
-        return response
-
-    @retry(stop=stop_after_attempt(3), wait=wait_fixed(1))
     async def request(self, method, url, return_ori_content=False, proxy=None, **kwargs) -> Union[str, Any]:
         """
-        封装requests的公共请求方法，对请求响应做一些处理
+        封装httpx的公共请求方法，请求经过 AbstractApiClient 的请求管道(重试/限速/指标)，复用长连接池
         Args:
             method: 请求方法
             url: 请求的URL
             return_ori_content: 是否返回原始内容
-            proxy: 代理IP
+            proxy: 代理IP, 传入后作为之后请求的默认代理
             **kwargs: 其他请求参数，例如请求头、请求体等
 
         Returns:
 
         """
-        actual_proxy = proxy if proxy else self.default_ip_proxy
-
-        # 在线程池中执行同步的requests请求
-        response = await asyncio.to_thread(
-            self._sync_request,
-            method,
-            url,
-            actual_proxy,
-            **kwargs
-        )
-
-        if response.status_code != 200:
-            utils.logger.error(f"Request failed, method: {method}, url: {url}, status code: {response.status_code}")
-            utils.logger.error(f"Request failed, response: {response.text}")
-            raise Exception(f"Request failed, method: {method}, url: {url}, status code: {response.status_code}")
-
-        if response.text == "" or response.text == "blocked":
-            utils.logger.error(f"request params incorrect, response.text: {response.text}")
-            raise Exception("account blocked")
-
-        if return_ori_content:
-            return response.text
-
-        return response.json()
+        if proxy:
+            self.default_ip_proxy = proxy
+        kwargs.setdefault("headers", self.headers)
+        # 与 requests 一致, 自动跟随重定向
+        kwargs.setdefault("follow_redirects", True)
+        return await self.execute(method, url, options={"return_ori_content": return_ori_content}, **kwargs)
 
     async def get(self, uri: str, params=None, return_ori_content=False, **kwargs) -> Any:
         """
@@ -137,14 +115,8 @@ class BaiduTieBaClient(AbstractApiClient):
         try:
             res = await self.request(method="GET", url=f"{self._host}{final_uri}", return_ori_content=return_ori_content, **kwargs)
             return res
-        except RetryError as e:
-            if self.ip_pool:
-                proxie_model = await self.ip_pool.get_proxy()
-                _, proxy = utils.format_proxy_info(proxie_model)
-                res = await self.request(method="GET", url=f"{self._host}{final_uri}", return_ori_content=return_ori_content, proxy=proxy, **kwargs)
-                self.default_ip_proxy = proxy
-                return res
-
+        except (DataFetchError, IPBlockError, httpx.TransportError) as e:
+            # 设置了代理池时, 请求管道已经在封禁/超时后切换代理重试过
             utils.logger.error(f"[BaiduTieBaClient.get] 达到了最大重试次数，IP已经被Block，请尝试更换新的IP代理: {e}")
             raise Exception(f"[BaiduTieBaClient.get] 达到了最大重试次数，IP已经被Block，请尝试更换新的IP代理: {e}")
 
@@ -56,6 +56,7 @@ class TieBaCrawler(AbstractCrawler):
 
         """
         playwright_proxy_format, httpx_proxy_format = None, None
+        ip_proxy_pool, ip_proxy_info = None, None
         if config.ENABLE_IP_PROXY:
             utils.logger.info(
                 "[BaiduTieBaCrawler.start] Begin create ip proxy pool ..."
@@ -101,8 +102,11 @@ class TieBaCrawler(AbstractCrawler):
             # Create a client to interact with the baidutieba website.
             self.tieba_client = await self.create_tieba_client(
                 httpx_proxy_format,
-                ip_proxy_pool if config.ENABLE_IP_PROXY else None
+                ip_proxy_pool
             )
+            if ip_proxy_pool:
+                # 请求被封禁或超时时, 客户端从代理池租借新的代理重试
+                self.tieba_client.use_proxy_pool(ip_proxy_pool, ip_proxy_info)
 
             # Check login status and perform login if necessary
             if not await self.tieba_client.pong(browser_context=self.browser_context):
@@ -117,18 +121,26 @@ class TieBaCrawler(AbstractCrawler):
                 await self.tieba_client.update_cookies(browser_context=self.browser_context)
 
             crawler_type_var.set(config.CRAWLER_TYPE)
-            if config.CRAWLER_TYPE == "search":
-                # Search for notes and retrieve their comment information.
-                await self.search()
-                await self.get_specified_tieba_notes()
-            elif config.CRAWLER_TYPE == "detail":
-                # Get the information and comments of the specified post
-                await self.get_specified_notes()
-            elif config.CRAWLER_TYPE == "creator":
-                # Get creator's information and their notes and comments
-                await self.get_creators_and_notes()
-            else:
-                pass
+            try:
+                if config.CRAWLER_TYPE == "search":
+                    # Search for notes and retrieve their comment information.
+                    await self.search()
+                    await self.get_specified_tieba_notes()
+                elif config.CRAWLER_TYPE == "detail":
+                    # Get the information and comments of the specified post
+                    await self.get_specified_notes()
+                elif config.CRAWLER_TYPE == "creator":
+                    # Get creator's information and their notes and comments
+                    await self.get_creators_and_notes()
+                else:
+                    pass
+            finally:
+                # 刷新并关闭存储, 保证缓冲中的数据全部写入磁盘
+                await tieba_store.TieBaStoreFactory.close_store()
+                if getattr(self, "tieba_client", None):
+                    await self.tieba_client.aclose()
+                if ip_proxy_pool:
+                    await ip_proxy_pool.close()
 
             utils.logger.info("[BaiduTieBaCrawler.start] Tieba Crawler finished ...")
 
@@ -662,6 +674,9 @@ class TieBaCrawler(AbstractCrawler):
         Returns:
 
         """
+        await tieba_store.TieBaStoreFactory.close_store()
+        if getattr(self, "tieba_client", None):
+            await self.tieba_client.aclose()
         # 如果使用CDP模式，需要特殊处理
         if self.cdp_manager:
             await self.cdp_manager.cleanup()
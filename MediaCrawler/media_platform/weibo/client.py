@@ -13,7 +13,6 @@
 # @Time    : 2023/12/23 15:40
 # @Desc    : 微博爬虫 API 请求 client
 
-import asyncio
 import copy
 import json
 import re
@@ -25,13 +24,18 @@ from httpx import Response
 from playwright.async_api import BrowserContext, Page
 
 import config
-from tools import utils
+from base.base_crawler import AbstractApiClient
+from base.request_pipeline import RequestContext
+from tools import json_codec, utils
+from tools.rate_limiter import crawl_sleep
+from tools.media_downloader import download_to_file
 
 from .exception import DataFetchError
 from .field import SearchType
 
 
-class WeiboClient:
+class WeiboClient(AbstractApiClient):
+    identity_cookies = ("SUB",)
 
     def __init__(
         self,
@@ -50,25 +54,26 @@ class WeiboClient:
         self.cookie_dict = cookie_dict
         self._image_agent_host = "https://i1.wp.com/"
 
-    async def request(self, method, url, **kwargs) -> Union[Response, Dict]:
-        enable_return_response = kwargs.pop("return_response", False)
-        async with httpx.AsyncClient(proxy=self.proxy) as client:
-            response = await client.request(method, url, timeout=self.timeout, **kwargs)
-
-        if enable_return_response:
+    def classify_response(self, ctx: RequestContext) -> Union[Response, Dict]:
+        response = ctx.response
+        if ctx.options.get("return_response"):
             return response
 
-        data: Dict = response.json()
+        data: Dict = json_codec.decode_response(response)
         ok_code = data.get("ok")
         if ok_code == 0:  # response error
-            utils.logger.error(f"[WeiboClient.request] request {method}:{url} err, res:{data}")
+            utils.logger.error(f"[WeiboClient.request] request {ctx.method}:{ctx.url} err, res:{data}")
             raise DataFetchError(data.get("msg", "response error"))
         elif ok_code != 1:  # unknown error
-            utils.logger.error(f"[WeiboClient.request] request {method}:{url} err, res:{data}")
+            utils.logger.error(f"[WeiboClient.request] request {ctx.method}:{ctx.url} err, res:{data}")
             raise DataFetchError(data.get("msg", "unknown error"))
         else:  # response right
             return data.get("data", {})
 
+    async def request(self, method, url, **kwargs) -> Union[Response, Dict]:
+        options = {"return_response": kwargs.pop("return_response", False)}
+        return await self.execute(method, url, options=options, **kwargs)
+
     async def get(self, uri: str, params=None, headers=None, **kwargs) -> Union[Response, Dict]:
         final_uri = uri
         if isinstance(params, dict):
@@ -176,7 +181,7 @@ class WeiboClient:
                 comment_list = comment_list[:max_count - len(result)]
             if callback:  # 如果有回调函数，就执行回调函数
                 await callback(note_id, comment_list)
-            await asyncio.sleep(crawl_interval)
+            await crawl_sleep(crawl_interval)
             result.extend(comment_list)
             sub_comment_result = await self.get_comments_all_sub_comments(note_id, comment_list, callback)
             result.extend(sub_comment_result)
@@ -217,22 +222,30 @@ class WeiboClient:
         :return:
         """
         url = f"{self._host}/detail/{note_id}"
-        async with httpx.AsyncClient(proxy=self.proxy) as client:
+        async with self.use_http_client() as client:
             response = await client.request("GET", url, timeout=self.timeout, headers=self.headers)
-            if response.status_code != 200:
-                raise DataFetchError(f"get weibo detail err: {response.text}")
-            match = re.search(r'var \$render_data = (\[.*?\])\[0\]', response.text, re.DOTALL)
-            if match:
-                render_data_json = match.group(1)
-                render_data_dict = json.loads(render_data_json)
-                note_detail = render_data_dict[0].get("status")
-                note_item = {"mblog": note_detail}
-                return note_item
-            else:
-                utils.logger.info(f"[WeiboClient.get_note_info_by_id] 未找到$render_data的值")
-                return dict()
+        if response.status_code != 200:
+            raise DataFetchError(f"get weibo detail err: {response.text}")
+        match = re.search(r'var \$render_data = (\[.*?\])\[0\]', response.text, re.DOTALL)
+        if match:
+            render_data_json = match.group(1)
+            render_data_dict = json.loads(render_data_json)
+            note_detail = render_data_dict[0].get("status")
+            note_item = {"mblog": note_detail}
+            return note_item
+        else:
+            utils.logger.info(f"[WeiboClient.get_note_info_by_id] 未找到$render_data的值")
+            return dict()
+
+    def get_note_image_url(self, image_url: str) -> str:
+        """
+        转换为图床代理的高清大图地址
+        Args:
+            image_url: 原始图片地址
 
-    async def get_note_image(self, image_url: str) -> bytes:
+        Returns:
+
+        """
         image_url = image_url[8:]  # 去掉 https://
         sub_url = image_url.split("/")
         image_url = ""
@@ -245,20 +258,36 @@ class WeiboClient:
                 image_url += sub_url[i] + "/"
         # 微博图床对外存在防盗链，所以需要代理访问
         # 由于微博图片是通过 i1.wp.com 来访问的，所以需要拼接一下
-        final_uri = (f"{self._image_agent_host}"
-                     f"{image_url}")
-        async with httpx.AsyncClient(proxy=self.proxy) as client:
-            try:
+        return (f"{self._image_agent_host}"
+                f"{image_url}")
+
+    async def get_note_image(self, image_url: str) -> bytes:
+        final_uri = self.get_note_image_url(image_url)
+        try:
+            async with self.use_http_client() as client:
                 response = await client.request("GET", final_uri, timeout=self.timeout)
-                response.raise_for_status()
-                if not response.reason_phrase == "OK":
-                    utils.logger.error(f"[WeiboClient.get_note_image] request {final_uri} err, res:{response.text}")
-                    return None
-                else:
-                    return response.content
-            except httpx.HTTPError as exc:  # some wrong when call httpx.request method, such as connection error, client error, server error or response status code is not 2xx
-                utils.logger.error(f"[DouYinClient.get_aweme_media] {exc.__class__.__name__} for {exc.request.url} - {exc}")    # 保留原始异常类型名称，以便开发者调试
+            response.raise_for_status()
+            if not response.reason_phrase == "OK":
+                utils.logger.error(f"[WeiboClient.get_note_image] request {final_uri} err, res:{response.text}")
                 return None
+            else:
+                return response.content
+        except httpx.HTTPError as exc:  # some wrong when call httpx.request method, such as connection error, client error, server error or response status code is not 2xx
+            utils.logger.error(f"[DouYinClient.get_aweme_media] {exc.__class__.__name__} for {exc.request.url} - {exc}")    # 保留原始异常类型名称，以便开发者调试
+            return None
+
+    async def download_note_image(self, image_url: str, save_file_name: str) -> bool:
+        """
+        流式下载微博图片到本地文件
+        Args:
+            image_url: 原始图片地址
+            save_file_name: 保存路径
+
+        Returns:
+            是否下载成功
+        """
+        async with self.use_http_client() as client:
+            return await download_to_file(client, self.get_note_image_url(image_url), save_file_name)
 
     async def get_creator_container_info(self, creator_id: str) -> Dict:
         """
@@ -374,7 +403,7 @@ class WeiboClient:
             notes = [note for note in notes if note.get("card_type") == 9]
             if callback:
                 await callback(notes)
-            await asyncio.sleep(crawl_interval)
+            await crawl_sleep(crawl_interval)
             result.extend(notes)
             crawler_total_count += 10
             notes_has_more = notes_res.get("cardlistInfo", {}).get("total", 0) > crawler_total_count
@@ -32,6 +32,8 @@ from base.base_crawler import AbstractCrawler
 from proxy.proxy_ip_pool import IpInfoModel, create_ip_pool
 from store import weibo as weibo_store
 from tools import utils
+from tools.rate_limiter import crawl_sleep
+from tools.media_download_pool import close_media_download_pool, get_media_download_pool
 from tools.cdp_browser import CDPBrowserManager
 from tools.resource_path import get_libs_path
 from var import crawler_type_var, source_keyword_var
@@ -58,6 +60,7 @@ class WeiboCrawler(AbstractCrawler):
 
     async def start(self):
         playwright_proxy_format, httpx_proxy_format = None, None
+        ip_proxy_pool, ip_proxy_info = None, None
         if config.ENABLE_IP_PROXY:
             ip_proxy_pool = await create_ip_pool(config.IP_PROXY_POOL_COUNT, enable_validate_ip=True)
             ip_proxy_info: IpInfoModel = await ip_proxy_pool.get_proxy()
@@ -90,6 +93,9 @@ class WeiboCrawler(AbstractCrawler):
 
             # Create a client to interact with the xiaohongshu website.
             self.wb_client = await self.create_weibo_client(httpx_proxy_format)
+            if ip_proxy_pool:
+                # 请求被封禁或超时时, 客户端从代理池租借新的代理重试
+                self.wb_client.use_proxy_pool(ip_proxy_pool, ip_proxy_info)
             if not await self.wb_client.pong():
                 login_obj = WeiboLogin(
                     login_type=config.LOGIN_TYPE,
@@ -107,17 +113,27 @@ class WeiboCrawler(AbstractCrawler):
                 await self.wb_client.update_cookies(browser_context=self.browser_context)
 
             crawler_type_var.set(config.CRAWLER_TYPE)
-            if config.CRAWLER_TYPE == "search":
-                # Search for video and retrieve their comment information.
-                await self.search()
-            elif config.CRAWLER_TYPE == "detail":
-                # Get the information and comments of the specified post
-                await self.get_specified_notes()
-            elif config.CRAWLER_TYPE == "creator":
-                # Get creator's information and their notes and comments
-                await self.get_creators_and_notes()
-            else:
-                pass
+            try:
+                if config.CRAWLER_TYPE == "search":
+                    # Search for video and retrieve their comment information.
+                    await self.search()
+                elif config.CRAWLER_TYPE == "detail":
+                    # Get the information and comments of the specified post
+                    await self.get_specified_notes()
+                elif config.CRAWLER_TYPE == "creator":
+                    # Get creator's information and their notes and comments
+                    await self.get_creators_and_notes()
+                else:
+                    pass
+            finally:
+                # 等待已提交的媒体下载完成, 再刷新并关闭存储, 保证缓冲中的数据全部写入磁盘
+                await close_media_download_pool()
+                await weibo_store.WeibostoreFactory.close_store()
+                if getattr(self, "wb_client", None):
+                    await self.wb_client.aclose()
+                if ip_proxy_pool:
+                    await ip_proxy_pool.close()
+
             utils.logger.info("[WeiboCrawler.start] Weibo Crawler finished ...")
 
     async def search(self):
@@ -168,8 +184,7 @@ class WeiboCrawler(AbstractCrawler):
                 page += 1
                 
                 # Sleep after page navigation
-                await asyncio.sleep(config.CRAWLER_MAX_SLEEP_SEC)
-                utils.logger.info(f"[WeiboCrawler.search] Sleeping for {config.CRAWLER_MAX_SLEEP_SEC} seconds after page {page-1}")
+                await crawl_sleep(config.CRAWLER_MAX_SLEEP_SEC)
                 
                 await self.batch_get_notes_comments(note_id_list)
 
@@ -198,8 +213,7 @@ class WeiboCrawler(AbstractCrawler):
                 result = await self.wb_client.get_note_info_by_id(note_id)
                 
                 # Sleep after fetching note details
-                await asyncio.sleep(config.CRAWLER_MAX_SLEEP_SEC)
-                utils.logger.info(f"[WeiboCrawler.get_note_info_task] Sleeping for {config.CRAWLER_MAX_SLEEP_SEC} seconds after fetching note details {note_id}")
+                await crawl_sleep(config.CRAWLER_MAX_SLEEP_SEC)
                 
                 return result
             except DataFetchError as ex:
@@ -239,8 +253,7 @@ class WeiboCrawler(AbstractCrawler):
                 utils.logger.info(f"[WeiboCrawler.get_note_comments] begin get note_id: {note_id} comments ...")
                 
                 # Sleep before fetching comments
-                await asyncio.sleep(config.CRAWLER_MAX_SLEEP_SEC)
-                utils.logger.info(f"[WeiboCrawler.get_note_comments] Sleeping for {config.CRAWLER_MAX_SLEEP_SEC} seconds before fetching comments for note {note_id}")
+                await crawl_sleep(config.CRAWLER_MAX_SLEEP_SEC)
                 
                 await self.wb_client.get_note_all_comments(
                     note_id=note_id,
@@ -270,12 +283,9 @@ class WeiboCrawler(AbstractCrawler):
             url = pic.get("url")
             if not url:
                 continue
-            content = await self.wb_client.get_note_image(url)
-            await asyncio.sleep(config.CRAWLER_MAX_SLEEP_SEC)
-            utils.logger.info(f"[WeiboCrawler.get_note_images] Sleeping for {config.CRAWLER_MAX_SLEEP_SEC} seconds after fetching image")
-            if content != None:
-                extension_file_name = url.split(".")[-1]
-                await weibo_store.update_weibo_note_image(pic["pid"], content, extension_file_name)
+            extension_file_name = url.split(".")[-1]
+            save_file_name = weibo_store.WeiboStoreImage().prepare_save_file_name(pic["pid"], extension_file_name)
+            get_media_download_pool().submit(url, save_file_name, self.wb_client.download_note_image)
 
     async def get_creators_and_notes(self) -> None:
         """
@@ -386,6 +396,10 @@ class WeiboCrawler(AbstractCrawler):
 
     async def close(self):
         """Close browser context"""
+        await close_media_download_pool()
+        await weibo_store.WeibostoreFactory.close_store()
+        if getattr(self, "wb_client", None):
+            await self.wb_client.aclose()
         # 如果使用CDP模式，需要特殊处理
         if self.cdp_manager:
             await self.cdp_manager.cleanup()
@@ -20,16 +20,26 @@ from tenacity import retry, stop_after_attempt, wait_fixed, retry_if_result
 
 import config
 from base.base_crawler import AbstractApiClient
-from tools import utils
+from base.request_pipeline import RequestContext
+from tools import json_codec, utils
+from tools.crawl_state import comment_crawl_cursor
+from tools.rate_limiter import crawl_sleep
+from tools.media_downloader import download_to_file
 from html import unescape
 
-from .exception import DataFetchError, IPBlockError
+from .exception import CaptchaError, DataFetchError, IPBlockError, TransientFetchError
 from .field import SearchNoteType, SearchSortType
 from .help import get_search_id, sign
 from .extractor import XiaoHongShuExtractor
+from .signer import XhsPageSigner
 
 
 class XiaoHongShuClient(AbstractApiClient):
+    retryable_errors = (TransientFetchError,)
+    # 可重试的业务码: 访问频次异常; 笔记不存在、参数错误等重试也不会成功
+    TRANSIENT_ERROR_CODES = (300013,)
+    throttle_errors = (CaptchaError, IPBlockError)
+    identity_cookies = ("web_session",)
 
     def __init__(
         self,
@@ -52,6 +62,7 @@ class XiaoHongShuClient(AbstractApiClient):
         self.playwright_page = playwright_page
         self.cookie_dict = cookie_dict
         self._extractor = XiaoHongShuExtractor()
+        self.signer = XhsPageSigner(playwright_page)
 
     async def _pre_headers(self, url: str, data=None) -> Dict:
         """
@@ -63,88 +74,91 @@ class XiaoHongShuClient(AbstractApiClient):
         Returns:
 
         """
-        # 🔥 等待window._webmsxyw函数加载完成
-        max_retries = 3
-        for attempt in range(max_retries):
-            try:
-                # 检查函数是否存在
-                func_exists = await self.playwright_page.evaluate(
-                    "() => typeof window._webmsxyw === 'function'"
-                )
-
-                if not func_exists:
-                    if attempt < max_retries - 1:
-                        utils.logger.warning(f"[XiaoHongShuClient._pre_headers] window._webmsxyw not ready, retry {attempt + 1}/{max_retries}")
-                        await asyncio.sleep(1)
-                        continue
-                    else:
-                        raise Exception("window._webmsxyw function not found after retries")
-
-                # 调用加密函数
-                encrypt_params = await self.playwright_page.evaluate(
-                    "([url, data]) => window._webmsxyw(url,data)", [url, data]
-                )
-                break
-
-            except Exception as e:
-                if attempt < max_retries - 1:
-                    utils.logger.warning(f"[XiaoHongShuClient._pre_headers] Attempt {attempt + 1} failed: {e}, retrying...")
-                    await asyncio.sleep(1)
-                else:
-                    raise
-
-        local_storage = await self.playwright_page.evaluate("() => window.localStorage")
+        # 一次 evaluate 取回 X-s/X-t, b1 在 cookie 更新前一直使用缓存
+        encrypt_params = await self.signer.sign(url, data)
         signs = sign(
             a1=self.cookie_dict.get("a1", ""),
-            b1=local_storage.get("b1", ""),
-            x_s=encrypt_params.get("X-s", ""),
-            x_t=str(encrypt_params.get("X-t", "")),
+            b1=encrypt_params["b1"],
+            x_s=encrypt_params["x_s"],
+            x_t=encrypt_params["x_t"],
         )
 
-        headers = {
+        # 返回新的请求头, 并发签名的请求不会互相覆盖签名
+        return {
+            **self.headers,
             "X-S": signs["x-s"],
             "X-T": signs["x-t"],
             "x-S-Common": signs["x-s-common"],
             "X-B3-Traceid": signs["x-b3-traceid"],
         }
-        self.headers.update(headers)
-        return self.headers
 
-    @retry(stop=stop_after_attempt(3), wait=wait_fixed(1))
-    async def request(self, method, url, **kwargs) -> Union[str, Any]:
+    async def open_sign_pages(self, browser_context: BrowserContext, count: int):
         """
-        封装httpx的公共请求方法，对请求响应做一些处理
+        打开额外的签名页面, 并发请求分摊到多个页面上签名
         Args:
-            method: 请求方法
-            url: 请求的URL
-            **kwargs: 其他请求参数，例如请求头、请求体等
+            browser_context: 浏览器上下文对象
+            count: 额外打开的页面数量
 
         Returns:
 
         """
-        # return response.text
-        return_response = kwargs.pop("return_response", False)
-        async with httpx.AsyncClient(proxy=self.proxy) as client:
-            response = await client.request(method, url, timeout=self.timeout, **kwargs)
+        await self.signer.open_pages(browser_context, self._domain, count)
+
+    async def aclose(self):
+        await super().aclose()
+        await self.signer.close()
+
+    async def sign_request(self, ctx: RequestContext):
+        """
+        对请求头签名, get/post 通过 ctx.options 传入待签名的 uri 和请求体, 每次重试都会重新签名
+        """
+        if "sign_uri" not in ctx.options:
+            return
+        ctx.kwargs["headers"] = await self._pre_headers(ctx.options["sign_uri"], ctx.options.get("sign_data"))
 
+    def classify_response(self, ctx: RequestContext) -> Union[str, Any]:
+        """
+        对请求响应做一些处理: 验证码/IP 封禁映射为异常, 其余返回 data 字段
+        """
+        response = ctx.response
         if response.status_code == 471 or response.status_code == 461:
             # someday someone maybe will bypass captcha
             verify_type = response.headers["Verifytype"]
             verify_uuid = response.headers["Verifyuuid"]
             msg = f"出现验证码，请求失败，Verifytype: {verify_type}，Verifyuuid: {verify_uuid}, Response: {response}"
             utils.logger.error(msg)
-            raise Exception(msg)
+            raise CaptchaError(msg)
+        if response.status_code >= 500:
+            raise TransientFetchError(f"server error, status code: {response.status_code}")
 
-        if return_response:
+        if ctx.options.get("return_response"):
             return response.text
-        data: Dict = response.json()
+        data: Dict = json_codec.decode_response(response)
         if data["success"]:
             return data.get("data", data.get("success", {}))
         elif data["code"] == self.IP_ERROR_CODE:
             raise IPBlockError(self.IP_ERROR_STR)
+        elif data.get("code") in self.TRANSIENT_ERROR_CODES:
+            raise TransientFetchError(data.get("msg", None))
         else:
             raise DataFetchError(data.get("msg", None))
 
+    async def request(self, method, url, **kwargs) -> Union[str, Any]:
+        """
+        封装httpx的公共请求方法，请求经过 AbstractApiClient 的请求管道(重试/签名/指标)
+        Args:
+            method: 请求方法
+            url: 请求的URL
+            **kwargs: 其他请求参数，例如请求头、请求体等
+
+        Returns:
+
+        """
+        options = {
+            "return_response": kwargs.pop("return_response", False),
+        }
+        return await self.execute(method, url, options=options, **kwargs)
+
     async def get(self, uri: str, params=None) -> Dict:
         """
         GET请求，对请求头签名
@@ -158,9 +172,8 @@ class XiaoHongShuClient(AbstractApiClient):
         final_uri = uri
         if isinstance(params, dict):
             final_uri = f"{uri}?" f"{urlencode(params)}"
-        headers = await self._pre_headers(final_uri)
-        return await self.request(
-            method="GET", url=f"{self._host}{final_uri}", headers=headers
+        return await self.execute(
+            "GET", f"{self._host}{final_uri}", options={"sign_uri": final_uri}
         )
 
     async def post(self, uri: str, data: dict, **kwargs) -> Dict:
@@ -173,35 +186,48 @@ class XiaoHongShuClient(AbstractApiClient):
         Returns:
 
         """
-        headers = await self._pre_headers(uri, data)
         json_str = json.dumps(data, separators=(",", ":"), ensure_ascii=False)
-        return await self.request(
-            method="POST",
-            url=f"{self._host}{uri}",
-            data=json_str,
-            headers=headers,
-            **kwargs,
+        options = {
+            "sign_uri": uri,
+            "sign_data": data,
+            "return_response": kwargs.pop("return_response", False),
+        }
+        return await self.execute(
+            "POST", f"{self._host}{uri}", options=options, data=json_str, **kwargs
         )
 
     async def get_note_media(self, url: str) -> Union[bytes, None]:
-        async with httpx.AsyncClient(proxy=self.proxy) as client:
-            try:
+        try:
+            async with self.use_http_client() as client:
                 response = await client.request("GET", url, timeout=self.timeout)
-                response.raise_for_status()
-                if not response.reason_phrase == "OK":
-                    utils.logger.error(
-                        f"[XiaoHongShuClient.get_note_media] request {url} err, res:{response.text}"
-                    )
-                    return None
-                else:
-                    return response.content
-            except (
-                httpx.HTTPError
-            ) as exc:  # some wrong when call httpx.request method, such as connection error, client error, server error or response status code is not 2xx
+            response.raise_for_status()
+            if not response.reason_phrase == "OK":
                 utils.logger.error(
-                    f"[XiaoHongShuClient.get_aweme_media] {exc.__class__.__name__} for {exc.request.url} - {exc}"
-                )  # 保留原始异常类型名称，以便开发者调试
+                    f"[XiaoHongShuClient.get_note_media] request {url} err, res:{response.text}"
+                )
                 return None
+            else:
+                return response.content
+        except (
+            httpx.HTTPError
+        ) as exc:  # some wrong when call httpx.request method, such as connection error, client error, server error or response status code is not 2xx
+            utils.logger.error(
+                f"[XiaoHongShuClient.get_aweme_media] {exc.__class__.__name__} for {exc.request.url} - {exc}"
+            )  # 保留原始异常类型名称，以便开发者调试
+            return None
+
+    async def download_note_media(self, url: str, save_file_name: str) -> bool:
+        """
+        流式下载笔记图片/视频到本地文件, 不在内存中保留完整内容
+        Args:
+            url: 媒体地址
+            save_file_name: 保存路径
+
+        Returns:
+            是否下载成功
+        """
+        async with self.use_http_client() as client:
+            return await download_to_file(client, url, save_file_name)
 
     async def pong(self) -> bool:
         """
@@ -235,6 +261,7 @@ class XiaoHongShuClient(AbstractApiClient):
         cookie_str, cookie_dict = utils.convert_cookies(await browser_context.cookies())
         self.headers["Cookie"] = cookie_str
         self.cookie_dict = cookie_dict
+        self.signer.invalidate_b1()
 
     async def get_note_by_keyword(
         self,
@@ -386,7 +413,8 @@ class XiaoHongShuClient(AbstractApiClient):
 
         result = []
         comments_has_more = True
-        comments_cursor = ""
+        crawl_cursor = await comment_crawl_cursor("xhs", note_id, id_key="id", ts_key="create_time")
+        comments_cursor = crawl_cursor.start_cursor("") if crawl_cursor else ""
 
         # 🔥 添加调试信息
         utils.logger.info(f"[XiaoHongShuClient.get_note_all_comments] 开始获取评论, note_id={note_id}, max_count={max_count}")
@@ -395,6 +423,7 @@ class XiaoHongShuClient(AbstractApiClient):
         while comments_has_more and len(result) < max_count:
             page_num += 1
 
+            page_cursor = comments_cursor
             comments_res = await self.get_note_comments(
                 note_id=note_id, xsec_token=xsec_token, cursor=comments_cursor
             )
@@ -410,14 +439,22 @@ class XiaoHongShuClient(AbstractApiClient):
                 )
                 break
             comments = comments_res["comments"]
+            if crawl_cursor:
+                comments = await crawl_cursor.new_comments(comments)
 
             # 🔥 添加调试信息
             utils.logger.info(f"[XiaoHongShuClient.get_note_all_comments] 本次获取={len(comments)}条评论")
 
-            if len(result) + len(comments) > max_count:
+            truncated = len(result) + len(comments) > max_count
+            if truncated:
                 comments = comments[: max_count - len(result)]
             if callback:
                 await callback(note_id, comments)
+            if crawl_cursor:
+                # 截断的页面下次从本页续抓, 已保存的评论会被过滤掉
+                next_cursor = page_cursor if truncated else comments_cursor
+                if not await crawl_cursor.commit(comments, next_cursor, comments_has_more or truncated):
+                    comments_has_more = False
 
             # 🔥 增加随机延迟,模拟真实用户阅读评论的时间
             delay = random.uniform(8, 12)
@@ -500,7 +537,7 @@ class XiaoHongShuClient(AbstractApiClient):
                 comments = comments_res["comments"]
                 if callback:
                     await callback(note_id, comments)
-                await asyncio.sleep(crawl_interval)
+                await crawl_sleep(crawl_interval)
                 result.extend(comments)
         return result
 
@@ -603,7 +640,7 @@ class XiaoHongShuClient(AbstractApiClient):
                 await callback(notes_to_add)
 
             result.extend(notes_to_add)
-            await asyncio.sleep(crawl_interval)
+            await crawl_sleep(crawl_interval)
 
         utils.logger.info(
             f"[XiaoHongShuClient.get_all_notes_by_creator] Finished getting notes for user {user_id}, total: {len(result)}"
@@ -31,6 +31,8 @@ from model.m_xiaohongshu import NoteUrlInfo, CreatorUrlInfo
 from proxy.proxy_ip_pool import IpInfoModel, create_ip_pool
 from store import xhs as xhs_store
 from tools import utils
+from tools.rate_limiter import crawl_sleep
+from tools.media_download_pool import close_media_download_pool, get_media_download_pool
 from tools.cdp_browser import CDPBrowserManager
 from tools.resource_path import get_libs_path
 from var import crawler_type_var, source_keyword_var
@@ -56,6 +58,7 @@ class XiaoHongShuCrawler(AbstractCrawler):
 
     async def start(self) -> None:
         playwright_proxy_format, httpx_proxy_format = None, None
+        ip_proxy_pool, ip_proxy_info = None, None
         if config.ENABLE_IP_PROXY:
             ip_proxy_pool = await create_ip_pool(config.IP_PROXY_POOL_COUNT, enable_validate_ip=True)
             ip_proxy_info: IpInfoModel = await ip_proxy_pool.get_proxy()
@@ -91,6 +94,9 @@ class XiaoHongShuCrawler(AbstractCrawler):
 
             # Create a client to interact with the xiaohongshu website.
             self.xhs_client = await self.create_xhs_client(httpx_proxy_format)
+            if ip_proxy_pool:
+                # 请求被封禁或超时时, 客户端从代理池租借新的代理重试
+                self.xhs_client.use_proxy_pool(ip_proxy_pool, ip_proxy_info)
             if not await self.xhs_client.pong():
                 login_obj = XiaoHongShuLogin(
                     login_type=config.LOGIN_TYPE,
@@ -101,19 +107,30 @@ class XiaoHongShuCrawler(AbstractCrawler):
                 )
                 await login_obj.begin()
                 await self.xhs_client.update_cookies(browser_context=self.browser_context)
+            # 登录之后再打开额外的签名页面, 共享同一个浏览器上下文的 cookie
+            await self.xhs_client.open_sign_pages(self.browser_context, config.XHS_SIGN_PAGE_POOL_SIZE - 1)
 
             crawler_type_var.set(config.CRAWLER_TYPE)
-            if config.CRAWLER_TYPE == "search":
-                # Search for notes and retrieve their comment information.
-                await self.search()
-            elif config.CRAWLER_TYPE == "detail":
-                # Get the information and comments of the specified post
-                await self.get_specified_notes()
-            elif config.CRAWLER_TYPE == "creator":
-                # Get creator's information and their notes and comments
-                await self.get_creators_and_notes()
-            else:
-                pass
+            try:
+                if config.CRAWLER_TYPE == "search":
+                    # Search for notes and retrieve their comment information.
+                    await self.search()
+                elif config.CRAWLER_TYPE == "detail":
+                    # Get the information and comments of the specified post
+                    await self.get_specified_notes()
+                elif config.CRAWLER_TYPE == "creator":
+                    # Get creator's information and their notes and comments
+                    await self.get_creators_and_notes()
+                else:
+                    pass
+            finally:
+                # 等待已提交的媒体下载完成, 再刷新并关闭存储, 保证缓冲中的数据全部写入磁盘
+                await close_media_download_pool()
+                await xhs_store.XhsStoreFactory.close_store()
+                if getattr(self, "xhs_client", None):
+                    await self.xhs_client.aclose()
+                if ip_proxy_pool:
+                    await ip_proxy_pool.close()
 
             utils.logger.info("[XiaoHongShuCrawler.start] Xhs Crawler finished ...")
 
@@ -170,8 +187,7 @@ class XiaoHongShuCrawler(AbstractCrawler):
                     await self.batch_get_note_comments(note_ids, xsec_tokens)
                     
                     # Sleep after each page navigation
-                    await asyncio.sleep(config.CRAWLER_MAX_SLEEP_SEC)
-                    utils.logger.info(f"[XiaoHongShuCrawler.search] Sleeping for {config.CRAWLER_MAX_SLEEP_SEC} seconds after page {page-1}")
+                    await crawl_sleep(config.CRAWLER_MAX_SLEEP_SEC)
                 except DataFetchError:
                     utils.logger.error("[XiaoHongShuCrawler.search] Get note detail error")
                     break
@@ -344,8 +360,7 @@ class XiaoHongShuCrawler(AbstractCrawler):
                 note_detail.update({"xsec_token": xsec_token, "xsec_source": xsec_source})
                 
                 # Sleep after fetching note detail
-                await asyncio.sleep(config.CRAWLER_MAX_SLEEP_SEC)
-                utils.logger.info(f"[get_note_detail_async_task] Sleeping for {config.CRAWLER_MAX_SLEEP_SEC} seconds after fetching note {note_id}")
+                await crawl_sleep(config.CRAWLER_MAX_SLEEP_SEC)
                 
                 return note_detail
 
@@ -404,8 +419,7 @@ class XiaoHongShuCrawler(AbstractCrawler):
             )
             
             # Sleep after fetching comments
-            await asyncio.sleep(crawl_interval)
-            utils.logger.info(f"[XiaoHongShuCrawler.get_comments] Sleeping for {crawl_interval} seconds after fetching comments for note {note_id}")
+            await crawl_sleep(crawl_interval)
 
     async def create_xhs_client(self, httpx_proxy: Optional[str]) -> XiaoHongShuClient:
         """Create xhs client"""
@@ -499,6 +513,10 @@ class XiaoHongShuCrawler(AbstractCrawler):
 
     async def close(self):
         """Close browser context"""
+        await close_media_download_pool()
+        await xhs_store.XhsStoreFactory.close_store()
+        if getattr(self, "xhs_client", None):
+            await self.xhs_client.aclose()
         # 如果使用CDP模式，需要特殊处理
         if self.cdp_manager:
             await self.cdp_manager.cleanup()
@@ -536,13 +554,11 @@ class XiaoHongShuCrawler(AbstractCrawler):
             url = pic.get("url")
             if not url:
                 continue
-            content = await self.xhs_client.get_note_media(url)
-            await asyncio.sleep(random.random())
-            if content is None:
-                continue
+            # 文件名按图片位置编号, 失败后重新下载时可以续传同一个 .part 文件
             extension_file_name = f"{picNum}.jpg"
             picNum += 1
-            await xhs_store.update_xhs_note_image(note_id, content, extension_file_name)
+            save_file_name = xhs_store.XiaoHongShuImage().prepare_save_file_name(note_id, extension_file_name)
+            get_media_download_pool().submit(url, save_file_name, self.xhs_client.download_note_media)
 
     async def get_notice_video(self, note_item: Dict):
         """
@@ -560,10 +576,7 @@ class XiaoHongShuCrawler(AbstractCrawler):
             return
         videoNum = 0
         for url in videos:
-            content = await self.xhs_client.get_note_media(url)
-            await asyncio.sleep(random.random())
-            if content is None:
-                continue
             extension_file_name = f"{videoNum}.mp4"
             videoNum += 1
-            await xhs_store.update_xhs_note_video(note_id, content, extension_file_name)
+            save_file_name = xhs_store.XiaoHongShuVideo().prepare_save_file_name(note_id, extension_file_name)
+            get_media_download_pool().submit(url, save_file_name, self.xhs_client.download_note_media)
@@ -16,5 +16,13 @@ class DataFetchError(RequestError):
     """something error when fetch"""
 
 
+class TransientFetchError(DataFetchError):
+    """temporary failure (server busy, too frequent, risk control), the request is retried"""
+
+
 class IPBlockError(RequestError):
     """fetch so fast that the server block us ip"""
+
+
+class CaptchaError(RequestError):
+    """the server asks for a captcha, we fetch too fast"""
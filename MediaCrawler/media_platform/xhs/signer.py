@@ -0,0 +1,123 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+# @Desc    : 小红书请求头签名页面池：每次签名只做一次 page.evaluate(同时取回 X-s/X-t 和未缓存的 b1)，
+#            b1 缓存到 cookie 更新为止，签名分摊到多个页面，并发请求不再排队等待同一个页面
+import asyncio
+from typing import Dict, List, Optional
+
+from playwright.async_api import BrowserContext, Page
+
+from tools import utils
+
+# 签名函数未加载时返回 null; with_b1 为 true 时顺带读取 localStorage 中的 b1
+_SIGN_JS = """([url, data, withB1]) => {
+    if (typeof window._webmsxyw !== 'function') {
+        return null;
+    }
+    const encrypted = window._webmsxyw(url, data);
+    return {
+        x_s: encrypted['X-s'],
+        x_t: encrypted['X-t'],
+        b1: withB1 ? window.localStorage.getItem('b1') : null,
+    };
+}"""
+
+
+class XhsPageSigner:
+    """
+    Sign requests with window._webmsxyw on a pool of logged-in xiaohongshu pages. The first page is the
+    crawler page, extra pages are opened by open_pages and closed by close.
+    """
+
+    def __init__(self, page: Page, max_retries: int = 3, retry_interval_sec: float = 1):
+        self.pages: List[Page] = [page]
+        self._extra_pages: List[Page] = []
+        self._idle: Optional[asyncio.Queue] = None
+        self._b1: Optional[str] = None
+        self.max_retries = max_retries
+        self.retry_interval_sec = retry_interval_sec
+        self.signed = 0
+
+    def _idle_pages(self) -> asyncio.Queue:
+        if self._idle is None:
+            self._idle = asyncio.Queue()
+            for page in self.pages:
+                self._idle.put_nowait(page)
+        return self._idle
+
+    async def open_pages(self, browser_context: BrowserContext, url: str, count: int):
+        """
+        open count extra pages of the browser context on url and add them to the pool
+        """
+        for _ in range(max(0, count)):
+            page = await browser_context.new_page()
+            await page.goto(url)
+            self.pages.append(page)
+            self._extra_pages.append(page)
+            self._idle_pages().put_nowait(page)
+        if count > 0:
+            utils.logger.info(f"[XhsPageSigner.open_pages] sign with {len(self.pages)} pages")
+
+    def invalidate_b1(self):
+        """
+        b1 is read again by the next sign call, called after the cookies changed
+        """
+        self._b1 = None
+
+    async def sign(self, url: str, data=None) -> Dict[str, str]:
+        """
+        Returns:
+            {"x_s", "x_t", "b1"}
+        """
+        idle = self._idle_pages()
+        page = await idle.get()
+        try:
+            return await self._sign_on_page(page, url, data)
+        finally:
+            idle.put_nowait(page)
+
+    async def _sign_on_page(self, page: Page, url: str, data) -> Dict[str, str]:
+        for attempt in range(self.max_retries):
+            try:
+                result = await page.evaluate(_SIGN_JS, [url, data, not self._b1])
+            except Exception as e:
+                if attempt >= self.max_retries - 1:
+                    raise
+                utils.logger.warning(f"[XhsPageSigner.sign] Attempt {attempt + 1} failed: {e}, retrying...")
+                await asyncio.sleep(self.retry_interval_sec)
+                continue
+            if result is None:
+                # 页面刚打开或刷新时签名函数还未加载
+                if attempt >= self.max_retries - 1:
+                    raise Exception("window._webmsxyw function not found after retries")
+                utils.logger.warning(f"[XhsPageSigner.sign] window._webmsxyw not ready, retry {attempt + 1}/{self.max_retries}")
+                await asyncio.sleep(self.retry_interval_sec)
+                continue
+            if not self._b1:
+                # localStorage 还没写入 b1 时不缓存空值, 下次签名重新读取
+                self._b1 = result.get("b1") or None
+            self.signed += 1
+            return {"x_s": result.get("x_s") or "", "x_t": str(result.get("x_t") or ""), "b1": self._b1 or ""}
+
+    async def close(self):
+        """
+        close the extra pages, the crawler page is left to the crawler
+        """
+        for page in self._extra_pages:
+            try:
+                await page.close()
+            except Exception as e:
+                utils.logger.warning(f"[XhsPageSigner.close] close sign page failed: {e}")
+        self.pages = [page for page in self.pages if page not in self._extra_pages]
+        self._extra_pages = []
+        self._idle = None
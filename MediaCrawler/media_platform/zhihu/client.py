@@ -9,28 +9,30 @@
 # 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
 
 # -*- coding: utf-8 -*-
-import asyncio
 import json
 from typing import Any, Callable, Dict, List, Optional, Union
 from urllib.parse import urlencode
 
-import httpx
 from httpx import Response
 from playwright.async_api import BrowserContext, Page
-from tenacity import retry, stop_after_attempt, wait_fixed
 
 import config
 from base.base_crawler import AbstractApiClient
+from base.request_pipeline import RequestContext
 from constant import zhihu as zhihu_constant
 from model.m_zhihu import ZhihuComment, ZhihuContent, ZhihuCreator
-from tools import utils
+from tools import json_codec, utils
+from tools.rate_limiter import crawl_sleep
 
-from .exception import DataFetchError, ForbiddenError
+from .exception import DataFetchError, ForbiddenError, TransientFetchError
 from .field import SearchSort, SearchTime, SearchType
 from .help import ZhihuExtractor, sign
 
 
 class ZhiHuClient(AbstractApiClient):
+    # 只重试服务端错误、限流和不完整的响应
+    retryable_errors = (TransientFetchError,)
+    identity_cookies = ("z_c0",)
 
     def __init__(
         self,
@@ -64,44 +66,57 @@ class ZhiHuClient(AbstractApiClient):
         headers['x-zse-96'] = sign_res["x-zse-96"]
         return headers
 
-    @retry(stop=stop_after_attempt(3), wait=wait_fixed(1))
-    async def request(self, method, url, **kwargs) -> Union[str, Any]:
+    async def sign_request(self, ctx: RequestContext):
         """
-        封装httpx的公共请求方法，对请求响应做一些处理
-        Args:
-            method: 请求方法
-            url: 请求的URL
-            **kwargs: 其他请求参数，例如请求头、请求体等
-
-        Returns:
-
+        对请求头签名, 待签名的 uri(包含请求参数) 由 get 通过 ctx.options 传入
         """
-        # return response.text
-        return_response = kwargs.pop('return_response', False)
-
-        async with httpx.AsyncClient(proxy=self.proxy) as client:
-            response = await client.request(method, url, timeout=self.timeout, **kwargs)
+        if "sign_uri" not in ctx.options:
+            return
+        ctx.kwargs["headers"] = await self._pre_headers(ctx.options["sign_uri"])
 
+    def classify_response(self, ctx: RequestContext) -> Union[str, Any]:
+        """
+        对请求响应做一些处理: 403 映射为 ForbiddenError, 其余错误映射为 DataFetchError
+        """
+        response = ctx.response
         if response.status_code != 200:
-            utils.logger.error(f"[ZhiHuClient.request] Requset Url: {url}, Request error: {response.text}")
+            utils.logger.error(f"[ZhiHuClient.request] Requset Url: {ctx.url}, Request error: {response.text}")
             if response.status_code == 403:
                 raise ForbiddenError(response.text)
             elif response.status_code == 404:  # 如果一个content没有评论也是404
                 return {}
+            elif response.status_code == 429 or response.status_code >= 500:
+                raise TransientFetchError(response.text)
 
             raise DataFetchError(response.text)
 
-        if return_response:
+        if ctx.options.get("return_response"):
             return response.text
         try:
-            data: Dict = response.json()
+            data: Dict = json_codec.decode_response(response)
             if data.get("error"):
                 utils.logger.error(f"[ZhiHuClient.request] Request error: {data}")
                 raise DataFetchError(data.get("error", {}).get("message"))
             return data
         except json.JSONDecodeError:
             utils.logger.error(f"[ZhiHuClient.request] Request error: {response.text}")
-            raise DataFetchError(response.text)
+            raise TransientFetchError(response.text)
+
+    async def request(self, method, url, **kwargs) -> Union[str, Any]:
+        """
+        封装httpx的公共请求方法，请求经过 AbstractApiClient 的请求管道(重试/签名/指标)
+        Args:
+            method: 请求方法
+            url: 请求的URL
+            **kwargs: 其他请求参数，例如请求头、请求体等
+
+        Returns:
+
+        """
+        options = {
+            "return_response": kwargs.pop('return_response', False),
+        }
+        return await self.execute(method, url, options=options, **kwargs)
 
     async def get(self, uri: str, params=None, **kwargs) -> Union[Response, Dict, str]:
         """
@@ -116,9 +131,12 @@ class ZhiHuClient(AbstractApiClient):
         final_uri = uri
         if isinstance(params, dict):
             final_uri += '?' + urlencode(params)
-        headers = await self._pre_headers(final_uri)
         base_url = (zhihu_constant.ZHIHU_URL if "/p/" not in uri else zhihu_constant.ZHIHU_ZHUANLAN_URL)
-        return await self.request(method="GET", url=base_url + final_uri, headers=headers, **kwargs)
+        options = {
+            "sign_uri": final_uri,
+            "return_response": kwargs.pop('return_response', False),
+        }
+        return await self.execute("GET", base_url + final_uri, options=options, **kwargs)
 
     async def pong(self) -> bool:
         """
@@ -298,7 +316,7 @@ class ZhiHuClient(AbstractApiClient):
 
             result.extend(comments)
             await self.get_comments_all_sub_comments(content, comments, crawl_interval=crawl_interval, callback=callback)
-            await asyncio.sleep(crawl_interval)
+            await crawl_sleep(crawl_interval)
         return result
 
     async def get_comments_all_sub_comments(
@@ -346,7 +364,7 @@ class ZhiHuClient(AbstractApiClient):
                     await callback(sub_comments)
 
                 all_sub_comments.extend(sub_comments)
-                await asyncio.sleep(crawl_interval)
+                await crawl_sleep(crawl_interval)
         return all_sub_comments
 
     async def get_creator_info(self, url_token: str) -> Optional[ZhihuCreator]:
@@ -452,7 +470,7 @@ class ZhiHuClient(AbstractApiClient):
                 await callback(contents)
             all_contents.extend(contents)
             offset += limit
-            await asyncio.sleep(crawl_interval)
+            await crawl_sleep(crawl_interval)
         return all_contents
 
     async def get_all_articles_by_creator(
@@ -486,7 +504,7 @@ class ZhiHuClient(AbstractApiClient):
                 await callback(contents)
             all_contents.extend(contents)
             offset += limit
-            await asyncio.sleep(crawl_interval)
+            await crawl_sleep(crawl_interval)
         return all_contents
 
     async def get_all_videos_by_creator(
@@ -520,7 +538,7 @@ class ZhiHuClient(AbstractApiClient):
                 await callback(contents)
             all_contents.extend(contents)
             offset += limit
-            await asyncio.sleep(crawl_interval)
+            await crawl_sleep(crawl_interval)
         return all_contents
 
     async def get_answer_info(
@@ -16,6 +16,10 @@ class DataFetchError(RequestError):
     """something error when fetch"""
 
 
+class TransientFetchError(DataFetchError):
+    """temporary failure (server busy, too frequent, risk control), the request is retried"""
+
+
 class IPBlockError(RequestError):
     """fetch so fast that the server block us ip"""
 
@@ -11,12 +11,13 @@
 # -*- coding: utf-8 -*-
 # @Author  : relakkes@gmail.com
 # @Time    : 2023/12/2 13:45
-# @Desc    : ip代理池实现
-import random
-from typing import Dict, List
+# @Desc    : ip代理池实现：并发验证候选代理，按延迟和成功率为每个代理打分，租借给客户端，淘汰坏代理并在耗尽前后台补充
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional
 
 import httpx
-from tenacity import retry, stop_after_attempt, wait_fixed
 
 import config
 from proxy.providers import (
@@ -25,89 +26,222 @@ from proxy.providers import (
 )
 from tools import utils
 
-from .base_proxy import ProxyProvider
+from .base_proxy import IpGetError, ProxyProvider
 from .types import IpInfoModel, ProviderNameEnum
 
 
+def proxy_key(proxy: IpInfoModel) -> str:
+    return f"{proxy.ip}:{proxy.port}"
+
+
+@dataclass
+class ProxyHealth:
+    proxy: IpInfoModel
+    successes: int = 0
+    failures: int = 0
+    consecutive_failures: int = 0
+    # 延迟的指数加权平均(秒)
+    latency_sec: Optional[float] = None
+    leases: int = 0
+
+    @property
+    def success_rate(self) -> float:
+        # 拉普拉斯平滑, 新代理从 0.5 开始
+        return (self.successes + 1) / (self.successes + self.failures + 2)
+
+    @property
+    def score(self) -> float:
+        """
+        higher is better: success rate discounted by the average latency
+        """
+        return self.success_rate / (1 + (self.latency_sec or 0.0))
+
+    def record_success(self, latency_sec: Optional[float] = None):
+        self.successes += 1
+        self.consecutive_failures = 0
+        if latency_sec is not None:
+            self.latency_sec = latency_sec if self.latency_sec is None else 0.7 * self.latency_sec + 0.3 * latency_sec
+
+    def record_failure(self):
+        self.failures += 1
+        self.consecutive_failures += 1
+
+    def expires_within(self, seconds: float) -> bool:
+        return bool(self.proxy.expired_time_ts) and self.proxy.expired_time_ts - time.time() < seconds
+
+
 class ProxyIpPool:
 
     def __init__(
-        self, ip_pool_count: int, enable_validate_ip: bool, ip_provider: ProxyProvider
+        self, ip_pool_count: int, enable_validate_ip: bool, ip_provider: ProxyProvider,
+        valid_ip_url: str = None,
     ) -> None:
         """
 
         Args:
-            ip_pool_count:
-            enable_validate_ip:
-            ip_provider:
+            ip_pool_count: 每次从代理商提取的 IP 数量
+            enable_validate_ip: 是否在入池前验证 IP
+            ip_provider: 代理商
+            valid_ip_url: 验证 IP 是否有效的地址, 默认 config.IP_PROXY_VALIDATE_URL
         """
-        self.valid_ip_url = "https://echo.apifox.cn/"  # 验证 IP 是否有效的地址
+        self.valid_ip_url = valid_ip_url or config.IP_PROXY_VALIDATE_URL
         self.ip_pool_count = ip_pool_count
         self.enable_validate_ip = enable_validate_ip
-        self.proxy_list: List[IpInfoModel] = []
         self.ip_provider: ProxyProvider = ip_provider
+        # 已验证可用的代理, 按 ip:port 索引
+        self.proxies: Dict[str, ProxyHealth] = {}
+        self.evicted_count = 0
+        self._refill_lock = asyncio.Lock()
+        self._refill_task: Optional[asyncio.Task] = None
 
     async def load_proxies(self) -> None:
         """
-        加载IP代理
+        从代理商提取一批 IP, 并发验证后放入池中
         Returns:
 
         """
-        self.proxy_list = await self.ip_provider.get_proxy(self.ip_pool_count)
+        async with self._refill_lock:
+            candidates = await self.ip_provider.get_proxy(self.ip_pool_count)
+            candidates = [proxy for proxy in candidates if proxy_key(proxy) not in self.proxies]
+            if self.enable_validate_ip:
+                latencies = await self._validate_all(candidates)
+            else:
+                latencies = [0.0] * len(candidates)
+            for proxy, latency in zip(candidates, latencies):
+                if latency is None:
+                    continue
+                health = ProxyHealth(proxy=proxy)
+                health.record_success(latency)
+                self.proxies[proxy_key(proxy)] = health
+            utils.logger.info(
+                f"[ProxyIpPool.load_proxies] {len(self.proxies)} healthy proxies after validating {len(candidates)} candidates"
+            )
+
+    async def _validate_all(self, candidates: List[IpInfoModel]) -> List[Optional[float]]:
+        semaphore = asyncio.Semaphore(config.IP_PROXY_VALIDATE_CONCURRENCY)
 
-    async def _is_valid_proxy(self, proxy: IpInfoModel) -> bool:
+        async def validate(proxy: IpInfoModel) -> Optional[float]:
+            async with semaphore:
+                return await self._validate_proxy(proxy)
+
+        return await asyncio.gather(*[validate(proxy) for proxy in candidates])
+
+    async def _validate_proxy(self, proxy: IpInfoModel) -> Optional[float]:
         """
-        验证代理IP是否有效
+        通过代理访问 valid_ip_url
         :param proxy:
-        :return:
+        :return: 可用时返回延迟(秒), 不可用时返回 None
         """
-        utils.logger.info(
-            f"[ProxyIpPool._is_valid_proxy] testing {proxy.ip} is it valid "
-        )
+        _, proxy_url = utils.format_proxy_info(proxy)
+        start = time.monotonic()
         try:
-            # httpx 0.28.1 需要直接传入代理URL字符串，而不是字典
-            if proxy.user and proxy.password:
-                proxy_url = f"http://{proxy.user}:{proxy.password}@{proxy.ip}:{proxy.port}"
-            else:
-                proxy_url = f"http://{proxy.ip}:{proxy.port}"
-            
-            async with httpx.AsyncClient(proxy=proxy_url) as client:
+            async with httpx.AsyncClient(proxy=proxy_url, timeout=config.IP_PROXY_VALIDATE_TIMEOUT_SEC) as client:
                 response = await client.get(self.valid_ip_url)
-            if response.status_code == 200:
-                return True
-            else:
-                return False
         except Exception as e:
-            utils.logger.info(
-                f"[ProxyIpPool._is_valid_proxy] testing {proxy.ip} err: {e}"
-            )
-            raise e
+            utils.logger.info(f"[ProxyIpPool._validate_proxy] testing {proxy.ip} err: {e}")
+            return None
+        if response.status_code != 200:
+            utils.logger.info(f"[ProxyIpPool._validate_proxy] testing {proxy.ip} status code: {response.status_code}")
+            return None
+        return time.monotonic() - start
+
+    def _evict(self, key: str, reason: str):
+        health = self.proxies.pop(key, None)
+        if health:
+            self.evicted_count += 1
+            utils.logger.info(f"[ProxyIpPool] evict proxy {key}: {reason}")
+
+    def _evict_expired(self):
+        for key, health in list(self.proxies.items()):
+            if health.expires_within(config.IP_PROXY_EXPIRE_MARGIN_SEC):
+                self._evict(key, "expired")
 
-    @retry(stop=stop_after_attempt(3), wait=wait_fixed(1))
-    async def get_proxy(self) -> IpInfoModel:
+    def _schedule_refill(self):
         """
-        从代理池中随机提取一个代理IP
-        :return:
+        healthy proxies fall below the threshold: refill in the background so the next lease does not wait
         """
-        if len(self.proxy_list) == 0:
-            await self._reload_proxies()
+        if len(self.proxies) > config.IP_PROXY_REFILL_THRESHOLD:
+            return
+        if self._refill_task is not None and not self._refill_task.done():
+            return
+        self._refill_task = asyncio.create_task(self._refill())
 
-        proxy = random.choice(self.proxy_list)
-        self.proxy_list.remove(proxy)  # 取出来一个IP就应该移出掉
-        if self.enable_validate_ip:
-            if not await self._is_valid_proxy(proxy):
-                raise Exception(
-                    "[ProxyIpPool.get_proxy] current ip invalid and again get it"
-                )
-        return proxy
+    async def _refill(self):
+        try:
+            await self.load_proxies()
+        except Exception as e:
+            utils.logger.error(f"[ProxyIpPool._refill] refill proxies err: {e}")
 
-    async def _reload_proxies(self):
+    async def get_proxy(self, exclude: Optional[List[IpInfoModel]] = None) -> IpInfoModel:
         """
-        # 重新加载代理池
+        租借当前得分最高、被租借次数最少的代理IP, 池为空时同步补充
+        :param exclude: 不参与租借的代理, 例如刚刚失败的代理
         :return:
         """
-        self.proxy_list = []
-        await self.load_proxies()
+        exclude_keys = {proxy_key(proxy) for proxy in exclude or []}
+        candidates: List[ProxyHealth] = []
+        for _ in range(3):
+            self._evict_expired()
+            candidates = [health for key, health in self.proxies.items() if key not in exclude_keys]
+            if candidates:
+                break
+            if self._refill_task is not None and not self._refill_task.done():
+                await self._refill_task
+            else:
+                await self.load_proxies()
+        if not candidates:
+            raise IpGetError("[ProxyIpPool.get_proxy] no valid proxy ip after 3 reloads")
+
+        health = max(candidates, key=lambda h: h.score / (1 + h.leases))
+        health.leases += 1
+        self._schedule_refill()
+        return health.proxy
+
+    def release_proxy(self, proxy: IpInfoModel):
+        """
+        归还租借的代理
+        """
+        health = self.proxies.get(proxy_key(proxy))
+        if health and health.leases > 0:
+            health.leases -= 1
+
+    def report_success(self, proxy: IpInfoModel, latency_sec: Optional[float] = None):
+        health = self.proxies.get(proxy_key(proxy))
+        if health:
+            health.record_success(latency_sec)
+
+    def report_failure(self, proxy: IpInfoModel):
+        """
+        记录一次失败, 连续失败过多或成功率过低的代理会被淘汰
+        """
+        key = proxy_key(proxy)
+        health = self.proxies.get(key)
+        if not health:
+            return
+        health.record_failure()
+        if health.consecutive_failures >= config.IP_PROXY_MAX_FAILURES:
+            self._evict(key, f"{health.consecutive_failures} consecutive failures")
+        elif health.successes + health.failures >= 5 and health.success_rate < config.IP_PROXY_MIN_SUCCESS_RATE:
+            self._evict(key, f"success rate {health.success_rate:.2f}")
+        self._schedule_refill()
+
+    def stats(self) -> Dict:
+        return {
+            "healthy": len(self.proxies),
+            "evicted": self.evicted_count,
+            "proxies": {
+                key: {"score": round(h.score, 3), "latency_sec": round(h.latency_sec or 0.0, 3), "leases": h.leases}
+                for key, h in self.proxies.items()
+            },
+        }
+
+    async def close(self):
+        if self._refill_task is not None and not self._refill_task.done():
+            self._refill_task.cancel()
+            try:
+                await self._refill_task
+            except asyncio.CancelledError:
+                pass
 
 
 IpProxyProvider: Dict[str, ProxyProvider] = {
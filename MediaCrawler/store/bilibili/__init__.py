@@ -13,9 +13,11 @@
 # @Time    : 2024/1/14 19:34
 # @Desc    :
 
-from typing import List
+from typing import Dict, List, Optional
 
 import config
+from store.write_behind import wrap_store
+from tools.crawl_state import content_already_crawled, flush_crawl_state, remember_crawled_content
 from var import source_keyword_var
 
 from ._store_impl import *
@@ -28,14 +30,34 @@ class BiliStoreFactory:
         "db": BiliDbStoreImplement,
         "json": BiliJsonStoreImplement,
         "sqlite": BiliSqliteStoreImplement,
+        "parquet": BiliParquetStoreImplement,
     }
 
+    # 当前采集的store实例（确保同一次采集使用同一个文件）
+    _current_store = None
+
     @staticmethod
     def create_store() -> AbstractStore:
+        if BiliStoreFactory._current_store is not None:
+            return BiliStoreFactory._current_store
+
         store_class = BiliStoreFactory.STORES.get(config.SAVE_DATA_OPTION)
         if not store_class:
-            raise ValueError("[BiliStoreFactory.create_store] Invalid save option only supported csv or db or json or sqlite ...")
-        return store_class()
+            raise ValueError("[BiliStoreFactory.create_store] Invalid save option only supported csv or db or json or sqlite or parquet ...")
+        BiliStoreFactory._current_store = store_class()
+        # 写入队列开启时, 存储操作由后台任务批量执行
+        BiliStoreFactory._current_store = wrap_store(BiliStoreFactory._current_store)
+        return BiliStoreFactory._current_store
+
+    @staticmethod
+    async def close_store():
+        """关闭当前store实例，将缓冲中的数据写入磁盘，采集结束时调用"""
+        if BiliStoreFactory._current_store is not None:
+            store, BiliStoreFactory._current_store = BiliStoreFactory._current_store, None
+            await store.close()
+        if config.ENABLE_INCREMENTAL_CRAWL:
+            # 队列已写完, 提交本次保存的内容ID
+            await flush_crawl_state()
 
 
 async def update_bilibili_video(video_item: Dict):
@@ -65,8 +87,12 @@ async def update_bilibili_video(video_item: Dict):
         "video_cover_url": video_item_view.get("pic", ""),
         "source_keyword": source_keyword_var.get(),
     }
+    if await content_already_crawled("bili", video_id):
+        utils.logger.info(f"[store.bilibili.update_bilibili_video] bilibili video id:{video_id} already stored by a previous crawl, skip")
+        return
     utils.logger.info(f"[store.bilibili.update_bilibili_video] bilibili video id:{video_id}, title:{save_content_item.get('title')}")
     await BiliStoreFactory.create_store().store_content(content_item=save_content_item)
+    remember_crawled_content("bili", video_id)
 
 
 async def update_up_info(video_item: Dict):
@@ -91,11 +117,18 @@ async def update_up_info(video_item: Dict):
 async def batch_update_bilibili_video_comments(video_id: str, comments: List[Dict]):
     if not comments:
         return
-    for comment_item in comments:
-        await update_bilibili_video_comment(video_id, comment_item)
+    # 整批交给store, db存储时一条语句批量写入
+    save_items = [_build_bilibili_video_comment_item(video_id, comment_item) for comment_item in comments]
+    await BiliStoreFactory.create_store().store_comments([item for item in save_items if item])
 
 
 async def update_bilibili_video_comment(video_id: str, comment_item: Dict):
+    save_item = _build_bilibili_video_comment_item(video_id, comment_item)
+    if save_item:
+        await BiliStoreFactory.create_store().store_comment(save_item)
+
+
+def _build_bilibili_video_comment_item(video_id: str, comment_item: Dict) -> Optional[Dict]:
     comment_id = str(comment_item.get("rpid"))
     parent_comment_id = str(comment_item.get("parent", 0))
     content: Dict = comment_item.get("content")
@@ -117,7 +150,7 @@ async def update_bilibili_video_comment(video_id: str, comment_item: Dict):
         "last_modify_ts": utils.get_current_timestamp(),
     }
     utils.logger.info(f"[store.bilibili.update_bilibili_video_comment] Bilibili video comment: {comment_id}, content: {save_comment_item.get('content')}")
-    await BiliStoreFactory.create_store().store_comment(comment_item=save_comment_item)
+    return save_comment_item
 
 
 async def store_video(aid, video_content, extension_file_name):
@@ -18,7 +18,7 @@ import csv
 import json
 import os
 import pathlib
-from typing import Dict
+from typing import Dict, List
 
 import aiofiles
 from sqlalchemy import select
@@ -26,7 +26,7 @@ from sqlalchemy.orm import sessionmaker
 
 import config
 from base.base_crawler import AbstractStore
-from database.db_session import get_session
+from database.db_session import bulk_upsert, get_session
 from database.models import BilibiliVideoComment, BilibiliVideo, BilibiliUpInfo, BilibiliUpDynamic, BilibiliContactInfo
 from tools.async_file_writer import AsyncFileWriter
 from tools import utils, words
@@ -110,6 +110,12 @@ class BiliCsvStoreImplement(AbstractStore):
             item_type="dynamics"
         )
 
+    async def close(self):
+        """
+        flush buffered data and close the output files
+        """
+        await self.file_writer.close()
+
 
 class BiliDbStoreImplement(AbstractStore):
     async def store_content(self, content_item: Dict):
@@ -152,6 +158,24 @@ class BiliDbStoreImplement(AbstractStore):
                     setattr(comment_detail, key, value)
             await session.commit()
 
+    async def store_contents(self, content_items: List[Dict]):
+        """
+        Bilibili content DB batch storage implementation, one bulk upsert per batch
+        Args:
+            content_items: content item dict list
+        """
+        async with get_session() as session:
+            await bulk_upsert(session, BilibiliVideo, content_items, "video_id")
+
+    async def store_comments(self, comment_items: List[Dict]):
+        """
+        Bilibili comment DB batch storage implementation, one bulk upsert per batch
+        Args:
+            comment_items: comment item dict list
+        """
+        async with get_session() as session:
+            await bulk_upsert(session, BilibiliVideoComment, comment_items, "comment_id")
+
     async def store_creator(self, creator: Dict):
         """
         Bilibili creator DB storage implementation
@@ -293,7 +317,82 @@ class BiliJsonStoreImplement(AbstractStore):
             item_type="dynamics"
         )
 
+    async def close(self):
+        """
+        flush buffered data and close the output files
+        """
+        await self.file_writer.close()
+
 
 
 class BiliSqliteStoreImplement(BiliDbStoreImplement):
     pass
+
+
+class BiliParquetStoreImplement(AbstractStore):
+    def __init__(self):
+        self.file_writer = AsyncFileWriter(
+            crawler_type=crawler_type_var.get(),
+            platform="bilibili"
+        )
+
+    async def store_content(self, content_item: Dict):
+        """
+        content Parquet storage implementation
+        Args:
+            content_item:
+
+        Returns:
+
+        """
+        await self.file_writer.write_to_parquet(item=content_item, item_type="contents", model=BilibiliVideo)
+
+    async def store_comment(self, comment_item: Dict):
+        """
+        comment Parquet storage implementation
+        Args:
+            comment_item:
+
+        Returns:
+
+        """
+        await self.file_writer.write_to_parquet(item=comment_item, item_type="comments", model=BilibiliVideoComment)
+
+    async def store_creator(self, creator: Dict):
+        """
+        creator Parquet storage implementation
+        Args:
+            creator:
+
+        Returns:
+
+        """
+        await self.file_writer.write_to_parquet(item=creator, item_type="creators", model=BilibiliUpInfo)
+
+    async def store_contact(self, contact_item: Dict):
+        """
+        contact Parquet storage implementation
+        Args:
+            contact_item:
+
+        Returns:
+
+        """
+        await self.file_writer.write_to_parquet(item=contact_item, item_type="contacts", model=BilibiliContactInfo)
+
+    async def store_dynamic(self, dynamic_item: Dict):
+        """
+        dynamic Parquet storage implementation
+        Args:
+            dynamic_item:
+
+        Returns:
+
+        """
+        await self.file_writer.write_to_parquet(item=dynamic_item, item_type="dynamics", model=BilibiliUpDynamic)
+
+    async def close(self):
+        """
+        write the buffered rows and the parquet footers
+        """
+        await self.file_writer.close()
@@ -49,6 +49,20 @@ class BilibiliVideo(AbstractStoreVideo):
         """
         return f"{self.video_store_path}/{aid}/{extension_file_name}"
 
+    def prepare_save_file_name(self, aid: str, extension_file_name: str) -> str:
+        """
+        create the directory and return the file path, used when the video is streamed straight to disk
+
+        Args:
+            aid: aid
+            extension_file_name: video filename with extension
+
+        Returns:
+
+        """
+        pathlib.Path(self.video_store_path + "/" + str(aid)).mkdir(parents=True, exist_ok=True)
+        return self.make_save_file_name(aid, extension_file_name)
+
     async def save_video(self, aid: int, video_content: str, extension_file_name="mp4"):
         """
         save video to local
@@ -12,9 +12,11 @@
 # @Author  : relakkes@gmail.com
 # @Time    : 2024/1/14 18:46
 # @Desc    :
-from typing import List, Dict
+from typing import Dict, List, Optional
 
 import config
+from store.write_behind import WriteBehindStore, wrap_store
+from tools.crawl_state import content_already_crawled, flush_crawl_state, remember_crawled_content
 from var import source_keyword_var
 
 from ._store_impl import *
@@ -33,6 +35,7 @@ class DouyinStoreFactory:
         "db": DouyinDbStoreImplement,
         "json": DouyinJsonStoreImplement,
         "sqlite": DouyinSqliteStoreImplement,
+        "parquet": DouyinParquetStoreImplement,
     }
 
     # 🔥 全局输出目录设置
@@ -47,9 +50,9 @@ class DouyinStoreFactory:
         DouyinStoreFactory._output_dir = output_dir
 
     @staticmethod
-    def reset_store():
-        """重置store实例，开始新的采集"""
-        DouyinStoreFactory._current_store = None
+    async def reset_store():
+        """重置store实例，开始新的采集; 先关闭当前实例, 写入队列和缓冲中的数据不会丢失"""
+        await DouyinStoreFactory.close_store()
         print(f"🔄 已重置Store实例，准备创建新文件")
 
     @staticmethod
@@ -60,16 +63,28 @@ class DouyinStoreFactory:
 
         store_class = DouyinStoreFactory.STORES.get(config.SAVE_DATA_OPTION)
         if not store_class:
-            raise ValueError("[DouyinStoreFactory.create_store] Invalid save option only supported csv or db or json or sqlite ...")
+            raise ValueError("[DouyinStoreFactory.create_store] Invalid save option only supported csv or db or json or sqlite or parquet ...")
 
         # 🔥 如果是CSV或JSON存储，传递output_dir参数
-        if config.SAVE_DATA_OPTION in ["csv", "json"]:
+        if config.SAVE_DATA_OPTION in ["csv", "json", "parquet"]:
             DouyinStoreFactory._current_store = store_class(output_dir=DouyinStoreFactory._output_dir)
         else:
             DouyinStoreFactory._current_store = store_class()
 
+        # 写入队列开启时, 存储操作由后台任务批量执行
+        DouyinStoreFactory._current_store = wrap_store(DouyinStoreFactory._current_store)
         return DouyinStoreFactory._current_store
 
+    @staticmethod
+    async def close_store():
+        """关闭当前store实例，将缓冲中的数据写入磁盘，采集结束时调用"""
+        if DouyinStoreFactory._current_store is not None:
+            store, DouyinStoreFactory._current_store = DouyinStoreFactory._current_store, None
+            await store.close()
+        if config.ENABLE_INCREMENTAL_CRAWL:
+            # 队列已写完, 提交本次保存的内容ID
+            await flush_crawl_state()
+
 
 def _extract_note_image_list(aweme_detail: Dict) -> List[str]:
     """
@@ -215,22 +230,33 @@ async def update_douyin_aweme(aweme_item: Dict):
         "comment_count": save_content_item.get("comment_count", "0")
     }
 
+    if await content_already_crawled("dy", aweme_id):
+        utils.logger.info(f"[store.douyin.update_douyin_aweme] douyin aweme id:{aweme_id} already stored by a previous crawl, skip")
+        return
     utils.logger.info(f"[store.douyin.update_douyin_aweme] douyin aweme id:{aweme_id}, title:{save_content_item.get('title')}")
     await DouyinStoreFactory.create_store().store_content(content_item=save_content_item)
+    remember_crawled_content("dy", aweme_id)
 
 
 async def batch_update_dy_aweme_comments(aweme_id: str, comments: List[Dict]):
     if not comments:
         return
-    for comment_item in comments:
-        await update_dy_aweme_comment(aweme_id, comment_item)
+    # 整批交给store, db存储时一条语句批量写入
+    save_items = [_build_dy_aweme_comment_item(aweme_id, comment_item) for comment_item in comments]
+    await DouyinStoreFactory.create_store().store_comments([item for item in save_items if item])
 
 
 async def update_dy_aweme_comment(aweme_id: str, comment_item: Dict):
+    save_item = _build_dy_aweme_comment_item(aweme_id, comment_item)
+    if save_item:
+        await DouyinStoreFactory.create_store().store_comment(save_item)
+
+
+def _build_dy_aweme_comment_item(aweme_id: str, comment_item: Dict) -> Optional[Dict]:
     comment_aweme_id = comment_item.get("aweme_id")
     if aweme_id != comment_aweme_id:
         utils.logger.error(f"[store.douyin.update_dy_aweme_comment] comment_aweme_id: {comment_aweme_id} != aweme_id: {aweme_id}")
-        return
+        return None
     user_info = comment_item.get("user", {})
     comment_id = comment_item.get("cid")
     parent_comment_id = comment_item.get("reply_id", "0")
@@ -265,7 +291,7 @@ async def update_dy_aweme_comment(aweme_id: str, comment_item: Dict):
     }
     utils.logger.info(f"[store.douyin.update_dy_aweme_comment] douyin aweme comment: {comment_id}, content: {save_comment_item.get('content')}")
 
-    await DouyinStoreFactory.create_store().store_comment(comment_item=save_comment_item)
+    return save_comment_item
 
 
 async def save_creator(user_id: str, creator: Dict):
@@ -290,6 +316,9 @@ async def save_creator(user_id: str, creator: Dict):
     # 🔥 设置创作者信息到file_writer(用于文件命名)
     store = DouyinStoreFactory.create_store()
     if hasattr(store, 'file_writer') and hasattr(store.file_writer, 'set_creator_info'):
+        # 文件名随创作者变化, 先把队列中上一个创作者的数据写完
+        if isinstance(store, WriteBehindStore):
+            await store.drain()
         nickname = user_info.get("nickname", "未命名")
         video_count = user_info.get("aweme_count", 0)
         store.file_writer.set_creator_info(nickname, video_count)
@@ -17,13 +17,13 @@ import asyncio
 import json
 import os
 import pathlib
-from typing import Dict
+from typing import Dict, List
 
 from sqlalchemy import select
 
 import config
 from base.base_crawler import AbstractStore
-from database.db_session import get_session
+from database.db_session import bulk_upsert, get_session
 from database.models import DouyinAweme, DouyinAwemeComment, DyCreator
 from tools import utils, words
 from tools.async_file_writer import AsyncFileWriter
@@ -82,6 +82,12 @@ class DouyinCsvStoreImplement(AbstractStore):
             item_type="creators"
         )
 
+    async def close(self):
+        """
+        flush buffered data and close the output files
+        """
+        await self.file_writer.close()
+
 
 class DouyinDbStoreImplement(AbstractStore):
     async def store_content(self, content_item: Dict):
@@ -125,6 +131,26 @@ class DouyinDbStoreImplement(AbstractStore):
                     setattr(comment_detail, key, value)
             await session.commit()
 
+    async def store_contents(self, content_items: List[Dict]):
+        """
+        Douyin content DB batch storage implementation, one bulk upsert per batch
+        Args:
+            content_items: content item dict list
+        """
+        # 与 store_content 保持一致, 没有标题的视频不入库
+        content_items = [item for item in content_items if item.get("title")]
+        async with get_session() as session:
+            await bulk_upsert(session, DouyinAweme, content_items, "aweme_id")
+
+    async def store_comments(self, comment_items: List[Dict]):
+        """
+        Douyin comment DB batch storage implementation, one bulk upsert per batch
+        Args:
+            comment_items: comment item dict list
+        """
+        async with get_session() as session:
+            await bulk_upsert(session, DouyinAwemeComment, comment_items, "comment_id")
+
     async def store_creator(self, creator: Dict):
         """
         Douyin creator DB storage implementation
@@ -196,7 +222,61 @@ class DouyinJsonStoreImplement(AbstractStore):
             item_type="creators"
         )
 
+    async def close(self):
+        """
+        flush buffered data and close the output files
+        """
+        await self.file_writer.close()
+
 
 
 class DouyinSqliteStoreImplement(DouyinDbStoreImplement):
-    pass
\ No newline at end of file
+    pass
+
+
+class DouyinParquetStoreImplement(AbstractStore):
+    def __init__(self, output_dir: str = None):
+        self.file_writer = AsyncFileWriter(
+            platform="douyin",
+            crawler_type=crawler_type_var.get(),
+            output_dir=output_dir
+        )
+
+    async def store_content(self, content_item: Dict):
+        """
+        content Parquet storage implementation
+        Args:
+            content_item:
+
+        Returns:
+
+        """
+        await self.file_writer.write_to_parquet(item=content_item, item_type="contents", model=DouyinAweme)
+
+    async def store_comment(self, comment_item: Dict):
+        """
+        comment Parquet storage implementation
+        Args:
+            comment_item:
+
+        Returns:
+
+        """
+        await self.file_writer.write_to_parquet(item=comment_item, item_type="comments", model=DouyinAwemeComment)
+
+    async def store_creator(self, creator: Dict):
+        """
+        creator Parquet storage implementation
+        Args:
+            creator:
+
+        Returns:
+
+        """
+        await self.file_writer.write_to_parquet(item=creator, item_type="creators", model=DyCreator)
+
+    async def close(self):
+        """
+        write the buffered rows and the parquet footers
+        """
+        await self.file_writer.close()
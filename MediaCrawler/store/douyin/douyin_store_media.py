@@ -45,6 +45,20 @@ class DouYinImage(AbstractStoreImage):
         """
         return f"{self.image_store_path}/{aweme_id}/{extension_file_name}"
 
+    def prepare_save_file_name(self, aweme_id: str, extension_file_name: str) -> str:
+        """
+        create the directory and return the file path, used when the image is streamed straight to disk
+
+        Args:
+            aweme_id: aweme id
+            extension_file_name: image filename with extension
+
+        Returns:
+
+        """
+        pathlib.Path(self.image_store_path + "/" + aweme_id).mkdir(parents=True, exist_ok=True)
+        return self.make_save_file_name(aweme_id, extension_file_name)
+
     async def save_image(self, aweme_id: str, pic_content: str, extension_file_name):
         """
         save image to local
@@ -92,6 +106,20 @@ class DouYinVideo(AbstractStoreVideo):
         """
         return f"{self.video_store_path}/{aweme_id}/{extension_file_name}"
 
+    def prepare_save_file_name(self, aweme_id: str, extension_file_name: str) -> str:
+        """
+        create the directory and return the file path, used when the video is streamed straight to disk
+
+        Args:
+            aweme_id: aweme id
+            extension_file_name: video filename with extension
+
+        Returns:
+
+        """
+        pathlib.Path(self.video_store_path + "/" + aweme_id).mkdir(parents=True, exist_ok=True)
+        return self.make_save_file_name(aweme_id, extension_file_name)
+
     async def save_video(self, aweme_id: str, video_content: str, extension_file_name):
         """
         save video to local
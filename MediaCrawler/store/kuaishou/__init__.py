@@ -13,9 +13,10 @@
 # @Author  : relakkes@gmail.com
 # @Time    : 2024/1/14 20:03
 # @Desc    :
-from typing import List
+from typing import Dict, List, Optional
 
 import config
+from store.write_behind import wrap_store
 from var import source_keyword_var
 
 from ._store_impl import *
@@ -26,16 +27,33 @@ class KuaishouStoreFactory:
         "csv": KuaishouCsvStoreImplement,
         "db": KuaishouDbStoreImplement,
         "json": KuaishouJsonStoreImplement,
-        "sqlite": KuaishouSqliteStoreImplement
+        "sqlite": KuaishouSqliteStoreImplement,
+        "parquet": KuaishouParquetStoreImplement,
     }
 
+    # 当前采集的store实例（确保同一次采集使用同一个文件）
+    _current_store = None
+
     @staticmethod
     def create_store() -> AbstractStore:
+        if KuaishouStoreFactory._current_store is not None:
+            return KuaishouStoreFactory._current_store
+
         store_class = KuaishouStoreFactory.STORES.get(config.SAVE_DATA_OPTION)
         if not store_class:
             raise ValueError(
-                "[KuaishouStoreFactory.create_store] Invalid save option only supported csv or db or json or sqlite ...")
-        return store_class()
+                "[KuaishouStoreFactory.create_store] Invalid save option only supported csv or db or json or sqlite or parquet ...")
+        KuaishouStoreFactory._current_store = store_class()
+        # 写入队列开启时, 存储操作由后台任务批量执行
+        KuaishouStoreFactory._current_store = wrap_store(KuaishouStoreFactory._current_store)
+        return KuaishouStoreFactory._current_store
+
+    @staticmethod
+    async def close_store():
+        """关闭当前store实例，将缓冲中的数据写入磁盘，采集结束时调用"""
+        if KuaishouStoreFactory._current_store is not None:
+            store, KuaishouStoreFactory._current_store = KuaishouStoreFactory._current_store, None
+            await store.close()
 
 
 async def update_kuaishou_video(video_item: Dict):
@@ -70,11 +88,18 @@ async def batch_update_ks_video_comments(video_id: str, comments: List[Dict]):
     utils.logger.info(f"[store.kuaishou.batch_update_ks_video_comments] video_id:{video_id}, comments:{comments}")
     if not comments:
         return
-    for comment_item in comments:
-        await update_ks_video_comment(video_id, comment_item)
+    # 整批交给store, db存储时一条语句批量写入
+    save_items = [_build_ks_video_comment_item(video_id, comment_item) for comment_item in comments]
+    await KuaishouStoreFactory.create_store().store_comments([item for item in save_items if item])
 
 
 async def update_ks_video_comment(video_id: str, comment_item: Dict):
+    save_item = _build_ks_video_comment_item(video_id, comment_item)
+    if save_item:
+        await KuaishouStoreFactory.create_store().store_comment(save_item)
+
+
+def _build_ks_video_comment_item(video_id: str, comment_item: Dict) -> Optional[Dict]:
     comment_id = comment_item.get("commentId")
     save_comment_item = {
         "comment_id": comment_id,
@@ -89,7 +114,7 @@ async def update_ks_video_comment(video_id: str, comment_item: Dict):
     }
     utils.logger.info(
         f"[store.kuaishou.update_ks_video_comment] Kuaishou video comment: {comment_id}, content: {save_comment_item.get('content')}")
-    await KuaishouStoreFactory.create_store().store_comment(comment_item=save_comment_item)
+    return save_comment_item
 
 async def save_creator(user_id: str, creator: Dict):
     ownerCount = creator.get('ownerCount', {})
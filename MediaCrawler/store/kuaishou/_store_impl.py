@@ -18,7 +18,7 @@ import csv
 import json
 import os
 import pathlib
-from typing import Dict
+from typing import Dict, List
 from tools.async_file_writer import AsyncFileWriter
 
 import aiofiles
@@ -26,7 +26,7 @@ from sqlalchemy import select
 
 import config
 from base.base_crawler import AbstractStore
-from database.db_session import get_session
+from database.db_session import bulk_upsert, get_session
 from database.models import KuaishouVideo, KuaishouVideoComment
 from tools import utils, words
 from var import crawler_type_var
@@ -77,6 +77,12 @@ class KuaishouCsvStoreImplement(AbstractStore):
     async def store_creator(self, creator: Dict):
         pass
 
+    async def close(self):
+        """
+        flush buffered data and close the output files
+        """
+        await self.writer.close()
+
 
 class KuaishouDbStoreImplement(AbstractStore):
     async def store_creator(self, creator: Dict):
@@ -123,6 +129,24 @@ class KuaishouDbStoreImplement(AbstractStore):
                     setattr(comment_detail, key, value)
             await session.commit()
 
+    async def store_contents(self, content_items: List[Dict]):
+        """
+        Kuaishou content DB batch storage implementation, one bulk upsert per batch
+        Args:
+            content_items: content item dict list
+        """
+        async with get_session() as session:
+            await bulk_upsert(session, KuaishouVideo, content_items, "video_id")
+
+    async def store_comments(self, comment_items: List[Dict]):
+        """
+        Kuaishou comment DB batch storage implementation, one bulk upsert per batch
+        Args:
+            comment_items: comment item dict list
+        """
+        async with get_session() as session:
+            await bulk_upsert(session, KuaishouVideoComment, comment_items, "comment_id")
+
 
 class KuaishouJsonStoreImplement(AbstractStore):
     def __init__(self, **kwargs):
@@ -154,7 +178,50 @@ class KuaishouJsonStoreImplement(AbstractStore):
     async def store_creator(self, creator: Dict):
         pass
 
+    async def close(self):
+        """
+        flush buffered data and close the output files
+        """
+        await self.writer.close()
+
 
 class KuaishouSqliteStoreImplement(KuaishouDbStoreImplement):
     async def store_creator(self, creator: Dict):
-        pass
\ No newline at end of file
+        pass
+
+
+class KuaishouParquetStoreImplement(AbstractStore):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.writer = AsyncFileWriter(platform="kuaishou", crawler_type=crawler_type_var.get())
+
+    async def store_content(self, content_item: Dict):
+        """
+        content Parquet storage implementation
+        Args:
+            content_item:
+
+        Returns:
+
+        """
+        await self.writer.write_to_parquet(item=content_item, item_type="contents", model=KuaishouVideo)
+
+    async def store_comment(self, comment_item: Dict):
+        """
+        comment Parquet storage implementation
+        Args:
+            comment_item:
+
+        Returns:
+
+        """
+        await self.writer.write_to_parquet(item=comment_item, item_type="comments", model=KuaishouVideoComment)
+
+    async def store_creator(self, creator: Dict):
+        pass
+
+    async def close(self):
+        """
+        write the buffered rows and the parquet footers
+        """
+        await self.writer.close()
@@ -10,7 +10,7 @@
 
 
 # -*- coding: utf-8 -*-
-from typing import List
+from typing import Dict, List, Optional
 
 from model.m_baidu_tieba import TiebaComment, TiebaCreator, TiebaNote
 from var import source_keyword_var
@@ -23,16 +23,33 @@ class TieBaStoreFactory:
         "csv": TieBaCsvStoreImplement,
         "db": TieBaDbStoreImplement,
         "json": TieBaJsonStoreImplement,
-        "sqlite": TieBaSqliteStoreImplement
+        "sqlite": TieBaSqliteStoreImplement,
+        "parquet": TieBaParquetStoreImplement,
     }
 
+    # 当前采集的store实例（确保同一次采集使用同一个文件）
+    _current_store = None
+
     @staticmethod
     def create_store() -> AbstractStore:
+        if TieBaStoreFactory._current_store is not None:
+            return TieBaStoreFactory._current_store
+
         store_class = TieBaStoreFactory.STORES.get(config.SAVE_DATA_OPTION)
         if not store_class:
             raise ValueError(
-                "[TieBaStoreFactory.create_store] Invalid save option only supported csv or db or json ...")
-        return store_class()
+                "[TieBaStoreFactory.create_store] Invalid save option only supported csv or db or json or sqlite or parquet ...")
+        TieBaStoreFactory._current_store = store_class()
+        # 写入队列开启时, 存储操作由后台任务批量执行
+        TieBaStoreFactory._current_store = wrap_store(TieBaStoreFactory._current_store)
+        return TieBaStoreFactory._current_store
+
+    @staticmethod
+    async def close_store():
+        """关闭当前store实例，将缓冲中的数据写入磁盘，采集结束时调用"""
+        if TieBaStoreFactory._current_store is not None:
+            store, TieBaStoreFactory._current_store = TieBaStoreFactory._current_store, None
+            await store.close()
 
 
 async def batch_update_tieba_notes(note_list: List[TiebaNote]):
@@ -46,8 +63,9 @@ async def batch_update_tieba_notes(note_list: List[TiebaNote]):
     """
     if not note_list:
         return
-    for note_item in note_list:
-        await update_tieba_note(note_item)
+    # 整批交给store, db存储时一条语句批量写入
+    save_items = [_build_tieba_note_item(note_item) for note_item in note_list]
+    await TieBaStoreFactory.create_store().store_contents([item for item in save_items if item])
 
 
 async def update_tieba_note(note_item: TiebaNote):
@@ -59,12 +77,18 @@ async def update_tieba_note(note_item: TiebaNote):
     Returns:
 
     """
+    save_item = _build_tieba_note_item(note_item)
+    if save_item:
+        await TieBaStoreFactory.create_store().store_content(save_item)
+
+
+def _build_tieba_note_item(note_item: TiebaNote) -> Optional[Dict]:
     note_item.source_keyword = source_keyword_var.get()
     save_note_item = note_item.model_dump()
     save_note_item.update({"last_modify_ts": utils.get_current_timestamp()})
     utils.logger.info(f"[store.tieba.update_tieba_note] tieba note: {save_note_item}")
 
-    await TieBaStoreFactory.create_store().store_content(save_note_item)
+    return save_note_item
 
 
 async def batch_update_tieba_note_comments(note_id: str, comments: List[TiebaComment]):
@@ -79,8 +103,9 @@ async def batch_update_tieba_note_comments(note_id: str, comments: List[TiebaCom
     """
     if not comments:
         return
-    for comment_item in comments:
-        await update_tieba_note_comment(note_id, comment_item)
+    # 整批交给store, db存储时一条语句批量写入
+    save_items = [_build_tieba_note_comment_item(note_id, comment_item) for comment_item in comments]
+    await TieBaStoreFactory.create_store().store_comments([item for item in save_items if item])
 
 
 async def update_tieba_note_comment(note_id: str, comment_item: TiebaComment):
@@ -93,10 +118,16 @@ async def update_tieba_note_comment(note_id: str, comment_item: TiebaComment):
     Returns:
 
     """
+    save_item = _build_tieba_note_comment_item(note_id, comment_item)
+    if save_item:
+        await TieBaStoreFactory.create_store().store_comment(save_item)
+
+
+def _build_tieba_note_comment_item(note_id: str, comment_item: TiebaComment) -> Optional[Dict]:
     save_comment_item = comment_item.model_dump()
     save_comment_item.update({"last_modify_ts": utils.get_current_timestamp()})
     utils.logger.info(f"[store.tieba.update_tieba_note_comment] tieba note id: {note_id} comment:{save_comment_item}")
-    await TieBaStoreFactory.create_store().store_comment(save_comment_item)
+    return save_comment_item
 
 
 async def save_creator(user_info: TiebaCreator):
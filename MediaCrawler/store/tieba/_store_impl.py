@@ -18,7 +18,7 @@ import csv
 import json
 import os
 import pathlib
-from typing import Dict
+from typing import Dict, List
 
 import aiofiles
 from sqlalchemy import select
@@ -28,7 +28,7 @@ import config
 from base.base_crawler import AbstractStore
 from database.models import TiebaNote, TiebaComment, TiebaCreator
 from tools import utils, words
-from database.db_session import get_session
+from database.db_session import bulk_upsert, get_session
 from var import crawler_type_var
 from tools.async_file_writer import AsyncFileWriter
 
@@ -86,6 +86,12 @@ class TieBaCsvStoreImplement(AbstractStore):
         """
         await self.writer.write_to_csv(item_type="creators", item=creator)
 
+    async def close(self):
+        """
+        flush buffered data and close the output files
+        """
+        await self.writer.close()
+
 
 class TieBaDbStoreImplement(AbstractStore):
     async def store_content(self, content_item: Dict):
@@ -126,6 +132,24 @@ class TieBaDbStoreImplement(AbstractStore):
                 session.add(db_comment)
             await session.commit()
 
+    async def store_contents(self, content_items: List[Dict]):
+        """
+        tieba content DB batch storage implementation, one bulk upsert per batch
+        Args:
+            content_items: content item dict list
+        """
+        async with get_session() as session:
+            await bulk_upsert(session, TiebaNote, content_items, "note_id")
+
+    async def store_comments(self, comment_items: List[Dict]):
+        """
+        tieba comment DB batch storage implementation, one bulk upsert per batch
+        Args:
+            comment_items: comment item dict list
+        """
+        async with get_session() as session:
+            await bulk_upsert(session, TiebaComment, comment_items, "comment_id")
+
     async def store_creator(self, creator: Dict):
         """
         tieba content DB storage implementation
@@ -184,9 +208,60 @@ class TieBaJsonStoreImplement(AbstractStore):
         """
         await self.writer.write_single_item_to_json(item_type="creators", item=creator)
 
+    async def close(self):
+        """
+        flush buffered data and close the output files
+        """
+        await self.writer.close()
+
 
 class TieBaSqliteStoreImplement(TieBaDbStoreImplement):
     """
     Tieba sqlite store implement
     """
     pass
+
+
+class TieBaParquetStoreImplement(AbstractStore):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.writer = AsyncFileWriter(platform="tieba", crawler_type=crawler_type_var.get())
+
+    async def store_content(self, content_item: Dict):
+        """
+        content Parquet storage implementation
+        Args:
+            content_item:
+
+        Returns:
+
+        """
+        await self.writer.write_to_parquet(item=content_item, item_type="contents", model=TiebaNote)
+
+    async def store_comment(self, comment_item: Dict):
+        """
+        comment Parquet storage implementation
+        Args:
+            comment_item:
+
+        Returns:
+
+        """
+        await self.writer.write_to_parquet(item=comment_item, item_type="comments", model=TiebaComment)
+
+    async def store_creator(self, creator: Dict):
+        """
+        creator Parquet storage implementation
+        Args:
+            creator:
+
+        Returns:
+
+        """
+        await self.writer.write_to_parquet(item=creator, item_type="creators", model=TiebaCreator)
+
+    async def close(self):
+        """
+        write the buffered rows and the parquet footers
+        """
+        await self.writer.close()
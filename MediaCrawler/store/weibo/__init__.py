@@ -14,7 +14,7 @@
 # @Desc    :
 
 import re
-from typing import List
+from typing import Dict, List, Optional
 
 from var import source_keyword_var
 
@@ -28,14 +28,31 @@ class WeibostoreFactory:
         "db": WeiboDbStoreImplement,
         "json": WeiboJsonStoreImplement,
         "sqlite": WeiboSqliteStoreImplement,
+        "parquet": WeiboParquetStoreImplement,
     }
 
+    # 当前采集的store实例（确保同一次采集使用同一个文件）
+    _current_store = None
+
     @staticmethod
     def create_store() -> AbstractStore:
+        if WeibostoreFactory._current_store is not None:
+            return WeibostoreFactory._current_store
+
         store_class = WeibostoreFactory.STORES.get(config.SAVE_DATA_OPTION)
         if not store_class:
-            raise ValueError("[WeibotoreFactory.create_store] Invalid save option only supported csv or db or json or sqlite ...")
-        return store_class()
+            raise ValueError("[WeibotoreFactory.create_store] Invalid save option only supported csv or db or json or sqlite or parquet ...")
+        WeibostoreFactory._current_store = store_class()
+        # 写入队列开启时, 存储操作由后台任务批量执行
+        WeibostoreFactory._current_store = wrap_store(WeibostoreFactory._current_store)
+        return WeibostoreFactory._current_store
+
+    @staticmethod
+    async def close_store():
+        """关闭当前store实例，将缓冲中的数据写入磁盘，采集结束时调用"""
+        if WeibostoreFactory._current_store is not None:
+            store, WeibostoreFactory._current_store = WeibostoreFactory._current_store, None
+            await store.close()
 
 
 async def batch_update_weibo_notes(note_list: List[Dict]):
@@ -49,8 +66,9 @@ async def batch_update_weibo_notes(note_list: List[Dict]):
     """
     if not note_list:
         return
-    for note_item in note_list:
-        await update_weibo_note(note_item)
+    # 整批交给store, db存储时一条语句批量写入
+    save_items = [_build_weibo_note_item(note_item) for note_item in note_list]
+    await WeibostoreFactory.create_store().store_contents([item for item in save_items if item])
 
 
 async def update_weibo_note(note_item: Dict):
@@ -62,8 +80,14 @@ async def update_weibo_note(note_item: Dict):
     Returns:
 
     """
+    save_item = _build_weibo_note_item(note_item)
+    if save_item:
+        await WeibostoreFactory.create_store().store_content(save_item)
+
+
+def _build_weibo_note_item(note_item: Dict) -> Optional[Dict]:
     if not note_item:
-        return
+        return None
 
     mblog: Dict = note_item.get("mblog")
     user_info: Dict = mblog.get("user")
@@ -92,7 +116,7 @@ async def update_weibo_note(note_item: Dict):
         "source_keyword": source_keyword_var.get(),
     }
     utils.logger.info(f"[store.weibo.update_weibo_note] weibo note id:{note_id}, title:{save_content_item.get('content')[:24]} ...")
-    await WeibostoreFactory.create_store().store_content(content_item=save_content_item)
+    return save_content_item
 
 
 async def batch_update_weibo_note_comments(note_id: str, comments: List[Dict]):
@@ -107,8 +131,9 @@ async def batch_update_weibo_note_comments(note_id: str, comments: List[Dict]):
     """
     if not comments:
         return
-    for comment_item in comments:
-        await update_weibo_note_comment(note_id, comment_item)
+    # 整批交给store, db存储时一条语句批量写入
+    save_items = [_build_weibo_note_comment_item(note_id, comment_item) for comment_item in comments]
+    await WeibostoreFactory.create_store().store_comments([item for item in save_items if item])
 
 
 async def update_weibo_note_comment(note_id: str, comment_item: Dict):
@@ -121,8 +146,14 @@ async def update_weibo_note_comment(note_id: str, comment_item: Dict):
     Returns:
 
     """
+    save_item = _build_weibo_note_comment_item(note_id, comment_item)
+    if save_item:
+        await WeibostoreFactory.create_store().store_comment(save_item)
+
+
+def _build_weibo_note_comment_item(note_id: str, comment_item: Dict) -> Optional[Dict]:
     if not comment_item or not note_id:
-        return
+        return None
     comment_id = str(comment_item.get("id"))
     user_info: Dict = comment_item.get("user")
     content_text = comment_item.get("text")
@@ -147,7 +178,7 @@ async def update_weibo_note_comment(note_id: str, comment_item: Dict):
         "avatar": user_info.get("profile_image_url", ""),
     }
     utils.logger.info(f"[store.weibo.update_weibo_note_comment] Weibo note comment: {comment_id}, content: {save_comment_item.get('content', '')[:24]} ...")
-    await WeibostoreFactory.create_store().store_comment(comment_item=save_comment_item)
+    return save_comment_item
 
 
 async def update_weibo_note_image(picid: str, pic_content, extension_file_name):
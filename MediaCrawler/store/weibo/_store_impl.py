@@ -18,7 +18,7 @@ import csv
 import json
 import os
 import pathlib
-from typing import Dict
+from typing import Dict, List
 
 import aiofiles
 from sqlalchemy import select
@@ -29,7 +29,7 @@ from base.base_crawler import AbstractStore
 from database.models import WeiboCreator, WeiboNote, WeiboNoteComment
 from tools import utils, words
 from tools.async_file_writer import AsyncFileWriter
-from database.db_session import get_session
+from database.db_session import bulk_upsert, get_session
 from var import crawler_type_var
 
 
@@ -86,6 +86,12 @@ class WeiboCsvStoreImplement(AbstractStore):
         """
         await self.writer.write_to_csv(item_type="creators", item=creator)
 
+    async def close(self):
+        """
+        flush buffered data and close the output files
+        """
+        await self.writer.close()
+
 
 class WeiboDbStoreImplement(AbstractStore):
 
@@ -141,6 +147,30 @@ class WeiboDbStoreImplement(AbstractStore):
                 session.add(db_comment)
             await session.commit()
 
+    async def store_contents(self, content_items: List[Dict]):
+        """
+        Weibo content DB batch storage implementation, one bulk upsert per batch
+        Args:
+            content_items: content item dict list
+        """
+        now_ts = utils.get_current_timestamp()
+        for content_item in content_items:
+            content_item["last_modify_ts"] = now_ts
+        async with get_session() as session:
+            await bulk_upsert(session, WeiboNote, content_items, "note_id")
+
+    async def store_comments(self, comment_items: List[Dict]):
+        """
+        Weibo comment DB batch storage implementation, one bulk upsert per batch
+        Args:
+            comment_items: comment item dict list
+        """
+        now_ts = utils.get_current_timestamp()
+        for comment_item in comment_items:
+            comment_item["last_modify_ts"] = now_ts
+        async with get_session() as session:
+            await bulk_upsert(session, WeiboNoteComment, comment_items, "comment_id")
+
     async def store_creator(self, creator: Dict):
         """
         Weibo creator DB storage implementation
@@ -206,9 +236,60 @@ class WeiboJsonStoreImplement(AbstractStore):
         """
         await self.writer.write_single_item_to_json(item_type="creators", item=creator)
 
+    async def close(self):
+        """
+        flush buffered data and close the output files
+        """
+        await self.writer.close()
+
 
 class WeiboSqliteStoreImplement(WeiboDbStoreImplement):
     """
     Weibo content SQLite storage implementation
     """
     pass
+
+
+class WeiboParquetStoreImplement(AbstractStore):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.writer = AsyncFileWriter(platform="weibo", crawler_type=crawler_type_var.get())
+
+    async def store_content(self, content_item: Dict):
+        """
+        content Parquet storage implementation
+        Args:
+            content_item:
+
+        Returns:
+
+        """
+        await self.writer.write_to_parquet(item=content_item, item_type="contents", model=WeiboNote)
+
+    async def store_comment(self, comment_item: Dict):
+        """
+        comment Parquet storage implementation
+        Args:
+            comment_item:
+
+        Returns:
+
+        """
+        await self.writer.write_to_parquet(item=comment_item, item_type="comments", model=WeiboNoteComment)
+
+    async def store_creator(self, creator: Dict):
+        """
+        creator Parquet storage implementation
+        Args:
+            creator:
+
+        Returns:
+
+        """
+        await self.writer.write_to_parquet(item=creator, item_type="creators", model=WeiboCreator)
+
+    async def close(self):
+        """
+        write the buffered rows and the parquet footers
+        """
+        await self.writer.close()
@@ -0,0 +1,262 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+# @Desc    : 写入队列(write-behind)，采集协程入队后立即返回，后台任务批量写入真实存储
+import asyncio
+import time
+import weakref
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import config
+from base.base_crawler import AbstractStore
+from tools import utils
+
+# 队列中的记录类型，content/comment 会被合并成批量写入
+_KIND_CONTENT = "content"
+_KIND_COMMENT = "comment"
+_KIND_CREATOR = "creator"
+_KIND_CALL = "call"
+
+# 所有未关闭的写入队列, 增量抓取状态要等队列确认写入后才能提交
+_live_stores: "weakref.WeakSet[WriteBehindStore]" = weakref.WeakSet()
+
+
+class StoreWriteError(Exception):
+    """
+    raised by the store queue once a backend write failed; records holds the (kind, payloads)
+    batches that were not written, so nothing is dropped silently
+    """
+
+    def __init__(self, message: str, records: List[Tuple[str, List[Any]]]):
+        super().__init__(message)
+        self.records = records
+
+
+class WriteBehindStore(AbstractStore):
+    """
+    Wrap a store backend with a bounded asyncio.Queue drained by background writer tasks.
+    store_* calls only enqueue records, so slow disks or databases no longer stall fetching;
+    when the queue is full the caller waits, which throttles the crawler (backpressure).
+    A failed backend write is kept and raised as StoreWriteError by the next store_* call,
+    drain() or close(), so storage errors still stop the crawl instead of losing data.
+    written() gives a future resolved once the records enqueued so far are written, without waiting on the queue.
+    """
+
+    def __init__(self, backend: AbstractStore, max_size: int = None, batch_size: int = None, workers: int = None):
+        self.backend = backend
+        self.max_size = max_size or config.STORE_QUEUE_MAX_SIZE
+        self.batch_size = batch_size or config.STORE_QUEUE_BATCH_SIZE
+        self.workers = workers or config.STORE_QUEUE_WORKERS
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=self.max_size)
+        self._worker_tasks: List[asyncio.Task] = []
+        self._failed_records: List[Tuple[str, List[Any]]] = []
+        self._last_error: Optional[Exception] = None
+        # 每条记录按入队顺序编号, _done_upto 之前的记录都已处理完
+        self._next_seq = 0
+        self._done_upto = 0
+        self._done_seqs: Set[int] = set()
+        self._failed_seqs: List[int] = []
+        self._barriers: List[Tuple[int, asyncio.Future]] = []
+        self._metrics: Dict[str, Any] = {
+            "enqueued": 0,
+            "written": 0,
+            "failed": 0,
+            "batches": 0,
+            "max_depth": 0,
+            "backpressure_waits": 0,
+            "backpressure_wait_seconds": 0.0,
+        }
+        _live_stores.add(self)
+
+    def __getattr__(self, name: str):
+        # 只有找不到的属性才会进入这里, 例如 file_writer 或平台特有的 store_contact/store_dynamic
+        attr = getattr(self.backend, name)
+        if name.startswith("store_") and callable(attr):
+            async def enqueue_call(*args, **kwargs):
+                await self._put((_KIND_CALL, (name, args, kwargs)))
+            return enqueue_call
+        return attr
+
+    async def store_content(self, content_item: Dict):
+        await self._put((_KIND_CONTENT, content_item))
+
+    async def store_comment(self, comment_item: Dict):
+        await self._put((_KIND_COMMENT, comment_item))
+
+    async def store_contents(self, content_items: List[Dict]):
+        for content_item in content_items:
+            await self._put((_KIND_CONTENT, content_item))
+
+    async def store_comments(self, comment_items: List[Dict]):
+        for comment_item in comment_items:
+            await self._put((_KIND_COMMENT, comment_item))
+
+    async def store_creator(self, creator: Dict):
+        await self._put((_KIND_CREATOR, creator))
+
+    def written(self) -> asyncio.Future:
+        """
+        future resolved once every record enqueued so far has been handled by a writer:
+        True when they were all written, False when any of them failed or the store closed first
+        """
+        future = asyncio.get_running_loop().create_future()
+        if self._done_upto >= self._next_seq:
+            future.set_result(not self._failed_before(self._next_seq))
+        else:
+            self._barriers.append((self._next_seq, future))
+        return future
+
+    def _failed_before(self, seq: int) -> bool:
+        return any(failed_seq < seq for failed_seq in self._failed_seqs)
+
+    def _mark_done(self, seqs: List[int], ok: bool):
+        self._done_seqs.update(seqs)
+        if not ok:
+            self._failed_seqs.extend(seqs)
+        while self._done_upto in self._done_seqs:
+            self._done_seqs.remove(self._done_upto)
+            self._done_upto += 1
+        barriers = []
+        for target, future in self._barriers:
+            if target > self._done_upto:
+                barriers.append((target, future))
+            elif not future.done():
+                future.set_result(not self._failed_before(target))
+        self._barriers = barriers
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        queue metrics: current depth, peak depth, records written/failed and time spent blocked on a full queue
+        """
+        return dict(self._metrics, depth=self._queue.qsize(), max_size=self.max_size)
+
+    def _raise_failures(self):
+        if not self._failed_records:
+            return
+        records, self._failed_records = self._failed_records, []
+        count = sum(len(payloads) for _, payloads in records)
+        raise StoreWriteError(f"{count} record(s) were not written: {self._last_error}", records) from self._last_error
+
+    async def _put(self, record: Tuple[str, Any]):
+        self._raise_failures()
+        self._ensure_workers()
+        record = (self._next_seq, *record)
+        self._next_seq += 1
+        if self._queue.full():
+            self._metrics["backpressure_waits"] += 1
+            wait_start = time.monotonic()
+            await self._queue.put(record)
+            self._metrics["backpressure_wait_seconds"] += time.monotonic() - wait_start
+        else:
+            self._queue.put_nowait(record)
+        self._metrics["enqueued"] += 1
+        self._metrics["max_depth"] = max(self._metrics["max_depth"], self._queue.qsize())
+
+    def _ensure_workers(self):
+        if self._worker_tasks:
+            return
+        for _ in range(self.workers):
+            self._worker_tasks.append(asyncio.create_task(self._worker()))
+
+    async def _worker(self):
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                await self._write_batch(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _write_batch(self, batch: List[Tuple[int, str, Any]]):
+        """
+        write a batch keeping the enqueue order, consecutive contents/comments go through one bulk call
+        """
+        self._metrics["batches"] += 1
+        start = 0
+        while start < len(batch):
+            kind = batch[start][1]
+            end = start + 1
+            if kind in (_KIND_CONTENT, _KIND_COMMENT):
+                while end < len(batch) and batch[end][1] == kind:
+                    end += 1
+            seqs = [seq for seq, _, _ in batch[start:end]]
+            payloads = [payload for _, _, payload in batch[start:end]]
+            try:
+                if kind == _KIND_CONTENT:
+                    await self.backend.store_contents(payloads)
+                elif kind == _KIND_COMMENT:
+                    await self.backend.store_comments(payloads)
+                elif kind == _KIND_CREATOR:
+                    await self.backend.store_creator(payloads[0])
+                else:
+                    name, args, kwargs = payloads[0]
+                    await getattr(self.backend, name)(*args, **kwargs)
+                self._metrics["written"] += len(payloads)
+                self._mark_done(seqs, True)
+            except Exception as e:
+                self._metrics["failed"] += len(payloads)
+                self._failed_records.append((kind, payloads))
+                self._last_error = e
+                utils.logger.error(f"[WriteBehindStore._write_batch] write {len(payloads)} {kind} record(s) failed: {e}")
+                self._mark_done(seqs, False)
+            start = end
+
+    async def drain(self):
+        """
+        wait until every queued record has been written, raise StoreWriteError if any write failed
+        """
+        if self._worker_tasks:
+            await self._queue.join()
+        self._raise_failures()
+
+    async def close(self):
+        """
+        drain the queue, stop the writer tasks and close the backend store;
+        failed writes are raised as StoreWriteError after the backend is closed
+        """
+        try:
+            await self.drain()
+        finally:
+            _live_stores.discard(self)
+            for _, future in self._barriers:
+                if not future.done():
+                    future.set_result(False)
+            self._barriers = []
+            for task in self._worker_tasks:
+                task.cancel()
+            await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+            self._worker_tasks = []
+            utils.logger.info(f"[WriteBehindStore.close] store queue stats: {self.stats()}")
+            await self.backend.close()
+
+
+def pending_writes() -> List[asyncio.Future]:
+    """
+    written() futures of every open store queue, see WriteBehindStore.written
+    """
+    return [store.written() for store in list(_live_stores)]
+
+
+def wrap_store(store: Optional[AbstractStore]) -> Optional[AbstractStore]:
+    """
+    Put the store behind a write queue when config.ENABLE_STORE_QUEUE is on
+    Args:
+        store: store backend created by a StoreFactory
+
+    Returns:
+        WriteBehindStore wrapping the backend, or the backend itself
+    """
+    if store is None or not config.ENABLE_STORE_QUEUE or isinstance(store, WriteBehindStore):
+        return store
+    return WriteBehindStore(store)
@@ -12,9 +12,11 @@
 # @Author  : relakkes@gmail.com
 # @Time    : 2024/1/14 17:34
 # @Desc    :
-from typing import List
+from typing import Dict, List, Optional
 
 import config
+from store.write_behind import wrap_store
+from tools.crawl_state import content_already_crawled, flush_crawl_state, remember_crawled_content
 from var import source_keyword_var
 
 from .xhs_store_media import *
@@ -27,6 +29,7 @@ class XhsStoreFactory:
         "db": XhsDbStoreImplement,
         "json": XhsJsonStoreImplement,
         "sqlite": XhsSqliteStoreImplement,
+        "parquet": XhsParquetStoreImplement,
     }
 
     # 🔥 全局输出目录设置
@@ -41,9 +44,9 @@ class XhsStoreFactory:
         XhsStoreFactory._output_dir = output_dir
 
     @staticmethod
-    def reset_store():
-        """重置store实例，开始新的采集"""
-        XhsStoreFactory._current_store = None
+    async def reset_store():
+        """重置store实例，开始新的采集; 先关闭当前实例, 写入队列和缓冲中的数据不会丢失"""
+        await XhsStoreFactory.close_store()
         print(f"🔄 已重置Store实例，准备创建新文件")
 
     @staticmethod
@@ -54,16 +57,28 @@ class XhsStoreFactory:
 
         store_class = XhsStoreFactory.STORES.get(config.SAVE_DATA_OPTION)
         if not store_class:
-            raise ValueError("[XhsStoreFactory.create_store] Invalid save option only supported csv or db or json or sqlite ...")
+            raise ValueError("[XhsStoreFactory.create_store] Invalid save option only supported csv or db or json or sqlite or parquet ...")
 
         # 🔥 如果是CSV或JSON存储，传递output_dir参数
-        if config.SAVE_DATA_OPTION in ["csv", "json"]:
+        if config.SAVE_DATA_OPTION in ["csv", "json", "parquet"]:
             XhsStoreFactory._current_store = store_class(output_dir=XhsStoreFactory._output_dir)
         else:
             XhsStoreFactory._current_store = store_class()
 
+        # 写入队列开启时, 存储操作由后台任务批量执行
+        XhsStoreFactory._current_store = wrap_store(XhsStoreFactory._current_store)
         return XhsStoreFactory._current_store
 
+    @staticmethod
+    async def close_store():
+        """关闭当前store实例，将缓冲中的数据写入磁盘，采集结束时调用"""
+        if XhsStoreFactory._current_store is not None:
+            store, XhsStoreFactory._current_store = XhsStoreFactory._current_store, None
+            await store.close()
+        if config.ENABLE_INCREMENTAL_CRAWL:
+            # 队列已写完, 提交本次保存的内容ID
+            await flush_crawl_state()
+
 
 def get_video_url_arr(note_item: Dict) -> List:
     """
@@ -136,8 +151,12 @@ async def update_xhs_note(note_item: Dict):
         "source_keyword": source_keyword_var.get(),  # 搜索关键词
         "xsec_token": note_item.get("xsec_token"),  # xsec_token
     }
+    if await content_already_crawled("xhs", note_id):
+        utils.logger.info(f"[store.xhs.update_xhs_note] xhs note id:{note_id} already stored by a previous crawl, skip")
+        return
     utils.logger.info(f"[store.xhs.update_xhs_note] xhs note: {local_db_item}")
     await XhsStoreFactory.create_store().store_content(local_db_item)
+    remember_crawled_content("xhs", note_id)
 
 
 async def batch_update_xhs_note_comments(note_id: str, comments: List[Dict]):
@@ -152,8 +171,9 @@ async def batch_update_xhs_note_comments(note_id: str, comments: List[Dict]):
     """
     if not comments:
         return
-    for comment_item in comments:
-        await update_xhs_note_comment(note_id, comment_item)
+    # 整批交给store, db存储时一条语句批量写入
+    save_items = [_build_xhs_note_comment_item(note_id, comment_item) for comment_item in comments]
+    await XhsStoreFactory.create_store().store_comments([item for item in save_items if item])
 
 
 async def update_xhs_note_comment(note_id: str, comment_item: Dict):
@@ -166,6 +186,12 @@ async def update_xhs_note_comment(note_id: str, comment_item: Dict):
     Returns:
 
     """
+    save_item = _build_xhs_note_comment_item(note_id, comment_item)
+    if save_item:
+        await XhsStoreFactory.create_store().store_comment(save_item)
+
+
+def _build_xhs_note_comment_item(note_id: str, comment_item: Dict) -> Optional[Dict]:
     user_info = comment_item.get("user_info", {})
     comment_id = comment_item.get("id")
     comment_pictures = [item.get("url_default", "") for item in comment_item.get("pictures", [])]
@@ -186,7 +212,7 @@ async def update_xhs_note_comment(note_id: str, comment_item: Dict):
         "like_count": comment_item.get("like_count", 0),
     }
     utils.logger.info(f"[store.xhs.update_xhs_note_comment] xhs note comment:{local_db_item}")
-    await XhsStoreFactory.create_store().store_comment(local_db_item)
+    return local_db_item
 
 
 async def save_creator(user_id: str, creator: Dict):
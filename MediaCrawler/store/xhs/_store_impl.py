@@ -12,7 +12,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from base.base_crawler import AbstractStore
-from database.db_session import get_session
+from database.db_session import bulk_upsert, get_session
 from database.models import XhsNote, XhsNoteComment, XhsCreator
 
 from tools.async_file_writer import AsyncFileWriter
@@ -51,6 +51,12 @@ class XhsCsvStoreImplement(AbstractStore):
     def flush(self):
         pass
 
+    async def close(self):
+        """
+        flush buffered data and close the output files
+        """
+        await self.writer.close()
+
 
 class XhsJsonStoreImplement(AbstractStore):
     def __init__(self, output_dir: str = None):
@@ -87,6 +93,12 @@ class XhsJsonStoreImplement(AbstractStore):
         """
         pass
 
+    async def close(self):
+        """
+        flush buffered data and close the output files
+        """
+        await self.writer.close()
+
 
 
 class XhsDbStoreImplement(AbstractStore):
@@ -104,9 +116,13 @@ class XhsDbStoreImplement(AbstractStore):
                 await self.add_content(session, content_item)
 
     async def add_content(self, session: AsyncSession, content_item: Dict):
+        session.add(XhsNote(**self._content_row(content_item)))
+
+    @staticmethod
+    def _content_row(content_item: Dict) -> Dict:
         add_ts = int(get_current_timestamp())
         last_modify_ts = int(get_current_timestamp())
-        note = XhsNote(
+        return dict(
             user_id=content_item.get("user_id"),
             nickname=content_item.get("nickname"),
             avatar=content_item.get("avatar"),
@@ -130,7 +146,16 @@ class XhsDbStoreImplement(AbstractStore):
             source_keyword=content_item.get("source_keyword", ""),
             xsec_token=content_item.get("xsec_token", "")
         )
-        session.add(note)
+
+    async def store_contents(self, content_items: List[Dict]):
+        """
+        批量写入笔记, 已存在的笔记只更新互动数据(与 update_content 一致)
+        """
+        rows = [self._content_row(item) for item in content_items if item.get("note_id")]
+        async with get_session() as session:
+            await bulk_upsert(session, XhsNote, rows, "note_id", update_columns=[
+                "last_modify_ts", "liked_count", "collected_count", "comment_count", "share_count", "last_update_time",
+            ])
 
     async def update_content(self, session: AsyncSession, content_item: Dict):
         note_id = content_item.get("note_id")
@@ -164,9 +189,13 @@ class XhsDbStoreImplement(AbstractStore):
                 await self.add_comment(session, comment_item)
 
     async def add_comment(self, session: AsyncSession, comment_item: Dict):
+        session.add(XhsNoteComment(**self._comment_row(comment_item)))
+
+    @staticmethod
+    def _comment_row(comment_item: Dict) -> Dict:
         add_ts = int(get_current_timestamp())
         last_modify_ts = int(get_current_timestamp())
-        comment = XhsNoteComment(
+        return dict(
             user_id=comment_item.get("user_id"),
             nickname=comment_item.get("nickname"),
             avatar=comment_item.get("avatar"),
@@ -182,7 +211,16 @@ class XhsDbStoreImplement(AbstractStore):
             parent_comment_id=comment_item.get("parent_comment_id"),
             like_count=str(comment_item.get("like_count"))
         )
-        session.add(comment)
+
+    async def store_comments(self, comment_items: List[Dict]):
+        """
+        批量写入一页评论, 已存在的评论只更新点赞数和子评论数(与 update_comment 一致)
+        """
+        rows = [self._comment_row(item) for item in comment_items if item and item.get("comment_id")]
+        async with get_session() as session:
+            await bulk_upsert(session, XhsNoteComment, rows, "comment_id", update_columns=[
+                "last_modify_ts", "like_count", "sub_comment_count",
+            ])
 
     async def update_comment(self, session: AsyncSession, comment_item: Dict):
         comment_id = comment_item.get("comment_id")
@@ -266,3 +304,51 @@ class XhsDbStoreImplement(AbstractStore):
 class XhsSqliteStoreImplement(XhsDbStoreImplement):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
+
+
+class XhsParquetStoreImplement(AbstractStore):
+    def __init__(self, output_dir: str = None):
+        self.writer = AsyncFileWriter(
+            platform="xhs",
+            crawler_type=crawler_type_var.get(),
+            output_dir=output_dir
+        )
+
+    async def store_content(self, content_item: Dict):
+        """
+        content Parquet storage implementation
+        Args:
+            content_item:
+
+        Returns:
+
+        """
+        await self.writer.write_to_parquet(item=content_item, item_type="contents", model=XhsNote)
+
+    async def store_comment(self, comment_item: Dict):
+        """
+        comment Parquet storage implementation
+        Args:
+            comment_item:
+
+        Returns:
+
+        """
+        await self.writer.write_to_parquet(item=comment_item, item_type="comments", model=XhsNoteComment)
+
+    async def store_creator(self, creator_item: Dict):
+        """
+        creator Parquet storage implementation
+        Args:
+            creator_item:
+
+        Returns:
+
+        """
+        await self.writer.write_to_parquet(item=creator_item, item_type="creators", model=XhsCreator)
+
+    async def close(self):
+        """
+        write the buffered rows and the parquet footers
+        """
+        await self.writer.close()
@@ -49,6 +49,20 @@ class XiaoHongShuImage(AbstractStoreImage):
         """
         return f"{self.image_store_path}/{notice_id}/{extension_file_name}"
 
+    def prepare_save_file_name(self, notice_id: str, extension_file_name: str) -> str:
+        """
+        create the directory and return the file path, used when the image is streamed straight to disk
+
+        Args:
+            notice_id: notice id
+            extension_file_name: image filename with extension
+
+        Returns:
+
+        """
+        pathlib.Path(self.image_store_path + "/" + notice_id).mkdir(parents=True, exist_ok=True)
+        return self.make_save_file_name(notice_id, extension_file_name)
+
     async def save_image(self, notice_id: str, pic_content: str, extension_file_name):
         """
         save image to local
@@ -96,6 +110,20 @@ class XiaoHongShuVideo(AbstractStoreVideo):
         """
         return f"{self.video_store_path}/{notice_id}/{extension_file_name}"
 
+    def prepare_save_file_name(self, notice_id: str, extension_file_name: str) -> str:
+        """
+        create the directory and return the file path, used when the video is streamed straight to disk
+
+        Args:
+            notice_id: notice id
+            extension_file_name: video filename with extension
+
+        Returns:
+
+        """
+        pathlib.Path(self.video_store_path + "/" + notice_id).mkdir(parents=True, exist_ok=True)
+        return self.make_save_file_name(notice_id, extension_file_name)
+
     async def save_video(self, notice_id: str, video_content: str, extension_file_name):
         """
         save video to local
@@ -10,14 +10,16 @@
 
 
 # -*- coding: utf-8 -*-
-from typing import List
+from typing import Dict, List, Optional
 
 import config
+from store.write_behind import wrap_store
 from base.base_crawler import AbstractStore
 from model.m_zhihu import ZhihuComment, ZhihuContent, ZhihuCreator
 from ._store_impl import (ZhihuCsvStoreImplement,
                                           ZhihuDbStoreImplement,
                                           ZhihuJsonStoreImplement,
+                                          ZhihuParquetStoreImplement,
                                           ZhihuSqliteStoreImplement)
 from tools import utils
 from var import source_keyword_var
@@ -28,15 +30,32 @@ class ZhihuStoreFactory:
         "csv": ZhihuCsvStoreImplement,
         "db": ZhihuDbStoreImplement,
         "json": ZhihuJsonStoreImplement,
-        "sqlite": ZhihuSqliteStoreImplement
+        "sqlite": ZhihuSqliteStoreImplement,
+        "parquet": ZhihuParquetStoreImplement,
     }
 
+    # 当前采集的store实例（确保同一次采集使用同一个文件）
+    _current_store = None
+
     @staticmethod
     def create_store() -> AbstractStore:
+        if ZhihuStoreFactory._current_store is not None:
+            return ZhihuStoreFactory._current_store
+
         store_class = ZhihuStoreFactory.STORES.get(config.SAVE_DATA_OPTION)
         if not store_class:
-            raise ValueError("[ZhihuStoreFactory.create_store] Invalid save option only supported csv or db or json or sqlite ...")
-        return store_class()
+            raise ValueError("[ZhihuStoreFactory.create_store] Invalid save option only supported csv or db or json or sqlite or parquet ...")
+        ZhihuStoreFactory._current_store = store_class()
+        # 写入队列开启时, 存储操作由后台任务批量执行
+        ZhihuStoreFactory._current_store = wrap_store(ZhihuStoreFactory._current_store)
+        return ZhihuStoreFactory._current_store
+
+    @staticmethod
+    async def close_store():
+        """关闭当前store实例，将缓冲中的数据写入磁盘，采集结束时调用"""
+        if ZhihuStoreFactory._current_store is not None:
+            store, ZhihuStoreFactory._current_store = ZhihuStoreFactory._current_store, None
+            await store.close()
 
 async def batch_update_zhihu_contents(contents: List[ZhihuContent]):
     """
@@ -50,8 +69,9 @@ async def batch_update_zhihu_contents(contents: List[ZhihuContent]):
     if not contents:
         return
 
-    for content_item in contents:
-        await update_zhihu_content(content_item)
+    # 整批交给store, db存储时一条语句批量写入
+    save_items = [_build_zhihu_content_item(content_item) for content_item in contents]
+    await ZhihuStoreFactory.create_store().store_contents([item for item in save_items if item])
 
 async def update_zhihu_content(content_item: ZhihuContent):
     """
@@ -62,11 +82,17 @@ async def update_zhihu_content(content_item: ZhihuContent):
     Returns:
 
     """
+    save_item = _build_zhihu_content_item(content_item)
+    if save_item:
+        await ZhihuStoreFactory.create_store().store_content(save_item)
+
+
+def _build_zhihu_content_item(content_item: ZhihuContent) -> Optional[Dict]:
     content_item.source_keyword = source_keyword_var.get()
     local_db_item = content_item.model_dump()
     local_db_item.update({"last_modify_ts": utils.get_current_timestamp()})
     utils.logger.info(f"[store.zhihu.update_zhihu_content] zhihu content: {local_db_item}")
-    await ZhihuStoreFactory.create_store().store_content(local_db_item)
+    return local_db_item
 
 
 
@@ -82,8 +108,9 @@ async def batch_update_zhihu_note_comments(comments: List[ZhihuComment]):
     if not comments:
         return
     
-    for comment_item in comments:
-        await update_zhihu_content_comment(comment_item)
+    # 整批交给store, db存储时一条语句批量写入
+    save_items = [_build_zhihu_content_comment_item(comment_item) for comment_item in comments]
+    await ZhihuStoreFactory.create_store().store_comments([item for item in save_items if item])
 
 
 async def update_zhihu_content_comment(comment_item: ZhihuComment):
@@ -95,10 +122,16 @@ async def update_zhihu_content_comment(comment_item: ZhihuComment):
     Returns:
 
     """
+    save_item = _build_zhihu_content_comment_item(comment_item)
+    if save_item:
+        await ZhihuStoreFactory.create_store().store_comment(save_item)
+
+
+def _build_zhihu_content_comment_item(comment_item: ZhihuComment) -> Optional[Dict]:
     local_db_item = comment_item.model_dump()
     local_db_item.update({"last_modify_ts": utils.get_current_timestamp()})
     utils.logger.info(f"[store.zhihu.update_zhihu_note_comment] zhihu content comment:{local_db_item}")
-    await ZhihuStoreFactory.create_store().store_comment(local_db_item)
+    return local_db_item
 
 
 async def save_creator(creator: ZhihuCreator):
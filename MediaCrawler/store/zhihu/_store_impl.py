@@ -18,7 +18,7 @@ import csv
 import json
 import os
 import pathlib
-from typing import Dict
+from typing import Dict, List
 
 import aiofiles
 from sqlalchemy import select
@@ -26,7 +26,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 import config
 from base.base_crawler import AbstractStore
-from database.db_session import get_session
+from database.db_session import bulk_upsert, get_session
 from database.models import ZhihuContent, ZhihuComment, ZhihuCreator
 from tools import utils, words
 from var import crawler_type_var
@@ -85,6 +85,12 @@ class ZhihuCsvStoreImplement(AbstractStore):
         """
         await self.writer.write_to_csv(item_type="creators", item=creator)
 
+    async def close(self):
+        """
+        flush buffered data and close the output files
+        """
+        await self.writer.close()
+
 
 class ZhihuDbStoreImplement(AbstractStore):
     async def store_content(self, content_item: Dict):
@@ -125,6 +131,24 @@ class ZhihuDbStoreImplement(AbstractStore):
                 session.add(new_comment)
             await session.commit()
 
+    async def store_contents(self, content_items: List[Dict]):
+        """
+        Zhihu content DB batch storage implementation, one bulk upsert per batch
+        Args:
+            content_items: content item dict list
+        """
+        async with get_session() as session:
+            await bulk_upsert(session, ZhihuContent, content_items, "content_id")
+
+    async def store_comments(self, comment_items: List[Dict]):
+        """
+        Zhihu comment DB batch storage implementation, one bulk upsert per batch
+        Args:
+            comment_items: comment item dict list
+        """
+        async with get_session() as session:
+            await bulk_upsert(session, ZhihuComment, comment_items, "comment_id")
+
     async def store_creator(self, creator: Dict):
         """
         Zhihu content DB storage implementation
@@ -183,9 +207,60 @@ class ZhihuJsonStoreImplement(AbstractStore):
         """
         await self.writer.write_single_item_to_json(item_type="creators", item=creator)
 
+    async def close(self):
+        """
+        flush buffered data and close the output files
+        """
+        await self.writer.close()
+
 
 class ZhihuSqliteStoreImplement(ZhihuDbStoreImplement):
     """
     Zhihu content SQLite storage implementation
     """
     pass
+
+
+class ZhihuParquetStoreImplement(AbstractStore):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.writer = AsyncFileWriter(platform="zhihu", crawler_type=crawler_type_var.get())
+
+    async def store_content(self, content_item: Dict):
+        """
+        content Parquet storage implementation
+        Args:
+            content_item:
+
+        Returns:
+
+        """
+        await self.writer.write_to_parquet(item=content_item, item_type="contents", model=ZhihuContent)
+
+    async def store_comment(self, comment_item: Dict):
+        """
+        comment Parquet storage implementation
+        Args:
+            comment_item:
+
+        Returns:
+
+        """
+        await self.writer.write_to_parquet(item=comment_item, item_type="comments", model=ZhihuComment)
+
+    async def store_creator(self, creator: Dict):
+        """
+        creator Parquet storage implementation
+        Args:
+            creator:
+
+        Returns:
+
+        """
+        await self.writer.write_to_parquet(item=creator, item_type="creators", model=ZhihuCreator)
+
+    async def close(self):
+        """
+        write the buffered rows and the parquet footers
+        """
+        await self.writer.close()
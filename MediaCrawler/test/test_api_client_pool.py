@@ -0,0 +1,93 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+from unittest import IsolatedAsyncioTestCase
+
+import httpx
+
+from base.base_crawler import AbstractApiClient
+
+
+class DummyClient(AbstractApiClient):
+
+    def __init__(self, proxy=None):
+        self.proxy = proxy
+        self.timeout = 10
+
+    async def request(self, method, url, **kwargs):
+        pass
+
+    async def update_cookies(self, browser_context):
+        pass
+
+
+class TestApiClientPool(IsolatedAsyncioTestCase):
+
+    async def test_client_is_reused(self):
+        client = DummyClient()
+        http_client = client.get_http_client()
+        self.assertIs(client.get_http_client(), http_client)
+        self.assertEqual(http_client.timeout.read, 10)
+        await client.aclose()
+        self.assertTrue(http_client.is_closed)
+
+    async def test_proxy_switch_rebuilds_pool(self):
+        client = DummyClient(proxy="http://127.0.0.1:8001")
+        first = client.get_http_client()
+        client.proxy = "http://127.0.0.1:8002"
+        second = client.get_http_client()
+        self.assertIsNot(first, second)
+        # 切换代理时旧连接池不立即关闭, 避免中断仍在进行的请求
+        self.assertFalse(first.is_closed)
+
+        await client.aclose()
+        self.assertTrue(first.is_closed)
+        self.assertTrue(second.is_closed)
+
+    async def test_retired_pool_closed_after_last_request(self):
+        client = DummyClient(proxy="http://127.0.0.1:8001")
+        async with client.use_http_client() as first:
+            client.proxy = "http://127.0.0.1:8002"
+            async with client.use_http_client() as second:
+                self.assertIsNot(first, second)
+            # 旧连接池上还有请求在进行
+            self.assertFalse(first.is_closed)
+        self.assertTrue(first.is_closed)
+        self.assertFalse(second.is_closed)
+        self.assertEqual(client._retired_http_clients, [])
+
+        # 切换时旧连接池空闲, 下一个请求结束后即关闭
+        client.proxy = "http://127.0.0.1:8003"
+        async with client.use_http_client() as third:
+            self.assertFalse(second.is_closed)
+        self.assertTrue(second.is_closed)
+        self.assertFalse(third.is_closed)
+        await client.aclose()
+
+    async def test_response_cookies_are_not_kept(self):
+        client = DummyClient()
+        http_client = client.get_http_client()
+        http_client._transport = httpx.MockTransport(
+            lambda request: httpx.Response(200, headers={"Set-Cookie": "sid=server; Path=/"}, text=request.headers.get("Cookie", ""))
+        )
+        await http_client.get("https://api.test/a")
+        response = await http_client.get("https://api.test/b")
+        self.assertEqual(response.text, "")
+        response = await http_client.get("https://api.test/c", headers={"Cookie": "sid=mine"})
+        self.assertEqual(response.text, "sid=mine")
+        await client.aclose()
+
+    async def test_clients_do_not_share_pool(self):
+        a, b = DummyClient(), DummyClient()
+        self.assertIsNot(a.get_http_client(), b.get_http_client())
+        await a.aclose()
+        await b.aclose()
@@ -0,0 +1,206 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+import asyncio
+import csv
+import gzip
+import io
+import json
+import os
+import tempfile
+from unittest import IsolatedAsyncioTestCase
+
+import pyarrow.parquet as pq
+import zstandard
+
+from database.models import DouyinAwemeComment
+from tools.async_file_writer import AsyncFileWriter
+
+
+class TestAsyncFileWriter(IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.writer = AsyncFileWriter(platform="douyin", crawler_type="search", output_dir=self.tmp_dir.name)
+
+    async def asyncTearDown(self):
+        await self.writer.close()
+        self.tmp_dir.cleanup()
+
+    async def test_json_stream_matches_full_dump(self):
+        items = [{"comment_id": str(i), "content": f"评论{i}", "pictures": ["a", "b"]} for i in range(5)]
+        for item in items:
+            await self.writer.write_single_item_to_json(item, "comments")
+            # 每次写入后文件都应是合法的JSON数组
+            file_path = self.writer.get_file_paths()["json_comments"]
+            with open(file_path, encoding="utf-8") as f:
+                self.assertIsInstance(json.load(f), list)
+
+        with open(file_path, encoding="utf-8") as f:
+            content = f.read()
+        self.assertEqual(content, json.dumps(items, ensure_ascii=False, indent=4))
+
+    async def test_json_stream_appends_to_existing_file(self):
+        await self.writer.write_single_item_to_json({"id": 1}, "contents")
+        file_path = self.writer.get_file_paths()["json_contents"]
+        await self.writer.close()
+
+        # 重新打开句柄后继续追加
+        await self.writer.write_single_item_to_json({"id": 2}, "contents")
+        with open(file_path, encoding="utf-8") as f:
+            self.assertEqual(json.load(f), [{"id": 1}, {"id": 2}])
+
+    async def test_json_existing_file_is_replaced_atomically(self):
+        file_path = os.path.join(self.tmp_dir.name, "contents.json")
+        self.writer.file_paths["json_contents"] = file_path
+        with open(file_path, "w", encoding="utf-8") as f:
+            f.write('[{"id": 1}]')
+
+        await self.writer.write_single_item_to_json({"id": 2}, "contents")
+        with open(file_path, encoding="utf-8") as f:
+            self.assertEqual(json.load(f), [{"id": 1}, {"id": 2}])
+        self.assertFalse(os.path.exists(file_path + ".tmp"))
+
+    async def test_json_invalid_file_is_kept_as_backup(self):
+        file_path = os.path.join(self.tmp_dir.name, "contents.json")
+        self.writer.file_paths["json_contents"] = file_path
+        with open(file_path, "w", encoding="utf-8") as f:
+            f.write('[{"id": 1},')
+
+        await self.writer.write_single_item_to_json({"id": 2}, "contents")
+        with open(file_path, encoding="utf-8") as f:
+            self.assertEqual(json.load(f), [{"id": 2}])
+        with open(file_path + ".bak", encoding="utf-8") as f:
+            self.assertEqual(f.read(), '[{"id": 1},')
+
+    async def test_csv_buffered_until_flush(self):
+        self.writer.csv_flush_rows = 3
+        self.writer.csv_flush_interval = 3600
+        for i in range(2):
+            await self.writer.write_to_csv({"comment_id": str(i), "content": f"评论{i}"}, "comments")
+        file_path = self.writer.get_file_paths()["csv_comments"]
+        with open(file_path, encoding="utf-8-sig", newline="") as f:
+            self.assertEqual(list(csv.reader(f)), [])
+
+        # 第三行达到 csv_flush_rows, 表头和三行数据一起写入
+        await self.writer.write_to_csv({"content": "评论2", "comment_id": "2", "extra": "x"}, "comments")
+        await self.writer.write_to_csv({"comment_id": "3", "content": "评论3"}, "comments")
+        await self.writer.close()
+        with open(file_path, encoding="utf-8-sig", newline="") as f:
+            rows = list(csv.reader(f))
+        # 表头按 column_orders 固定, 后续行使用同一表头
+        self.assertEqual(rows[0], ["content", "comment_id"])
+        self.assertEqual(rows[1:], [["评论0", "0"], ["评论1", "1"], ["评论2", "2"], ["评论3", "3"]])
+
+    async def test_csv_flushed_by_timer_without_new_rows(self):
+        self.writer.csv_flush_rows = 100
+        self.writer.csv_flush_interval = 0.05
+        await self.writer.write_to_csv({"comment_id": "1", "content": "评论1"}, "comments")
+        file_path = self.writer.get_file_paths()["csv_comments"]
+        await asyncio.sleep(0.2)
+        with open(file_path, encoding="utf-8-sig", newline="") as f:
+            self.assertEqual(list(csv.reader(f)), [["content", "comment_id"], ["评论1", "1"]])
+
+    async def test_csv_dropped_fields_are_logged_once(self):
+        with self.assertLogs("MediaCrawler", level="WARNING") as logs:
+            await self.writer.write_to_csv({"comment_id": "1"}, "comments")
+            await self.writer.write_to_csv({"comment_id": "2", "extra": "x"}, "comments")
+            await self.writer.write_to_csv({"comment_id": "3", "extra": "y"}, "comments")
+        self.assertEqual(len([line for line in logs.output if "'extra'" in line]), 1)
+
+    async def test_csv_reuses_existing_header(self):
+        await self.writer.write_to_csv({"user_id": "1", "nickname": "a"}, "creators")
+        file_path = self.writer.get_file_paths()["csv_creators"]
+        await self.writer.close()
+
+        await self.writer.write_to_csv({"nickname": "b", "user_id": "2"}, "creators")
+        await self.writer.close()
+        with open(file_path, encoding="utf-8-sig", newline="") as f:
+            rows = list(csv.reader(f))
+        self.assertEqual(rows, [["user_id", "nickname"], ["1", "a"], ["2", "b"]])
+
+    async def test_parquet_row_groups_and_typed_schema(self):
+        self.writer.parquet_row_group_size = 2
+        for i in range(5):
+            await self.writer.write_to_parquet(
+                {"comment_id": str(i), "content": f"评论{i}", "like_count": i, "video_title": "标题"},
+                "comments",
+                model=DouyinAwemeComment,
+            )
+        file_path = self.writer.get_file_paths()["parquet_comments"]
+        await self.writer.close()
+
+        parquet_file = pq.ParquetFile(file_path)
+        # 每2行一个 row group, close() 写入最后剩余的1行
+        self.assertEqual(parquet_file.num_row_groups, 3)
+        schema = parquet_file.schema_arrow
+        self.assertEqual(str(schema.field("comment_id").type), "int64")
+        self.assertEqual(str(schema.field("like_count").type), "string")
+        self.assertEqual(str(schema.field("video_title").type), "string")
+        self.assertNotIn("id", schema.names)
+        table = parquet_file.read()
+        self.assertEqual(table.column("comment_id").to_pylist(), [0, 1, 2, 3, 4])
+        self.assertEqual(table.column("like_count").to_pylist(), ["0", "1", "2", "3", "4"])
+
+    async def test_parquet_non_integer_values(self):
+        rows = [
+            {"comment_id": "1", "create_time": "3天前", "aweme_id": "10"},
+            {"comment_id": "2.0", "create_time": 1700000000, "aweme_id": "1.2万"},
+        ]
+        with self.assertLogs("MediaCrawler", level="WARNING") as logs:
+            for row in rows:
+                await self.writer.write_to_parquet(row, "comments", model=DouyinAwemeComment)
+            file_path = self.writer.get_file_paths()["parquet_comments"]
+            await self.writer.close()
+        self.assertTrue(any("aweme_id" in line and "1.2万" in line for line in logs.output))
+
+        table = pq.read_table(file_path)
+        # 首行不是整数的列保留为字符串, 之后出现的非整数值写为 null 并记录日志
+        self.assertEqual(str(table.schema.field("create_time").type), "string")
+        self.assertEqual(table.column("create_time").to_pylist(), ["3天前", "1700000000"])
+        self.assertEqual(table.column("comment_id").to_pylist(), [1, 2])
+        self.assertEqual(table.column("aweme_id").to_pylist(), [10, None])
+
+    async def _write_rotated_comments(self, count: int):
+        for i in range(count):
+            await self.writer.write_to_csv({"comment_id": str(i), "content": f"评论{i}"}, "comments")
+        base_path = self.writer.get_file_paths()["csv_comments"]
+        await self.writer.close()
+        with open(base_path[:-len(".csv")] + "_manifest.json", encoding="utf-8") as f:
+            return json.load(f)
+
+    async def test_csv_rotates_by_rows_with_zstd(self):
+        self.writer.csv_compression = "zstd"
+        self.writer.csv_rotate_max_rows = 2
+        self.writer.csv_flush_rows = 100
+        manifest = await self._write_rotated_comments(5)
+
+        self.assertEqual(manifest["total_rows"], 5)
+        self.assertEqual([part["rows"] for part in manifest["parts"]], [2, 2, 1])
+        self.assertTrue(manifest["parts"][0]["file"].endswith("_part0001.csv.zst"))
+        rows = []
+        for part in manifest["parts"]:
+            with open(os.path.join(self.tmp_dir.name, part["file"]), "rb") as f:
+                text = zstandard.ZstdDecompressor().stream_reader(f).read().decode("utf-8-sig")
+            part_rows = list(csv.reader(io.StringIO(text)))
+            # 每个分卷都带表头
+            self.assertEqual(part_rows[0], ["content", "comment_id"])
+            rows.extend(part_rows[1:])
+        self.assertEqual([row[1] for row in rows], ["0", "1", "2", "3", "4"])
+
+    async def test_csv_gzip_without_rotation(self):
+        self.writer.csv_compression = "gzip"
+        manifest = await self._write_rotated_comments(3)
+
+        self.assertEqual(len(manifest["parts"]), 1)
+        with gzip.open(os.path.join(self.tmp_dir.name, manifest["parts"][0]["file"]), "rt", encoding="utf-8-sig") as f:
+            self.assertEqual(len(list(csv.reader(f))), 4)
@@ -0,0 +1,154 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+import os
+import tempfile
+import threading
+from typing import Dict, List
+from unittest import IsolatedAsyncioTestCase, TestCase
+from unittest.mock import patch
+
+import httpx
+
+from cache.sqlite_cache import SqliteCache
+from media_platform.bilibili.client import BilibiliClient
+from media_platform.bilibili.exception import DataFetchError, TransientFetchError
+from media_platform.bilibili.help import (BilibiliSign, WbiKeyCache,
+                                          get_mixin_key, get_wbi_signer)
+
+IMG_KEY = "7cd084941338484aae1ad9425b84077c"
+SUB_KEY = "4932caff0ff746eab6f01bf08b70ac45"
+WBI_IMG_URLS = (f"https://i0.hdslb.com/bfs/wbi/{IMG_KEY}.png-"
+                f"https://i0.hdslb.com/bfs/wbi/{SUB_KEY}.png")
+
+
+class TestBilibiliSign(TestCase):
+
+    def test_mixin_key(self):
+        # 接口文档中的示例
+        self.assertEqual(get_mixin_key(IMG_KEY, SUB_KEY), "ea1db124af3c7062474693fa704f4ff8")
+        self.assertIs(get_wbi_signer(IMG_KEY, SUB_KEY), get_wbi_signer(IMG_KEY, SUB_KEY))
+
+    def test_sign(self):
+        signed = BilibiliSign(IMG_KEY, SUB_KEY).sign({"foo": "114", "bar": "514", "zab": 1919810}, current_ts=1702204169)
+        self.assertEqual(signed["wts"], "1702204169")
+        self.assertEqual(signed["w_rid"], "8f6f2b5b3d485fe1886cec6a0be8c5d4")
+        self.assertEqual(list(signed), ["bar", "foo", "wts", "zab", "w_rid"])
+
+    def test_sign_filters_value_chars(self):
+        sign = BilibiliSign(IMG_KEY, SUB_KEY)
+        self.assertEqual(sign.sign({"keyword": "a(b)!*'"}, current_ts=1)["keyword"], "ab")
+
+
+class FakePage:
+
+    def __init__(self, local_storage: Dict):
+        self.local_storage = local_storage
+        self.reads = 0
+
+    async def evaluate(self, expression: str, arg=None) -> Dict:
+        self.reads += 1
+        return self.local_storage
+
+
+class TestWbiKeyCache(IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.patch = patch.multiple("config", REQUEST_RETRY_BASE_DELAY_SEC=0, ENABLE_ADAPTIVE_RATE_LIMIT=False)
+        self.patch.start()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache = SqliteCache(os.path.join(self.tmp_dir.name, "cache.db"))
+
+    def tearDown(self):
+        self.patch.stop()
+        self.cache.close()
+        self.tmp_dir.cleanup()
+
+    def build_client(self, page, responses: List[Dict]) -> BilibiliClient:
+        client = BilibiliClient(headers={"User-Agent": "test"}, playwright_page=page, cookie_dict={})
+        client.wbi_key_cache = WbiKeyCache(self.cache, ttl_sec=60)
+        client.sent = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            client.sent.append(request)
+            return httpx.Response(200, json=responses.pop(0) if len(responses) > 1 else responses[0])
+
+        client._http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        return client
+
+    async def test_keys_are_read_from_page_once(self):
+        page = FakePage({"wbi_img_urls": WBI_IMG_URLS})
+        client = self.build_client(page, [{"code": 0, "data": {}}])
+        for mid in ("1", "2", "3"):
+            await client.get("/x/space/wbi/acc/info", {"mid": mid})
+        self.assertEqual(page.reads, 1)
+        self.assertEqual(len(client.sent), 3)
+        self.assertTrue(all("w_rid" in request.url.params for request in client.sent))
+
+        # 另一个进程通过共享的 cache 拿到密钥, 不需要浏览器页面
+        other = self.build_client(None, [{"code": 0, "data": {}}])
+        self.assertEqual(await other.get_wbi_keys(), (IMG_KEY, SUB_KEY))
+        self.assertEqual(other.sent, [])
+        await client.aclose()
+        await other.aclose()
+
+    async def test_keys_from_nav_api_without_page(self):
+        nav = {"code": 0, "data": {"wbi_img": {"img_url": f"https://i0.hdslb.com/bfs/wbi/{IMG_KEY}.png",
+                                               "sub_url": f"https://i0.hdslb.com/bfs/wbi/{SUB_KEY}.png"}}}
+        client = self.build_client(None, [nav])
+        self.assertEqual(await client.get_wbi_keys(), (IMG_KEY, SUB_KEY))
+        self.assertEqual(await client.get_wbi_keys(), (IMG_KEY, SUB_KEY))
+        self.assertEqual([request.url.path for request in client.sent], ["/x/web-interface/nav"])
+        await client.aclose()
+
+    async def test_ttl_expiry(self):
+        key_cache = WbiKeyCache(self.cache, ttl_sec=60)
+        await key_cache.set(IMG_KEY, SUB_KEY)
+        self.assertEqual(await WbiKeyCache(self.cache).get(), (IMG_KEY, SUB_KEY))
+        with patch("time.time", return_value=key_cache._expire_at + 1):
+            self.assertIsNone(await key_cache.get())
+
+    async def test_blocking_cache_runs_in_thread(self):
+        threads = []
+        cache = self.cache
+        get, set_ = cache.get, cache.set
+
+        def record(func):
+            def wrapper(*args):
+                threads.append(threading.get_ident())
+                return func(*args)
+            return wrapper
+
+        with patch.object(cache, "get", record(get)), patch.object(cache, "set", record(set_)):
+            key_cache = WbiKeyCache(cache, ttl_sec=60)
+            await key_cache.set(IMG_KEY, SUB_KEY)
+            self.assertEqual(await WbiKeyCache(cache).get(), (IMG_KEY, SUB_KEY))
+            await key_cache.invalidate()
+        self.assertEqual(len(threads), 3)
+        self.assertNotIn(threading.get_ident(), threads)
+
+    async def test_permanent_error_is_not_retried(self):
+        client = self.build_client(None, [{"code": -404, "message": "啥都木有"}])
+        with self.assertRaises(DataFetchError) as cm:
+            await client.get("/x/web-interface/view", {"aid": "1"}, enable_params_sign=False)
+        self.assertNotIsInstance(cm.exception, TransientFetchError)
+        self.assertEqual(len(client.sent), 1)
+        await client.aclose()
+
+    async def test_risk_control_invalidates_keys(self):
+        page = FakePage({"wbi_img_urls": WBI_IMG_URLS})
+        client = self.build_client(page, [{"code": -352, "message": "风控校验失败"}, {"code": 0, "data": {"ok": 1}}])
+        self.assertEqual(await client.get("/x/space/wbi/acc/info", {"mid": "1"}), {"ok": 1})
+        # 第一次签名和 -352 之后的重试各读取一次密钥
+        self.assertEqual(page.reads, 2)
+        self.assertEqual(len(client.sent), 2)
+        await client.aclose()
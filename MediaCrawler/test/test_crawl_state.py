@@ -0,0 +1,206 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+import asyncio
+import os
+import tempfile
+from typing import Dict, List
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import patch
+
+import store.douyin as douyin_store
+from base.base_crawler import AbstractStore
+from media_platform.douyin.client import DouYinClient
+from store.write_behind import StoreWriteError, WriteBehindStore
+from tools.crawl_state import CrawlStateStore, flush_crawl_state
+
+
+def make_pages(comment_ids: List[int], page_size: int = 3) -> Dict[int, Dict]:
+    """
+    douyin comment pages keyed by cursor, newest comments first
+    """
+    pages = {}
+    for cursor in range(0, len(comment_ids), page_size):
+        ids = comment_ids[cursor:cursor + page_size]
+        pages[cursor] = {
+            "comments": [{"cid": str(cid), "create_time": cid, "reply_comment_total": 0} for cid in ids],
+            "cursor": cursor + page_size,
+            "has_more": int(cursor + page_size < len(comment_ids)),
+        }
+    return pages
+
+
+class CommentStore(AbstractStore):
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.contents: List[Dict] = []
+        self.comments: List[Dict] = []
+        # 未 set 时写入会一直等待, 模拟慢速存储
+        self.gate = asyncio.Event()
+        self.gate.set()
+
+    async def store_content(self, content_item: Dict):
+        await self.gate.wait()
+        self.contents.append(content_item)
+
+    async def store_comment(self, comment_item: Dict):
+        await self.gate.wait()
+        if self.fail:
+            raise IOError("disk full")
+        self.comments.append(comment_item)
+
+    async def store_creator(self, creator: Dict):
+        pass
+
+
+class TestCrawlStateStore(IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.store = CrawlStateStore(os.path.join(self.tmp_dir.name, "crawl_state.db"))
+
+    def tearDown(self):
+        self.store.close()
+        self.tmp_dir.cleanup()
+
+    async def test_state_persists(self):
+        cursor = await self.store.comment_cursor("dy", "1", id_key="cid", ts_key="create_time")
+        self.assertEqual(cursor.start_cursor(0), 0)
+        self.assertTrue(await cursor.commit([{"cid": "a", "create_time": 5}], 20, has_more=True))
+        await flush_crawl_state()
+        self.store.close()
+
+        store = CrawlStateStore(self.store._db_path)
+        state = store.get_state("dy", "1")
+        self.assertEqual((state.last_cursor, state.newest_comment_ts, state.finished), ("20", 5, False))
+        self.assertGreater(state.last_crawl_ts, 0)
+        self.assertEqual(store.seen_ids("dy", "1", ["a", "b"]), {"a"})
+        self.assertEqual(store.seen_ids("xhs", "1", ["a"]), set())
+        store.close()
+
+    async def crawl(self, pages: Dict[int, Dict], max_count: int) -> List[str]:
+        client = DouYinClient(headers={}, playwright_page=None, cookie_dict={})
+        requested = []
+
+        async def get_aweme_comments(aweme_id, cursor=0):
+            requested.append(cursor)
+            return pages[cursor]
+
+        stored = []
+
+        async def callback(aweme_id, comments):
+            stored.extend(comment["cid"] for comment in comments)
+
+        client.get_aweme_comments = get_aweme_comments
+        with patch("config.ENABLE_INCREMENTAL_CRAWL", True), patch("tools.crawl_state._crawl_state_store", self.store):
+            await client.get_aweme_all_comments("7300", crawl_interval=0, callback=callback, max_count=max_count)
+            await flush_crawl_state()
+        self.requested = requested
+        return stored
+
+    async def test_resume_then_only_new_comments(self):
+        pages = make_pages([10, 9, 8, 7, 6, 5, 4])
+        # 第一次抓取达到上限, 截断在第二页中间
+        self.assertEqual(await self.crawl(pages, max_count=4), ["10", "9", "8", "7"])
+        # 第二次从第二页续抓, 跳过已保存的评论
+        self.assertEqual(await self.crawl(pages, max_count=10), ["6", "5", "4"])
+        self.assertEqual(self.requested, [3, 6])
+        self.assertTrue(self.store.get_state("dy", "7300").finished)
+
+        # 出现两条新评论: 从头抓取, 遇到整页已知评论即停止
+        pages = make_pages([12, 11, 10, 9, 8, 7, 6, 5, 4])
+        self.assertEqual(await self.crawl(pages, max_count=10), ["12", "11"])
+        self.assertEqual(self.requested, [0, 3])
+        self.assertEqual(self.store.get_state("dy", "7300").newest_comment_ts, 12)
+
+    async def test_disabled_by_default(self):
+        client = DouYinClient(headers={}, playwright_page=None, cookie_dict={})
+        pages = make_pages([3, 2, 1])
+
+        async def get_aweme_comments(aweme_id, cursor=0):
+            return pages[cursor]
+
+        client.get_aweme_comments = get_aweme_comments
+        with patch("tools.crawl_state._crawl_state_store", self.store):
+            for _ in range(2):
+                result = await client.get_aweme_all_comments("7300", crawl_interval=0, max_count=10)
+                self.assertEqual(len(result), 3)
+        self.assertIsNone(self.store.get_state("dy", "7300"))
+
+    async def test_pages_are_saved_once_written(self):
+        backend = CommentStore()
+        backend.gate.clear()
+        store = WriteBehindStore(backend, max_size=100, batch_size=10, workers=1)
+
+        async def callback(aweme_id, comments):
+            for comment in comments:
+                await store.store_comment(comment)
+
+        # 存储还没写入时抓取照常翻页, 状态暂不保存
+        await self.crawl_with(make_pages([6, 5, 4, 3, 2, 1]), callback)
+        self.assertEqual(backend.comments, [])
+        await asyncio.sleep(0.05)
+        self.assertIsNone(self.store.get_state("dy", "7300"))
+
+        backend.gate.set()
+        await store.close()
+        await flush_crawl_state()
+        self.assertTrue(self.store.get_state("dy", "7300").finished)
+        self.assertEqual(len(self.store.seen_ids("dy", "7300", [str(i) for i in range(1, 7)])), 6)
+
+    async def test_failed_write_leaves_comments_uncrawled(self):
+        store = WriteBehindStore(CommentStore(fail=True), max_size=100, batch_size=10, workers=1)
+
+        async def callback(aweme_id, comments):
+            for comment in comments:
+                await store.store_comment(comment)
+
+        await self.crawl_with(make_pages([3, 2, 1]), callback)
+        with self.assertRaises(StoreWriteError):
+            await store.close()
+        await flush_crawl_state()
+        self.assertIsNone(self.store.get_state("dy", "7300"))
+        self.assertEqual(self.store.seen_ids("dy", "7300", ["3", "2", "1"]), set())
+
+    async def crawl_with(self, pages: Dict[int, Dict], callback):
+        client = DouYinClient(headers={}, playwright_page=None, cookie_dict={})
+
+        async def get_aweme_comments(aweme_id, cursor=0):
+            return pages[cursor]
+
+        client.get_aweme_comments = get_aweme_comments
+        with patch("config.ENABLE_INCREMENTAL_CRAWL", True), patch("tools.crawl_state._crawl_state_store", self.store):
+            await client.get_aweme_all_comments("7300", crawl_interval=0, callback=callback, max_count=10)
+
+    async def test_stored_contents_are_skipped(self):
+        aweme = {"aweme_id": "7300", "desc": "first"}
+        with patch("config.ENABLE_INCREMENTAL_CRAWL", True), patch("tools.crawl_state._crawl_state_store", self.store), \
+                patch("tools.crawl_state._pending_contents", {}):
+            backend = CommentStore()
+            backend.gate.clear()
+            douyin_store.DouyinStoreFactory._current_store = WriteBehindStore(backend, max_size=100, batch_size=10, workers=1)
+            await douyin_store.update_douyin_aweme(aweme)
+            await douyin_store.update_douyin_aweme(aweme)
+            # 存储确认写入前不算已抓取
+            self.assertEqual(self.store.seen_content_ids("dy", ["7300"]), set())
+            backend.gate.set()
+            await douyin_store.DouyinStoreFactory.close_store()
+            self.assertEqual(len(backend.contents), 1)
+            self.assertEqual(self.store.seen_content_ids("dy", ["7300"]), {"7300"})
+
+            # 下一次抓取不再保存同一内容
+            backend = CommentStore()
+            douyin_store.DouyinStoreFactory._current_store = WriteBehindStore(backend, max_size=100, batch_size=10, workers=1)
+            await douyin_store.update_douyin_aweme(aweme)
+            await douyin_store.update_douyin_aweme({"aweme_id": "7301", "desc": "second"})
+            await douyin_store.DouyinStoreFactory.close_store()
+            self.assertEqual([content["aweme_id"] for content in backend.contents], ["7301"])
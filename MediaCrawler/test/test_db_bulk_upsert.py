@@ -0,0 +1,131 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+import os
+import tempfile
+from unittest import IsolatedAsyncioTestCase
+
+from sqlalchemy import inspect, select, text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from database.db_session import bulk_upsert, migrate_unique_indexes
+from database.models import Base, DouyinAwemeComment
+
+
+class TestBulkUpsert(IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.engine = create_async_engine("sqlite+aiosqlite://")
+        async with self.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+    async def asyncTearDown(self):
+        await self.engine.dispose()
+
+    async def _upsert(self, rows, **kwargs):
+        async with AsyncSession(self.engine) as session:
+            await bulk_upsert(session, DouyinAwemeComment, rows, "comment_id", **kwargs)
+            await session.commit()
+
+    async def _all_comments(self):
+        async with AsyncSession(self.engine) as session:
+            result = await session.execute(select(DouyinAwemeComment).order_by(DouyinAwemeComment.comment_id))
+            return result.scalars().all()
+
+    async def test_insert_then_update(self):
+        rows = [
+            {"comment_id": i, "aweme_id": 1, "content": f"评论{i}", "like_count": "0", "video_title": "不是表字段"}
+            for i in range(3)
+        ]
+        await self._upsert(rows)
+        comments = await self._all_comments()
+        self.assertEqual([c.comment_id for c in comments], [0, 1, 2])
+        add_ts = comments[0].add_ts
+        self.assertIsNotNone(add_ts)
+
+        await self._upsert([
+            {"comment_id": 0, "aweme_id": 1, "content": "评论0", "like_count": "9", "add_ts": add_ts + 1000},
+            {"comment_id": 3, "aweme_id": 1, "content": "评论3", "like_count": "1"},
+        ])
+        comments = await self._all_comments()
+        self.assertEqual([c.comment_id for c in comments], [0, 1, 2, 3])
+        self.assertEqual(comments[0].like_count, "9")
+        # 更新时保留首次入库时间
+        self.assertEqual(comments[0].add_ts, add_ts)
+
+    async def test_duplicates_in_batch_keep_last(self):
+        await self._upsert([
+            {"comment_id": 1, "content": "first"},
+            {"comment_id": 1, "content": "second"},
+        ])
+        comments = await self._all_comments()
+        self.assertEqual(len(comments), 1)
+        self.assertEqual(comments[0].content, "second")
+
+    async def test_update_columns_limits_overwrite(self):
+        await self._upsert([{"comment_id": 1, "content": "old", "like_count": "0"}])
+        await self._upsert([{"comment_id": 1, "content": "new", "like_count": "5"}], update_columns=["like_count"])
+        comments = await self._all_comments()
+        self.assertEqual(comments[0].content, "old")
+        self.assertEqual(comments[0].like_count, "5")
+
+    async def test_missing_columns_are_not_overwritten(self):
+        await self._upsert([{"comment_id": 1, "content": "old", "like_count": "3"}])
+        await self._upsert([
+            {"comment_id": 1, "like_count": "5"},
+            {"comment_id": 2, "content": "new", "like_count": "1"},
+        ])
+        comments = await self._all_comments()
+        self.assertEqual([(c.content, c.like_count) for c in comments], [("old", "5"), ("new", "1")])
+
+
+class TestUniqueIndexMigration(IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        db_path = os.path.join(self.tmp_dir.name, "legacy.db")
+        self.engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}")
+        # 旧版本建的表: comment_id 只有普通索引, 并且已有重复数据
+        async with self.engine.begin() as conn:
+            await conn.run_sync(DouyinAwemeComment.__table__.create)
+            await conn.execute(text("DROP INDEX ix_douyin_aweme_comment_comment_id"))
+            await conn.execute(text("CREATE INDEX ix_douyin_aweme_comment_comment_id ON douyin_aweme_comment (comment_id)"))
+            await conn.execute(text("INSERT INTO douyin_aweme_comment (comment_id, content) VALUES (1, 'a'), (1, 'b'), (2, 'c')"))
+
+    async def asyncTearDown(self):
+        await self.engine.dispose()
+        self.tmp_dir.cleanup()
+
+    async def test_bulk_upsert_requires_migration(self):
+        # 运行时不会隐式删除重复数据, 提示执行 --init_db
+        async with AsyncSession(self.engine) as session:
+            with self.assertRaisesRegex(RuntimeError, "--init_db sqlite"):
+                await bulk_upsert(session, DouyinAwemeComment, [{"comment_id": 1, "content": "new"}], "comment_id")
+            await session.rollback()
+            result = await session.execute(text("SELECT count(*) FROM douyin_aweme_comment"))
+            self.assertEqual(result.scalar(), 3)
+
+    async def test_migration_replaces_plain_index(self):
+        async with self.engine.begin() as conn:
+            await conn.run_sync(migrate_unique_indexes)
+            indexes = await conn.run_sync(lambda sync_conn: inspect(sync_conn).get_indexes("douyin_aweme_comment"))
+            comment_id_indexes = [(i["name"], i["unique"]) for i in indexes if i["column_names"] == ["comment_id"]]
+            # 旧的普通索引被替换成模型声明的唯一索引, 不会并存
+            self.assertEqual(comment_id_indexes, [("ix_douyin_aweme_comment_comment_id", 1)])
+            # 重复执行不会再次修改
+            await conn.run_sync(migrate_unique_indexes)
+
+        async with AsyncSession(self.engine) as session:
+            await bulk_upsert(session, DouyinAwemeComment, [{"comment_id": 1, "content": "new"}], "comment_id")
+            await session.commit()
+            result = await session.execute(text("SELECT comment_id, content FROM douyin_aweme_comment ORDER BY comment_id"))
+            self.assertEqual(result.all(), [(1, "new"), (2, "c")])
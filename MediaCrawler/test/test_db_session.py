@@ -0,0 +1,57 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+import os
+import tempfile
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import patch
+
+from sqlalchemy import text
+
+import config
+from database import db_session
+
+
+class TestDbSession(IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.patches = [
+            patch.object(config, "SAVE_DATA_OPTION", "sqlite"),
+            patch.dict(db_session.sqlite_db_config, {"db_path": os.path.join(self.tmp_dir.name, "test.db")}),
+        ]
+        for p in self.patches:
+            p.start()
+
+    async def asyncTearDown(self):
+        await db_session.dispose_engines()
+        for p in self.patches:
+            p.stop()
+        self.tmp_dir.cleanup()
+
+    async def test_session_factory_is_reused(self):
+        self.assertIs(db_session.get_session_factory(), db_session.get_session_factory())
+
+    async def test_sqlite_pragmas_applied_on_connect(self):
+        async with db_session.get_session() as session:
+            journal_mode = (await session.execute(text("PRAGMA journal_mode"))).scalar()
+            synchronous = (await session.execute(text("PRAGMA synchronous"))).scalar()
+            busy_timeout = (await session.execute(text("PRAGMA busy_timeout"))).scalar()
+        self.assertEqual(journal_mode, "wal")
+        self.assertEqual(synchronous, 1)  # NORMAL
+        self.assertEqual(busy_timeout, db_session.sqlite_db_config["busy_timeout_ms"])
+
+    async def test_dispose_engines_clears_cache(self):
+        db_session.get_session_factory()
+        await db_session.dispose_engines()
+        self.assertEqual(db_session._engines, {})
+        self.assertEqual(db_session._session_factories, {})
@@ -0,0 +1,104 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+from typing import Dict, List
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import AsyncMock, patch
+
+import httpx
+
+from media_platform.douyin.client import DouYinClient
+from media_platform.douyin.exception import AccountBlockedError
+
+
+class FakePage:
+
+    def __init__(self, tokens: List[str]):
+        self.tokens = tokens
+        self.reads = 0
+
+    async def evaluate(self, expression: str, arg=None) -> Dict:
+        self.reads += 1
+        return {"xmst": self.tokens[min(self.reads, len(self.tokens)) - 1], "HasUserLogin": "1"}
+
+
+class FakeBrowserContext:
+
+    async def cookies(self):
+        return [{"name": "sessionid", "value": "new"}]
+
+
+class TestDouYinClientParams(IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.patch = patch.multiple("config", REQUEST_RETRY_BASE_DELAY_SEC=0, ENABLE_ADAPTIVE_RATE_LIMIT=False)
+        self.patch.start()
+        self.sign_patch = patch("media_platform.douyin.client.get_a_bogus", AsyncMock(return_value="a_bogus_value"))
+        self.sign_patch.start()
+
+    def tearDown(self):
+        self.patch.stop()
+        self.sign_patch.stop()
+
+    def build_client(self, page: FakePage, responses: List[httpx.Response]) -> DouYinClient:
+        client = DouYinClient(headers={"User-Agent": "test", "Cookie": "sessionid=old"}, playwright_page=page, cookie_dict={})
+        client.sent = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            client.sent.append(request)
+            return responses.pop(0) if len(responses) > 1 else responses[0]
+
+        client._http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        return client
+
+    async def test_params_are_cached_per_session(self):
+        page = FakePage(["token1", "token2"])
+        client = self.build_client(page, [httpx.Response(200, json={"status_code": 0})])
+        for aweme_id in ("1", "2", "3"):
+            await client.get("/aweme/v1/web/aweme/detail/", {"aweme_id": aweme_id})
+        self.assertEqual(page.reads, 1)
+        params = [dict(request.url.params) for request in client.sent]
+        self.assertEqual({p["msToken"] for p in params}, {"token1"})
+        self.assertEqual(len({p["webid"] for p in params}), 1)
+        self.assertEqual([p["aweme_id"] for p in params], ["1", "2", "3"])
+        self.assertEqual(params[0]["device_platform"], "webapp")
+        self.assertEqual(params[0]["a_bogus"], "a_bogus_value")
+
+        # cookie 更新后重新读取 msToken, webid 保持不变
+        await client.update_cookies(FakeBrowserContext())
+        await client.get("/aweme/v1/web/aweme/detail/", {"aweme_id": "4"})
+        self.assertEqual(page.reads, 2)
+        self.assertEqual(client.sent[-1].url.params["msToken"], "token2")
+        self.assertEqual(client.sent[-1].url.params["webid"], params[0]["webid"])
+        await client.aclose()
+
+    async def test_pong_primes_cache_and_ttl_expires(self):
+        page = FakePage(["token1", "token2"])
+        client = self.build_client(page, [httpx.Response(200, json={"status_code": 0})])
+        self.assertTrue(await client.pong(FakeBrowserContext()))
+        await client.get("/aweme/v1/web/aweme/detail/", {"aweme_id": "1"})
+        self.assertEqual(page.reads, 1)
+
+        client.params_context.ms_token_ttl_sec = 0
+        await client.get("/aweme/v1/web/aweme/detail/", {"aweme_id": "2"})
+        self.assertEqual(page.reads, 2)
+        await client.aclose()
+
+    async def test_blocked_response_refreshes_ms_token(self):
+        page = FakePage(["stale", "fresh"])
+        client = self.build_client(page, [httpx.Response(200, text="blocked"), httpx.Response(200, json={"status_code": 0})])
+        with patch("config.REQUEST_MAX_ATTEMPTS", 1), self.assertRaises(AccountBlockedError):
+            await client.get("/aweme/v1/web/aweme/detail/", {"aweme_id": "1"})
+        client.sent.clear()
+        await client.get("/aweme/v1/web/aweme/detail/", {"aweme_id": "1"})
+        self.assertEqual(client.sent[-1].url.params["msToken"], "fresh")
+        await client.aclose()
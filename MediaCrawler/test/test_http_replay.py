@@ -0,0 +1,97 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+import json
+import os
+import tempfile
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import patch
+
+import httpx
+
+from benchmark import bench_clients
+from tools.http_replay import (RecordingTransport, ReplayMissError,
+                               ReplayStore, ReplayTransport, replay_key)
+
+
+class TestHttpReplay(IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "replay", "fixtures.jsonl")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    async def test_record_then_replay(self):
+        count = 0
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            nonlocal count
+            count += 1
+            return httpx.Response(200, json={"n": count, "page": request.url.params["page"]})
+
+        async with httpx.AsyncClient(transport=RecordingTransport(httpx.MockTransport(handler), ReplayStore(self.path))) as client:
+            self.assertEqual((await client.get("https://api.test/list?page=1&w_rid=a")).json(), {"n": 1, "page": "1"})
+            self.assertEqual((await client.get("https://api.test/list?page=1&w_rid=b")).json(), {"n": 2, "page": "1"})
+            await client.get("https://api.test/list?page=2&w_rid=c")
+
+        store = ReplayStore(self.path)
+        async with httpx.AsyncClient(transport=ReplayTransport(store)) as client:
+            # 签名参数不同也能命中, 同一请求按录制顺序回放
+            self.assertEqual((await client.get("https://api.test/list?w_rid=x&page=1")).json(), {"n": 1, "page": "1"})
+            self.assertEqual((await client.get("https://api.test/list?w_rid=y&page=1")).json(), {"n": 2, "page": "1"})
+            self.assertEqual((await client.get("https://api.test/list?w_rid=z&page=1")).json(), {"n": 2, "page": "1"})
+            self.assertEqual((await client.get("https://api.test/list?page=2")).json(), {"n": 3, "page": "2"})
+            with self.assertRaises(ReplayMissError):
+                await client.get("https://api.test/list?page=3")
+        self.assertEqual(count, 3)
+        self.assertEqual(store.stats(), {"replay_hits": 4, "replay_misses": 1, "recorded": 0})
+
+    async def test_bilibili_benchmark_replay(self):
+        replies = [{"rpid": i, "rcount": 0, "content": {"message": f"comment {i}"}} for i in range(5)]
+        pages = [
+            {"cursor": {"is_end": False, "next": 2}, "replies": replies[:3]},
+            {"cursor": {"is_end": True, "next": 0}, "replies": replies[3:]},
+        ]
+        entries = [{
+            "key": "EVALUATE () => window.localStorage null",
+            "result": {"wbi_img_urls": "https://i0.hdslb.com/bfs/wbi/7cd084941338484aae1ad9425b84077c.png-"
+                                       "https://i0.hdslb.com/bfs/wbi/4932caff0ff746eab6f01bf08b70ac45.png"},
+        }]
+        for next_page, data in zip([0, 2], pages):
+            url = f"https://api.bilibili.com/x/v2/reply/wbi/main?oid=42&mode=0&type=1&ps=20&next={next_page}&w_rid=a&wts=1"
+            entries.append({
+                "key": replay_key("GET", url),
+                "status": 200,
+                "headers": [["content-type", "application/json"]],
+                "body": json.dumps({"code": 0, "data": data}),
+            })
+        os.makedirs(os.path.dirname(self.path))
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.writelines(json.dumps(entry) + "\n" for entry in entries)
+
+        with patch.multiple("config", HTTP_REPLAY_MODE="", HTTP_REPLAY_FILE="", ENABLE_GET_SUB_COMMENTS=False,
+                            ENABLE_REQUEST_CACHE=False, REQUEST_CACHE_TTL_SEC=0, ENABLE_ADAPTIVE_RATE_LIMIT=True):
+            results = await bench_clients.main(
+                ["--platform", "bili", "--id", "42", "--fixtures", self.path, "--max_count", "10", "--rounds", "2"]
+            )
+        self.assertEqual(len(results), 2)
+        for result in results:
+            self.assertEqual(result["comments"], 5)
+            self.assertEqual(result["callback_comments"], 5)
+            self.assertEqual(result["requests"], 2)
+            self.assertEqual(result["replay_misses"], 0)
+            # crawl_interval 的休眠被虚拟化
+            self.assertGreaterEqual(result["virtual_sleep_sec"], 2)
+            self.assertIn("sign", result["stage_cpu_ms"])
+            self.assertIn("parse", result["stage_cpu_ms"])
@@ -0,0 +1,97 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+import asyncio
+import os
+import shutil
+import tempfile
+import unittest
+from collections import Counter
+from unittest import IsolatedAsyncioTestCase
+
+from tools.js_worker_pool import JsCallError, JsWorkerPool
+
+SCRIPT = """
+let counter = 0;
+const prefix = "n";
+function add(a, b) { return a + b; }
+function next() { counter += 1; return prefix + counter; }
+function fail() { throw new Error("broken"); }
+function spin() { while (true) {} }
+"""
+
+
+@unittest.skipUnless(shutil.which("node"), "node is not installed")
+class TestJsWorkerPool(IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.script_path = os.path.join(self.tmp_dir.name, "sign.js")
+        with open(self.script_path, "w", encoding="utf-8-sig") as f:
+            f.write(SCRIPT)
+        self.pool = JsWorkerPool(self.script_path, size=2, timeout_sec=1)
+
+    async def asyncTearDown(self):
+        await self.pool.close()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    async def test_script_is_loaded_once_per_worker(self):
+        self.assertEqual(await self.pool.call("add", 1, 2), 3)
+        results = await asyncio.gather(*[self.pool.call("next") for _ in range(20)])
+        # 两个常驻进程各自累加计数, 说明脚本状态在调用之间保留, 每个计数值最多出现两次
+        counts = Counter(results)
+        self.assertLessEqual(max(counts.values()), 2)
+        self.assertEqual(sum(counts.values()), 20)
+        self.assertEqual(sum(worker.calls for worker in self.pool._workers), 21)
+        stats = self.pool.stats()
+        self.assertEqual(stats["workers"], 2)
+        self.assertEqual(stats["calls"], 21)
+        self.assertEqual(stats["queue_depth"], 0)
+
+    async def test_script_error_keeps_worker(self):
+        with self.assertRaises(JsCallError):
+            await self.pool.call("fail")
+        self.assertEqual(await self.pool.call("add", "a", "b"), "ab")
+        self.assertEqual(self.pool.stats()["errors"], 1)
+
+    async def test_timeout_restarts_worker(self):
+        with self.assertRaises(asyncio.TimeoutError):
+            await self.pool.call("spin")
+        results = await asyncio.gather(*[self.pool.call("add", i, 1) for i in range(4)])
+        self.assertEqual(results, [1, 2, 3, 4])
+        self.assertTrue(all(worker.alive for worker in self.pool._workers))
+
+    async def test_execjs_fallback(self):
+        self.pool.node_path = None
+        self.assertEqual(self.pool.backend, "execjs")
+        self.assertEqual(await self.pool.call("add", 2, 3), 5)
+
+
+@unittest.skipUnless(shutil.which("node"), "node is not installed")
+class TestDouyinSign(IsolatedAsyncioTestCase):
+
+    async def test_sign_matches_execjs_format(self):
+        from media_platform.douyin import help
+
+        user_agent = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/123.0.0.0 Safari/537.36"
+        query = "device_platform=webapp&aid=6383&aweme_id=7300000000000000000"
+        try:
+            a_bogus = await help.sign("/aweme/v1/web/comment/list/reply/", query, user_agent)
+            expected = help.get_a_bogus_from_js("/aweme/v1/web/comment/list/reply/", query, user_agent)
+            # a_bogus 含随机前缀, 只比较长度和结尾
+            self.assertEqual(len(a_bogus), len(expected))
+            self.assertTrue(a_bogus.endswith("="))
+            self.assertEqual(help.douyin_sign_pool.stats()["backend"], "node")
+        finally:
+            await help.douyin_sign_pool.close()
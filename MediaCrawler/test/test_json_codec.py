@@ -0,0 +1,101 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+import json
+import tempfile
+import unittest
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import patch
+
+import httpx
+
+from tools import json_codec
+from tools.async_file_writer import AsyncFileWriter
+
+SAMPLE = {
+    "status_code": 0,
+    "comments": [
+        {"cid": "7300000000000000001", "text": "第一条\n  换行 \"引号\" 😀", "digg_count": 12, "ratio": 0.5,
+         "user": {"nickname": "用户", "avatar": {"url_list": []}}, "labels": {}, "image_list": None},
+        {"cid": "7300000000000000002", "text": "    行首空格", "is_top": True, "reply": [[1, [2, {}]]]},
+    ],
+    "has_more": False,
+}
+
+
+class TestJsonCodec(unittest.TestCase):
+
+    def tearDown(self):
+        json_codec._codec = None
+
+    def _codecs(self):
+        codecs = [json_codec.StdlibJsonCodec()]
+        if json_codec.orjson is not None:
+            codecs.append(json_codec.OrjsonCodec())
+        return codecs
+
+    def test_backends_are_interchangeable(self):
+        raw = json.dumps(SAMPLE, ensure_ascii=False).encode("utf-8")
+        expected_indent = json.dumps(SAMPLE, ensure_ascii=False, indent=4).encode("utf-8")
+        for codec in self._codecs():
+            with self.subTest(codec=codec.name):
+                self.assertEqual(codec.loads(raw), SAMPLE)
+                self.assertEqual(codec.loads(raw.decode("utf-8")), SAMPLE)
+                self.assertEqual(codec.dumps(SAMPLE, indent=True), expected_indent)
+                self.assertEqual(json.loads(codec.dumps(SAMPLE)), SAMPLE)
+                self.assertEqual(codec.dumps({1: "a"}), b'{"1":"a"}')
+
+    def test_values_orjson_formats_differently(self):
+        values = [1e16, -1e22, 1e-05, 1.7976931348623157e308, float("nan"), float("inf"), 2 ** 64, -2 ** 63 - 1,
+                  0.0001, 123.456, 2 ** 64 - 1]
+        for value in values:
+            obj = {"value": value, "list": [value], 1.5e20: "key"}
+            for codec in self._codecs():
+                with self.subTest(codec=codec.name, value=value):
+                    self.assertEqual(codec.dumps(obj), json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+                    self.assertEqual(codec.dumps(obj, indent=True), json.dumps(obj, ensure_ascii=False, indent=4).encode("utf-8"))
+
+    def test_decode_error_is_json_decode_error(self):
+        for codec in self._codecs():
+            with self.subTest(codec=codec.name), self.assertRaises(json_codec.JSONDecodeError):
+                codec.loads(b"blocked")
+
+    def test_config_selects_backend(self):
+        with patch("config.JSON_CODEC", "json"):
+            self.assertIsInstance(json_codec.get_codec(), json_codec.StdlibJsonCodec)
+        with self.assertRaises(ValueError):
+            json_codec.set_codec("simdjson")
+
+    def test_decode_response(self):
+        response = httpx.Response(200, json=SAMPLE)
+        self.assertEqual(json_codec.decode_response(response), SAMPLE)
+
+
+class TestJsonFileFormat(IsolatedAsyncioTestCase):
+
+    async def test_file_matches_stdlib_format(self):
+        items = SAMPLE["comments"]
+        for name in ("json", "orjson"):
+            if name == "orjson" and json_codec.orjson is None:
+                continue
+            with self.subTest(codec=name), tempfile.TemporaryDirectory() as tmp_dir:
+                json_codec.set_codec(name)
+                writer = AsyncFileWriter(platform="dy", crawler_type="search", output_dir=tmp_dir)
+                try:
+                    for item in items:
+                        await writer.write_single_item_to_json(item, "comments")
+                finally:
+                    await writer.close()
+                    json_codec._codec = None
+                file_path = writer.file_paths["json_comments"]
+                with open(file_path, "r", encoding="utf-8") as f:
+                    self.assertEqual(f.read(), json.dumps(items, ensure_ascii=False, indent=4))
@@ -0,0 +1,101 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+import asyncio
+import os
+import tempfile
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import patch
+
+from tools import media_cas
+from tools.media_cas import ContentAddressedMediaStore
+from tools.media_download_pool import close_media_download_pool
+
+
+class TestContentAddressedMediaStore(IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.store = ContentAddressedMediaStore(root_dir=os.path.join(self.tmp_dir.name, "media"))
+        self.bodies = {
+            "https://cdn.test/a.jpg": b"same image",
+            "https://mirror.test/a.jpg": b"same image",
+            "https://cdn.test/b.jpg": b"other image",
+        }
+        self.downloaded = []
+
+    def tearDown(self):
+        self.store.close()
+        self.tmp_dir.cleanup()
+
+    async def download(self, url: str, save_file_name: str) -> bool:
+        self.downloaded.append(url)
+        with open(save_file_name, "wb") as f:
+            f.write(self.bodies[url])
+        return True
+
+    def post_path(self, post_id: str, name: str) -> str:
+        return os.path.join(self.tmp_dir.name, "images", post_id, name)
+
+    def blob_files(self):
+        return [name for _, _, files in os.walk(self.store.blob_dir) for name in files]
+
+    async def test_known_url_is_not_downloaded_again(self):
+        self.assertTrue(await self.store.fetch("https://cdn.test/a.jpg", self.post_path("1", "000.jpg"), self.download))
+        self.assertTrue(await self.store.fetch("https://cdn.test/a.jpg", self.post_path("2", "000.jpg"), self.download))
+        self.assertEqual(self.downloaded, ["https://cdn.test/a.jpg"])
+        with open(self.post_path("2", "000.jpg"), "rb") as f:
+            self.assertEqual(f.read(), b"same image")
+
+    async def test_same_content_from_different_urls_stored_once(self):
+        await self.store.fetch("https://cdn.test/a.jpg", self.post_path("1", "000.jpg"), self.download)
+        await self.store.fetch("https://mirror.test/a.jpg", self.post_path("2", "000.jpg"), self.download)
+        await self.store.fetch("https://cdn.test/b.jpg", self.post_path("2", "001.jpg"), self.download)
+        self.assertEqual(len(self.blob_files()), 2)
+
+    async def test_index_survives_reopen(self):
+        await self.store.fetch("https://cdn.test/a.jpg", self.post_path("1", "000.jpg"), self.download)
+        self.store.close()
+        reopened = ContentAddressedMediaStore(root_dir=self.store.root_dir)
+        try:
+            await reopened.fetch("https://cdn.test/a.jpg", self.post_path("3", "000.jpg"), self.download)
+        finally:
+            reopened.close()
+        self.assertEqual(self.downloaded, ["https://cdn.test/a.jpg"])
+
+    async def test_failed_download_creates_no_file(self):
+        async def failing_download(url, save_file_name):
+            return False
+
+        self.assertFalse(await self.store.fetch("https://cdn.test/b.jpg", self.post_path("1", "000.jpg"), failing_download))
+        self.assertFalse(os.path.exists(self.post_path("1", "000.jpg")))
+
+    async def test_url_locks_are_released(self):
+        async def slow_download(url, save_file_name):
+            await asyncio.sleep(0.01)
+            return await self.download(url, save_file_name)
+
+        results = await asyncio.gather(*[
+            self.store.fetch("https://cdn.test/a.jpg", self.post_path(str(i), "000.jpg"), slow_download) for i in range(3)
+        ])
+        self.assertEqual(results, [True, True, True])
+        self.assertEqual(self.downloaded, ["https://cdn.test/a.jpg"])
+        self.assertEqual(self.store._url_locks, {})
+
+    async def test_close_media_store_closes_index(self):
+        with patch("config.MEDIA_CAS_DIR", os.path.join(self.tmp_dir.name, "shared")):
+            store = media_cas.get_media_store()
+            await store.fetch("https://cdn.test/b.jpg", self.post_path("1", "000.jpg"), self.download)
+            await close_media_download_pool()
+        self.assertIsNone(store._conn)
+        self.assertIsNot(media_cas.get_media_store(), store)
+        media_cas.close_media_store()
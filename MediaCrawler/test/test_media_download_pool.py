@@ -0,0 +1,87 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+import asyncio
+import os
+import tempfile
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import patch
+
+from tools.media_download_pool import MediaDownloadPool
+
+
+class TestMediaDownloadPool(IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.dedup_patch = patch("config.ENABLE_MEDIA_DEDUP", False)
+        self.dedup_patch.start()
+        self.active = {}
+        self.max_active = {}
+        self.attempts = {}
+
+    def tearDown(self):
+        self.dedup_patch.stop()
+        self.tmp_dir.cleanup()
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.tmp_dir.name, name)
+
+    async def download(self, url: str, save_file_name: str) -> bool:
+        host = url.split("/")[2]
+        self.attempts[url] = self.attempts.get(url, 0) + 1
+        self.active[host] = self.active.get(host, 0) + 1
+        self.max_active[host] = max(self.max_active.get(host, 0), self.active[host])
+        await asyncio.sleep(0.01)
+        self.active[host] -= 1
+        if "flaky" in url and self.attempts[url] < 2:
+            return False
+        if "broken" in url:
+            return False
+        with open(save_file_name, "wb") as f:
+            f.write(url.encode())
+        return True
+
+    async def test_submit_returns_immediately_and_drain_waits(self):
+        pool = MediaDownloadPool(workers=4, per_host_limit=2, max_retries=0, max_interval_sec=0)
+        for i in range(6):
+            pool.submit(f"https://a.test/{i}.jpg", self.path(f"a{i}.jpg"), self.download)
+        self.assertEqual(pool.stats()["pending"], 6)
+
+        await pool.close()
+
+        self.assertEqual(pool.stats()["succeeded"], 6)
+        self.assertEqual(pool.stats()["pending"], 0)
+        self.assertTrue(all(os.path.exists(self.path(f"a{i}.jpg")) for i in range(6)))
+
+    async def test_per_host_limit(self):
+        pool = MediaDownloadPool(workers=6, per_host_limit=2, max_retries=0, max_interval_sec=0)
+        for i in range(6):
+            pool.submit(f"https://a.test/{i}.jpg", self.path(f"a{i}.jpg"), self.download)
+            pool.submit(f"https://b.test/{i}.jpg", self.path(f"b{i}.jpg"), self.download)
+        await pool.close()
+
+        self.assertLessEqual(self.max_active["a.test"], 2)
+        self.assertLessEqual(self.max_active["b.test"], 2)
+
+    async def test_retry_queue(self):
+        pool = MediaDownloadPool(workers=2, per_host_limit=2, max_retries=1, retry_backoff_sec=0.01, max_interval_sec=0)
+        pool.submit("https://a.test/flaky.jpg", self.path("flaky.jpg"), self.download)
+        pool.submit("https://a.test/broken.jpg", self.path("broken.jpg"), self.download)
+        await pool.close()
+
+        stats = pool.stats()
+        self.assertEqual(stats["succeeded"], 1)
+        self.assertEqual(stats["failed"], 1)
+        self.assertEqual(stats["retried"], 2)
+        self.assertEqual(self.attempts["https://a.test/broken.jpg"], 2)
+        self.assertTrue(os.path.exists(self.path("flaky.jpg")))
@@ -0,0 +1,75 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+import os
+import tempfile
+from unittest import IsolatedAsyncioTestCase
+
+import httpx
+
+from tools.media_downloader import PART_SUFFIX, download_to_file
+
+MEDIA_BODY = bytes(range(256)) * 40
+
+
+def media_handler(request: httpx.Request) -> httpx.Response:
+    range_header = request.headers.get("Range")
+    if range_header:
+        start = int(range_header[len("bytes="):-1])
+        if start >= len(MEDIA_BODY):
+            return httpx.Response(416)
+        return httpx.Response(
+            206,
+            content=MEDIA_BODY[start:],
+            headers={"Content-Range": f"bytes {start}-{len(MEDIA_BODY) - 1}/{len(MEDIA_BODY)}"},
+        )
+    return httpx.Response(200, content=MEDIA_BODY)
+
+
+class TestMediaDownloader(IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.save_file_name = os.path.join(self.tmp_dir.name, "video.mp4")
+        self.requests = []
+
+        def handler(request):
+            self.requests.append(request)
+            return media_handler(request)
+
+        self.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    async def asyncTearDown(self):
+        await self.client.aclose()
+        self.tmp_dir.cleanup()
+
+    async def test_download_renames_part_file(self):
+        ok = await download_to_file(self.client, "https://media.test/v.mp4", self.save_file_name, chunk_size=1000)
+        self.assertTrue(ok)
+        self.assertFalse(os.path.exists(self.save_file_name + PART_SUFFIX))
+        with open(self.save_file_name, "rb") as f:
+            self.assertEqual(f.read(), MEDIA_BODY)
+
+    async def test_resume_partial_file_with_range(self):
+        with open(self.save_file_name + PART_SUFFIX, "wb") as f:
+            f.write(MEDIA_BODY[:3000])
+        ok = await download_to_file(self.client, "https://media.test/v.mp4", self.save_file_name)
+        self.assertTrue(ok)
+        self.assertEqual(self.requests[0].headers["Range"], "bytes=3000-")
+        with open(self.save_file_name, "rb") as f:
+            self.assertEqual(f.read(), MEDIA_BODY)
+
+    async def test_size_cap_discards_file(self):
+        ok = await download_to_file(self.client, "https://media.test/v.mp4", self.save_file_name, max_bytes=1000)
+        self.assertFalse(ok)
+        self.assertFalse(os.path.exists(self.save_file_name))
+        self.assertFalse(os.path.exists(self.save_file_name + PART_SUFFIX))
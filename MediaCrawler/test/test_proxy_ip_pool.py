@@ -13,9 +13,13 @@
 # @Author  : relakkes@gmail.com
 # @Time    : 2023/12/2 14:42
 # @Desc    :
+import asyncio
+from typing import List
 from unittest import IsolatedAsyncioTestCase
+from unittest.mock import patch
 
-from proxy.proxy_ip_pool import create_ip_pool
+from proxy.base_proxy import IpGetError, ProxyProvider
+from proxy.proxy_ip_pool import ProxyIpPool, create_ip_pool, proxy_key
 from proxy.types import IpInfoModel
 
 
@@ -28,3 +32,108 @@ class TestIpPool(IsolatedAsyncioTestCase):
             print(ip_proxy_info)
             self.assertIsNotNone(ip_proxy_info.ip, msg="验证 ip 是否获取成功")
 
+
+class EchoProxyServer:
+    """
+    local stand-in for proxy + echo server: answers every proxied request with `status` after `delay` seconds
+    """
+
+    def __init__(self, status: int = 200, delay: float = 0.0):
+        self.status = status
+        self.delay = delay
+        self.requests = 0
+        self.server = None
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        await reader.readuntil(b"\r\n\r\n")
+        self.requests += 1
+        await asyncio.sleep(self.delay)
+        writer.write(f"HTTP/1.1 {self.status} X\r\nContent-Length: 2\r\nConnection: close\r\n\r\nok".encode())
+        await writer.drain()
+        writer.close()
+
+    async def start(self) -> int:
+        self.server = await asyncio.start_server(self.handle, "127.0.0.1", 0)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+
+class FakeProvider(ProxyProvider):
+
+    def __init__(self, batches: List[List[int]]):
+        self.batches = batches
+        self.calls = 0
+
+    async def get_proxy(self, num: int) -> List[IpInfoModel]:
+        ports = self.batches[min(self.calls, len(self.batches) - 1)]
+        self.calls += 1
+        return [IpInfoModel(ip="127.0.0.1", port=port, user="", password="", expired_time_ts=None) for port in ports]
+
+
+class TestProxyHealthPool(IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.servers = {name: EchoProxyServer(*args) for name, args in
+                        {"fast": (200,), "slow": (200, 0.2), "bad": (502,), "spare": (200,)}.items()}
+        self.ports = {name: await server.start() for name, server in self.servers.items()}
+        # 关闭后的端口用作连不上的代理
+        dead = EchoProxyServer()
+        self.ports["dead"] = await dead.start()
+        await dead.stop()
+        self.patch = patch.multiple("config", IP_PROXY_REFILL_THRESHOLD=1, IP_PROXY_MAX_FAILURES=2)
+        self.patch.start()
+
+    async def asyncTearDown(self):
+        self.patch.stop()
+        for server in self.servers.values():
+            await server.stop()
+
+    def pool(self, batches: List[List[str]]) -> ProxyIpPool:
+        provider = FakeProvider([[self.ports[name] for name in batch] for batch in batches])
+        return ProxyIpPool(ip_pool_count=4, enable_validate_ip=True, ip_provider=provider,
+                           valid_ip_url="http://echo.test/")
+
+    def key(self, name: str) -> str:
+        return f"127.0.0.1:{self.ports[name]}"
+
+    async def test_concurrent_validation_and_scoring(self):
+        pool = self.pool([["fast", "slow", "bad", "dead"]])
+        await pool.load_proxies()
+        self.assertEqual(set(pool.proxies), {self.key("fast"), self.key("slow")})
+        self.assertEqual(self.servers["bad"].requests, 1)
+        self.assertGreater(pool.proxies[self.key("fast")].score, pool.proxies[self.key("slow")].score)
+
+        first = await pool.get_proxy()
+        self.assertEqual(proxy_key(first), self.key("fast"))
+        # 租借次数参与排序, 第二个客户端拿到另一个代理
+        second = await pool.get_proxy()
+        self.assertEqual(proxy_key(second), self.key("slow"))
+        pool.release_proxy(first)
+        self.assertEqual(pool.proxies[self.key("fast")].leases, 0)
+        await pool.close()
+
+    async def test_evict_and_background_refill(self):
+        pool = self.pool([["fast", "slow"], ["spare"]])
+        await pool.load_proxies()
+        proxy = await pool.get_proxy()
+        pool.report_failure(proxy)
+        self.assertIn(proxy_key(proxy), pool.proxies)
+        pool.report_failure(proxy)
+        self.assertNotIn(proxy_key(proxy), pool.proxies)
+        self.assertEqual(pool.evicted_count, 1)
+
+        # 只剩一个可用代理, 后台补充
+        await pool._refill_task
+        self.assertIn(self.key("spare"), pool.proxies)
+        self.assertEqual(len(pool.proxies), 2)
+        await pool.close()
+
+    async def test_exhausted_pool_raises(self):
+        pool = self.pool([["bad", "dead"]])
+        with self.assertRaises(IpGetError):
+            await pool.get_proxy()
+        self.assertEqual(pool.ip_provider.calls, 3)
+
@@ -0,0 +1,97 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+import time
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import patch
+
+import httpx
+
+from base.request_pipeline import RateLimitMiddleware, RequestContext
+from tools.rate_limiter import AdaptiveTokenBucket, crawl_sleep, get_token_bucket
+
+
+class CaptchaError(Exception):
+    pass
+
+
+class TestAdaptiveTokenBucket(IsolatedAsyncioTestCase):
+
+    def test_aimd(self):
+        bucket = AdaptiveTokenBucket(rate=1, min_rate=0.2, max_rate=1.5, increase_step=0.25, decrease_factor=0.5)
+        bucket.on_success()
+        bucket.on_success()
+        self.assertAlmostEqual(bucket.rate, 1.5)
+        bucket.on_success()
+        self.assertAlmostEqual(bucket.rate, 1.5)
+        bucket.on_throttled()
+        self.assertAlmostEqual(bucket.rate, 0.75)
+        self.assertLessEqual(bucket.tokens, 0)
+        for _ in range(5):
+            bucket.on_throttled()
+        self.assertAlmostEqual(bucket.rate, 0.2)
+
+    async def test_acquire_paces_requests(self):
+        bucket = AdaptiveTokenBucket(rate=20, burst=1, min_rate=1, max_rate=20)
+        start = time.monotonic()
+        for _ in range(5):
+            await bucket.acquire()
+        # 第一个令牌立即可用, 之后每个令牌 1/20 秒
+        self.assertGreaterEqual(time.monotonic() - start, 4 / 20 * 0.9)
+
+    async def test_crawl_sleep_skipped_with_adaptive_rate_limit(self):
+        with patch("config.ENABLE_ADAPTIVE_RATE_LIMIT", True):
+            start = time.monotonic()
+            await crawl_sleep(5)
+            self.assertLess(time.monotonic() - start, 0.5)
+
+
+class TestRateLimitMiddleware(IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.middleware = RateLimitMiddleware(lambda ctx: httpx.URL(ctx.url).host, throttle_errors=(CaptchaError,))
+
+    async def test_success_speeds_up(self):
+        bucket = get_token_bucket("success.test")
+        rate = bucket.rate
+
+        async def call_next(ctx):
+            ctx.response = httpx.Response(200)
+            return "ok"
+
+        result = await self.middleware.handle(RequestContext("GET", "https://success.test/a"), call_next)
+        self.assertEqual(result, "ok")
+        self.assertGreater(bucket.rate, rate)
+
+    async def test_throttle_error_slows_down(self):
+        bucket = get_token_bucket("captcha.test")
+        rate = bucket.rate
+
+        async def call_next(ctx):
+            ctx.response = httpx.Response(461)
+            raise CaptchaError("captcha")
+
+        with self.assertRaises(CaptchaError):
+            await self.middleware.handle(RequestContext("GET", "https://captcha.test/a"), call_next)
+        self.assertLess(bucket.rate, rate)
+        self.assertEqual(bucket.throttled_count, 1)
+
+    async def test_http_429_slows_down(self):
+        bucket = get_token_bucket("busy.test")
+        rate = bucket.rate
+
+        async def call_next(ctx):
+            ctx.response = httpx.Response(429)
+            return {}
+
+        await self.middleware.handle(RequestContext("GET", "https://busy.test/a"), call_next)
+        self.assertLess(bucket.rate, rate)
@@ -0,0 +1,267 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+from typing import List
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import patch
+
+import httpx
+
+from base.base_crawler import AbstractApiClient
+from base.request_pipeline import (CacheMiddleware, MetricsMiddleware,
+                                   RequestContext, RetryMiddleware)
+from cache.local_cache import ExpiringLocalCache
+from proxy.base_proxy import ProxyProvider
+from proxy.proxy_ip_pool import ProxyIpPool
+from proxy.types import IpInfoModel
+
+
+class FlakyError(Exception):
+    pass
+
+
+class BlockedError(Exception):
+    pass
+
+
+class DummyClient(AbstractApiClient):
+    retryable_errors = (FlakyError,)
+
+    def __init__(self, statuses: List[int]):
+        self.proxy = None
+        self.timeout = 10
+        self.statuses = statuses
+        self.signatures = []
+        self.sent = []
+        self._http_client = httpx.AsyncClient(transport=httpx.MockTransport(self.handler))
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        self.sent.append(request)
+        status = self.statuses.pop(0) if len(self.statuses) > 1 else self.statuses[0]
+        return httpx.Response(status, json={"n": len(self.sent)})
+
+    async def sign_request(self, ctx: RequestContext):
+        if "sign_uri" not in ctx.options:
+            return
+        signature = f"{ctx.options['sign_uri']}#{ctx.attempt}"
+        self.signatures.append(signature)
+        ctx.kwargs["headers"] = {"X-Sign": signature}
+
+    def classify_response(self, ctx: RequestContext):
+        if ctx.response.status_code == 500:
+            raise FlakyError("server error")
+        if ctx.response.status_code == 403:
+            raise BlockedError("blocked")
+        return ctx.response.json()
+
+    async def request(self, method, url, **kwargs):
+        return await self.execute(method, url, **kwargs)
+
+    async def update_cookies(self, browser_context):
+        pass
+
+
+class TestRequestPipeline(IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.delay_patch = patch("config.REQUEST_RETRY_BASE_DELAY_SEC", 0)
+        self.delay_patch.start()
+        self.rate_limit_patch = patch("config.ENABLE_ADAPTIVE_RATE_LIMIT", False)
+        self.rate_limit_patch.start()
+
+    def tearDown(self):
+        self.delay_patch.stop()
+        self.rate_limit_patch.stop()
+
+    async def test_retry_resigns_every_attempt(self):
+        client = DummyClient([500, 500, 200])
+        result = await client.execute("GET", "https://api.test/a", options={"sign_uri": "/a"})
+
+        self.assertEqual(result, {"n": 3})
+        self.assertEqual(client.signatures, ["/a#1", "/a#2", "/a#3"])
+        self.assertEqual([r.headers["X-Sign"] for r in client.sent], ["/a#1", "/a#2", "/a#3"])
+        stats = client.request_stats()
+        self.assertEqual(stats["requests"], 1)
+        self.assertEqual(stats["retries"], 2)
+        self.assertEqual(stats["failed"], 0)
+        await client.aclose()
+
+    async def test_non_retryable_error_is_raised_at_once(self):
+        client = DummyClient([403])
+        with self.assertRaises(BlockedError):
+            await client.execute("GET", "https://api.test/a")
+        self.assertEqual(len(client.sent), 1)
+        self.assertEqual(client.request_stats()["failed"], 1)
+        await client.aclose()
+
+    async def test_retry_gives_up_after_max_attempts(self):
+        client = DummyClient([500])
+        with patch("config.REQUEST_MAX_ATTEMPTS", 2):
+            with self.assertRaises(FlakyError):
+                await client.execute("GET", "https://api.test/a")
+        self.assertEqual(len(client.sent), 2)
+        await client.aclose()
+
+    async def test_cache_middleware(self):
+        client = DummyClient([200])
+        client._pipeline = None
+        with patch("config.REQUEST_CACHE_TTL_SEC", 60), \
+                patch("base.base_crawler._response_cache", ExpiringLocalCache(cron_interval=60)):
+            self.assertIsNotNone(client.pipeline.find(CacheMiddleware))
+        first = await client.execute("GET", "https://api.test/a", params={"page": 1})
+        second = await client.execute("GET", "https://api.test/a", params={"page": 1})
+        third = await client.execute("GET", "https://api.test/a", params={"page": 2})
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, third)
+        self.assertEqual(len(client.sent), 2)
+        await client.aclose()
+
+    def test_backoff_has_jitter_and_cap(self):
+        middleware = RetryMiddleware(max_attempts=5, base_delay_sec=1, max_delay_sec=4)
+        for attempt, cap in [(1, 1), (2, 2), (3, 4), (4, 4)]:
+            delay = middleware.backoff(attempt)
+            self.assertGreaterEqual(delay, cap / 2)
+            self.assertLessEqual(delay, cap)
+
+    def test_default_middleware_order(self):
+        client = DummyClient([200])
+        middlewares = client.build_middlewares()
+        self.assertIsInstance(middlewares[0], MetricsMiddleware)
+        self.assertIsInstance(middlewares[1], RetryMiddleware)
+        self.assertIn(FlakyError, middlewares[1].retry_on)
+        self.assertIn(httpx.TransportError, middlewares[1].retry_on)
+
+
+class FakeProxyPool:
+
+    def __init__(self, ports: List[int]):
+        self.ports = ports
+        self.failures = []
+        self.successes = []
+        self.released = []
+        self.events = []
+
+    async def get_proxy(self, exclude=None) -> IpInfoModel:
+        self.events.append("lease")
+        return IpInfoModel(ip="127.0.0.1", port=self.ports.pop(0), user="", password="", expired_time_ts=None)
+
+    def report_failure(self, proxy: IpInfoModel):
+        self.events.append("failure")
+        self.failures.append(proxy.port)
+
+    def release_proxy(self, proxy: IpInfoModel):
+        self.released.append(proxy.port)
+
+    def report_success(self, proxy: IpInfoModel, latency_sec: float = None):
+        self.successes.append(proxy.port)
+
+
+class RotatingClient(DummyClient):
+    throttle_errors = (BlockedError,)
+
+    def __init__(self, blocked_proxies: List[str]):
+        super().__init__([200])
+        self.blocked_proxies = blocked_proxies
+        self.proxies_used = []
+
+    def get_http_client(self) -> httpx.AsyncClient:
+        # 每个代理对应一个模拟的连接池, 被封禁的代理返回 403
+        def handler(request: httpx.Request, proxy=self.proxy) -> httpx.Response:
+            self.proxies_used.append(proxy)
+            return httpx.Response(403 if proxy in self.blocked_proxies else 200, json={"proxy": proxy})
+
+        return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+class TestProxyRotation(IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.patch = patch.multiple("config", REQUEST_RETRY_BASE_DELAY_SEC=0, ENABLE_ADAPTIVE_RATE_LIMIT=False)
+        self.patch.start()
+
+    def tearDown(self):
+        self.patch.stop()
+
+    async def test_blocked_request_rotates_proxy_and_retries(self):
+        client = RotatingClient(blocked_proxies=["http://127.0.0.1:8001"])
+        pool = FakeProxyPool([8002, 8003])
+        client.proxy = "http://127.0.0.1:8001"
+        client.use_proxy_pool(pool, IpInfoModel(ip="127.0.0.1", port=8001, user="", password="", expired_time_ts=None))
+
+        result = await client.execute("GET", "https://api.test/a")
+        self.assertEqual(result, {"proxy": "http://127.0.0.1:8002"})
+        self.assertEqual(client.proxies_used, ["http://127.0.0.1:8001", "http://127.0.0.1:8002"])
+        self.assertEqual(client.proxy, "http://127.0.0.1:8002")
+        self.assertEqual(pool.failures, [8001])
+        self.assertEqual(pool.released, [8001])
+        self.assertEqual(pool.successes, [8002])
+        # 先记录失败、归还旧代理, 再租借新代理
+        self.assertEqual(pool.events, ["failure", "lease"])
+
+        # 之后的请求继续使用新代理
+        await client.execute("GET", "https://api.test/b")
+        self.assertEqual(client.proxies_used[-1], "http://127.0.0.1:8002")
+
+    async def test_without_pool_block_is_not_retried(self):
+        client = RotatingClient(blocked_proxies=[None])
+        with self.assertRaises(BlockedError):
+            await client.execute("GET", "https://api.test/a")
+        self.assertEqual(len(client.proxies_used), 1)
+
+
+
+class FixedProvider(ProxyProvider):
+
+    def __init__(self, ports: List[int]):
+        self.ports = ports
+
+    async def get_proxy(self, num: int) -> List[IpInfoModel]:
+        return [IpInfoModel(ip="1.1.1.1", port=port, user="", password="", expired_time_ts=None) for port in self.ports]
+
+
+class TestRotateProxyWithPool(IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.patch = patch.multiple("config", REQUEST_RETRY_BASE_DELAY_SEC=0, ENABLE_ADAPTIVE_RATE_LIMIT=False)
+        self.patch.start()
+
+    async def asyncTearDown(self):
+        self.patch.stop()
+
+    async def lease_client(self, ports: List[int]):
+        pool = ProxyIpPool(ip_pool_count=len(ports), enable_validate_ip=False, ip_provider=FixedProvider(ports))
+        await pool.load_proxies()
+        client = RotatingClient(blocked_proxies=[])
+        info = await pool.get_proxy()
+        client.proxy = "http://1.1.1.1:%d" % info.port
+        client.use_proxy_pool(pool, info)
+        return pool, client, info
+
+    async def test_failed_proxy_is_not_leased_again(self):
+        pool, client, info = await self.lease_client([1, 2])
+        # 失败的代理得分仍然更高时也不会被再次租借
+        pool.proxies["1.1.1.1:1"].record_success(0.01)
+        pool.proxies["1.1.1.1:2"].record_success(5)
+        self.assertEqual(info.port, 1)
+        await client.rotate_proxy("http://1.1.1.1:1", BlockedError("blocked"))
+        self.assertEqual(client.proxy, "http://1.1.1.1:2")
+        self.assertEqual(client.proxy_info.port, 2)
+        self.assertEqual(pool.proxies["1.1.1.1:1"].leases, 0)
+        self.assertEqual(pool.proxies["1.1.1.1:1"].failures, 1)
+        await pool.close()
+
+    async def test_single_proxy_pool_keeps_proxy(self):
+        pool, client, info = await self.lease_client([1])
+        await client.rotate_proxy("http://1.1.1.1:1", BlockedError("blocked"))
+        self.assertEqual(client.proxy, "http://1.1.1.1:1")
+        self.assertIs(client.proxy_info, info)
+        await pool.close()
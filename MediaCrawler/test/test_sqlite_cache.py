@@ -0,0 +1,141 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+import asyncio
+import os
+import tempfile
+import unittest
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import patch
+
+from base.request_pipeline import CacheMiddleware, RequestContext
+from cache.sqlite_cache import SqliteCache
+
+
+class TestSqliteCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp_dir.name, "cache", "response_cache.db")
+        self.cache = SqliteCache(self.db_path)
+
+    def tearDown(self):
+        self.cache.close()
+        self.tmp_dir.cleanup()
+
+    def test_set_and_get(self):
+        self.cache.set('key', {'name': '程序员阿江-Relakkes'}, 10)
+        self.assertEqual(self.cache.get('key'), {'name': '程序员阿江-Relakkes'})
+
+    def test_expired_key(self):
+        self.cache.set('key', 'value', -1)
+        self.assertIsNone(self.cache.get('key'))
+        self.assertEqual(self.cache.keys('*'), [])
+
+    def test_keys(self):
+        self.cache.set('api_cache:a', 'value', 10)
+        self.cache.set('other', 'value', 10)
+        self.assertEqual(self.cache.keys('api_cache:*'), ['api_cache:a'])
+
+    def test_persist_across_instances(self):
+        self.cache.set('key', 'value', 10)
+        self.cache.close()
+        self.assertEqual(SqliteCache(self.db_path).get('key'), 'value')
+
+
+class TestResponseCache(IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache = SqliteCache(os.path.join(self.tmp_dir.name, "response_cache.db"))
+        self.sent = 0
+
+    def tearDown(self):
+        self.cache.close()
+        self.tmp_dir.cleanup()
+
+    def middleware(self, **kwargs) -> CacheMiddleware:
+        kwargs.setdefault("endpoint_ttls", {"/aweme/v1/web/aweme/detail/": 60})
+        kwargs.setdefault("ignore_params", ["a_bogus", "xsec_token"])
+        return CacheMiddleware(self.cache, 0, namespace="DouYinClient", **kwargs)
+
+    async def call_next(self, ctx: RequestContext):
+        self.sent += 1
+        return {"n": self.sent}
+
+    async def test_endpoint_ttl_and_normalized_key(self):
+        middleware = self.middleware()
+        first = RequestContext("GET", "https://www.douyin.com/aweme/v1/web/aweme/detail/?a_bogus=1",
+                               options={"sign_params": {"aweme_id": "1", "device": "web"}})
+        second = RequestContext("GET", "https://www.douyin.com/aweme/v1/web/aweme/detail/?a_bogus=2",
+                                options={"sign_params": {"device": "web", "aweme_id": "1"}})
+        self.assertEqual(await middleware.handle(first, self.call_next), {"n": 1})
+        self.assertEqual(await middleware.handle(second, self.call_next), {"n": 1})
+        self.assertEqual(middleware.stats(), {"cache_hits": 1, "cache_misses": 1})
+
+        # 未配置缓存时间的接口不缓存
+        other = RequestContext("GET", "https://www.douyin.com/aweme/v1/web/comment/list/")
+        await middleware.handle(other, self.call_next)
+        await middleware.handle(other, self.call_next)
+        self.assertEqual(self.sent, 3)
+        self.assertEqual(middleware.stats(), {"cache_hits": 1, "cache_misses": 1})
+
+    async def test_bypass_refreshes_cache(self):
+        url = "https://www.douyin.com/aweme/v1/web/aweme/detail/?aweme_id=1"
+        await self.middleware().handle(RequestContext("GET", url), self.call_next)
+        bypass = self.middleware(bypass=True)
+        self.assertEqual(await bypass.handle(RequestContext("GET", url), self.call_next), {"n": 2})
+        self.assertEqual(bypass.stats(), {"cache_hits": 0, "cache_misses": 1})
+        self.assertEqual(await self.middleware().handle(RequestContext("GET", url), self.call_next), {"n": 2})
+
+    async def test_request_opt_out(self):
+        middleware = self.middleware()
+        url = "https://www.douyin.com/aweme/v1/web/aweme/detail/?aweme_id=1"
+        await middleware.handle(RequestContext("GET", url, options={"cache": False}), self.call_next)
+        await middleware.handle(RequestContext("GET", url, options={"cache": False}), self.call_next)
+        self.assertEqual(self.sent, 2)
+        self.assertEqual(self.cache.keys("api_cache:*"), [])
+
+    async def test_accounts_do_not_share_responses(self):
+        account = {"cookie": "sessionid=a"}
+        middleware = self.middleware(identity=lambda: account["cookie"])
+        url = "https://www.douyin.com/aweme/v1/web/aweme/detail/?aweme_id=1"
+        self.assertEqual(await middleware.handle(RequestContext("GET", url), self.call_next), {"n": 1})
+        account["cookie"] = "sessionid=b"
+        self.assertEqual(await middleware.handle(RequestContext("GET", url), self.call_next), {"n": 2})
+        account["cookie"] = "sessionid=a"
+        self.assertEqual(await middleware.handle(RequestContext("GET", url), self.call_next), {"n": 1})
+
+    async def test_blocking_backend_runs_in_thread(self):
+        middleware = self.middleware()
+        url = "https://www.douyin.com/aweme/v1/web/aweme/detail/?aweme_id=1"
+        with patch("asyncio.to_thread", wraps=asyncio.to_thread) as to_thread:
+            await middleware.handle(RequestContext("GET", url), self.call_next)
+            await middleware.handle(RequestContext("GET", url), self.call_next)
+        self.assertEqual([c.args[0].__name__ for c in to_thread.call_args_list], ["get", "set", "get"])
+
+
+class TestCacheIdentity(unittest.TestCase):
+
+    def test_identity_cookies(self):
+        from media_platform.douyin.client import DouYinClient
+        client = DouYinClient(headers={"Cookie": "ttwid=1; sessionid=abc; msToken=x"}, playwright_page=None, cookie_dict={})
+        self.assertEqual(client.cache_identity(), "sessionid=abc")
+        # 轮换的 cookie 不影响缓存 key
+        client.headers["Cookie"] = "ttwid=2; sessionid=abc; msToken=y"
+        self.assertEqual(client.cache_identity(), "sessionid=abc")
+        client.headers["Cookie"] = "ttwid=2"
+        self.assertEqual(client.cache_identity(), "")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import patch
+
+import httpx
+
+from media_platform.tieba.client import BaiduTieBaClient
+from media_platform.tieba.exception import IPBlockError
+
+
+class TestTieBaClient(IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.delay_patch = patch("config.REQUEST_RETRY_BASE_DELAY_SEC", 0)
+        self.delay_patch.start()
+        self.rate_limit_patch = patch("config.ENABLE_ADAPTIVE_RATE_LIMIT", False)
+        self.rate_limit_patch.start()
+
+    def tearDown(self):
+        self.delay_patch.stop()
+        self.rate_limit_patch.stop()
+
+    def build_client(self, responses):
+        client = BaiduTieBaClient(headers={"User-Agent": "test", "Cookie": "BDUSS=1"})
+        client.sent = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            client.sent.append(request)
+            return responses.pop(0) if len(responses) > 1 else responses[0]
+
+        client._http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        return client
+
+    async def test_get_reuses_pool_and_retries(self):
+        client = self.build_client([httpx.Response(500), httpx.Response(200, text="<html></html>")])
+        res = await client.get("/f", params={"kw": "python"}, return_ori_content=True)
+        self.assertEqual(res, "<html></html>")
+        self.assertEqual(len(client.sent), 2)
+        self.assertEqual(client.sent[-1].url, "https://tieba.baidu.com/f?kw=python")
+        self.assertEqual(client.sent[-1].headers["Cookie"], "BDUSS=1")
+        await client.aclose()
+
+    async def test_blocked_response(self):
+        client = self.build_client([httpx.Response(200, text="blocked")])
+        with patch("config.REQUEST_MAX_ATTEMPTS", 1):
+            with self.assertRaises(IPBlockError):
+                await client.request("GET", "https://tieba.baidu.com/f")
+        await client.aclose()
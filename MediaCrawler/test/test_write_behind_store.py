@@ -0,0 +1,141 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+import asyncio
+from typing import Dict, List
+from unittest import IsolatedAsyncioTestCase
+
+from base.base_crawler import AbstractStore
+from store.write_behind import StoreWriteError, WriteBehindStore
+
+
+class RecordingStore(AbstractStore):
+    def __init__(self, delay: float = 0):
+        self.delay = delay
+        self.calls: List = []
+        self.closed = False
+
+    async def store_content(self, content_item: Dict):
+        self.calls.append(("content", content_item))
+
+    async def store_comment(self, comment_item: Dict):
+        self.calls.append(("comment", comment_item))
+
+    async def store_comments(self, comment_items: List[Dict]):
+        await asyncio.sleep(self.delay)
+        self.calls.append(("comments", list(comment_items)))
+
+    async def store_creator(self, creator: Dict):
+        self.calls.append(("creator", creator))
+
+    async def store_contact(self, contact_item: Dict):
+        self.calls.append(("contact", contact_item))
+
+    async def close(self):
+        self.closed = True
+
+
+class FailingStore(RecordingStore):
+
+    async def store_comments(self, comment_items: List[Dict]):
+        raise IOError("disk full")
+
+
+class TestWriteBehindStore(IsolatedAsyncioTestCase):
+
+    async def test_comments_are_batched_and_drained_on_close(self):
+        backend = RecordingStore()
+        store = WriteBehindStore(backend, max_size=100, batch_size=10, workers=1)
+        await store.store_comments([{"comment_id": i} for i in range(5)])
+        await store.store_creator({"user_id": "u"})
+        await store.store_contact(contact_item={"id": 1})
+        await store.close()
+
+        self.assertTrue(backend.closed)
+        self.assertEqual(backend.calls, [
+            ("comments", [{"comment_id": i} for i in range(5)]),
+            ("creator", {"user_id": "u"}),
+            ("contact", {"id": 1}),
+        ])
+        stats = store.stats()
+        self.assertEqual(stats["enqueued"], 7)
+        self.assertEqual(stats["written"], 7)
+        self.assertEqual(stats["depth"], 0)
+
+    async def test_full_queue_applies_backpressure(self):
+        backend = RecordingStore(delay=0.01)
+        store = WriteBehindStore(backend, max_size=2, batch_size=1, workers=1)
+        for i in range(6):
+            await store.store_comment({"comment_id": i})
+            self.assertLessEqual(store.stats()["depth"], 2)
+        await store.close()
+
+        written = [item["comment_id"] for _, items in backend.calls for item in items]
+        self.assertEqual(written, list(range(6)))
+        self.assertGreater(store.stats()["backpressure_waits"], 0)
+
+    async def test_backend_attributes_are_forwarded(self):
+        backend = RecordingStore()
+        backend.file_writer = object()
+        store = WriteBehindStore(backend)
+        self.assertIs(store.file_writer, backend.file_writer)
+        await store.close()
+
+    async def test_failed_writes_are_raised_not_dropped(self):
+        backend = FailingStore()
+        store = WriteBehindStore(backend, max_size=100, batch_size=10, workers=1)
+        await store.store_comments([{"comment_id": i} for i in range(3)])
+        with self.assertRaises(StoreWriteError) as ctx:
+            await store.drain()
+        self.assertEqual(ctx.exception.records, [("comment", [{"comment_id": i} for i in range(3)])])
+        self.assertIsInstance(ctx.exception.__cause__, IOError)
+
+        # 写入失败会在下一次入队时抛出
+        await store.store_comment({"comment_id": 3})
+        await store._queue.join()
+        with self.assertRaises(StoreWriteError):
+            await store.store_comment({"comment_id": 4})
+
+        # 关闭时抛出, 真实存储仍会被关闭
+        await store.store_comment({"comment_id": 5})
+        with self.assertRaises(StoreWriteError):
+            await store.close()
+        self.assertTrue(backend.closed)
+
+    async def test_written_future_confirms_earlier_records(self):
+        backend = RecordingStore(delay=0.01)
+        store = WriteBehindStore(backend, max_size=100, batch_size=2, workers=1)
+        self.assertTrue(await store.written())
+        await store.store_comments([{"comment_id": i} for i in range(3)])
+        written = store.written()
+        await store.store_comment({"comment_id": 3})
+        self.assertFalse(written.done())
+        # 只等待 written() 之前入队的记录
+        self.assertTrue(await written)
+        self.assertGreaterEqual(sum(len(call[1]) for call in backend.calls), 3)
+
+        failing = WriteBehindStore(FailingStore(), max_size=100, batch_size=10, workers=1)
+        await failing.store_comments([{"comment_id": 1}])
+        self.assertFalse(await failing.written())
+        with self.assertRaises(StoreWriteError):
+            await failing.close()
+        await store.close()
+
+    async def test_reset_store_drains_the_queue(self):
+        from store.douyin import DouyinStoreFactory
+        backend = RecordingStore(delay=0.01)
+        DouyinStoreFactory._current_store = WriteBehindStore(backend, max_size=100, batch_size=10, workers=1)
+        await DouyinStoreFactory._current_store.store_comments([{"comment_id": 1}])
+        await DouyinStoreFactory.reset_store()
+        self.assertIsNone(DouyinStoreFactory._current_store)
+        self.assertEqual(backend.calls, [("comments", [{"comment_id": 1}])])
+        self.assertTrue(backend.closed)
@@ -0,0 +1,174 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+import asyncio
+import time
+from typing import List
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import patch
+
+import httpx
+
+from media_platform.xhs.client import XiaoHongShuClient
+from media_platform.xhs.exception import DataFetchError, TransientFetchError
+from media_platform.xhs.signer import XhsPageSigner
+
+
+class FakePage:
+
+    def __init__(self, name: str, ready_after: int = 0, delay_sec: float = 0):
+        self.name = name
+        self.ready_after = ready_after
+        self.delay_sec = delay_sec
+        self.calls: List[list] = []
+        self.closed = False
+        self.b1 = "b1-value"
+
+    async def evaluate(self, expression: str, arg=None):
+        self.calls.append(arg)
+        await asyncio.sleep(self.delay_sec)
+        if len(self.calls) <= self.ready_after:
+            return None
+        url, data, with_b1 = arg
+        # 真实的 X-s 是较长的 base64 串, help.sign 的校验和至少需要 57 个字符
+        return {"x_s": f"XYW_{self.name}_{url}_" + "e" * 60, "x_t": 1700000000000, "b1": self.b1 if with_b1 else None}
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeBrowserContext:
+
+    def __init__(self):
+        self.pages: List[FakePage] = []
+
+    async def new_page(self):
+        page = FakePage(f"extra{len(self.pages)}", delay_sec=0.05)
+        page.goto = self._goto
+        self.pages.append(page)
+        return page
+
+    async def _goto(self, url):
+        pass
+
+    async def cookies(self):
+        return [{"name": "a1", "value": "a1-new"}]
+
+
+class TestXhsPageSigner(IsolatedAsyncioTestCase):
+
+    async def test_one_evaluate_per_sign_and_b1_cached(self):
+        page = FakePage("main")
+        signer = XhsPageSigner(page)
+        first = await signer.sign("/api/a")
+        second = await signer.sign("/api/b", {"k": 1})
+        self.assertEqual(first, {"x_s": "XYW_main_/api/a_" + "e" * 60, "x_t": "1700000000000", "b1": "b1-value"})
+        self.assertEqual(second["b1"], "b1-value")
+        # 只有第一次签名读取 b1
+        self.assertEqual([call[2] for call in page.calls], [True, False])
+
+        signer.invalidate_b1()
+        await signer.sign("/api/c")
+        self.assertTrue(page.calls[-1][2])
+
+    async def test_empty_b1_is_not_cached(self):
+        page = FakePage("main")
+        page.b1 = ""
+        signer = XhsPageSigner(page)
+        self.assertEqual((await signer.sign("/api/a"))["b1"], "")
+        page.b1 = "b1-value"
+        self.assertEqual((await signer.sign("/api/b"))["b1"], "b1-value")
+        await signer.sign("/api/c")
+        self.assertEqual([call[2] for call in page.calls], [True, True, False])
+
+    async def test_waits_until_sign_function_is_loaded(self):
+        page = FakePage("main", ready_after=2)
+        signer = XhsPageSigner(page, retry_interval_sec=0)
+        result = await signer.sign("/api/a")
+        self.assertTrue(result["x_s"].startswith("XYW_main_/api/a_"))
+        self.assertEqual(len(page.calls), 3)
+
+        with self.assertRaises(Exception):
+            await XhsPageSigner(FakePage("main", ready_after=5), retry_interval_sec=0).sign("/api/a")
+
+    async def test_concurrent_signs_use_all_pages(self):
+        main_page = FakePage("main", delay_sec=0.05)
+        signer = XhsPageSigner(main_page)
+        context = FakeBrowserContext()
+        await signer.open_pages(context, "https://www.xiaohongshu.com", 1)
+
+        start = time.monotonic()
+        results = await asyncio.gather(*[signer.sign(f"/api/{i}") for i in range(4)])
+        # 两个页面并行签名, 4 次签名约为 2 次的耗时
+        self.assertLess(time.monotonic() - start, 0.18)
+        self.assertEqual({r["x_s"].split("_")[1] for r in results}, {"main", "extra0"})
+
+        await signer.close()
+        self.assertTrue(context.pages[0].closed)
+        self.assertFalse(main_page.closed)
+        self.assertEqual(signer.pages, [main_page])
+
+
+class TestXhsClientHeaders(IsolatedAsyncioTestCase):
+
+    async def test_pre_headers_do_not_touch_shared_headers(self):
+        page = FakePage("main")
+        client = XiaoHongShuClient(headers={"Cookie": "a1=a1-old"}, playwright_page=page, cookie_dict={"a1": "a1-old"})
+        headers = await client._pre_headers("/api/sns/web/v1/search/notes", {"keyword": "python"})
+        self.assertTrue(headers["X-S"].startswith("XYW_main_/api/sns/web/v1/search/notes_"))
+        self.assertEqual(headers["X-T"], "1700000000000")
+        self.assertIn("x-S-Common", headers)
+        self.assertEqual(headers["Cookie"], "a1=a1-old")
+        self.assertNotIn("X-S", client.headers)
+
+        await client.update_cookies(FakeBrowserContext())
+        await client._pre_headers("/api/sns/web/v1/feed")
+        self.assertTrue(page.calls[-1][2])
+        self.assertEqual(client.cookie_dict, {"a1": "a1-new"})
+
+
+class TestXhsClientErrors(IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.patch = patch.multiple("config", REQUEST_RETRY_BASE_DELAY_SEC=0, ENABLE_ADAPTIVE_RATE_LIMIT=False)
+        self.patch.start()
+
+    def tearDown(self):
+        self.patch.stop()
+
+    def build_client(self, responses: List[httpx.Response]) -> XiaoHongShuClient:
+        client = XiaoHongShuClient(headers={"Cookie": "a1=a1-old"}, playwright_page=FakePage("main"), cookie_dict={"a1": "a1-old"})
+        client.sent = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            client.sent.append(request)
+            return responses.pop(0)
+
+        client._http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        return client
+
+    async def test_only_transient_errors_are_retried(self):
+        client = self.build_client([
+            httpx.Response(200, json={"success": False, "code": 300013, "msg": "访问频次异常"}),
+            httpx.Response(502, text="bad gateway"),
+            httpx.Response(200, json={"success": True, "data": {"ok": 1}}),
+        ])
+        self.assertEqual(await client.get("/api/sns/web/v1/feed"), {"ok": 1})
+        self.assertEqual(len(client.sent), 3)
+        await client.aclose()
+
+        client = self.build_client([httpx.Response(200, json={"success": False, "code": -510001, "msg": "笔记不存在"})])
+        with self.assertRaises(DataFetchError) as cm:
+            await client.get("/api/sns/web/v1/feed")
+        self.assertNotIsInstance(cm.exception, TransientFetchError)
+        self.assertEqual(len(client.sent), 1)
+        await client.aclose()
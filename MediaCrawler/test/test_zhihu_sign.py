@@ -0,0 +1,85 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+import json
+import os
+import random
+import shutil
+import subprocess
+import tempfile
+import unittest
+from typing import List, Tuple
+from unittest.mock import patch
+
+from media_platform.zhihu import help
+from tools.resource_path import get_libs_path
+
+# 在 node 中执行 libs/zhihu.js, 用输入中的 random_byte 固定 Math.random, 逐条输出 x-zse-96
+_JS_DRIVER = """
+const inputs = JSON.parse(require("fs").readFileSync(0, "utf8"));
+const output = inputs.map(([url, cookies, randomByte]) => {
+    Math.random = () => (randomByte + 0.5) / 127;
+    return get_sign(url, cookies)["x-zse-96"];
+});
+process.stdout.write(JSON.stringify(output));
+"""
+
+_CHARS = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789-_.~/?&=%+:|,;知乎搜索😀"
+
+
+def random_inputs(count: int, seed: int = 20240610) -> List[Tuple[str, str, int]]:
+    rng = random.Random(seed)
+
+    def text(max_len: int) -> str:
+        return "".join(rng.choice(_CHARS) for _ in range(rng.randint(0, max_len)))
+
+    inputs = []
+    for _ in range(count):
+        url = "/api/v4/" + text(120)
+        cookies = [f"{text(6)}={text(20)}" for _ in range(rng.randint(0, 3))]
+        if rng.random() < 0.9:
+            cookies.insert(rng.randint(0, len(cookies)), f"d_c0={text(60)}")
+        inputs.append((url, "; ".join(cookies), rng.randrange(127)))
+    return inputs
+
+
+class TestZhihuNativeSign(unittest.TestCase):
+
+    @unittest.skipUnless(shutil.which("node"), "node is not installed")
+    def test_matches_zhihu_js(self):
+        inputs = random_inputs(3000)
+        with open(get_libs_path("zhihu.js"), encoding="utf-8-sig") as f:
+            source = f.read()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            script_path = os.path.join(tmp_dir, "zhihu_driver.js")
+            with open(script_path, "w", encoding="utf-8") as f:
+                f.write(source + "\n" + _JS_DRIVER)
+            completed = subprocess.run(
+                [shutil.which("node"), script_path], input=json.dumps(inputs).encode("utf-8"),
+                capture_output=True, check=True, timeout=120,
+            )
+        expected = json.loads(completed.stdout)
+        for (url, cookies, random_byte), js_value in zip(inputs, expected):
+            self.assertEqual(help.sign_native(url, cookies, random_byte)["x-zse-96"], js_value, (url, cookies, random_byte))
+        self.assertEqual(len(expected), len(inputs))
+
+    def test_sign_uses_native_by_default(self):
+        url, cookies = "/api/v4/search_v3?q=python", "d_c0=abc|1700000000"
+        with patch("media_platform.zhihu.help.sign_with_js") as sign_with_js:
+            result = help.sign(url, cookies)
+        sign_with_js.assert_not_called()
+        self.assertEqual(result["x-zst-81"], help.ZHIHU_X_ZST_81)
+        self.assertTrue(result["x-zse-96"].startswith("2.0_"))
+        self.assertEqual(len(result["x-zse-96"]), 68)
+        with patch("config.ZHIHU_SIGN_WITH_JS", True), patch("media_platform.zhihu.help.sign_with_js") as sign_with_js:
+            help.sign(url, cookies)
+        sign_with_js.assert_called_once_with(url, cookies)
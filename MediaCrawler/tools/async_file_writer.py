@@ -1,10 +1,15 @@
 import asyncio
 import csv
-import json
+import io
 import os
 import pathlib
-from typing import Dict, List, Optional
+import textwrap
+import time
+from typing import Any, Dict, List, Optional
 import aiofiles
+import config
+from tools import json_codec, parquet_util
+from tools.rotating_file_sink import RotatingFileSink
 from tools.utils import utils
 
 class AsyncFileWriter:
@@ -15,6 +20,23 @@ class AsyncFileWriter:
         self.output_dir = output_dir  # 🔥 新增：自定义输出目录
         self.file_paths = {}  # 🔥 新增：记录生成的文件路径
         self.creator_info = {}  # 🔥 新增：记录创作者信息(昵称、视频数量)
+        self._json_handles: Dict[str, Any] = {}  # 每个JSON文件保持一个打开的句柄
+        self._json_item_counts: Dict[str, int] = {}  # 每个JSON文件已写入的条数
+        self._csv_handles: Dict[str, Any] = {}  # 每个CSV文件保持一个打开的句柄
+        self._csv_writers: Dict[str, csv.DictWriter] = {}  # 每个CSV文件的DictWriter(写入内存缓冲)
+        self._csv_buffers: Dict[str, io.StringIO] = {}  # 每个CSV文件待刷盘的内存缓冲
+        self._csv_buffered_rows: Dict[str, int] = {}  # 每个CSV文件缓冲中的行数
+        self._csv_last_flush: Dict[str, float] = {}  # 每个CSV文件上次刷盘的时间
+        self._csv_dropped_keys: Dict[str, set] = {}  # 每个CSV文件已提示过的、表头中没有的字段
+        self._csv_flush_task: Optional[asyncio.Task] = None  # 按 csv_flush_interval 定时刷盘的任务
+        self.csv_flush_rows = config.CSV_FLUSH_ROWS
+        self.csv_flush_interval = config.CSV_FLUSH_INTERVAL_SEC
+        self.csv_compression = config.CSV_COMPRESSION
+        self.csv_rotate_max_bytes = config.CSV_ROTATE_MAX_BYTES
+        self.csv_rotate_max_rows = config.CSV_ROTATE_MAX_ROWS
+        self._parquet_writers: Dict[str, Any] = {}  # 每个Parquet文件一个 pq.ParquetWriter
+        self._parquet_buffers: Dict[str, List[Dict]] = {}  # 每个Parquet文件待写入的行
+        self.parquet_row_group_size = config.PARQUET_ROW_GROUP_SIZE
 
         # 🔥 定义CSV列顺序
         self.column_orders = {
@@ -100,7 +122,6 @@ class AsyncFileWriter:
         pathlib.Path(base_path).mkdir(parents=True, exist_ok=True)
 
         # 🔥 新命名规则：根据采集模式决定文件名
-        import config
         import re
         import time
 
@@ -211,36 +232,290 @@ class AsyncFileWriter:
 
         return ordered_fields + remaining_fields
 
+    async def _open_csv_writer(self, file_path: str, item: Dict, item_type: str) -> csv.DictWriter:
+        """
+        打开CSV文件句柄并创建DictWriter(每个文件只创建一次)
+
+        表头在首次写入时按 item_type 固定下来; 若文件已存在则沿用已有表头
+
+        Args:
+            file_path: CSV文件路径
+            item: 首条数据项, 用于确定表头
+            item_type: 数据类型（comments/contents/creators）
+
+        Returns:
+            写入内存缓冲的DictWriter
+        """
+        writer = self._csv_writers.get(file_path)
+        if writer is not None:
+            return writer
+
+        buffer = io.StringIO()
+        if self._csv_rotating():
+            # 分卷/压缩模式: 每个分卷都以表头开头, 表头由 RotatingFileSink 写入
+            fieldnames = self._get_ordered_fieldnames(item, item_type)
+            header_buffer = io.StringIO()
+            csv.DictWriter(header_buffer, fieldnames=fieldnames).writeheader()
+            writer = csv.DictWriter(buffer, fieldnames=fieldnames, extrasaction='ignore')
+            self._csv_handles[file_path] = RotatingFileSink(
+                file_path,
+                header=header_buffer.getvalue(),
+                compression=self.csv_compression,
+                max_bytes=self.csv_rotate_max_bytes,
+                max_rows=self.csv_rotate_max_rows,
+            )
+        else:
+            fieldnames = None
+            if os.path.exists(file_path) and os.path.getsize(file_path) > 0:
+                async with aiofiles.open(file_path, 'r', newline='', encoding='utf-8-sig') as f:
+                    header_line = await f.readline()
+                fieldnames = next(csv.reader([header_line]), None)
+
+            writer = csv.DictWriter(
+                buffer,
+                fieldnames=fieldnames or self._get_ordered_fieldnames(item, item_type),
+                extrasaction='ignore',
+            )
+            if not fieldnames:
+                writer.writeheader()
+            self._csv_handles[file_path] = await aiofiles.open(file_path, 'a', newline='', encoding='utf-8-sig')
+
+        self._csv_writers[file_path] = writer
+        self._csv_buffers[file_path] = buffer
+        self._csv_buffered_rows[file_path] = 0
+        self._csv_last_flush[file_path] = time.monotonic()
+        self._csv_dropped_keys[file_path] = set()
+        if self._csv_flush_task is None or self._csv_flush_task.done():
+            self._csv_flush_task = asyncio.create_task(self._csv_flush_loop())
+        return writer
+
+    async def _csv_flush_loop(self):
+        """
+        定时刷盘: 采集停顿(例如长时间等待浏览器)时, 缓冲中的行最多停留 csv_flush_interval 秒
+        """
+        while True:
+            await asyncio.sleep(self.csv_flush_interval)
+            async with self.lock:
+                now = time.monotonic()
+                for file_path in list(self._csv_buffers):
+                    if self._csv_buffered_rows[file_path] and now - self._csv_last_flush[file_path] >= self.csv_flush_interval:
+                        await self._flush_csv(file_path)
+
+    def _warn_dropped_keys(self, file_path: str, writer: csv.DictWriter, item: Dict):
+        """表头确定后新出现的字段不会写入CSV, 每个字段只提示一次"""
+        dropped = set(item) - set(writer.fieldnames) - self._csv_dropped_keys[file_path]
+        if dropped:
+            self._csv_dropped_keys[file_path].update(dropped)
+            utils.logger.warning(f"[AsyncFileWriter.write_to_csv] fields {sorted(dropped)} are not in the header of {file_path}, dropped")
+
+    async def _flush_csv(self, file_path: str):
+        """
+        将CSV内存缓冲写入磁盘
+
+        Args:
+            file_path: CSV文件路径
+        """
+        buffer = self._csv_buffers[file_path]
+        content = buffer.getvalue()
+        if content:
+            handle = self._csv_handles[file_path]
+            if isinstance(handle, RotatingFileSink):
+                await handle.write(content, rows=self._csv_buffered_rows[file_path])
+            else:
+                await handle.write(content)
+            await handle.flush()
+            buffer.seek(0)
+            buffer.truncate()
+        self._csv_buffered_rows[file_path] = 0
+        self._csv_last_flush[file_path] = time.monotonic()
+
+    def _csv_rotating(self) -> bool:
+        """是否启用了CSV压缩或分卷"""
+        return bool(self.csv_compression or self.csv_rotate_max_bytes or self.csv_rotate_max_rows)
+
     async def write_to_csv(self, item: Dict, item_type: str):
+        """
+        写入单条数据到CSV文件
+
+        数据先写入内存缓冲, 累计 csv_flush_rows 行或距上次刷盘超过
+        csv_flush_interval 秒时统一写入磁盘(没有新数据时由定时任务刷盘), close() 时保证最后一次刷盘;
+        启用压缩或分卷时写入 <文件名>_partNNNN.csv[.gz|.zst], 并生成 <文件名>_manifest.json
+
+        Args:
+            item: 数据项字典
+            item_type: 数据类型（comments/contents/creators）
+        """
         file_path = self._get_file_path('csv', item_type)
         async with self.lock:
-            file_exists = os.path.exists(file_path)
+            writer = await self._open_csv_writer(file_path, item, item_type)
+            self._warn_dropped_keys(file_path, writer, item)
+            writer.writerow(item)
+            self._csv_buffered_rows[file_path] += 1
+            handle = self._csv_handles[file_path]
+            if (self._csv_buffered_rows[file_path] >= self.csv_flush_rows
+                    or (isinstance(handle, RotatingFileSink) and handle.reaches_max_rows(self._csv_buffered_rows[file_path]))
+                    or time.monotonic() - self._csv_last_flush[file_path] >= self.csv_flush_interval):
+                await self._flush_csv(file_path)
 
-            # 🔥 使用有序的字段名
-            fieldnames = self._get_ordered_fieldnames(item, item_type)
+    async def _open_json_handle(self, file_path: str):
+        """
+        打开JSON文件句柄(每个文件只打开一次)
+
+        已存在的文件只在首次打开时解析一次, 格式不一致时写入临时文件后用 os.replace 替换,
+        中途崩溃不会丢失已有数据; 之后的写入全部为追加, 不再回读整个文件
+
+        Args:
+            file_path: JSON文件路径
+
+        Returns:
+            文件句柄
+        """
+        handle = self._json_handles.get(file_path)
+        if handle is not None:
+            return handle
+
+        existing_data = []
+        if os.path.exists(file_path) and os.path.getsize(file_path) > 0:
+            async with aiofiles.open(file_path, 'rb') as f:
+                content = await f.read()
+            try:
+                existing_data = json_codec.loads(content)
+            except json_codec.JSONDecodeError:
+                # 无法解析的文件保留为 .bak, 不直接覆盖
+                backup_path = f"{file_path}.bak"
+                os.replace(file_path, backup_path)
+                utils.logger.warning(f"[AsyncFileWriter._open_json_handle] invalid json in {file_path}, moved to {backup_path}")
+                content, existing_data = b"", []
+            if not isinstance(existing_data, list):
+                existing_data = [existing_data]
+            normalized = json_codec.dumps_bytes(existing_data, indent=True) if existing_data else b""
+            if normalized != content:
+                tmp_path = f"{file_path}.tmp"
+                async with aiofiles.open(tmp_path, 'wb') as f:
+                    await f.write(normalized)
+                    await f.flush()
+                    await asyncio.to_thread(os.fsync, f.fileno())
+                os.replace(tmp_path, file_path)
 
-            async with aiofiles.open(file_path, 'a', newline='', encoding='utf-8-sig') as f:
-                writer = csv.DictWriter(f, fieldnames=fieldnames)
-                if not file_exists or await f.tell() == 0:
-                    await writer.writeheader()
-                await writer.writerow(item)
+        handle = await aiofiles.open(file_path, 'r+b' if os.path.exists(file_path) else 'w+b')
+        self._json_handles[file_path] = handle
+        self._json_item_counts[file_path] = len(existing_data)
+        return handle
 
     async def write_single_item_to_json(self, item: Dict, item_type: str):
+        """
+        追加写入单条数据到JSON数组文件, 每次写入为O(1)
+
+        文件始终保持为合法的JSON数组, 格式与 json.dumps(list, indent=4) 完全一致:
+        每次追加时覆盖末尾的 "\n]", 写入 ",\n<item>\n]"
+
+        Args:
+            item: 数据项字典
+            item_type: 数据类型（comments/contents/creators）
+        """
         file_path = self._get_file_path('json', item_type)
         async with self.lock:
-            existing_data = []
-            if os.path.exists(file_path) and os.path.getsize(file_path) > 0:
-                async with aiofiles.open(file_path, 'r', encoding='utf-8') as f:
-                    try:
-                        content = await f.read()
-                        if content:
-                            existing_data = json.loads(content)
-                        if not isinstance(existing_data, list):
-                            existing_data = [existing_data]
-                    except json.JSONDecodeError:
-                        existing_data = []
-            
-            existing_data.append(item)
-
-            async with aiofiles.open(file_path, 'w', encoding='utf-8') as f:
-                await f.write(json.dumps(existing_data, ensure_ascii=False, indent=4))
\ No newline at end of file
+            handle = await self._open_json_handle(file_path)
+            item_text = textwrap.indent(json_codec.dumps(item, indent=True), "    ")
+            if self._json_item_counts[file_path] == 0:
+                await handle.seek(0)
+                await handle.truncate()
+                await handle.write(f"[\n{item_text}\n]".encode('utf-8'))
+            else:
+                await handle.seek(-2, os.SEEK_END)
+                await handle.write(f",\n{item_text}\n]".encode('utf-8'))
+            await handle.flush()
+            self._json_item_counts[file_path] += 1
+
+    async def _open_parquet_writer(self, file_path: str, item: Dict, item_type: str, model=None):
+        """
+        创建Parquet写入器(每个文件只创建一次), schema 由首条数据的字段和ORM模型确定
+
+        Parquet文件不能追加, 若同名文件已存在则改用带序号的新文件名
+
+        Args:
+            file_path: Parquet文件路径
+            item: 首条数据项
+            item_type: 数据类型（comments/contents/creators）
+            model: database/models.py 中对应的ORM模型
+
+        Returns:
+            (实际文件路径, pq.ParquetWriter)
+        """
+        writer = self._parquet_writers.get(file_path)
+        if writer is not None:
+            return file_path, writer
+
+        real_path = file_path
+        index = 1
+        while os.path.exists(real_path):
+            index += 1
+            real_path = file_path[:-len(".parquet")] + f"_{index}.parquet"
+        if real_path != file_path:
+            self.file_paths[f"parquet_{item_type}"] = real_path
+
+        schema = parquet_util.build_schema(self._get_ordered_fieldnames(item, item_type), model, first_row=item)
+        writer = parquet_util.pq.ParquetWriter(real_path, schema, compression="snappy")
+        self._parquet_writers[real_path] = writer
+        self._parquet_buffers[real_path] = []
+        return real_path, writer
+
+    async def _flush_parquet(self, file_path: str):
+        """
+        将缓冲的行作为一个 row group 写入Parquet文件
+
+        Args:
+            file_path: Parquet文件路径
+        """
+        rows = self._parquet_buffers[file_path]
+        if not rows:
+            return
+        writer = self._parquet_writers[file_path]
+        batch = parquet_util.rows_to_record_batch(rows, writer.schema)
+        await asyncio.to_thread(writer.write_batch, batch)
+        self._parquet_buffers[file_path] = []
+
+    async def write_to_parquet(self, item: Dict, item_type: str, model=None):
+        """
+        写入单条数据到Parquet文件
+
+        数据先缓冲在内存中, 累计 parquet_row_group_size 行后作为一个 row group 写入,
+        close() 时写入剩余的行并写出文件尾
+
+        Args:
+            item: 数据项字典
+            item_type: 数据类型（comments/contents/creators）
+            model: database/models.py 中对应的ORM模型, 用于确定列类型
+        """
+        parquet_util.ensure_pyarrow()
+        file_path = self._get_file_path('parquet', item_type)
+        async with self.lock:
+            file_path, _ = await self._open_parquet_writer(file_path, item, item_type, model)
+            self._parquet_buffers[file_path].append(item)
+            if len(self._parquet_buffers[file_path]) >= self.parquet_row_group_size:
+                await self._flush_parquet(file_path)
+
+    async def close(self):
+        """刷新CSV/Parquet缓冲并关闭所有打开的文件句柄"""
+        if self._csv_flush_task is not None:
+            self._csv_flush_task.cancel()
+            self._csv_flush_task = None
+        async with self.lock:
+            for file_path, writer in self._parquet_writers.items():
+                await self._flush_parquet(file_path)
+                await asyncio.to_thread(writer.close)
+            self._parquet_writers.clear()
+            self._parquet_buffers.clear()
+            for file_path, handle in self._csv_handles.items():
+                await self._flush_csv(file_path)
+                await handle.close()
+            self._csv_handles.clear()
+            self._csv_writers.clear()
+            self._csv_buffers.clear()
+            self._csv_buffered_rows.clear()
+            self._csv_last_flush.clear()
+            self._csv_dropped_keys.clear()
+            for handle in self._json_handles.values():
+                await handle.close()
+            self._json_handles.clear()
+            self._json_item_counts.clear()
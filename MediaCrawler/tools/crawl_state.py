@@ -0,0 +1,325 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+# @Desc    : 增量抓取状态：SQLite 记录每个内容的评论游标、最新评论时间、上次抓取时间、已抓取的评论ID和已保存的内容ID，
+#            重复抓取时从中断处续抓，或者只抓新评论、遇到已抓取的评论即停止，已保存过的内容不再重复保存。
+#            状态在存储队列确认写入对应记录后才在后台提交，写入失败的评论/内容下次会重新抓取；
+#            SQLite 读写都放到线程中执行，不阻塞事件循环
+import asyncio
+import dataclasses
+import os
+import pathlib
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+import config
+from tools import utils
+
+
+@dataclass
+class CrawlState:
+    platform: str
+    item_id: str
+    last_cursor: str = ""
+    newest_comment_ts: int = 0
+    last_crawl_ts: float = 0.0
+    # 上次抓取是否翻到了最后一页, 未完成时下次从 last_cursor 续抓
+    finished: bool = False
+
+
+class CrawlStateStore:
+    """
+    SQLite store of the comment crawl state of every content item and of the comment ids already crawled
+    """
+
+    def __init__(self, db_path: str = None):
+        self._db_path = db_path or config.CRAWL_STATE_DB_PATH
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            pathlib.Path(os.path.dirname(self._db_path) or ".").mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(self._db_path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS crawl_state ("
+                "platform TEXT NOT NULL, item_id TEXT NOT NULL, last_cursor TEXT NOT NULL DEFAULT '', "
+                "newest_comment_ts INTEGER NOT NULL DEFAULT 0, last_crawl_ts REAL NOT NULL DEFAULT 0, "
+                "finished INTEGER NOT NULL DEFAULT 0, PRIMARY KEY (platform, item_id))"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS seen_comment ("
+                "platform TEXT NOT NULL, item_id TEXT NOT NULL, comment_id TEXT NOT NULL, "
+                "PRIMARY KEY (platform, item_id, comment_id)) WITHOUT ROWID"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS seen_content ("
+                "platform TEXT NOT NULL, item_id TEXT NOT NULL, "
+                "PRIMARY KEY (platform, item_id)) WITHOUT ROWID"
+            )
+            self._conn.commit()
+        return self._conn
+
+    def get_state(self, platform: str, item_id: str) -> Optional[CrawlState]:
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT last_cursor, newest_comment_ts, last_crawl_ts, finished FROM crawl_state "
+                "WHERE platform = ? AND item_id = ?", (platform, str(item_id))
+            ).fetchone()
+        if row is None:
+            return None
+        return CrawlState(platform, str(item_id), row[0], row[1], row[2], bool(row[3]))
+
+    def seen_ids(self, platform: str, item_id: str, comment_ids: Iterable[str]) -> Set[str]:
+        """
+        the subset of comment_ids already crawled for the item
+        """
+        comment_ids = list({str(comment_id) for comment_id in comment_ids})
+        if not comment_ids:
+            return set()
+        placeholders = ",".join("?" * len(comment_ids))
+        with self._lock:
+            rows = self._connection().execute(
+                f"SELECT comment_id FROM seen_comment WHERE platform = ? AND item_id = ? AND comment_id IN ({placeholders})",
+                (platform, str(item_id), *comment_ids),
+            ).fetchall()
+        return {row[0] for row in rows}
+
+    def seen_content_ids(self, platform: str, item_ids: Iterable[str]) -> Set[str]:
+        """
+        the subset of item_ids whose content has already been stored
+        """
+        item_ids = list({str(item_id) for item_id in item_ids})
+        if not item_ids:
+            return set()
+        placeholders = ",".join("?" * len(item_ids))
+        with self._lock:
+            rows = self._connection().execute(
+                f"SELECT item_id FROM seen_content WHERE platform = ? AND item_id IN ({placeholders})",
+                (platform, *item_ids),
+            ).fetchall()
+        return {row[0] for row in rows}
+
+    def save_contents(self, platform: str, item_ids: Iterable[str]):
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.executemany(
+                    "INSERT OR IGNORE INTO seen_content (platform, item_id) VALUES (?, ?)",
+                    [(platform, str(item_id)) for item_id in item_ids],
+                )
+
+    def save_page(self, state: CrawlState, comment_ids: Iterable[str]):
+        """
+        save the state and the comment ids of one crawled page in one transaction
+        """
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.executemany(
+                    "INSERT OR IGNORE INTO seen_comment (platform, item_id, comment_id) VALUES (?, ?, ?)",
+                    [(state.platform, state.item_id, str(comment_id)) for comment_id in comment_ids],
+                )
+                conn.execute(
+                    "INSERT OR REPLACE INTO crawl_state "
+                    "(platform, item_id, last_cursor, newest_comment_ts, last_crawl_ts, finished) VALUES (?, ?, ?, ?, ?, ?)",
+                    (state.platform, state.item_id, state.last_cursor, state.newest_comment_ts,
+                     state.last_crawl_ts, int(state.finished)),
+                )
+
+    async def comment_cursor(self, platform: str, item_id: str, id_key: str, ts_key: str) -> "CommentCrawlCursor":
+        state = await asyncio.to_thread(self.get_state, platform, str(item_id))
+        return CommentCrawlCursor(self, state or CrawlState(platform, str(item_id)), id_key, ts_key)
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class _ConfirmedSaves:
+    """
+    Saves of crawl state run in order by a background task, each one once the store queue writes
+    enqueued before it are confirmed (store.write_behind.pending_writes). After a failed write
+    the remaining saves are dropped, so the state never gets ahead of the stored data.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.failed = False
+        self._saves: List[tuple] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def add(self, save: Callable[[], None], on_done: Callable[[], None] = None):
+        from store.write_behind import pending_writes
+
+        if self.failed:
+            return
+        self._saves.append((pending_writes(), save, on_done))
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+            _save_tasks.add(self._task)
+            self._task.add_done_callback(_save_tasks.discard)
+
+    async def _run(self):
+        while self._saves:
+            writes, save, on_done = self._saves[0]
+            if not all(await asyncio.gather(*writes)):
+                self.failed = True
+                utils.logger.warning(f"[crawl_state] store write failed, {len(self._saves)} pending {self.name} save(s) dropped")
+                for _, _, dropped_done in self._saves:
+                    if dropped_done:
+                        dropped_done()
+                self._saves.clear()
+                return
+            try:
+                await asyncio.to_thread(save)
+            finally:
+                self._saves.pop(0)
+                if on_done:
+                    on_done()
+
+
+class CommentCrawlCursor:
+    """
+    Incremental state of one comment crawl of an item, used by the get_xxx_all_comments loops:
+
+    - the previous crawl stopped before the last page (max_count reached, interrupted): resume from its cursor
+    - otherwise page from the start and stop at the first page without any new comment
+
+    Comments already crawled are dropped from every page, so the callbacks only store new ones.
+    """
+
+    def __init__(self, store: CrawlStateStore, state: CrawlState, id_key: str, ts_key: str):
+        self.store = store
+        self.id_key = id_key
+        self.ts_key = ts_key
+        self.state = state
+        self.resuming = False
+        # 已提交但存储还未确认写入的页面
+        self._saves = _ConfirmedSaves(f"{state.platform} {state.item_id} comment page")
+        self._pending_ids: Set[str] = set()
+
+    def start_cursor(self, initial: Any) -> Any:
+        """
+        cursor of the first page: the saved one when the previous crawl is unfinished, else initial
+        """
+        if not self.state.finished and self.state.last_cursor not in ("", str(initial)):
+            self.resuming = True
+            return type(initial)(self.state.last_cursor)
+        return initial
+
+    async def new_comments(self, comments: List[Dict]) -> List[Dict]:
+        seen = await asyncio.to_thread(self.store.seen_ids, self.state.platform, self.state.item_id,
+                                       [comment.get(self.id_key) for comment in comments])
+        seen |= self._pending_ids
+        result = []
+        for comment in comments:
+            comment_id = str(comment.get(self.id_key))
+            if comment_id not in seen:
+                seen.add(comment_id)
+                result.append(comment)
+        return result
+
+    async def commit(self, comments: List[Dict], next_cursor: Any, has_more: bool) -> bool:
+        """
+        Save the stored comments of a page and the cursor to resume from.
+        The page is saved in the background once the store queue confirms its comments are written,
+        the crawl does not wait for it; a failed write drops this and the later pages, so they are fetched again.
+
+        Args:
+            comments: the new comments of the page passed to the callback
+            next_cursor: cursor of the next page, or of this page when it was truncated
+            has_more: whether there are pages after next_cursor
+
+        Returns:
+            whether the crawl should go on with the next page
+        """
+        timestamps = [comment.get(self.ts_key) or 0 for comment in comments]
+        self.state.newest_comment_ts = max([self.state.newest_comment_ts, *timestamps])
+        self.state.last_cursor = "" if next_cursor is None else str(next_cursor)
+        self.state.finished = not has_more
+        self.state.last_crawl_ts = time.time()
+        state = dataclasses.replace(self.state)
+        comment_ids = [str(comment.get(self.id_key)) for comment in comments]
+        self._pending_ids.update(comment_ids)
+        self._saves.add(lambda: self.store.save_page(state, comment_ids),
+                        lambda: self._pending_ids.difference_update(comment_ids))
+        # 续抓时翻过的页面本来就是新的; 从头抓时整页都已抓取过, 说明之后都是已知评论
+        return bool(has_more) and (self.resuming or bool(comments))
+
+
+_crawl_state_store: Optional[CrawlStateStore] = None
+# 等待存储确认后保存状态的后台任务
+_save_tasks: Set[asyncio.Task] = set()
+# 已交给存储、还未保存为已抓取的内容ID: platform -> item_ids
+_pending_contents: Dict[str, Set[str]] = {}
+_content_saves: Optional[_ConfirmedSaves] = None
+
+
+def get_crawl_state_store() -> CrawlStateStore:
+    global _crawl_state_store
+    if _crawl_state_store is None:
+        _crawl_state_store = CrawlStateStore()
+    return _crawl_state_store
+
+
+async def comment_crawl_cursor(platform: str, item_id: str, id_key: str, ts_key: str) -> Optional[CommentCrawlCursor]:
+    """
+    incremental cursor of an item's comment crawl, None when ENABLE_INCREMENTAL_CRAWL is off
+    """
+    if not config.ENABLE_INCREMENTAL_CRAWL:
+        return None
+    return await get_crawl_state_store().comment_cursor(platform, item_id, id_key, ts_key)
+
+
+async def content_already_crawled(platform: str, item_id: str) -> bool:
+    """
+    whether the content was stored by a previous crawl, always False when ENABLE_INCREMENTAL_CRAWL is off
+    """
+    if not config.ENABLE_INCREMENTAL_CRAWL:
+        return False
+    item_id = str(item_id)
+    if item_id in _pending_contents.get(platform, ()):
+        return True
+    return bool(await asyncio.to_thread(get_crawl_state_store().seen_content_ids, platform, [item_id]))
+
+
+def remember_crawled_content(platform: str, item_id: str):
+    """
+    mark a content handed to the store, it is saved as crawled once the store confirms the write
+    """
+    global _content_saves
+    if not config.ENABLE_INCREMENTAL_CRAWL:
+        return
+    if _content_saves is None:
+        _content_saves = _ConfirmedSaves("content")
+    item_id = str(item_id)
+    pending = _pending_contents.setdefault(platform, set())
+    pending.add(item_id)
+    _content_saves.add(lambda: get_crawl_state_store().save_contents(platform, [item_id]),
+                       lambda: pending.discard(item_id))
+
+
+async def flush_crawl_state():
+    """
+    wait for the background state saves, call after the store is closed so every pending write is confirmed
+    """
+    global _content_saves
+    while _save_tasks:
+        await asyncio.gather(*list(_save_tasks), return_exceptions=True)
+    _content_saves = None
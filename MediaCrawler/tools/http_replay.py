@@ -0,0 +1,222 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+# @Desc    : HTTP 录制/回放：录制模式把真实响应追加写入 jsonl 夹具文件，回放模式按规范化的请求键离线返回录制的响应
+import base64
+import hashlib
+import json
+import os
+import pathlib
+import threading
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional
+
+import httpx
+
+import config
+
+# 录制时丢弃的响应头: 保存的 body 已经解压, 回放时不能再按原编码解码
+_DROP_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "set-cookie"}
+
+
+class ReplayMissError(LookupError):
+    """the request was not recorded in the fixture file"""
+
+
+def replay_key(method: str, url: Any, body: bytes = b"", ignore_params: Iterable[str] = None) -> str:
+    """
+    normalized request key: method, host, path, sorted query without the volatile params
+    (signatures, timestamps, fingerprints) and the hash of the body
+    """
+    ignore_params = set(config.REQUEST_CACHE_IGNORE_PARAMS if ignore_params is None else ignore_params)
+    url = httpx.URL(str(url))
+    query = sorted((k, v) for k, v in url.params.multi_items() if k not in ignore_params)
+    key = f"{method.upper()} {url.host}{url.path}?{json.dumps(query, ensure_ascii=False)}"
+    if body:
+        key += f" #{hashlib.sha1(body).hexdigest()}"
+    return key
+
+
+class ReplayStore:
+    """
+    Fixture file of recorded exchanges, one json object per line. Responses recorded several times
+    under the same key are replayed in recording order, the last one is repeated afterwards.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._entries: Dict[str, List[Dict]] = defaultdict(list)
+        self._cursors: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.recorded = 0
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._entries[entry["key"]].append(entry)
+
+    def append(self, entry: Dict):
+        with self._lock:
+            pathlib.Path(os.path.dirname(self.path) or ".").mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self._entries[entry["key"]].append(entry)
+            self.recorded += 1
+
+    def next(self, key: str) -> Dict:
+        entries = self._entries.get(key)
+        if not entries:
+            self.misses += 1
+            raise ReplayMissError(f"no recorded response for {key} in {self.path}")
+        index = min(self._cursors[key], len(entries) - 1)
+        self._cursors[key] += 1
+        self.hits += 1
+        return entries[index]
+
+    def stats(self) -> Dict[str, int]:
+        return {"replay_hits": self.hits, "replay_misses": self.misses, "recorded": self.recorded}
+
+
+def _encode_body(content: bytes) -> Dict[str, str]:
+    try:
+        return {"body": content.decode("utf-8")}
+    except UnicodeDecodeError:
+        return {"body_b64": base64.b64encode(content).decode("ascii")}
+
+
+def _decode_body(entry: Dict) -> bytes:
+    if "body_b64" in entry:
+        return base64.b64decode(entry["body_b64"])
+    return entry.get("body", "").encode("utf-8")
+
+
+class RecordingTransport(httpx.AsyncBaseTransport):
+    """
+    wrap the real transport and append every response to the fixture file
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, store: ReplayStore):
+        self.transport = transport
+        self.store = store
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        response = await self.transport.handle_async_request(request)
+        # aread 返回按 content-encoding 解压后的 body
+        content = await response.aread()
+        await response.aclose()
+        headers = [(k, v) for k, v in response.headers.multi_items() if k.lower() not in _DROP_HEADERS]
+        entry = {
+            "key": replay_key(request.method, request.url, request.content),
+            "url": str(request.url),
+            "status": response.status_code,
+            "headers": headers,
+        }
+        entry.update(_encode_body(content))
+        self.store.append(entry)
+        return httpx.Response(response.status_code, headers=headers, content=content, request=request)
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+class ReplayTransport(httpx.AsyncBaseTransport):
+    """
+    serve the recorded responses without touching the network, unknown requests raise ReplayMissError
+    """
+
+    def __init__(self, store: ReplayStore):
+        self.store = store
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        entry = self.store.next(replay_key(request.method, request.url, request.content))
+        return httpx.Response(entry["status"], headers=entry["headers"], content=_decode_body(entry), request=request)
+
+
+class RecordingPage:
+    """
+    Wrap a playwright page and record goto/content/evaluate, for the platforms reading pages
+    in the browser (tieba) or signing with the page localStorage (douyin, bilibili)
+    """
+
+    def __init__(self, page, store: ReplayStore):
+        self.page = page
+        self.store = store
+        self.url = ""
+
+    async def goto(self, url: str, **kwargs):
+        self.url = url
+        return await self.page.goto(url, **kwargs)
+
+    async def content(self) -> str:
+        content = await self.page.content()
+        self.store.append({"key": replay_key("PAGE", self.url), "url": self.url, "body": content})
+        return content
+
+    async def evaluate(self, expression: str, arg: Any = None) -> Any:
+        result = await self.page.evaluate(expression, arg)
+        self.store.append({"key": _evaluate_key(expression, arg), "result": result})
+        return result
+
+
+class ReplayPage:
+    """
+    stand-in for a playwright page serving what RecordingPage recorded
+    """
+
+    def __init__(self, store: ReplayStore):
+        self.store = store
+        self.url = ""
+
+    async def goto(self, url: str, **kwargs):
+        self.url = url
+
+    async def content(self) -> str:
+        return self.store.next(replay_key("PAGE", self.url))["body"]
+
+    async def evaluate(self, expression: str, arg: Any = None) -> Any:
+        return self.store.next(_evaluate_key(expression, arg))["result"]
+
+
+def _evaluate_key(expression: str, arg: Any) -> str:
+    return f"EVALUATE {expression} {json.dumps(arg, ensure_ascii=False, default=str)}"
+
+
+_stores: Dict[str, ReplayStore] = {}
+
+
+def get_replay_store(path: str = None) -> ReplayStore:
+    path = path or config.HTTP_REPLAY_FILE
+    if path not in _stores:
+        _stores[path] = ReplayStore(path)
+    return _stores[path]
+
+
+def create_replay_transport(mode: str, proxy: Optional[str] = None, **transport_kwargs) -> httpx.AsyncBaseTransport:
+    """
+    transport of the pooled api clients when config.HTTP_REPLAY_MODE is set
+    Args:
+        mode: record | replay
+        proxy: proxy of the real transport in record mode
+        **transport_kwargs: http2 / limits of the real transport
+
+    Returns:
+
+    """
+    store = get_replay_store()
+    if mode == "record":
+        return RecordingTransport(httpx.AsyncHTTPTransport(proxy=proxy, **transport_kwargs), store)
+    if mode == "replay":
+        return ReplayTransport(store)
+    raise ValueError(f"Unknown http replay mode: {mode}")
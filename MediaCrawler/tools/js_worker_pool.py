@@ -0,0 +1,233 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+# @Desc    : 常驻 JS 签名进程池：每个 node 进程只加载一次签名脚本，通过 stdin/stdout 按行收发 JSON 调用，
+#            签名不再阻塞事件循环，也不再为每次调用启动新进程。没有 node 时回退到 execjs 并放到线程中执行
+import asyncio
+import itertools
+import json
+import shutil
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import execjs
+
+from tools import utils
+
+# node 端的常驻服务: 在全局作用域执行签名脚本, 之后每行读取一个 {"id", "fn", "args"} 调用并返回 {"id", "result"|"error"}
+_NODE_BOOTSTRAP = r"""
+const fs = require("fs");
+const vm = require("vm");
+const readline = require("readline");
+vm.runInThisContext(fs.readFileSync(process.argv[1], "utf8").replace(/^﻿/, ""), {filename: process.argv[1]});
+const functions = {};
+const rl = readline.createInterface({input: process.stdin, terminal: false});
+rl.on("line", (line) => {
+    let msg;
+    try {
+        msg = JSON.parse(line);
+        const fn = functions[msg.fn] || (functions[msg.fn] = vm.runInThisContext(msg.fn));
+        process.stdout.write(JSON.stringify({id: msg.id, result: fn.apply(null, msg.args)}) + "\n");
+    } catch (e) {
+        process.stdout.write(JSON.stringify({id: msg ? msg.id : null, error: String(e && e.stack || e)}) + "\n");
+    }
+});
+rl.on("close", () => process.exit(0));
+"""
+
+
+class JsCallError(Exception):
+    pass
+
+
+class _NodeWorker:
+
+    def __init__(self, process: asyncio.subprocess.Process):
+        self.process = process
+        self.calls = 0
+
+    @property
+    def alive(self) -> bool:
+        return self.process.returncode is None
+
+    async def call(self, call_id: int, fn: str, args: List[Any]) -> Any:
+        message = json.dumps({"id": call_id, "fn": fn, "args": args}, ensure_ascii=False)
+        self.process.stdin.write(message.encode("utf-8") + b"\n")
+        await self.process.stdin.drain()
+        line = await self.process.stdout.readline()
+        if not line:
+            raise JsCallError(f"js worker exited with code {self.process.returncode}")
+        response = json.loads(line)
+        if response.get("id") != call_id:
+            raise JsCallError(f"js worker answered call {response.get('id')} instead of {call_id}")
+        if "error" in response:
+            raise JsCallError(response["error"])
+        self.calls += 1
+        return response.get("result")
+
+    def kill(self):
+        if self.alive:
+            try:
+                self.process.kill()
+            except ProcessLookupError:  # pragma: no cover - 进程刚好已退出
+                pass
+
+
+class JsWorkerPool:
+    """
+    Pool of long-lived node processes that load script_path once and run its global functions off the
+    event loop. Workers start lazily on the first call and are restarted after a crash or timeout.
+    Without a node binary, calls run through execjs in a worker thread.
+    """
+
+    def __init__(self, script_path: str, size: int = 2, timeout_sec: float = 10, node_path: Optional[str] = None):
+        self.script_path = script_path
+        self.size = max(1, size)
+        self.timeout_sec = timeout_sec
+        self.node_path = node_path or shutil.which("node") or shutil.which("nodejs")
+        self._idle: Optional[asyncio.Queue] = None
+        self._workers: List[_NodeWorker] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._start_lock: Optional[asyncio.Lock] = None
+        self._execjs_ctx = None
+        self._ids = itertools.count(1)
+        self.calls = 0
+        self.errors = 0
+        self.waiting = 0
+        self.in_flight = 0
+        # 签名耗时不含排队等待空闲进程的时间, 排队时间单独统计
+        self.total_latency_sec = 0.0
+        self.max_latency_sec = 0.0
+        self.total_wait_sec = 0.0
+
+    @property
+    def backend(self) -> str:
+        return "node" if self.node_path else "execjs"
+
+    async def call(self, fn: str, *args: Any) -> Any:
+        """
+        call the global function fn of the script with json serializable args
+        """
+        start = time.perf_counter()
+        try:
+            if self.node_path:
+                result, wait_sec = await self._call_node(fn, list(args))
+            else:
+                result, wait_sec = await asyncio.to_thread(self._call_execjs, fn, args), 0.0
+        except Exception:
+            self.errors += 1
+            raise
+        latency = time.perf_counter() - start - wait_sec
+        self.calls += 1
+        self.total_wait_sec += wait_sec
+        self.total_latency_sec += latency
+        self.max_latency_sec = max(self.max_latency_sec, latency)
+        return result
+
+    def _call_execjs(self, fn: str, args) -> Any:
+        if self._execjs_ctx is None:
+            with open(self.script_path, encoding="utf-8-sig") as f:
+                self._execjs_ctx = execjs.compile(f.read())
+        return self._execjs_ctx.call(fn, *args)
+
+    async def _ensure_started(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # 进程管道绑定在创建它的事件循环上, 换了事件循环(例如测试)就重新启动
+            self._discard_workers()
+            self._loop = loop
+            self._idle = asyncio.Queue()
+            self._start_lock = asyncio.Lock()
+        if self._workers:
+            return
+        async with self._start_lock:
+            if self._workers:
+                return
+            for _ in range(self.size):
+                worker = await self._spawn()
+                self._workers.append(worker)
+                self._idle.put_nowait(worker)
+            utils.logger.info(f"[JsWorkerPool] started {self.size} node workers for {self.script_path}")
+
+    async def _spawn(self) -> _NodeWorker:
+        process = await asyncio.create_subprocess_exec(
+            self.node_path, "-e", _NODE_BOOTSTRAP, self.script_path,
+            stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE,
+            limit=1 << 20,
+        )
+        return _NodeWorker(process)
+
+    async def _call_node(self, fn: str, args: List[Any]) -> Tuple[Any, float]:
+        await self._ensure_started()
+        self.waiting += 1
+        start = time.perf_counter()
+        try:
+            worker = await self._idle.get()
+        finally:
+            self.waiting -= 1
+        wait_sec = time.perf_counter() - start
+        self.in_flight += 1
+        try:
+            if not worker.alive:
+                worker = await self._replace(worker)
+            return await asyncio.wait_for(worker.call(next(self._ids), fn, args), self.timeout_sec), wait_sec
+        except (asyncio.TimeoutError, asyncio.CancelledError, JsCallError, OSError, ValueError) as e:
+            # 超时或被取消时管道里可能残留未读的响应, 重启进程; 脚本自身抛出的异常不影响进程
+            if not (isinstance(e, JsCallError) and worker.alive):
+                worker = await self._replace(worker)
+            raise
+        finally:
+            self.in_flight -= 1
+            self._idle.put_nowait(worker)
+
+    async def _replace(self, worker: _NodeWorker) -> _NodeWorker:
+        worker.kill()
+        new_worker = await self._spawn()
+        self._workers = [new_worker if w is worker else w for w in self._workers]
+        utils.logger.warning(f"[JsWorkerPool] restarted a node worker for {self.script_path}")
+        return new_worker
+
+    def _discard_workers(self):
+        for worker in self._workers:
+            worker.kill()
+        self._workers = []
+
+    async def close(self):
+        """
+        stop the node workers, the next call starts them again
+        """
+        workers, self._workers = self._workers, []
+        for worker in workers:
+            if worker.alive and self._loop is asyncio.get_running_loop():
+                worker.process.stdin.close()
+                try:
+                    await asyncio.wait_for(worker.process.wait(), 2)
+                except asyncio.TimeoutError:
+                    worker.kill()
+            else:
+                worker.kill()
+        self._loop = None
+
+    def stats(self) -> Dict[str, Any]:
+        avg_latency_ms = self.total_latency_sec * 1000 / self.calls if self.calls else 0.0
+        avg_wait_ms = self.total_wait_sec * 1000 / self.calls if self.calls else 0.0
+        return {
+            "backend": self.backend,
+            "workers": len(self._workers),
+            "calls": self.calls,
+            "errors": self.errors,
+            "queue_depth": self.waiting,
+            "in_flight": self.in_flight,
+            "avg_latency_ms": round(avg_latency_ms, 3),
+            "max_latency_ms": round(self.max_latency_sec * 1000, 3),
+            "avg_wait_ms": round(avg_wait_ms, 3),
+        }
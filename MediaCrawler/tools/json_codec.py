@@ -0,0 +1,150 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+# @Desc    : JSON 编解码层：安装 orjson 时使用 orjson，否则回退到标准库 json，API 响应解码和 JSON 文件写入统一经过这里
+import json
+import math
+from typing import Any, Callable, Dict, Optional, Union
+
+import config
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - 未安装 orjson 时回退到标准库
+    orjson = None
+
+# orjson 的解码异常是 json.JSONDecodeError 的子类, 调用方统一捕获这个异常即可
+JSONDecodeError = json.JSONDecodeError
+
+class StdlibJsonCodec:
+    name = "json"
+
+    def loads(self, data: Union[str, bytes, bytearray]) -> Any:
+        return json.loads(data)
+
+    def dumps(self, obj: Any, indent: bool = False, sort_keys: bool = False,
+              default: Optional[Callable[[Any], Any]] = None) -> bytes:
+        if indent:
+            text = json.dumps(obj, ensure_ascii=False, indent=4, sort_keys=sort_keys, default=default)
+        else:
+            text = json.dumps(obj, ensure_ascii=False, separators=(",", ":"), sort_keys=sort_keys, default=default)
+        return text.encode("utf-8")
+
+
+# orjson 支持的整数范围: int64 和 uint64
+_ORJSON_INT_MIN, _ORJSON_INT_MAX = -2 ** 63, 2 ** 64 - 1
+
+
+def _needs_stdlib(obj: Any) -> bool:
+    """
+    Whether obj holds a value orjson encodes differently from json.dumps: NaN/Infinity (orjson
+    writes null), floats printed with an exponent (1e16 vs 1e+16, 1e-05) and ints beyond 64 bits
+    (rejected by orjson)
+    """
+    stack = [obj]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, str):
+            continue
+        if isinstance(value, dict):
+            stack.extend(value.values())
+            stack.extend(key for key in value if not isinstance(key, str))
+        elif isinstance(value, (list, tuple)):
+            stack.extend(value)
+        elif isinstance(value, float):
+            if not math.isfinite(value) or (value != 0 and not 1e-4 <= abs(value) < 1e16):
+                return True
+        elif isinstance(value, int) and not _ORJSON_INT_MIN <= value <= _ORJSON_INT_MAX:
+            return True
+    return False
+
+
+class OrjsonCodec:
+    """
+    orjson backend; objects holding values that orjson formats differently (see _needs_stdlib)
+    are encoded with the stdlib, so the output is always the same as StdlibJsonCodec
+    """
+    name = "orjson"
+    _fallback = StdlibJsonCodec()
+
+    def loads(self, data: Union[str, bytes, bytearray]) -> Any:
+        return orjson.loads(data)
+
+    def dumps(self, obj: Any, indent: bool = False, sort_keys: bool = False,
+              default: Optional[Callable[[Any], Any]] = None) -> bytes:
+        if _needs_stdlib(obj):
+            return self._fallback.dumps(obj, indent=indent, sort_keys=sort_keys, default=default)
+        option = orjson.OPT_NON_STR_KEYS
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if not indent:
+            return orjson.dumps(obj, default=default, option=option)
+        data = orjson.dumps(obj, default=default, option=option | orjson.OPT_INDENT_2)
+        # orjson 只支持 2 空格缩进; 字符串中的换行都已转义, 行首空格只可能是缩进, 翻倍后与 json.dumps(indent=4) 一致
+        lines = []
+        for line in data.split(b"\n"):
+            stripped = line.lstrip(b" ")
+            lines.append(b" " * (2 * (len(line) - len(stripped))) + stripped)
+        return b"\n".join(lines)
+
+
+CODECS: Dict[str, Callable[[], Any]] = {
+    "json": StdlibJsonCodec,
+    "orjson": OrjsonCodec,
+}
+
+_codec = None
+
+
+def get_codec():
+    """
+    codec selected by config.JSON_CODEC: auto (orjson when installed) | orjson | json
+    """
+    global _codec
+    if _codec is None:
+        set_codec(config.JSON_CODEC)
+    return _codec
+
+
+def set_codec(name: str):
+    global _codec
+    if name == "auto":
+        name = "orjson" if orjson is not None else "json"
+    if name not in CODECS:
+        raise ValueError(f"Unknown json codec: {name}")
+    if name == "orjson" and orjson is None:
+        raise ValueError("json codec orjson is not installed, pip install orjson")
+    _codec = CODECS[name]()
+
+
+def loads(data: Union[str, bytes, bytearray]) -> Any:
+    return get_codec().loads(data)
+
+
+def dumps_bytes(obj: Any, indent: bool = False, sort_keys: bool = False,
+                default: Optional[Callable[[Any], Any]] = None) -> bytes:
+    """
+    UTF-8 JSON without ascii escaping; compact, or indented like json.dumps(indent=4)
+    """
+    return get_codec().dumps(obj, indent=indent, sort_keys=sort_keys, default=default)
+
+
+def dumps(obj: Any, indent: bool = False, sort_keys: bool = False,
+          default: Optional[Callable[[Any], Any]] = None) -> str:
+    return dumps_bytes(obj, indent=indent, sort_keys=sort_keys, default=default).decode("utf-8")
+
+
+def decode_response(response) -> Any:
+    """
+    decode the json body of an httpx response, replaces response.json()
+    """
+    return loads(response.content)
@@ -0,0 +1,198 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+# @Desc    : 内容寻址的媒体存储：URL->sha256 索引(SQLite) + 按哈希分片的 blob 目录，帖子目录下的文件链接到 blob
+import asyncio
+import hashlib
+import os
+import pathlib
+import shutil
+import sqlite3
+import threading
+import time
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+import config
+from tools.utils import utils
+
+# 下载函数签名: (url, save_file_name) -> 是否成功, 例如 DouYinClient.download_aweme_media
+MediaDownloader = Callable[[str, str], Awaitable[bool]]
+
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+
+class ContentAddressedMediaStore:
+    """
+    Media files are stored once under blobs/<h[:2]>/<h[2:4]>/<sha256><ext>, and every post path
+    is a hard link (falling back to a symlink, then a copy) to its blob. A SQLite table maps each
+    downloaded url to its hash so known urls are linked without being downloaded again.
+    """
+
+    def __init__(self, root_dir: str = None):
+        self.root_dir = root_dir or config.MEDIA_CAS_DIR
+        self.blob_dir = os.path.join(self.root_dir, "blobs")
+        self.tmp_dir = os.path.join(self.root_dir, "tmp")
+        self.index_path = os.path.join(self.root_dir, "media_index.db")
+        self._conn: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        # url -> (锁, 持有或等待该锁的协程数), 没有协程使用时移除, 长时间运行不会无限增长
+        self._url_locks: Dict[str, Tuple[asyncio.Lock, int]] = {}
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            pathlib.Path(self.root_dir).mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(self.index_path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS media_url_index ("
+                "url TEXT PRIMARY KEY, sha256 TEXT NOT NULL, ext TEXT NOT NULL, size INTEGER NOT NULL, add_ts INTEGER NOT NULL)"
+            )
+        return self._conn
+
+    def _lookup_sync(self, url: str) -> Optional[str]:
+        with self._db_lock:
+            row = self._connection().execute("SELECT sha256, ext FROM media_url_index WHERE url = ?", (url,)).fetchone()
+        if row is None:
+            return None
+        blob_path = self.blob_path(row[0], row[1])
+        return blob_path if os.path.exists(blob_path) else None
+
+    def _index_sync(self, url: str, sha256: str, ext: str, size: int):
+        with self._db_lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO media_url_index (url, sha256, ext, size, add_ts) VALUES (?, ?, ?, ?, ?)",
+                (url, sha256, ext, size, int(time.time() * 1000)),
+            )
+            conn.commit()
+
+    def blob_path(self, sha256: str, ext: str) -> str:
+        return os.path.join(self.blob_dir, sha256[:2], sha256[2:4], f"{sha256}{ext}")
+
+    def _tmp_file_name(self, url: str) -> str:
+        # 临时文件名由 url 决定, 中断后再次下载同一个 url 可以续传
+        return os.path.join(self.tmp_dir, hashlib.sha1(url.encode("utf-8")).hexdigest())
+
+    def _add_blob_sync(self, url: str, tmp_file_name: str, ext: str) -> str:
+        sha = hashlib.sha256()
+        with open(tmp_file_name, "rb") as f:
+            for chunk in iter(lambda: f.read(_HASH_CHUNK_SIZE), b""):
+                sha.update(chunk)
+        sha256 = sha.hexdigest()
+        blob_path = self.blob_path(sha256, ext)
+        size = os.path.getsize(tmp_file_name)
+        if os.path.exists(blob_path):
+            # 不同 url 的相同内容只保留一份
+            os.remove(tmp_file_name)
+        else:
+            pathlib.Path(os.path.dirname(blob_path)).mkdir(parents=True, exist_ok=True)
+            os.replace(tmp_file_name, blob_path)
+        self._index_sync(url, sha256, ext, size)
+        return blob_path
+
+    @staticmethod
+    def _link_sync(blob_path: str, save_file_name: str):
+        pathlib.Path(os.path.dirname(save_file_name) or ".").mkdir(parents=True, exist_ok=True)
+        if os.path.lexists(save_file_name):
+            os.remove(save_file_name)
+        try:
+            os.link(blob_path, save_file_name)
+            return
+        except OSError:
+            pass
+        try:
+            os.symlink(os.path.abspath(blob_path), save_file_name)
+        except OSError:
+            shutil.copyfile(blob_path, save_file_name)
+
+    async def fetch(self, url: str, save_file_name: str, download: MediaDownloader) -> bool:
+        """
+        Make save_file_name point at the content of url, downloading it only when the url is not indexed yet
+        Args:
+            url: media url
+            save_file_name: per-post file path, e.g. data/douyin/videos/<aweme_id>/video.mp4
+            download: platform download function writing url into a given file
+
+        Returns:
+            True when save_file_name is available
+        """
+        # 同一个 url 同时只下载一次, 后到的请求直接链接已下载的 blob
+        lock, users = self._url_locks.get(url, (None, 0))
+        if lock is None:
+            lock = asyncio.Lock()
+        self._url_locks[url] = (lock, users + 1)
+        try:
+            async with lock:
+                return await self._fetch_locked(url, save_file_name, download)
+        finally:
+            lock, users = self._url_locks[url]
+            if users <= 1:
+                del self._url_locks[url]
+            else:
+                self._url_locks[url] = (lock, users - 1)
+
+    async def _fetch_locked(self, url: str, save_file_name: str, download: MediaDownloader) -> bool:
+        blob_path = await asyncio.to_thread(self._lookup_sync, url)
+        if blob_path is None:
+            pathlib.Path(self.tmp_dir).mkdir(parents=True, exist_ok=True)
+            tmp_file_name = self._tmp_file_name(url)
+            if not await download(url, tmp_file_name):
+                return False
+            ext = os.path.splitext(save_file_name)[1]
+            blob_path = await asyncio.to_thread(self._add_blob_sync, url, tmp_file_name, ext)
+        else:
+            utils.logger.info(f"[ContentAddressedMediaStore.fetch] {url} already downloaded, link to {blob_path}")
+        await asyncio.to_thread(self._link_sync, blob_path, save_file_name)
+        return True
+
+    def close(self):
+        with self._db_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+_media_store: Optional[ContentAddressedMediaStore] = None
+
+
+def get_media_store() -> ContentAddressedMediaStore:
+    global _media_store
+    if _media_store is None:
+        _media_store = ContentAddressedMediaStore()
+    return _media_store
+
+
+def close_media_store():
+    """
+    close the url index connection, a later crawl opens it again
+    """
+    global _media_store
+    if _media_store is None:
+        return
+    store, _media_store = _media_store, None
+    store.close()
+
+
+async def fetch_media(url: str, save_file_name: str, download: MediaDownloader) -> bool:
+    """
+    Download url into save_file_name, going through the content addressed store when ENABLE_MEDIA_DEDUP is on
+    Args:
+        url: media url
+        save_file_name: per-post file path
+        download: platform download function writing url into a given file
+
+    Returns:
+        True when save_file_name is available
+    """
+    if not config.ENABLE_MEDIA_DEDUP:
+        return await download(url, save_file_name)
+    return await get_media_store().fetch(url, save_file_name, download)
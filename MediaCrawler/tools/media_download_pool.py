@@ -0,0 +1,181 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+# @Desc    : 媒体下载池：采集协程提交 url 后立即返回，后台 worker 按域名限流下载，失败的任务进入重试队列
+import asyncio
+import random
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlparse
+
+import config
+from tools.media_cas import MediaDownloader, close_media_store, fetch_media
+from tools.utils import utils
+
+
+@dataclass
+class MediaDownloadJob:
+    url: str
+    save_file_name: str
+    download: MediaDownloader
+    attempt: int = 0
+
+
+class MediaDownloadPool:
+    """
+    Background media download subsystem.
+    submit() only puts a job into the queue, `workers` tasks download the jobs with at most
+    `per_host_limit` concurrent downloads per host, failed jobs are put back after an
+    exponential backoff until `max_retries` is reached.
+    """
+
+    def __init__(self, workers: int = None, per_host_limit: int = None, max_retries: int = None,
+                 retry_backoff_sec: float = None, max_interval_sec: float = None):
+        self.workers = workers or config.MEDIA_DOWNLOAD_WORKERS
+        self.per_host_limit = per_host_limit or config.MEDIA_DOWNLOAD_PER_HOST_LIMIT
+        self.max_retries = config.MEDIA_DOWNLOAD_MAX_RETRIES if max_retries is None else max_retries
+        self.retry_backoff_sec = config.MEDIA_DOWNLOAD_RETRY_BACKOFF_SEC if retry_backoff_sec is None else retry_backoff_sec
+        # 同一域名两次下载之间的随机间隔上限, 与原先逐张下载时的 asyncio.sleep(random.random()) 一致
+        self.max_interval_sec = 1.0 if max_interval_sec is None else max_interval_sec
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._worker_tasks: List[asyncio.Task] = []
+        self._retry_tasks: set = set()
+        self._host_semaphores: Dict[str, asyncio.Semaphore] = {}
+        # 已提交但尚未最终成功/失败的任务数(包含等待重试的任务)
+        self._pending = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._metrics: Dict[str, int] = {
+            "submitted": 0,
+            "succeeded": 0,
+            "failed": 0,
+            "retried": 0,
+        }
+
+    def submit(self, url: str, save_file_name: str, download: MediaDownloader):
+        """
+        Hand off one media file to the pool and return immediately
+        Args:
+            url: media url
+            save_file_name: per-post file path
+            download: platform download function writing url into a given file
+        """
+        self._ensure_workers()
+        self._pending += 1
+        self._idle.clear()
+        self._metrics["submitted"] += 1
+        self._queue.put_nowait(MediaDownloadJob(url, save_file_name, download))
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        progress of the pool: submitted/succeeded/failed/retried jobs, queued and unfinished jobs
+        """
+        return dict(self._metrics, queued=self._queue.qsize(), pending=self._pending)
+
+    def _ensure_workers(self):
+        if self._worker_tasks:
+            return
+        for _ in range(self.workers):
+            self._worker_tasks.append(asyncio.create_task(self._worker()))
+
+    def _host_semaphore(self, url: str) -> asyncio.Semaphore:
+        host = urlparse(url).netloc
+        if host not in self._host_semaphores:
+            self._host_semaphores[host] = asyncio.Semaphore(self.per_host_limit)
+        return self._host_semaphores[host]
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._run_job(job)
+            finally:
+                self._queue.task_done()
+
+    async def _run_job(self, job: MediaDownloadJob):
+        async with self._host_semaphore(job.url):
+            try:
+                success = await fetch_media(job.url, job.save_file_name, job.download)
+            except Exception as e:
+                utils.logger.error(f"[MediaDownloadPool._run_job] download {job.url} error: {e}")
+                success = False
+            # 持有域名信号量时休眠, 控制对同一域名的请求频率
+            if self.max_interval_sec:
+                await asyncio.sleep(random.random() * self.max_interval_sec)
+
+        if success:
+            self._metrics["succeeded"] += 1
+            utils.logger.info(f"[MediaDownloadPool._run_job] save media {job.save_file_name} success ...")
+            self._finish_job()
+        elif job.attempt < self.max_retries:
+            job.attempt += 1
+            self._metrics["retried"] += 1
+            task = asyncio.create_task(self._retry_later(job))
+            self._retry_tasks.add(task)
+            task.add_done_callback(self._retry_tasks.discard)
+        else:
+            self._metrics["failed"] += 1
+            utils.logger.error(f"[MediaDownloadPool._run_job] give up {job.url} after {job.attempt + 1} attempt(s)")
+            self._finish_job()
+
+    async def _retry_later(self, job: MediaDownloadJob):
+        await asyncio.sleep(self.retry_backoff_sec * (2 ** (job.attempt - 1)))
+        self._queue.put_nowait(job)
+
+    def _finish_job(self):
+        self._pending -= 1
+        if self._pending == 0:
+            self._idle.set()
+        done = self._metrics["succeeded"] + self._metrics["failed"]
+        if done % 20 == 0 or self._pending == 0:
+            utils.logger.info(f"[MediaDownloadPool] progress: {self.stats()}")
+
+    async def drain(self):
+        """
+        wait until every submitted job succeeded or ran out of retries
+        """
+        await self._idle.wait()
+
+    async def close(self):
+        """
+        drain the pool and stop the worker tasks
+        """
+        await self.drain()
+        for task in self._worker_tasks + list(self._retry_tasks):
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, *self._retry_tasks, return_exceptions=True)
+        self._worker_tasks = []
+        self._retry_tasks = set()
+        if self._metrics["submitted"]:
+            utils.logger.info(f"[MediaDownloadPool.close] media download stats: {self.stats()}")
+
+
+_media_download_pool: Optional[MediaDownloadPool] = None
+
+
+def get_media_download_pool() -> MediaDownloadPool:
+    global _media_download_pool
+    if _media_download_pool is None:
+        _media_download_pool = MediaDownloadPool()
+    return _media_download_pool
+
+
+async def close_media_download_pool():
+    """
+    wait for the submitted media downloads and release the pool, a later crawl gets a new pool;
+    the media url index used by the downloads is closed as well
+    """
+    global _media_download_pool
+    if _media_download_pool is not None:
+        pool, _media_download_pool = _media_download_pool, None
+        await pool.close()
+    close_media_store()
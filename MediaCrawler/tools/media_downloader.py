@@ -0,0 +1,128 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+# @Desc    : 媒体文件流式下载：分块写入临时文件 + 原子重命名，支持 HTTP Range 断点续传、大小上限和单文件超时
+import asyncio
+import os
+import re
+from typing import Dict, Optional
+
+import aiofiles
+import httpx
+
+import config
+from tools.utils import utils
+
+# 下载中的临时文件后缀，下载完成后原子重命名为目标文件
+PART_SUFFIX = ".part"
+
+_CONTENT_RANGE_PATTERN = re.compile(r"bytes (\d+)-\d+/(\d+|\*)")
+
+
+class MediaTooLargeError(Exception):
+    pass
+
+
+def _expected_total_size(response: httpx.Response, offset: int) -> Optional[int]:
+    """
+    total size of the resource, from Content-Range for 206 responses or Content-Length otherwise
+    """
+    if response.status_code == 206:
+        match = _CONTENT_RANGE_PATTERN.match(response.headers.get("Content-Range", ""))
+        if match and match.group(2) != "*":
+            return int(match.group(2))
+    content_length = response.headers.get("Content-Length")
+    if content_length and content_length.isdigit():
+        return offset + int(content_length)
+    return None
+
+
+async def download_to_file(
+    client: httpx.AsyncClient,
+    url: str,
+    save_file_name: str,
+    headers: Optional[Dict] = None,
+    max_bytes: Optional[int] = None,
+    timeout_sec: Optional[float] = None,
+    chunk_size: Optional[int] = None,
+) -> bool:
+    """
+    Stream url into save_file_name without holding the body in memory.
+    Chunks go to save_file_name + ".part", which is renamed onto save_file_name once complete;
+    a .part file left by an interrupted download is resumed with an HTTP Range request.
+    Args:
+        client: httpx client carrying the platform proxy settings
+        url: media url
+        save_file_name: final file path, its directory must exist
+        headers: extra request headers
+        max_bytes: size cap of one file, 0 disables the cap, defaults to config.MEDIA_DOWNLOAD_MAX_BYTES
+        timeout_sec: total time allowed for one file, defaults to config.MEDIA_DOWNLOAD_TIMEOUT_SEC
+        chunk_size: bytes per chunk, defaults to config.MEDIA_DOWNLOAD_CHUNK_SIZE
+
+    Returns:
+        True when the file is complete on disk
+    """
+    max_bytes = config.MEDIA_DOWNLOAD_MAX_BYTES if max_bytes is None else max_bytes
+    timeout_sec = timeout_sec or config.MEDIA_DOWNLOAD_TIMEOUT_SEC
+    chunk_size = chunk_size or config.MEDIA_DOWNLOAD_CHUNK_SIZE
+    part_file_name = save_file_name + PART_SUFFIX
+
+    try:
+        async with asyncio.timeout(timeout_sec):
+            await _download_part(client, url, part_file_name, dict(headers or {}), max_bytes, chunk_size)
+    except TimeoutError:
+        # 保留 .part 文件, 下次下载时断点续传
+        utils.logger.error(f"[download_to_file] download {url} timeout after {timeout_sec}s, partial file kept for resume")
+        return False
+    except MediaTooLargeError as e:
+        utils.logger.error(f"[download_to_file] skip {url}: {e}")
+        if os.path.exists(part_file_name):
+            os.remove(part_file_name)
+        return False
+    except httpx.HTTPError as exc:
+        utils.logger.error(f"[download_to_file] {exc.__class__.__name__} for {url} - {exc}")
+        return False
+
+    os.replace(part_file_name, save_file_name)
+    return True
+
+
+async def _download_part(client: httpx.AsyncClient, url: str, part_file_name: str, headers: Dict, max_bytes: int, chunk_size: int):
+    offset = os.path.getsize(part_file_name) if os.path.exists(part_file_name) else 0
+    if offset:
+        headers["Range"] = f"bytes={offset}-"
+
+    async with client.stream("GET", url, headers=headers, follow_redirects=True) as response:
+        if response.status_code == 416 and offset:
+            # 服务端认为已无剩余内容, 即上次已下载完整
+            return
+        response.raise_for_status()
+
+        resumed = False
+        if response.status_code == 206:
+            match = _CONTENT_RANGE_PATTERN.match(response.headers.get("Content-Range", ""))
+            resumed = bool(match) and int(match.group(1)) == offset
+        if not resumed:
+            # 服务端不支持 Range 或返回了完整内容, 从头开始写
+            offset = 0
+
+        total_size = _expected_total_size(response, offset)
+        if max_bytes and total_size and total_size > max_bytes:
+            raise MediaTooLargeError(f"size {total_size} exceeds limit {max_bytes}")
+
+        written = offset
+        async with aiofiles.open(part_file_name, "ab" if resumed else "wb") as f:
+            async for chunk in response.aiter_bytes(chunk_size):
+                written += len(chunk)
+                if max_bytes and written > max_bytes:
+                    raise MediaTooLargeError(f"size exceeds limit {max_bytes}")
+                await f.write(chunk)
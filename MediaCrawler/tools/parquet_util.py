@@ -0,0 +1,117 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+# @Desc    : Parquet 输出辅助函数：根据 database/models.py 推导 Arrow schema，并把字典行转换为 RecordBatch
+import json
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import Integer
+
+from tools import utils
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - 仅在选择 parquet 存储时需要
+    pa = None
+    pq = None
+
+# ORM 自增主键不属于采集数据
+_SKIPPED_COLUMNS = {"id"}
+
+
+def ensure_pyarrow():
+    if pa is None:
+        raise ImportError("SAVE_DATA_OPTION=parquet requires pyarrow, please run: pip install pyarrow")
+
+
+def build_schema(fieldnames: List[str], model=None, first_row: Optional[Dict] = None) -> "pa.Schema":
+    """
+    Build the Arrow schema of a parquet file
+    Args:
+        fieldnames: ordered field names of the first row
+        model: ORM model in database/models.py, integer columns become int64, everything else string
+        first_row: first row of the file, an integer column whose value there is not an integer
+            (e.g. "1.2万", "10w+") is kept as string
+
+    Returns:
+        pa.Schema, model columns missing from the first row are appended at the end
+    """
+    ensure_pyarrow()
+    column_types = {}
+    if model is not None:
+        for column in model.__table__.columns:
+            if column.name in _SKIPPED_COLUMNS:
+                continue
+            is_int = isinstance(column.type, Integer)
+            if is_int and first_row is not None and _to_int(first_row.get(column.name)) is _INVALID:
+                is_int = False
+            column_types[column.name] = pa.int64() if is_int else pa.string()
+
+    names = list(fieldnames) + [name for name in column_types if name not in fieldnames]
+    return pa.schema([pa.field(name, column_types.get(name, pa.string())) for name in names])
+
+
+# _to_int 无法转换时的返回值, 区别于空值 None
+_INVALID = object()
+_INT64_MIN, _INT64_MAX = -2 ** 63, 2 ** 63 - 1
+
+
+def _to_int(value: Any) -> Any:
+    if value is None or value == "":
+        return None
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        try:
+            number = float(value)
+        except (TypeError, ValueError):
+            return _INVALID
+        if not number.is_integer():
+            return _INVALID
+        number = int(number)
+    return number if _INT64_MIN <= number <= _INT64_MAX else _INVALID
+
+
+def _to_str(value: Any) -> Optional[str]:
+    if value is None:
+        return None
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, ensure_ascii=False)
+    return str(value)
+
+
+def rows_to_record_batch(rows: List[Dict], schema: "pa.Schema") -> "pa.RecordBatch":
+    """
+    Convert buffered rows into one record batch, values are coerced to the schema types
+    and keys that are not in the schema are dropped. Values of integer columns that are not
+    integers are written as null and logged
+    """
+    arrays = []
+    for field in schema:
+        if not pa.types.is_integer(field.type):
+            arrays.append(pa.array([_to_str(row.get(field.name)) for row in rows], type=field.type))
+            continue
+        values, invalid = [], []
+        for row in rows:
+            value = _to_int(row.get(field.name))
+            if value is _INVALID:
+                invalid.append(row.get(field.name))
+                value = None
+            values.append(value)
+        if invalid:
+            utils.logger.warning(
+                f"[parquet_util.rows_to_record_batch] {len(invalid)} non-integer value(s) of column {field.name} "
+                f"written as null, e.g. {invalid[:5]}"
+            )
+        arrays.append(pa.array(values, type=field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
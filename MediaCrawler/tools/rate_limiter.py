@@ -0,0 +1,94 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+# @Desc    : 自适应令牌桶限速(AIMD)：请求成功时线性提速，出现验证码/封禁时成倍降速，同一域名的所有请求共享一个令牌桶
+import asyncio
+import time
+from typing import Dict
+
+import config
+
+
+class AdaptiveTokenBucket:
+    """
+    Token bucket whose refill rate (requests per second) adapts AIMD-style:
+    every successful request adds increase_step to the rate, every throttle signal
+    (captcha, blocked response, HTTP 429) multiplies it by decrease_factor and drops the saved tokens.
+    """
+
+    def __init__(self, rate: float = None, burst: float = None, min_rate: float = None, max_rate: float = None,
+                 increase_step: float = None, decrease_factor: float = None):
+        self.min_rate = min_rate or config.RATE_LIMIT_MIN_RPS
+        self.max_rate = max_rate or config.RATE_LIMIT_MAX_RPS
+        self.rate = min(self.max_rate, max(self.min_rate, rate or config.RATE_LIMIT_INITIAL_RPS))
+        self.burst = burst or config.RATE_LIMIT_BURST
+        self.increase_step = config.RATE_LIMIT_INCREASE_STEP if increase_step is None else increase_step
+        self.decrease_factor = decrease_factor or config.RATE_LIMIT_DECREASE_FACTOR
+        self.tokens = 1.0
+        self.throttled_count = 0
+        self._updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    async def acquire(self):
+        """
+        wait until one token is available, waiters are served in arrival order
+        """
+        async with self._lock:
+            self._refill()
+            while self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= 1
+
+    def on_success(self):
+        self.rate = min(self.max_rate, self.rate + self.increase_step)
+
+    def on_throttled(self):
+        self.throttled_count += 1
+        self.rate = max(self.min_rate, self.rate * self.decrease_factor)
+        # 丢弃积攒的令牌, 降速立即生效
+        self._refill()
+        self.tokens = min(self.tokens, 0.0)
+
+    def stats(self) -> Dict:
+        return {"rate": round(self.rate, 3), "tokens": round(self.tokens, 3), "throttled": self.throttled_count}
+
+
+_buckets: Dict[str, AdaptiveTokenBucket] = {}
+
+
+def get_token_bucket(key: str) -> AdaptiveTokenBucket:
+    """
+    shared bucket of a host (optionally suffixed with an account id), created on first use
+    """
+    if key not in _buckets:
+        _buckets[key] = AdaptiveTokenBucket()
+    return _buckets[key]
+
+
+def rate_limit_stats() -> Dict[str, Dict]:
+    return {key: bucket.stats() for key, bucket in _buckets.items()}
+
+
+async def crawl_sleep(seconds: float):
+    """
+    Pause between pages/notes/comment batches. With ENABLE_ADAPTIVE_RATE_LIMIT the api requests
+    are already paced by the token buckets, so the fixed sleep is skipped
+    """
+    if config.ENABLE_ADAPTIVE_RATE_LIMIT:
+        return
+    await asyncio.sleep(seconds)
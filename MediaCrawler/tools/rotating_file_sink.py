@@ -0,0 +1,147 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+# @Desc    : 分卷(可压缩)文本输出：X.csv -> X_part0001.csv.zst, X_part0002.csv.zst ... 以及 X_manifest.json
+import asyncio
+import gzip
+import json
+import os
+from typing import Dict, List
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - 仅在选择 zstd 压缩时需要
+    zstandard = None
+
+COMPRESSION_SUFFIXES = {
+    "": "",
+    "gzip": ".gz",
+    "zstd": ".zst",
+}
+
+
+def _open_compressed(path: str, compression: str):
+    """
+    open a binary sync file object for one part, closing it also finishes the compressed stream
+    """
+    if compression == "gzip":
+        return gzip.open(path, "wb")
+    if compression == "zstd":
+        if zstandard is None:
+            raise ImportError("CSV_COMPRESSION=zstd requires zstandard, please run: pip install zstandard")
+        return zstandard.ZstdCompressor(level=3).stream_writer(open(path, "wb"), closefd=True)
+    return open(path, "wb")
+
+
+class RotatingFileSink:
+    """
+    Text sink writing into numbered, optionally compressed part files.
+    Every part starts with the header (e.g. the CSV header row), a new part is started once
+    the current one reaches max_rows rows or max_bytes uncompressed bytes, and a manifest
+    listing the parts and their row counts is rewritten on every rotation and on close.
+    """
+
+    def __init__(self, base_path: str, header: str = "", compression: str = "",
+                 max_bytes: int = 0, max_rows: int = 0, encoding: str = "utf-8-sig"):
+        if compression not in COMPRESSION_SUFFIXES:
+            raise ValueError(f"Unsupported compression: {compression}, only supported gzip or zstd")
+        self.base_path = base_path
+        self.header = header
+        self.compression = compression
+        self.max_bytes = max_bytes
+        self.max_rows = max_rows
+        self.encoding = encoding
+        root, self.ext = os.path.splitext(base_path)
+        self.root = root
+        self.manifest_path = f"{root}_manifest.json"
+        self.parts: List[Dict] = []
+        self._file = None
+        self._part_index = 0
+
+    def _part_path(self, index: int) -> str:
+        return f"{self.root}_part{index:04d}{self.ext}{COMPRESSION_SUFFIXES[self.compression]}"
+
+    def _open_next_part(self):
+        self._part_index += 1
+        # 不覆盖之前运行留下的分卷
+        while os.path.exists(self._part_path(self._part_index)):
+            self._part_index += 1
+        path = self._part_path(self._part_index)
+        self._file = _open_compressed(path, self.compression)
+        self.parts.append({"file": os.path.basename(path), "rows": 0, "bytes": 0})
+        if self.header:
+            self._write_text(self.header, bom=True)
+
+    def _write_text(self, text: str, bom: bool = False):
+        encoding = self.encoding if bom else self.encoding.replace("-sig", "")
+        data = text.encode(encoding)
+        self._file.write(data)
+        self.parts[-1]["bytes"] += len(data)
+
+    def _close_part(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _write_manifest(self):
+        manifest = {
+            "base_file": os.path.basename(self.base_path),
+            "compression": self.compression or None,
+            "total_rows": sum(part["rows"] for part in self.parts),
+            "parts": self.parts,
+        }
+        with open(self.manifest_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=4)
+
+    def reaches_max_rows(self, pending_rows: int) -> bool:
+        """
+        whether the current part reaches max_rows once pending_rows more rows are written
+        """
+        if not self.max_rows:
+            return False
+        current_rows = self.parts[-1]["rows"] if self._file is not None else 0
+        return current_rows + pending_rows >= self.max_rows
+
+    def _write_sync(self, text: str, rows: int):
+        if self._file is None:
+            self._open_next_part()
+        self._write_text(text)
+        self.parts[-1]["rows"] += rows
+        part = self.parts[-1]
+        if (self.max_rows and part["rows"] >= self.max_rows) or (self.max_bytes and part["bytes"] >= self.max_bytes):
+            self._close_part()
+            self._write_manifest()
+
+    def _flush_sync(self):
+        if self._file is not None:
+            self._file.flush()
+
+    def _close_sync(self):
+        self._close_part()
+        if self.parts:
+            self._write_manifest()
+
+    async def write(self, text: str, rows: int = 0):
+        """
+        Write text holding `rows` complete rows, rotation only happens between writes
+        Args:
+            text: already formatted rows
+            rows: number of rows in text, used for the manifest and max_rows
+        """
+        await asyncio.to_thread(self._write_sync, text, rows)
+
+    async def flush(self):
+        await asyncio.to_thread(self._flush_sync)
+
+    async def close(self):
+        await asyncio.to_thread(self._close_sync)
+
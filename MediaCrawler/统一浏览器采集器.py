@@ -99,7 +99,7 @@ class UnifiedBrowserCrawler:
             if platform == "dy":
                 from store.douyin import DouyinStoreFactory
                 import store.douyin as douyin_store
-                DouyinStoreFactory.reset_store()
+                await DouyinStoreFactory.reset_store()
                 douyin_store._video_info_cache.clear()
                 if output_dir:
                     DouyinStoreFactory.set_output_dir(output_dir)
@@ -107,7 +107,7 @@ class UnifiedBrowserCrawler:
             elif platform == "xhs":
                 from store.xhs import XhsStoreFactory
                 import store.xhs as xhs_store
-                XhsStoreFactory.reset_store()
+                await XhsStoreFactory.reset_store()
                 if hasattr(xhs_store, '_note_info_cache'):
                     xhs_store._note_info_cache.clear()
                 if output_dir:
@@ -255,7 +255,7 @@ class UnifiedBrowserCrawler:
             # 🔥 重置store
             from store.douyin import DouyinStoreFactory
             import store.douyin as douyin_store
-            DouyinStoreFactory.reset_store()
+            await DouyinStoreFactory.reset_store()
             douyin_store._video_info_cache.clear()
 
             if output_dir:
@@ -311,7 +311,7 @@ class UnifiedBrowserCrawler:
             # 🔥 重置store
             from store.douyin import DouyinStoreFactory
             import store.douyin as douyin_store
-            DouyinStoreFactory.reset_store()
+            await DouyinStoreFactory.reset_store()
             douyin_store._video_info_cache.clear()
 
             if output_dir:
@@ -395,6 +395,15 @@ class UnifiedBrowserCrawler:
             import traceback
             traceback.print_exc()
             raise
+        finally:
+            # 🔥 等待后台媒体下载完成，再刷新并关闭存储，保证缓冲中的数据全部写入文件
+            from store.douyin import DouyinStoreFactory
+            from tools.media_download_pool import close_media_download_pool
+            await close_media_download_pool()
+            await DouyinStoreFactory.close_store()
+            # 🔥 关闭客户端连接池，下次采集会重新创建客户端
+            if getattr(self.crawler, "dy_client", None):
+                await self.crawler.dy_client.aclose()
 
     async def start_unified_xiaohongshu_crawling(self):
         """🔥 使用统一浏览器进行小红书采集 - 支持三种模式"""
@@ -452,6 +461,15 @@ class UnifiedBrowserCrawler:
             import traceback
             traceback.print_exc()
             raise
+        finally:
+            # 🔥 等待后台媒体下载完成，再刷新并关闭存储，保证缓冲中的数据全部写入文件
+            from store.xhs import XhsStoreFactory
+            from tools.media_download_pool import close_media_download_pool
+            await close_media_download_pool()
+            await XhsStoreFactory.close_store()
+            # 🔥 关闭客户端连接池，下次采集会重新创建客户端
+            if getattr(self.crawler, "xhs_client", None):
+                await self.crawler.xhs_client.aclose()
 
     async def _rpa_search_and_collect(self):
         """🔥 RPA搜索并收集链接,然后抓取评论 - 支持抖音和小红书"""